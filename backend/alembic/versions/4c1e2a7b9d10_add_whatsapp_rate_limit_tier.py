@@ -0,0 +1,29 @@
+"""add whatsapp rate limit tier to tenant settings
+
+Revision ID: 4c1e2a7b9d10
+Revises: b01c91fd348d
+Create Date: 2026-10-17 09:12:41.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e2a7b9d10'
+down_revision: Union[str, None] = 'b01c91fd348d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'tenant_settings',
+        sa.Column('whatsapp_rate_limit_tier', sa.String(length=20), nullable=True, server_default='standard')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('tenant_settings', 'whatsapp_rate_limit_tier')
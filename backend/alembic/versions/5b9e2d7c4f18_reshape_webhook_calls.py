@@ -0,0 +1,54 @@
+"""reshape webhook_calls to match the call-ended webhook
+
+Revision ID: 5b9e2d7c4f18
+Revises: 7d3f0c5e2b41
+Create Date: 2026-10-17 14:05:12.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e2d7c4f18'
+down_revision: Union[str, None] = '7d3f0c5e2b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('webhook_calls', sa.Column('provider', sa.String(length=50), nullable=True))
+    op.add_column('webhook_calls', sa.Column('call_sid', sa.String(length=255), nullable=True))
+    op.add_column('webhook_calls', sa.Column('caller_phone', sa.String(length=20), nullable=True))
+    op.add_column('webhook_calls', sa.Column('receiver_phone', sa.String(length=20), nullable=True))
+    op.add_column('webhook_calls', sa.Column('status', sa.String(length=50), nullable=True))
+    op.add_column('webhook_calls', sa.Column('raw_payload', sa.JSON(), nullable=True))
+    op.add_column(
+        'webhook_calls',
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True)
+    )
+    op.execute(
+        "UPDATE webhook_calls SET caller_phone = caller_number, status = call_status, provider = 'generic'"
+    )
+    op.drop_column('webhook_calls', 'caller_number')
+    op.drop_column('webhook_calls', 'call_status')
+    op.drop_column('webhook_calls', 'call_duration_seconds')
+    op.create_index(op.f('ix_webhook_calls_tenant_id'), 'webhook_calls', ['tenant_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_webhook_calls_tenant_id'), table_name='webhook_calls')
+    op.add_column('webhook_calls', sa.Column('call_duration_seconds', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('webhook_calls', sa.Column('call_status', sa.String(), nullable=False, server_default=''))
+    op.add_column('webhook_calls', sa.Column('caller_number', sa.String(), nullable=False, server_default=''))
+    op.execute(
+        "UPDATE webhook_calls SET caller_number = COALESCE(caller_phone, ''), call_status = COALESCE(status, '')"
+    )
+    op.drop_column('webhook_calls', 'created_at')
+    op.drop_column('webhook_calls', 'raw_payload')
+    op.drop_column('webhook_calls', 'status')
+    op.drop_column('webhook_calls', 'receiver_phone')
+    op.drop_column('webhook_calls', 'call_sid')
+    op.drop_column('webhook_calls', 'provider')
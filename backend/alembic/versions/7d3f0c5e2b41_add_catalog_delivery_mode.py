@@ -0,0 +1,31 @@
+"""add catalog delivery mode to tenant settings
+
+Revision ID: 7d3f0c5e2b41
+Revises: 4c1e2a7b9d10
+Create Date: 2026-10-17 11:40:03.552190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f0c5e2b41'
+down_revision: Union[str, None] = '4c1e2a7b9d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'tenant_settings',
+        sa.Column('catalog_delivery_mode', sa.String(length=30), nullable=True, server_default='images')
+    )
+    op.add_column('tenant_settings', sa.Column('whatsapp_catalog_id', sa.String(length=100), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tenant_settings', 'whatsapp_catalog_id')
+    op.drop_column('tenant_settings', 'catalog_delivery_mode')
@@ -0,0 +1,52 @@
+"""unique call per (tenant, provider, call_sid)
+
+Revision ID: 8e4a1c6d2b57
+Revises: 5b9e2d7c4f18
+Create Date: 2026-10-17 15:22:47.106215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e4a1c6d2b57'
+down_revision: Union[str, None] = '5b9e2d7c4f18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# The row kept for each (tenant_id, provider, call_sid): the lowest id
+KEEP_ID = """
+    SELECT MIN(k.id) FROM calls k
+    WHERE k.tenant_id = {row}.tenant_id AND k.provider = {row}.provider AND k.call_sid = {row}.call_sid
+"""
+
+
+def upgrade() -> None:
+    # Merge existing duplicates: point their message logs at the kept call,
+    # then delete them (webhook_calls does not reference calls)
+    op.execute(f"""
+        UPDATE message_logs SET call_id = (
+            SELECT ({KEEP_ID.format(row='d')}) FROM calls d WHERE d.id = message_logs.call_id
+        )
+        WHERE call_id IN (
+            SELECT c.id FROM calls c
+            WHERE c.call_sid IS NOT NULL AND c.id > ({KEEP_ID.format(row='c')})
+        )
+    """)
+    op.execute(f"""
+        DELETE FROM calls
+        WHERE call_sid IS NOT NULL AND id > ({KEEP_ID.format(row='calls')})
+    """)
+    op.create_unique_constraint(
+        'uq_calls_tenant_provider_call_sid',
+        'calls',
+        ['tenant_id', 'provider', 'call_sid']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_calls_tenant_provider_call_sid', 'calls', type_='unique')
@@ -0,0 +1,31 @@
+"""message log replay payload for message-level retries
+
+Revision ID: a6f2d9c3e180
+Revises: 8e4a1c6d2b57
+Create Date: 2026-10-17 18:04:12.530981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6f2d9c3e180'
+down_revision: Union[str, None] = '8e4a1c6d2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('message_logs', sa.Column('payload', sa.JSON(), nullable=True))
+    op.add_column('message_logs', sa.Column('last_attempt_at', sa.DateTime(timezone=True), nullable=True))
+    # Retry workers scan for status = 'failed' / 'retrying'
+    op.create_index(op.f('ix_message_logs_status'), 'message_logs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_message_logs_status'), table_name='message_logs')
+    op.drop_column('message_logs', 'last_attempt_at')
+    op.drop_column('message_logs', 'payload')
@@ -0,0 +1,33 @@
+"""message log step journal (step key, idempotency key)
+
+Revision ID: d3b8e5f1a2c4
+Revises: a6f2d9c3e180
+Create Date: 2026-10-17 19:41:03.118254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3b8e5f1a2c4'
+down_revision: Union[str, None] = 'a6f2d9c3e180'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('message_logs', sa.Column('step_key', sa.String(length=100), nullable=True))
+    op.add_column('message_logs', sa.Column('idempotency_key', sa.String(length=150), nullable=True))
+    op.create_unique_constraint('uq_message_logs_idempotency_key', 'message_logs', ['idempotency_key'])
+    # The journal of a call is loaded by call_id
+    op.create_index(op.f('ix_message_logs_call_id'), 'message_logs', ['call_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_message_logs_call_id'), table_name='message_logs')
+    op.drop_constraint('uq_message_logs_idempotency_key', 'message_logs', type_='unique')
+    op.drop_column('message_logs', 'idempotency_key')
+    op.drop_column('message_logs', 'step_key')
@@ -1,13 +1,14 @@
-from typing import Generator, Annotated, Optional
+from typing import AsyncGenerator, Generator, Annotated, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 from app.core.security import verify_password
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
 from app.models.user import User as UserModel
 from app.schemas.token import TokenPayload
 
@@ -27,6 +28,15 @@ def get_db_dep() -> Generator:
 DBSessionDep = Annotated[Session, Depends(get_db_dep)]
 
 
+async def get_async_db_dep() -> AsyncGenerator[AsyncSession, None]:
+    """Yield an AsyncSession for `async def` handlers and close it afterwards."""
+    async for db in get_async_db():
+        yield db
+
+
+AsyncDBSessionDep = Annotated[AsyncSession, Depends(get_async_db_dep)]
+
+
 # ---------- USER HELPERS ----------
 
 def get_user_by_email(db: Session, email: str) -> Optional[UserModel]:
@@ -54,14 +64,8 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[UserMo
 
 # ---------- CURRENT USER DEPENDENCY ----------
 
-def get_current_user(
-    db: DBSessionDep,
-    credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(bearer_scheme)],
-) -> UserModel:
-    """
-    Extract user from Bearer token.
-    Expects header: Authorization: Bearer <token>
-    """
+def _token_user_id(credentials: Optional[HTTPAuthorizationCredentials]) -> int:
+    """Return the user id of a Bearer token or raise 401/403."""
     if credentials is None or not credentials.credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -90,15 +94,43 @@ def get_current_user(
             detail="Could not validate credentials",
         )
 
-    user_id = int(token_data.sub)
-    user = db.query(UserModel).filter(UserModel.id == user_id).first()
+    return int(token_data.sub)
+
+
+def _user_or_404(user: Optional[UserModel]) -> UserModel:
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
-
     return user
 
 
+async def get_current_user(
+    db: AsyncDBSessionDep,
+    credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(bearer_scheme)],
+) -> UserModel:
+    """
+    Extract user from Bearer token.
+    Expects header: Authorization: Bearer <token>
+    For `async def` handlers (AsyncSession).
+    """
+    user_id = _token_user_id(credentials)
+    return _user_or_404(await db.get(UserModel, user_id))
+
+
+def get_current_user_sync(
+    db: DBSessionDep,
+    credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(bearer_scheme)],
+) -> UserModel:
+    """
+    Same as get_current_user, for sync `def` handlers: the user is read on the
+    handler's own (cached per request) Session instead of a second, async
+    pool connection.
+    """
+    user_id = _token_user_id(credentials)
+    return _user_or_404(db.get(UserModel, user_id))
+
+
 CurrentUserDep = Annotated[UserModel, Depends(get_current_user)]
+CurrentUserSyncDep = Annotated[UserModel, Depends(get_current_user_sync)]
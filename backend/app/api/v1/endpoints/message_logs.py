@@ -1,13 +1,15 @@
 # NEW FILE - API for viewing message history
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timedelta
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_async_db_dep, get_current_user
 from app.models.user import User
 from app.models.message_log import MessageLog
 from app.schemas.message_log import MessageLogResponse
+from app.services.automation_journal import STATUS_UNKNOWN
 
 router = APIRouter()
 
@@ -19,56 +21,55 @@ async def get_message_logs(
     status: Optional[str] = None,
     phone: Optional[str] = None,
     days: int = Query(7, ge=1, le=90),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_dep),
     current_user: User = Depends(get_current_user)
 ):
     """Get message history for the tenant"""
-    query = db.query(MessageLog).filter(
+    query = select(MessageLog).where(
         MessageLog.tenant_id == current_user.tenant_id,
         MessageLog.created_at >= datetime.utcnow() - timedelta(days=days)
     )
 
     if status:
-        query = query.filter(MessageLog.status == status)
+        query = query.where(MessageLog.status == status)
 
     if phone:
-        query = query.filter(MessageLog.recipient_phone.contains(phone))
+        query = query.where(MessageLog.recipient_phone.contains(phone))
 
-    messages = query.order_by(MessageLog.created_at.desc()).offset(skip).limit(limit).all()
+    result = await db.execute(query.order_by(MessageLog.created_at.desc()).offset(skip).limit(limit))
 
-    return messages
+    return result.scalars().all()
 
 
 @router.get("/stats")
 async def get_message_stats(
     days: int = Query(7, ge=1, le=90),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_dep),
     current_user: User = Depends(get_current_user)
 ):
     """Get message statistics"""
     since = datetime.utcnow() - timedelta(days=days)
 
-    total = db.query(MessageLog).filter(
-        MessageLog.tenant_id == current_user.tenant_id,
-        MessageLog.created_at >= since
-    ).count()
-
-    sent = db.query(MessageLog).filter(
-        MessageLog.tenant_id == current_user.tenant_id,
-        MessageLog.created_at >= since,
-        MessageLog.status == "sent"
-    ).count()
-
-    failed = db.query(MessageLog).filter(
-        MessageLog.tenant_id == current_user.tenant_id,
-        MessageLog.created_at >= since,
-        MessageLog.status == "failed"
-    ).count()
+    # One round-trip for all three counts
+    result = await db.execute(
+        select(
+            func.count(MessageLog.id),
+            func.count(case((MessageLog.status == "sent", 1))),
+            func.count(case((MessageLog.status == "failed", 1))),
+            func.count(case((MessageLog.status == STATUS_UNKNOWN, 1))),
+        ).where(
+            MessageLog.tenant_id == current_user.tenant_id,
+            MessageLog.created_at >= since
+        )
+    )
+    total, sent, failed, unknown = result.one()
 
     return {
         "period_days": days,
         "total_messages": total,
         "sent": sent,
         "failed": failed,
+        # Timed out after sending: may or may not have reached the customer
+        "delivery_unknown": unknown,
         "success_rate": round((sent / total * 100), 2) if total > 0 else 0
     }
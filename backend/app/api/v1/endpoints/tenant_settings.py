@@ -1,9 +1,12 @@
 # NEW FILE - API endpoints for tenant settings management
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, cast
+from datetime import datetime, timezone
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_async_db_dep, get_current_user
 from app.models.user import User
 from app.models.tenant_settings import TenantSettings
 from app.schemas.tenant_settings import (
@@ -11,55 +14,89 @@ from app.schemas.tenant_settings import (
     TenantSettingsUpdate,
     TenantSettingsPublic,
     WhatsAppCredentialsUpdate,
-    WebhookSecurityUpdate
+    WebhookSecurityUpdate,
+    WhatsAppCircuitStatus
 )
+from app.services.circuit_breaker import get_circuit_breaker
+from app.services.tenant_routing import invalidate_tenant_route
 from app.services.whatsapp_client import WhatsAppCloudAPIClient
 
 router = APIRouter()
 
 
+# The circuit breaker and the route invalidation talk to Redis synchronously:
+# they run in the threadpool, never on the event loop
+async def _public_settings(settings: TenantSettings) -> TenantSettingsPublic:
+    """Convert to public response (hide tokens, add circuit breaker state)"""
+    circuit = await run_in_threadpool(
+        get_circuit_breaker().status,
+        cast(int, settings.tenant_id),
+        cast(Optional[str], settings.whatsapp_phone_number_id)
+    )
+    public = TenantSettingsPublic.model_validate(settings)
+    public.whatsapp_circuit_state = circuit.state
+    public.whatsapp_circuit_reason = circuit.reason
+    public.whatsapp_circuit_opened_at = _timestamp(circuit.opened_at)
+    return public
+
+
+async def _tenant_settings(db: AsyncSession, tenant_id: int) -> Optional[TenantSettings]:
+    result = await db.execute(select(TenantSettings).where(TenantSettings.tenant_id == tenant_id))
+    return result.scalars().first()
+
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value, tz=timezone.utc) if value else None
+
+
+async def _invalidate_route(tenant_id: int) -> None:
+    await run_in_threadpool(invalidate_tenant_route, tenant_id)
+
+
+def _circuit_status(tenant_id: int, phone_number_id: Optional[str]) -> WhatsAppCircuitStatus:
+    breaker = get_circuit_breaker()
+    status = breaker.status(tenant_id, phone_number_id)
+    return WhatsAppCircuitStatus(
+        state=status.state,
+        failures=status.failures,
+        reason=status.reason,
+        opened_at=_timestamp(status.opened_at),
+        updated_at=_timestamp(status.updated_at),
+        transitions=[
+            {"state": t["state"], "reason": t.get("reason"), "at": _timestamp(t["at"])}
+            for t in breaker.transitions(tenant_id, phone_number_id)
+        ]
+    )
+
+
 @router.get("/", response_model=TenantSettingsPublic)
 async def get_tenant_settings(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_dep),
     current_user: User = Depends(get_current_user)
 ):
     """Get current tenant settings (hides sensitive data)"""
-    settings = db.query(TenantSettings).filter(
-        TenantSettings.tenant_id == cast(int, current_user.tenant_id)
-    ).first()
+    settings = await _tenant_settings(db, cast(int, current_user.tenant_id))
 
     if not settings:
         # Create default settings
         settings = TenantSettings(tenant_id=cast(int, current_user.tenant_id))
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        await db.refresh(settings)
+        await _invalidate_route(cast(int, current_user.tenant_id))
 
     # Convert to public response (hide tokens)
-    return TenantSettingsPublic(
-        id=cast(int, settings.id),
-        tenant_id=cast(int, settings.tenant_id),
-        thank_you_message=cast(str, settings.thank_you_message),
-        include_catalog=cast(bool, settings.include_catalog),
-        catalog_header_message=cast(str, settings.catalog_header_message),
-        catalog_footer_message=cast(str, settings.catalog_footer_message),
-        message_delay_seconds=cast(int, settings.message_delay_seconds),
-        is_whatsapp_configured=cast(bool, settings.is_whatsapp_configured),
-        has_webhook_secret=bool(cast(Optional[str], settings.webhook_secret_key)),
-        is_active=cast(bool, settings.is_active)
-    )
+    return await _public_settings(settings)
 
 
 @router.put("/", response_model=TenantSettingsPublic)
 async def update_tenant_settings(
     settings_update: TenantSettingsUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_dep),
     current_user: User = Depends(get_current_user)
 ):
     """Update message templates and automation settings"""
-    settings = db.query(TenantSettings).filter(
-        TenantSettings.tenant_id == cast(int, current_user.tenant_id)
-    ).first()
+    settings = await _tenant_settings(db, cast(int, current_user.tenant_id))
 
     if not settings:
         settings = TenantSettings(tenant_id=cast(int, current_user.tenant_id))
@@ -69,33 +106,21 @@ async def update_tenant_settings(
     for field, value in settings_update.dict(exclude_unset=True).items():
         setattr(settings, field, value)
 
-    db.commit()
-    db.refresh(settings)
-
-    return TenantSettingsPublic(
-        id=cast(int, settings.id),
-        tenant_id=cast(int, settings.tenant_id),
-        thank_you_message=cast(str, settings.thank_you_message),
-        include_catalog=cast(bool, settings.include_catalog),
-        catalog_header_message=cast(str, settings.catalog_header_message),
-        catalog_footer_message=cast(str, settings.catalog_footer_message),
-        message_delay_seconds=cast(int, settings.message_delay_seconds),
-        is_whatsapp_configured=cast(bool, settings.is_whatsapp_configured),
-        has_webhook_secret=bool(cast(Optional[str], settings.webhook_secret_key)),
-        is_active=cast(bool, settings.is_active)
-    )
+    await db.commit()
+    await db.refresh(settings)
+    await _invalidate_route(cast(int, current_user.tenant_id))
+
+    return await _public_settings(settings)
 
 
 @router.post("/whatsapp-credentials")
 async def update_whatsapp_credentials(
     credentials: WhatsAppCredentialsUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_dep),
     current_user: User = Depends(get_current_user)
 ):
     """Update WhatsApp Cloud API credentials"""
-    settings = db.query(TenantSettings).filter(
-        TenantSettings.tenant_id == cast(int, current_user.tenant_id)
-    ).first()
+    settings = await _tenant_settings(db, cast(int, current_user.tenant_id))
 
     if not settings:
         settings = TenantSettings(tenant_id=cast(int, current_user.tenant_id))
@@ -105,17 +130,11 @@ async def update_whatsapp_credentials(
     client = WhatsAppCloudAPIClient(
         phone_number_id=credentials.whatsapp_phone_number_id,
         access_token=credentials.whatsapp_access_token,
-        business_account_id=credentials.whatsapp_business_account_id
+        business_account_id=credentials.whatsapp_business_account_id,
+        tenant_id=cast(int, current_user.tenant_id)
     )
 
-    import asyncio
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    try:
-        health_check = loop.run_until_complete(client.check_health())
-    finally:
-        loop.close()
+    health_check = await client.check_health()
 
     if not health_check.get("success"):
         raise HTTPException(
@@ -128,9 +147,20 @@ async def update_whatsapp_credentials(
     setattr(settings, "whatsapp_business_account_id", credentials.whatsapp_business_account_id)
     setattr(settings, "whatsapp_access_token", credentials.whatsapp_access_token)
     setattr(settings, "whatsapp_webhook_verify_token", credentials.whatsapp_webhook_verify_token)
+    if credentials.whatsapp_rate_limit_tier:
+        setattr(settings, "whatsapp_rate_limit_tier", credentials.whatsapp_rate_limit_tier)
     setattr(settings, "is_whatsapp_configured", True)
 
-    db.commit()
+    await db.commit()
+    await _invalidate_route(cast(int, current_user.tenant_id))
+
+    # Verified credentials close any open circuit for this tenant
+    await run_in_threadpool(
+        get_circuit_breaker().reset,
+        cast(int, current_user.tenant_id),
+        credentials.whatsapp_phone_number_id,
+        reason="credentials_updated"
+    )
 
     return {
         "success": True,
@@ -140,15 +170,13 @@ async def update_whatsapp_credentials(
 
 @router.post("/webhook-secret")
 async def generate_webhook_secret(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_dep),
     current_user: User = Depends(get_current_user)
 ):
     """Generate a new webhook secret key"""
     import secrets
 
-    settings = db.query(TenantSettings).filter(
-        TenantSettings.tenant_id == cast(int, current_user.tenant_id)
-    ).first()
+    settings = await _tenant_settings(db, cast(int, current_user.tenant_id))
 
     if not settings:
         settings = TenantSettings(tenant_id=cast(int, current_user.tenant_id))
@@ -156,7 +184,8 @@ async def generate_webhook_secret(
 
     # Generate new secret
     setattr(settings, "webhook_secret_key", secrets.token_urlsafe(32))
-    db.commit()
+    await db.commit()
+    await _invalidate_route(cast(int, current_user.tenant_id))
 
     return {
         "success": True,
@@ -168,35 +197,26 @@ async def generate_webhook_secret(
 @router.post("/test-whatsapp")
 async def test_whatsapp_connection(
     phone_number: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_dep),
     current_user: User = Depends(get_current_user)
 ):
     """Send a test WhatsApp message to verify setup"""
-    settings = db.query(TenantSettings).filter(
-        TenantSettings.tenant_id == cast(int, current_user.tenant_id)
-    ).first()
+    settings = await _tenant_settings(db, cast(int, current_user.tenant_id))
 
     if not settings or not cast(bool, settings.is_whatsapp_configured):
         raise HTTPException(status_code=400, detail="WhatsApp not configured")
 
     client = WhatsAppCloudAPIClient(
         phone_number_id=cast(str, settings.whatsapp_phone_number_id),
-        access_token=cast(str, settings.whatsapp_access_token)
+        access_token=cast(str, settings.whatsapp_access_token),
+        rate_limit_tier=cast(Optional[str], settings.whatsapp_rate_limit_tier),
+        tenant_id=cast(int, current_user.tenant_id)
     )
 
-    import asyncio
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    try:
-        result = loop.run_until_complete(
-            client.send_text_message(
-                to_phone=phone_number,
-                message="🎉 Test message from WhatsApp Automation System! Your configuration is working correctly."
-            )
-        )
-    finally:
-        loop.close()
+    result = await client.send_text_message(
+        to_phone=phone_number,
+        message="🎉 Test message from WhatsApp Automation System! Your configuration is working correctly."
+    )
 
     if result.get("success"):
         return {
@@ -214,22 +234,51 @@ async def test_whatsapp_connection(
 @router.post("/toggle-automation")
 async def toggle_automation(
     enabled: bool,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_dep),
     current_user: User = Depends(get_current_user)
 ):
     """Enable or disable automation"""
-    settings = db.query(TenantSettings).filter(
-        TenantSettings.tenant_id == cast(int, current_user.tenant_id)
-    ).first()
+    settings = await _tenant_settings(db, cast(int, current_user.tenant_id))
 
     if not settings:
         raise HTTPException(status_code=400, detail="Settings not configured")
 
     setattr(settings, "is_active", enabled)
-    db.commit()
+    await db.commit()
+    await _invalidate_route(cast(int, current_user.tenant_id))
 
     return {
         "success": True,
         "is_active": cast(bool, settings.is_active),
         "message": f"Automation {'enabled' if enabled else 'disabled'}"
     }
+
+
+@router.get("/whatsapp-circuit", response_model=WhatsAppCircuitStatus)
+async def get_whatsapp_circuit(
+    db: AsyncSession = Depends(get_async_db_dep),
+    current_user: User = Depends(get_current_user)
+):
+    """Circuit breaker state and recent open/close transitions for the tenant's WhatsApp number"""
+    settings = await _tenant_settings(db, cast(int, current_user.tenant_id))
+
+    phone_number_id = cast(Optional[str], settings.whatsapp_phone_number_id) if settings else None
+    return await run_in_threadpool(_circuit_status, cast(int, current_user.tenant_id), phone_number_id)
+
+
+@router.post("/whatsapp-circuit/reset", response_model=WhatsAppCircuitStatus)
+async def reset_whatsapp_circuit(
+    db: AsyncSession = Depends(get_async_db_dep),
+    current_user: User = Depends(get_current_user)
+):
+    """Manually close the circuit (e.g. after fixing the number in Meta Business Manager)"""
+    settings = await _tenant_settings(db, cast(int, current_user.tenant_id))
+
+    phone_number_id = cast(Optional[str], settings.whatsapp_phone_number_id) if settings else None
+    tenant_id = cast(int, current_user.tenant_id)
+
+    def reset() -> WhatsAppCircuitStatus:
+        get_circuit_breaker().reset(tenant_id, phone_number_id, reason="manual_reset")
+        return _circuit_status(tenant_id, phone_number_id)
+
+    return await run_in_threadpool(reset)
@@ -1,75 +1,46 @@
 # COMPLETE REWRITE - Removed JWT auth, added secret key verification
-import hmac
-import hashlib
+import asyncio
 import logging
-from typing import Optional
 from datetime import datetime
-from fastapi import APIRouter, Request, HTTPException, Depends, Header, Query
-from sqlalchemy.orm import Session
-
-from app.api.deps import get_db
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import APIRouter, Request, Response, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_async_db_dep
+from app.core.config import get_settings
+from app.core.logging import LogPayload, payload_sampled
+from app.core.metrics import CDR_IMPORT_RECORDS
 from app.models.tenant import Tenant
 from app.models.tenant_settings import TenantSettings
-from app.models.call import Call
-from app.models.webhook_call import WebhookCall
-from app.schemas.webhook import CallEndedEvent, WebhookResponse
-from app.tasks.whatsapp_tasks import process_call_ended_automation
+from app.schemas.webhook import CallEndedEvent, CdrBatchResponse, CdrRecordResult, WebhookResponse
+from app.services.call_events import WebhookBody, extract_call_event, record_call_event_async
+from app.services.call_writer import record_event_batch_async, submit_call_event
+from app.services.cdr_import import cdr_format, iter_cdr_records, record_ended_at
+from app.services.telephony import (
+    FALLBACK_PROVIDER,
+    PROVIDER_HINT_HEADER,
+    TelephonyAdapter,
+    get_adapter,
+    signed_by,
+)
+from app.services.tenant_routing import TenantRoute, get_tenant_routes, load_tenant_route_async
+from app.services.webhook_ingest import KEPT_HEADERS, IngestEntry, get_webhook_ingest_log
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-def verify_webhook_signature(
-    payload: bytes,
-    signature: str,
-    secret_key: str,
-    provider: str = "generic"
-) -> bool:
-    """Verify webhook signature from telephony provider"""
-    if provider == "twilio":
-        # Twilio uses HMAC-SHA1
-        expected = hmac.new(
-            secret_key.encode(),
-            payload,
-            hashlib.sha1
-        ).hexdigest()
-        return hmac.compare_digest(expected, signature)
-    else:
-        # Generic HMAC-SHA256
-        expected = hmac.new(
-            secret_key.encode(),
-            payload,
-            hashlib.sha256
-        ).hexdigest()
-        return hmac.compare_digest(expected, signature)
-
-
-def normalize_call_status(status: str, provider: str) -> str:
-    """Normalize call status from different providers"""
-    status = status.lower()
-
-    # Map to standard statuses
-    if status in ["completed", "call-completed", "complete"]:
-        return "completed"
-    elif status in ["busy", "line-busy"]:
-        return "busy"
-    elif status in ["no-answer", "noanswer", "no_answer", "unanswered"]:
-        return "no-answer"
-    elif status in ["failed", "error", "call-failed"]:
-        return "failed"
-    elif status in ["canceled", "cancelled"]:
-        return "canceled"
-    else:
-        return status
-
-
 @router.post("/call-ended/{tenant_slug}", response_model=WebhookResponse)
+@router.post("/call-ended/{tenant_slug}/{provider}", response_model=WebhookResponse)
 async def handle_call_ended_webhook(
     tenant_slug: str,
     request: Request,
-    db: Session = Depends(get_db),
-    x_webhook_signature: Optional[str] = Header(None),
-    x_twilio_signature: Optional[str] = Header(None),
+    response: Response,
+    provider: Optional[str] = None,  # routing hint, e.g. /call-ended/acme/twilio
+    db: AsyncSession = Depends(get_async_db_dep),
     secret: Optional[str] = Query(None)  # Alternative: pass secret as query param
 ):
     """
@@ -80,182 +51,248 @@ async def handle_call_ended_webhook(
     1. Webhook signature verification (if configured)
     2. Secret key in query parameter (simpler alternative)
     3. Tenant slug validation
+
+    The provider adapter is picked from the path (or X-Telephony-Provider
+    header) and otherwise detected from the payload.
+
+    With WEBHOOK_INGEST_MODE=stream the verified delivery is appended to the
+    ingest log and acknowledged with 202; app.workers.webhook_consumer
+    persists the call and queues the automation.
     """
 
-    # Get tenant by slug
-    tenant = db.query(Tenant).filter(
-        Tenant.slug == tenant_slug,
-        Tenant.is_active == True
-    ).first()
+    # Resolve tenant + settings (cached; invalidated when settings change)
+    route = await get_tenant_routes().get_async(tenant_slug, lambda: load_tenant_route_async(db, tenant_slug))
 
-    if not tenant:
+    if not route:
         raise HTTPException(status_code=404, detail="Tenant not found")
 
-    # Get tenant settings
-    settings = db.query(TenantSettings).filter(
-        TenantSettings.tenant_id == tenant.id
-    ).first()
-
-    if not settings:
+    if not route.has_settings:
         raise HTTPException(status_code=400, detail="Tenant settings not configured")
 
+    # The body is read once; it is decoded only if verification or processing needs it
+    body = WebhookBody(await request.body(), request.headers.get("content-type", ""))
+
     # Verify webhook authenticity
-    signature = x_webhook_signature or x_twilio_signature
-
-    if settings.webhook_secret_key:
-        webhook_secret_key_str = str(settings.webhook_secret_key)
-
-        # If secret key is configured, verify it
-        if secret:
-            # Simple query param verification
-            if secret != webhook_secret_key_str:
-                logger.warning(f"Invalid webhook secret for tenant {tenant_slug}")
-                raise HTTPException(status_code=401, detail="Invalid webhook secret")
-        elif signature:
-            # Signature-based verification
-            body = await request.body()
-            provider = "twilio" if x_twilio_signature else "generic"
-            if not verify_webhook_signature(body, signature, webhook_secret_key_str, provider):
-                logger.warning(f"Invalid webhook signature for tenant {tenant_slug}")
-                raise HTTPException(status_code=401, detail="Invalid webhook signature")
-        else:
-            logger.warning(f"No webhook authentication provided for tenant {tenant_slug}")
-            raise HTTPException(status_code=401, detail="Webhook authentication required")
+    signer, signature = signed_by(request.headers)
+    _authenticate(route, tenant_slug, request, secret, body, signer, signature)
+
+    # Fast ack: durably log the verified delivery, the ingest consumer does the rest
+    if get_settings().WEBHOOK_INGEST_MODE == "stream":
+        headers = {k: v for k, v in request.headers.items() if k in KEPT_HEADERS}
+        if provider:
+            headers[PROVIDER_HINT_HEADER] = provider
+        await get_webhook_ingest_log().append(IngestEntry(
+            tenant_slug=tenant_slug,
+            tenant_id=route.tenant_id,
+            body=body.raw,
+            content_type=body.content_type,
+            headers=headers
+        ))
+        response.status_code = 202
+        return WebhookResponse(success=True, message="Webhook accepted")
 
     # Parse webhook payload
-    content_type = request.headers.get("content-type", "")
-
-    if "application/json" in content_type:
-        payload = await request.json()
-    elif "application/x-www-form-urlencoded" in content_type:
-        form_data = await request.form()
-        payload = dict(form_data)
-    else:
-        payload = await request.json()
-
-    logger.info(f"Received webhook for tenant {tenant_slug}: {payload}")
-
-    # Determine provider and extract data
-    provider = "generic"
-    caller_phone = ""
-    receiver_phone = ""
-    call_sid = ""
-    call_status = ""
-    duration = None
-
-    # Twilio format
-    if "CallSid" in payload and "AccountSid" in payload:
-        provider = "twilio"
-        call_sid = str(payload.get("CallSid", ""))
-        caller_phone = str(payload.get("From", payload.get("Caller", "")))
-        receiver_phone = str(payload.get("To", payload.get("Called", "")))
-        call_status_raw = payload.get("CallStatus", "")
-        call_status = str(call_status_raw) if call_status_raw else ""
-        call_duration_raw = payload.get("CallDuration")
-        if call_duration_raw and str(call_duration_raw).isdigit():
-            duration = int(call_duration_raw)
-
-    # Exotel format
-    elif "CallSid" in payload and "Status" in payload:
-        provider = "exotel"
-        call_sid = str(payload.get("CallSid", ""))
-        caller_phone = str(payload.get("From", payload.get("CallFrom", "")))
-        receiver_phone = str(payload.get("To", payload.get("CallTo", "")))
-        status_raw = payload.get("Status", "")
-        call_status = str(status_raw) if status_raw else ""
-        dial_duration_raw = payload.get("DialCallDuration")
-        if dial_duration_raw and str(dial_duration_raw).isdigit():
-            duration = int(dial_duration_raw)
-
-    # Generic format
+    try:
+        payload = body.payload
+        event = extract_call_event(payload, provider, request.headers)
+    except ValueError:  # includes pydantic's ValidationError
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+
+    if payload_sampled(logger, route.tenant_id):
+        logger.info(
+            "Received %s webhook for tenant %s: %s", event.provider, tenant_slug, LogPayload(payload),
+            extra={"tenant_id": route.tenant_id, "call_sid": event.call_sid}
+        )
+
+    if get_settings().CALL_WRITE_BEHIND_ENABLED:
+        # Batched with concurrent webhooks; answers once our batch is committed.
+        # The dedupe claim is a sync Redis call, so it is made off the event loop
+        future = await run_in_threadpool(submit_call_event, route, event)
+        result = await asyncio.wrap_future(future)
     else:
-        call_sid = str(payload.get("call_id", payload.get("call_sid", str(datetime.utcnow().timestamp()))))
-        caller_phone = str(payload.get("caller", payload.get("from", payload.get("caller_phone", ""))))
-        receiver_phone = str(payload.get("receiver", payload.get("to", payload.get("receiver_phone", ""))))
-        status_raw = payload.get("status", "completed")
-        call_status = str(status_raw) if status_raw else "completed"
-        duration_raw = payload.get("duration", payload.get("duration_seconds"))
-        if duration_raw and str(duration_raw).isdigit():
-            duration = int(duration_raw)
-
-    # Normalize status
-    normalized_status = normalize_call_status(call_status, provider)
-
-    # Log the webhook call
-    webhook_log = WebhookCall(
-        tenant_id=tenant.id,
-        provider=provider,
-        call_sid=call_sid,
-        caller_phone=caller_phone,
-        receiver_phone=receiver_phone,
-        status=normalized_status,
-        raw_payload=payload
-    )
-    db.add(webhook_log)
-    db.commit()
-
-    # Create call record
-    call = Call(
-        tenant_id=tenant.id,
-        caller_phone=caller_phone,
-        receiver_phone=receiver_phone,
-        call_sid=call_sid,
-        status=normalized_status,
-        duration_seconds=duration,
-        provider=provider,
-        ended_at=datetime.utcnow()
+        # SQL over the async connection; Redis and broker calls in the threadpool
+        result = await record_call_event_async(db, route, event)
+
+    return WebhookResponse(
+        success=True,
+        message=f"Duplicate {event.provider} webhook ignored" if result.duplicate
+        else f"Webhook processed for {event.provider}",
+        call_id=result.call_id,
+        automation_triggered=result.automation_triggered,
+        duplicate=result.duplicate
     )
-    db.add(call)
-    db.commit()
-    db.refresh(call)
 
-    call_id_int = int(call.id) if call.id else None
 
-    # Trigger automation only for completed calls
-    automation_triggered = False
+@router.post("/cdr/{tenant_slug}", response_model=CdrBatchResponse)
+async def ingest_cdr_batch(
+    tenant_slug: str,
+    request: Request,
+    provider: Optional[str] = Query(None),  # adapter for every record; detected per record otherwise
+    db: AsyncSession = Depends(get_async_db_dep),
+    secret: Optional[str] = Query(None)
+):
+    """
+    Bulk call detail records for one tenant: a JSON array, NDJSON
+    (application/x-ndjson) or CSV (text/csv, header row) body of call events.
+
+    Records go through the same provider adapters as the call-ended webhook,
+    are written in chunks of CDR_BATCH_CHUNK_SIZE (one transaction each) and
+    their automations are queued in bulk. Authenticate with ?secret= (the
+    body is then streamed) or an X-Webhook-Signature HMAC-SHA256 of the body.
+    """
+    route = await get_tenant_routes().get_async(tenant_slug, lambda: load_tenant_route_async(db, tenant_slug))
+
+    if not route:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+
+    if not route.has_settings:
+        raise HTTPException(status_code=400, detail="Tenant settings not configured")
 
-    is_whatsapp_configured = bool(settings.is_whatsapp_configured)
-    is_settings_active = bool(settings.is_active)
+    fmt = cdr_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send application/json, application/x-ndjson or text/csv")
+
+    generic = get_adapter(FALLBACK_PROVIDER)
+    signature = request.headers.get(generic.signature_header)
+    if route.webhook_secret_key and not secret and signature:
+        # A signature covers the whole body: verify before reading any record
+        body = WebhookBody(await request.body(), request.headers.get("content-type", ""))
+        _authenticate(route, tenant_slug, request, secret, body, generic, signature)
+        chunks = _single_chunk(body.raw)
+    else:
+        _authenticate(route, tenant_slug, request, secret, None, None, None)
+        chunks = request.stream()
+
+    settings = get_settings()
+    response = CdrBatchResponse(success=True)
+    # (index, event, ended_at)
+    pending: List[Tuple[int, CallEndedEvent, datetime]] = []
+
+    async def flush() -> None:
+        results = await record_event_batch_async(db, [(route, event, ended_at) for _, event, ended_at in pending])
+        for (index, event, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.error("CDR record %s for tenant %s failed: %s", index, tenant_slug, result)
+                _cdr_result(response, CdrRecordResult(
+                    index=index, status="failed", call_sid=event.call_sid, error="could not be stored"
+                ))
+            else:
+                _cdr_result(response, CdrRecordResult(
+                    index=index,
+                    status="accepted",
+                    call_sid=event.call_sid,
+                    call_id=result.call_id,
+                    automation_triggered=result.automation_triggered
+                ))
+        pending.clear()
+
+    try:
+        async for record in iter_cdr_records(chunks, fmt):
+            if record.index > settings.CDR_BATCH_MAX_RECORDS:
+                response.truncated = True
+                break
+            if record.payload is None:
+                _cdr_result(response, CdrRecordResult(index=record.index, status="invalid", error=record.error))
+                continue
+            try:
+                event = extract_call_event(record.payload, provider, request.headers)
+            except ValueError as e:  # includes pydantic's ValidationError
+                _cdr_result(response, CdrRecordResult(index=record.index, status="invalid", error=_first_error(e)))
+                continue
+            # The call's own end time, not the upload's
+            pending.append((record.index, event, record_ended_at(record.payload) or datetime.utcnow()))
+            if len(pending) >= settings.CDR_BATCH_CHUNK_SIZE:
+                await flush()
+    except ValueError as e:  # a JSON body that is not an array of records
+        raise HTTPException(status_code=400, detail=str(e))
+    if pending:
+        await flush()
+
+    response.results.sort(key=lambda result: result.index)
+    response.success = response.failed == 0
+    logger.info(
+        "CDR batch for tenant %s: %s accepted, %s invalid, %s failed",
+        tenant_slug, response.accepted, response.invalid, response.failed
+    )
+    return response
 
-    if normalized_status == "completed" and caller_phone:
-        if is_whatsapp_configured and is_settings_active:
-            # Queue the automation task
-            delay_seconds = settings.message_delay_seconds or 5
 
-            process_call_ended_automation.apply_async(
-                args=[tenant.id, call_id_int, caller_phone],
-                countdown=delay_seconds
+def _authenticate(
+    route: TenantRoute,
+    tenant_slug: str,
+    request: Request,
+    secret: Optional[str],
+    body: Optional[WebhookBody],
+    signer: Optional[TelephonyAdapter],
+    signature: Optional[str]
+) -> None:
+    """Secret query param or provider signature, when the tenant has a webhook secret"""
+    if not route.webhook_secret_key:
+        return
+    webhook_secret_key_str = route.webhook_secret_key
+
+    # If secret key is configured, verify it
+    if secret:
+        # Simple query param verification
+        if secret != webhook_secret_key_str:
+            logger.warning("Invalid webhook secret for tenant %s", tenant_slug)
+            raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    elif signer is not None and body is not None:
+        # Signature-based verification, in the signing provider's scheme
+        try:
+            valid = signer.verify_signature(
+                body.raw, signature, webhook_secret_key_str, str(request.url), lambda: body.payload
             )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid webhook payload")
+        if not valid:
+            logger.warning("Invalid webhook signature for tenant %s", tenant_slug)
+            raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    else:
+        logger.warning("No webhook authentication provided for tenant %s", tenant_slug)
+        raise HTTPException(status_code=401, detail="Webhook authentication required")
+
+
+async def _single_chunk(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
 
-            automation_triggered = True
-            logger.info(f"Queued automation for call {call_id_int}, delay: {delay_seconds}s")
-        else:
-            logger.info(f"Automation not configured/enabled for tenant {tenant.id}")
+def _cdr_result(response: CdrBatchResponse, result: CdrRecordResult) -> None:
+    response.results.append(result)
+    response.total += 1
+    if result.status == "accepted":
+        response.accepted += 1
+        response.automation_triggered += int(result.automation_triggered)
+    elif result.status == "invalid":
+        response.invalid += 1
     else:
-        logger.info(f"Call status '{normalized_status}' - automation not triggered")
+        response.failed += 1
+    CDR_IMPORT_RECORDS.labels(result.status).inc()
 
-    return WebhookResponse(
-        success=True,
-        message=f"Webhook processed for {provider}",
-        call_id=call_id_int,
-        automation_triggered=automation_triggered
-    )
+
+def _first_error(error: ValueError) -> str:
+    """Short reason for a record the provider adapter rejected"""
+    if isinstance(error, ValidationError):
+        first = error.errors()[0]
+        field = ".".join(str(part) for part in first["loc"])
+        return f"{field}: {first['msg']}" if field else first["msg"]
+    return str(error)
 
 
 @router.get("/test/{tenant_slug}")
 async def test_webhook_endpoint(
     tenant_slug: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db_dep)
 ):
     """Test endpoint to verify webhook URL is accessible"""
-    tenant = db.query(Tenant).filter(Tenant.slug == tenant_slug).first()
+    tenant = (await db.execute(select(Tenant).where(Tenant.slug == tenant_slug))).scalars().first()
 
     if not tenant:
         raise HTTPException(status_code=404, detail="Tenant not found")
 
-    settings = db.query(TenantSettings).filter(
-        TenantSettings.tenant_id == tenant.id
-    ).first()
+    settings = (await db.execute(
+        select(TenantSettings).where(TenantSettings.tenant_id == tenant.id)
+    )).scalars().first()
 
     return {
         "status": "ok",
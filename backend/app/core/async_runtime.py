@@ -0,0 +1,145 @@
+# NEW FILE - One long-lived asyncio event loop per worker process, for sync callers (Celery tasks)
+"""
+Sync code (Celery tasks, scripts) runs coroutines on a loop that lives as long
+as the process, in its own thread:
+
+    result = run_async(client.send_text_message(...))
+
+Everything bound to the loop outlives a single task: pooled httpx clients,
+caches and background coroutines (`submit_async`). The loop is started on
+`worker_process_init` and stopped on `worker_process_shutdown`. Shutdown
+hooks (`on_runtime_shutdown`) run on the loop before it stops. It also starts
+lazily on first use (solo pool, scripts).
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Awaitable, Callable, Coroutine, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncRuntime:
+    """An event loop running forever in a daemon thread"""
+
+    def __init__(self, name: str = "async-runtime"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._shutdown_hooks: List[Callable[[], Awaitable[Any]]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return (
+            self._loop is not None and self._pid == os.getpid()
+            and self._thread is not None and self._thread.is_alive()
+        )
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if it is not running in this process (e.g. after a fork)"""
+        with self._lock:
+            if self.running:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            thread = threading.Thread(target=self._serve, args=(loop, ready), name=self.name, daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop, self._thread, self._pid = loop, thread, os.getpid()
+            logger.info("Async runtime started in process %s", self._pid)
+            return loop
+
+    @staticmethod
+    def _serve(loop: asyncio.AbstractEventLoop, ready: threading.Event) -> None:
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            try:
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                loop.close()
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """Run `coro` on the loop and wait for its result from this (sync) thread"""
+        loop = self.start()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("run_async() called from the runtime loop itself; await the coroutine instead")
+
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timeout, or the task itself was interrupted (e.g. Celery soft time limit)
+            future.cancel()
+            raise
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+        """Schedule `coro` in the background; it keeps running after the caller returns"""
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def on_shutdown(self, hook: Callable[[], Awaitable[Any]]) -> None:
+        """Await `hook()` on the loop when the runtime stops (close pools, flush caches)"""
+        if hook not in self._shutdown_hooks:
+            self._shutdown_hooks.append(hook)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Run shutdown hooks, cancel what is left and stop the loop thread"""
+        with self._lock:
+            if not self.running:
+                self._loop = self._thread = self._pid = None
+                return
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = self._pid = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout)
+        except Exception as e:
+            logger.warning("Async runtime shutdown did not complete cleanly: %s", e)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+
+    async def _shutdown(self) -> None:
+        for hook in self._shutdown_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                logger.warning("Async runtime shutdown hook failed: %s", e)
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+_runtime = AsyncRuntime()
+
+
+def get_async_runtime() -> AsyncRuntime:
+    return _runtime
+
+
+def run_async(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """Run a coroutine on this process's long-lived loop and return its result"""
+    return _runtime.run(coro, timeout)
+
+
+def submit_async(coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+    """Run a coroutine in the background on this process's loop"""
+    return _runtime.submit(coro)
+
+
+def on_runtime_shutdown(hook: Callable[[], Awaitable[Any]]) -> None:
+    _runtime.on_shutdown(hook)
@@ -1,6 +1,8 @@
 import platform
 from celery import Celery
+from celery.signals import setup_logging, worker_process_init
 from app.core.config import get_settings
+from app.core.logging import configure_logging
 
 settings = get_settings()
 
@@ -19,6 +21,29 @@ celery_app.conf.update(
     broker_connection_retry_on_startup=True,  # <-- Fix warning
 )
 
+# One lane per kind of work, so a retry sweep or test sends never queue behind
+# (or in front of) live post-call messages:
+#   celery -A app.core.celery_app worker -Q automation.live -c 16
+#   celery -A app.core.celery_app worker -Q automation.retry,automation.test -c 4
+celery_app.conf.task_routes = {
+    "app.tasks.whatsapp_tasks.process_call_ended_automation": {"queue": settings.CELERY_LIVE_QUEUE},
+    "app.tasks.whatsapp_tasks.retry_failed_messages": {"queue": settings.CELERY_RETRY_QUEUE},
+    "app.tasks.whatsapp_tasks.send_test_whatsapp_message": {"queue": settings.CELERY_TEST_QUEUE},
+}
+
+
+@setup_logging.connect
+def configure_worker_logging(**kwargs):
+    """Queued JSON logging instead of Celery's own handlers"""
+    configure_logging()
+
+
+@worker_process_init.connect
+def restart_log_listener(**kwargs):
+    """Prefork children need their own listener thread"""
+    configure_logging()
+
+
 # Autodiscover current task folder properly
 celery_app.autodiscover_tasks(["app.tasks"])
 
@@ -0,0 +1,212 @@
+# NEW FILE - Non-blocking, structured logging: queue handler + background listener
+"""
+`configure_logging()` routes every record through a QueueHandler. The calling
+thread (request handler, event loop, Celery task) only enqueues the record.
+A QueueListener thread formats it, redacts it and writes it to stderr.
+
+The message is formatted on the listener thread too (`%s` arguments stay lazy),
+so arguments must not be mutated after the log call.
+"""
+import atexit
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, TextIO
+
+from app.core import serialization
+from app.core.config import get_settings
+from app.core.metrics import LOG_RECORDS_DROPPED
+
+# Attributes of every LogRecord; anything else was passed with extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+QUIET_LOGGERS = ("httpx", "httpcore")
+
+# 10-15 digit numbers, optionally with +: E.164 and national phone numbers
+_PHONE = re.compile(r"(?<![\w.])\+?\d{6,11}(\d{4})(?![\w.])")
+_SECRETS = (
+    re.compile(r"(?i)(bearer\s+)[\w.\-~+/]+=*"),
+    re.compile(
+        r"(?i)((?:access_token|token|secret|password|signature|api_key|authorization)"
+        r"['\"]?\s*[:=]\s*['\"]?)[^'\"&\s,}]+"
+    ),
+    re.compile(r"()\bEAA[A-Za-z0-9]{20,}"),  # Meta access tokens
+)
+
+
+def redact(text: str) -> str:
+    """Mask phone numbers (all but the last 4 digits) and credentials"""
+    text = _PHONE.sub(lambda m: "*" * (len(m.group(0)) - 4) + m.group(1), text)
+    for pattern in _SECRETS:
+        text = pattern.sub(r"\1[REDACTED]", text)
+    return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, extra fields, exc"""
+
+    def __init__(self, redact_values: bool = True):
+        super().__init__()
+        self.redact_values = redact_values
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": self._clean(record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = self._clean(value) if isinstance(value, str) else value
+        if record.exc_info:
+            entry["exc"] = self._clean(self.formatException(record.exc_info))
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        try:
+            return serialization.dumps(entry).decode("utf-8")
+        except TypeError:
+            return serialization.dumps({k: v if isinstance(v, (str, int, float, bool)) or v is None else str(v)
+                                        for k, v in entry.items()}).decode("utf-8")
+
+    def _clean(self, text: str) -> str:
+        return redact(text) if self.redact_values else text
+
+
+class RedactingFormatter(logging.Formatter):
+    """Plain text lines (LOG_FORMAT=text), redacted"""
+
+    def __init__(self, fmt: str, redact_values: bool = True):
+        super().__init__(fmt)
+        self.redact_values = redact_values
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        return redact(text) if self.redact_values else text
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Enqueues the record as is: message formatting (and any payload str()) is
+    left to the listener thread. A full queue drops the record rather than block.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class LogPayload:
+    """A payload argument rendered as truncated JSON, only if the record is written"""
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+
+    def __str__(self) -> str:
+        try:
+            text = serialization.dumps(self.payload).decode("utf-8")
+        except TypeError:
+            text = str(self.payload)
+        limit = get_settings().LOG_PAYLOAD_MAX_CHARS
+        return text if len(text) <= limit else f"{text[:limit]}...({len(text)} chars)"
+
+
+class PayloadSampler:
+    """The first payload, then one in `every`, per tenant"""
+
+    def __init__(self, every: Optional[int] = None):
+        self.every = get_settings().LOG_PAYLOAD_SAMPLE_EVERY if every is None else every
+        self._counts: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def should_log(self, tenant_id: Any) -> bool:
+        if self.every <= 0:
+            return False
+        with self._lock:
+            seen = self._counts.get(tenant_id, 0)
+            self._counts[tenant_id] = seen + 1
+        return seen % self.every == 0
+
+
+_payload_sampler: Optional[PayloadSampler] = None
+
+
+def payload_sampled(logger: logging.Logger, tenant_id: Any) -> bool:
+    """Whether to log a full payload for this tenant now (always at DEBUG)"""
+    global _payload_sampler
+    if logger.isEnabledFor(logging.DEBUG):
+        return True
+    if not logger.isEnabledFor(logging.INFO):
+        return False
+    if _payload_sampler is None:
+        _payload_sampler = PayloadSampler()
+    return _payload_sampler.should_log(tenant_id)
+
+
+# ---------- SETUP ----------
+
+_listener: Optional[QueueListener] = None
+_listener_pid: Optional[int] = None
+_setup_lock = threading.Lock()
+
+
+def configure_logging(stream: Optional[TextIO] = None) -> None:
+    """
+    Install the queue handler on the root logger and start the listener.
+    Safe to call repeatedly; after a fork (Celery prefork children) it starts
+    a new listener, since the parent's thread does not exist in the child.
+    Records are written to `stream` (default stderr).
+    """
+    global _listener, _listener_pid
+    with _setup_lock:
+        if _listener_pid == os.getpid():
+            return
+        settings = get_settings()
+
+        handler = logging.StreamHandler(stream or sys.stderr)
+        if settings.LOG_FORMAT.lower() == "json":
+            handler.setFormatter(JsonFormatter(redact_values=settings.LOG_REDACT))
+        else:
+            handler.setFormatter(RedactingFormatter(
+                "%(asctime)s %(levelname)s [%(name)s] %(message)s", redact_values=settings.LOG_REDACT
+            ))
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(settings.LOG_QUEUE_SIZE)
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(LazyQueueHandler(log_queue))
+        root.setLevel(settings.LOG_LEVEL.upper())
+        # httpx logs every request (each Graph send) at INFO
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(max(root.level, logging.WARNING))
+
+        # The parent's listener (if any) is not running in a forked child: just replace it
+        first_setup = _listener is None
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+        if first_setup:
+            atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the listener (at exit)"""
+    global _listener, _listener_pid
+    with _setup_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+        _listener = None
+        _listener_pid = None
@@ -0,0 +1,185 @@
+# NEW FILE - Prometheus metrics for the outbound WhatsApp hot path
+import logging
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Cloud API latencies sit between ~100ms and a few seconds; the upper buckets
+# catch Meta-side slowdowns and client timeouts (30s)
+LATENCY_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 30.0)
+
+WHATSAPP_REQUEST_LATENCY = Histogram(
+    "whatsapp_api_request_duration_seconds",
+    "Latency of WhatsApp Cloud API requests (one observation per HTTP attempt)",
+    ["tenant", "message_type"],
+    buckets=LATENCY_BUCKETS,
+)
+
+WHATSAPP_REQUESTS = Counter(
+    "whatsapp_api_requests_total",
+    "WhatsApp Cloud API requests by HTTP status and Graph error code",
+    ["tenant", "message_type", "status", "error_code"],
+)
+
+WHATSAPP_IN_FLIGHT = Gauge(
+    "whatsapp_api_requests_in_flight",
+    "WhatsApp Cloud API requests currently awaiting a response",
+    ["tenant"],
+)
+
+WHATSAPP_BYTES_SENT = Counter(
+    "whatsapp_api_request_bytes_total",
+    "Request body bytes sent to the WhatsApp Cloud API",
+    ["tenant", "message_type"],
+)
+
+TENANT_ROUTE_CACHE_REQUESTS = Counter(
+    "tenant_route_cache_requests_total",
+    "Webhook tenant routing cache lookups by result (hit or miss)",
+    ["result"],
+)
+
+WEBHOOK_INGEST_APPENDS = Counter(
+    "webhook_ingest_appends_total",
+    "Call-ended webhooks accepted into the ingest log, by backend (stream or spool)",
+    ["backend"],
+)
+
+WEBHOOK_INGEST_PROCESSED = Counter(
+    "webhook_ingest_processed_total",
+    "Ingest log entries handled by the consumer, by outcome",
+    ["outcome"],
+)
+
+WEBHOOK_INGEST_LAG_SECONDS = Gauge(
+    "webhook_ingest_lag_seconds",
+    "Age of the oldest ingest entry not yet acknowledged by the consumer group",
+)
+
+WEBHOOK_INGEST_PENDING = Gauge(
+    "webhook_ingest_pending_entries",
+    "Ingest entries delivered to a consumer but not yet acknowledged",
+)
+
+WEBHOOK_INGEST_BACKLOG = Gauge(
+    "webhook_ingest_backlog_entries",
+    "Ingest entries not yet delivered to any consumer",
+)
+
+CALL_WRITE_BATCH_SIZE = Histogram(
+    "call_write_batch_size",
+    "Call-ended events written per write-behind flush",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500, 1000),
+)
+
+CALL_WRITE_QUEUE_DEPTH = Gauge(
+    "call_write_queue_depth",
+    "Call-ended events waiting for the write-behind writer",
+)
+
+CDR_IMPORT_RECORDS = Counter(
+    "cdr_import_records_total",
+    "Records received by the bulk CDR endpoint, by outcome (accepted, invalid, failed)",
+    ["outcome"],
+)
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the background log queue was full",
+)
+
+DELAY_SCHEDULER_PENDING = Gauge(
+    "delay_scheduler_pending_sends",
+    "Post-call sends waiting in the delay scheduler for their due time",
+)
+
+DELAY_SCHEDULER_LAG_SECONDS = Gauge(
+    "delay_scheduler_lag_seconds",
+    "How late the oldest due send was when the poller moved it to the work queue",
+)
+
+DELAY_SCHEDULER_MOVED = Counter(
+    "delay_scheduler_moved_total",
+    "Due sends handled by the delay poller, by outcome (queued, failed, superseded)",
+    ["outcome"],
+)
+
+AUTOMATION_QUEUE_WAIT_SECONDS = Histogram(
+    "automation_queue_wait_seconds",
+    "Time a live automation waited in its tenant's fair queue before it was dispatched",
+    ["tenant"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+FAIR_QUEUE_DEPTH = Gauge(
+    "fair_queue_depth",
+    "Live automations waiting in each tenant's fair queue",
+    ["tenant"],
+)
+
+FAIR_QUEUE_IN_FLIGHT = Gauge(
+    "fair_queue_in_flight",
+    "Live automations dispatched to workers and not yet finished, per tenant",
+    ["tenant"],
+)
+
+
+def tenant_label(tenant_id: Optional[int]) -> str:
+    return str(tenant_id) if tenant_id is not None else "unknown"
+
+
+def observe_whatsapp_request(
+    tenant: str,
+    message_type: str,
+    status: str,
+    error_code: Optional[int] = None,
+    duration: Optional[float] = None
+) -> None:
+    """
+    Record one Cloud API request. status is the HTTP status code, or
+    "timeout" / "transport_error" / "error" / "local_throttle" when no
+    response came back; duration is None when nothing was sent.
+    """
+    if duration is not None:
+        WHATSAPP_REQUEST_LATENCY.labels(tenant, message_type).observe(duration)
+    WHATSAPP_REQUESTS.labels(tenant, message_type, status, str(error_code or "")).inc()
+
+
+def metrics_payload() -> bytes:
+    """Prometheus text exposition of this process's registry"""
+    return generate_latest()
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def start_worker_metrics_server(process_index: int = 0, base_port: Optional[int] = None) -> Optional[int]:
+    """
+    Serve /metrics from a Celery worker process on CELERY_METRICS_PORT + index,
+    so every prefork child can be scraped. Returns the port, or None if disabled.
+    """
+    settings = get_settings()
+    base_port = settings.CELERY_METRICS_PORT if base_port is None else base_port
+    if not settings.METRICS_ENABLED or not base_port:
+        return None
+
+    port = base_port + process_index
+    try:
+        start_http_server(port)
+    except OSError as e:
+        logger.warning("Could not start worker metrics server on port %s: %s", port, e)
+        return None
+
+    logger.info("Worker metrics available on :%s/metrics", port)
+    return port
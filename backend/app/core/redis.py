@@ -0,0 +1,55 @@
+# NEW FILE - Shared Redis connections for caches, rate limits and coordination
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_async_clients: Dict[int, Tuple[asyncio.AbstractEventLoop, aioredis.Redis]] = {}
+_async_lock = threading.Lock()
+
+
+@lru_cache
+def get_redis() -> Optional[redis.Redis]:
+    """Process-wide sync Redis client, or None when REDIS_URL is empty"""
+    settings = get_settings()
+    if not settings.REDIS_URL:
+        return None
+    return redis.Redis.from_url(
+        settings.REDIS_URL,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
+
+
+def get_async_redis() -> Optional[aioredis.Redis]:
+    """
+    Async Redis client for the running event loop, or None when REDIS_URL is empty.
+    redis.asyncio connections are bound to a loop, so one client is kept per loop.
+    """
+    settings = get_settings()
+    if not settings.REDIS_URL:
+        return None
+
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        for key in [k for k, (owner, _) in _async_clients.items() if owner.is_closed()]:
+            _async_clients.pop(key, None)
+
+        entry = _async_clients.get(id(loop))
+        if entry is None:
+            client = aioredis.Redis.from_url(
+                settings.REDIS_URL,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            )
+            _async_clients[id(loop)] = (loop, client)
+            return client
+        return entry[1]
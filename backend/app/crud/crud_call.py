@@ -1,10 +1,19 @@
 import json
-from typing import List
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
+from sqlalchemy import func, tuple_, update
 from sqlalchemy.orm import Session
 
 from app.models.call import Call
 from app.schemas.call import CallWebhookIn
+from app.schemas.webhook import CallEndedEvent
+
+# Statuses a later (out of order) callback must not overwrite
+FINAL_STATUSES = ("completed",)
+
+# (tenant_id, provider, call_sid)
+CallKey = Tuple[int, str, str]
 
 
 class CRUDCall:
@@ -48,5 +57,170 @@ class CRUDCall:
         db.refresh(db_obj)
         return db_obj
 
+    def upsert_from_event(
+        self,
+        db: Session,
+        *,
+        tenant_id: int,
+        event: CallEndedEvent,
+        ended_at: datetime,
+    ) -> int:
+        """
+        Insert the call, or update the existing row for the same
+        (tenant, provider, call_sid). Returns the call id. Does not commit.
+        """
+        values = self.values_from_event(tenant_id=tenant_id, event=event, ended_at=ended_at)
+
+        insert = _dialect_insert(db)
+        if insert is None or not event.call_sid:
+            return self._select_or_insert(db, values)
+
+        stmt = _upsert(insert, [values]).returning(Call.id)
+
+        call_id = db.execute(stmt).scalar()
+        if call_id is None:
+            # Conflict with a final row: nothing updated, nothing returned
+            call_id = self._find_id(db, tenant_id, event.provider, event.call_sid)
+        return call_id
+
+    @staticmethod
+    def values_from_event(*, tenant_id: int, event: CallEndedEvent, ended_at: datetime) -> dict:
+        return {
+            "tenant_id": tenant_id,
+            "provider": event.provider,
+            "call_sid": event.call_sid or None,
+            "caller_phone": event.caller_phone,
+            "receiver_phone": event.receiver_phone,
+            "status": event.status,
+            "duration_seconds": event.duration_seconds,
+            "ended_at": ended_at,
+        }
+
+    def upsert_many(self, db: Session, rows: List[dict]) -> Dict[CallKey, int]:
+        """
+        Upsert many calls in one multi-row INSERT ... ON CONFLICT ... RETURNING.
+        `rows` come from values_from_event, all with a call_sid and at most one
+        per (tenant, provider, call_sid). Returns the call id per key. Does not commit.
+        """
+        if not rows:
+            return {}
+
+        insert = _dialect_insert(db)
+        if insert is None:
+            return {
+                (row["tenant_id"], row["provider"], row["call_sid"]): self._select_or_insert(db, row)
+                for row in rows
+            }
+
+        stmt = _upsert(insert, rows).returning(Call.id, Call.tenant_id, Call.provider, Call.call_sid)
+        ids = {(tenant_id, provider, call_sid): call_id for call_id, tenant_id, provider, call_sid in db.execute(stmt)}
+
+        # Conflicts with final rows return nothing; look those ids up in one query
+        missing = [(r["tenant_id"], r["provider"], r["call_sid"]) for r in rows]
+        missing = [key for key in missing if key not in ids]
+        if missing:
+            found = db.query(Call.id, Call.tenant_id, Call.provider, Call.call_sid).filter(
+                tuple_(Call.tenant_id, Call.provider, Call.call_sid).in_(missing)
+            )
+            ids.update({(tenant_id, provider, call_sid): call_id for call_id, tenant_id, provider, call_sid in found})
+        return ids
+
+    def insert_many(self, db: Session, rows: List[dict]) -> List[int]:
+        """Insert calls without a call_sid (never deduplicated); ids in input order. Does not commit."""
+        calls = [Call(**row) for row in rows]
+        db.add_all(calls)
+        db.flush()
+        return [call.id for call in calls]
+
+    def _find_id(self, db: Session, tenant_id: int, provider: str, call_sid: str) -> Optional[int]:
+        return db.query(Call.id).filter(
+            Call.tenant_id == tenant_id,
+            Call.provider == provider,
+            Call.call_sid == call_sid,
+        ).scalar()
+
+    def _select_or_insert(self, db: Session, values: dict) -> int:
+        """Portable fallback for databases without INSERT ... ON CONFLICT"""
+        existing = None
+        if values["call_sid"]:
+            existing = db.query(Call).filter(
+                Call.tenant_id == values["tenant_id"],
+                Call.provider == values["provider"],
+                Call.call_sid == values["call_sid"],
+            ).with_for_update().first()
+        if existing is None:
+            call = Call(**values)
+            db.add(call)
+            db.flush()
+            return call.id
+        if existing.status not in FINAL_STATUSES:
+            existing.status = values["status"]
+            existing.ended_at = values["ended_at"]
+            if values["duration_seconds"] is not None:
+                existing.duration_seconds = values["duration_seconds"]
+        return existing.id
+
+    def claim_automation(self, db: Session, *, call_id: int) -> bool:
+        """
+        Mark the call's automation as pending if nobody has yet. Only the
+        caller that gets True may enqueue the automation task.
+        """
+        result = db.execute(
+            update(Call)
+            .where(Call.id == call_id, Call.automation_status.is_(None))
+            .values(automation_status="pending")
+        )
+        return result.rowcount == 1
+
+    def claim_automation_many(self, db: Session, *, call_ids: Iterable[int]) -> Set[int]:
+        """claim_automation for many calls in one UPDATE; returns the ids this caller claimed"""
+        call_ids = list(call_ids)
+        if not call_ids:
+            return set()
+        stmt = (
+            update(Call)
+            .where(Call.id.in_(call_ids), Call.automation_status.is_(None))
+            .values(automation_status="pending")
+        )
+        if _dialect_insert(db) is None:
+            # No UPDATE ... RETURNING: claim one by one
+            return {call_id for call_id in call_ids if self.claim_automation(db, call_id=call_id)}
+        return set(db.execute(stmt.returning(Call.id)).scalars())
+
+    def release_automation(self, db: Session, *, call_id: int) -> None:
+        """Undo claim_automation when the task could not be enqueued"""
+        db.execute(
+            update(Call)
+            .where(Call.id == call_id, Call.automation_status == "pending")
+            .values(automation_status=None)
+        )
+
+
+def _dialect_insert(db: Session):
+    """INSERT construct with ON CONFLICT support for the session's database, if any"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def _upsert(insert, rows: List[dict]):
+    """INSERT of `rows` that updates the existing call unless it already has a final status"""
+    stmt = insert(Call).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["tenant_id", "provider", "call_sid"],
+        set_={
+            "status": stmt.excluded.status,
+            "receiver_phone": func.coalesce(stmt.excluded.receiver_phone, Call.receiver_phone),
+            "duration_seconds": func.coalesce(stmt.excluded.duration_seconds, Call.duration_seconds),
+            "ended_at": stmt.excluded.ended_at,
+        },
+        where=Call.status.notin_(FINAL_STATUSES),
+    )
+
 
 call_crud = CRUDCall()
@@ -0,0 +1,454 @@
+# NEW FILE - Resumable import of historical calls from large CSV/JSONL exports
+"""
+Stream a provider's call export into `calls` for one tenant, e.g. when
+onboarding (analytics, and suppression of calls that already happened).
+No automation is triggered unless --enqueue-recent-hours is given.
+
+    python -m app.db.backfill_calls --tenant demo-brand calls.csv
+    python -m app.db.backfill_calls --tenant demo-brand calls.jsonl --provider twilio \\
+        --enqueue-recent-hours 24
+
+Records are read line by line, normalized with the telephony provider
+adapters, and written in chunks of --chunk-size rows. On PostgreSQL, a chunk
+is COPYed into a temporary staging table, then moved with INSERT ... ON
+CONFLICT DO NOTHING. Memory use stays the same whatever the file size.
+
+After every chunk, the byte offset reached is saved to the checkpoint file
+(default <file>.checkpoint). A re-run resumes from there. Rows of a chunk
+committed just before a crash are skipped as duplicates.
+
+The checkpoint also records how far rows were written before their
+automations were queued. A chunk a previous run wrote, but may not have
+queued, has its rows still 'pending' queued again on resume. A call queued
+twice is still only sent once (see app.services.automation_journal).
+"""
+import argparse
+import csv
+import email.utils
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.celery_app import celery_app
+from app.db.session import SessionLocal, engine as default_engine
+from app.models.call import Call
+from app.services.call_events import extract_call_event
+from app.services.delay_scheduler import get_delay_scheduler
+from app.services.fair_queue import submit_automation
+from app.services.tenant_routing import TenantRoute, load_tenant_route
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "tenant_id", "provider", "call_sid", "caller_phone", "receiver_phone", "status",
+    "duration_seconds", "started_at", "ended_at", "automation_triggered", "automation_status",
+)
+# Backfilled calls are marked so a late webhook for them never starts an automation
+SKIPPED = "skipped"
+PENDING = "pending"
+
+START_TIME_KEYS = ("started_at", "start_time", "StartTime", "start_stamp", "DateCreated")
+END_TIME_KEYS = ("ended_at", "end_time", "EndTime", "end_stamp", "DateUpdated")
+
+STAGE_TABLE = "calls_backfill_stage"
+STAGE_DDL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} (
+    tenant_id integer, provider varchar(50), call_sid varchar(255),
+    caller_phone varchar(20), receiver_phone varchar(20), status varchar(50),
+    duration_seconds integer, started_at timestamptz, ended_at timestamptz,
+    automation_triggered boolean, automation_status varchar(50)
+) ON COMMIT DELETE ROWS
+"""
+MOVE_SQL = f"""
+INSERT INTO calls ({", ".join(COLUMNS)}, created_at)
+SELECT {", ".join(COLUMNS)}, COALESCE(ended_at, now()) FROM {STAGE_TABLE}
+ON CONFLICT (tenant_id, provider, call_sid) DO NOTHING
+RETURNING id, caller_phone, automation_status
+"""
+
+
+# ---------- READING ----------
+
+def read_records(path: str, fmt: str, offset: int = 0) -> Iterator[Tuple[int, bytes, Optional[Dict[str, Any]]]]:
+    """
+    Yield (offset after the record, raw record, payload or None if unreadable)
+    starting at byte `offset`. CSV files are read with their header row.
+    """
+    with open(path, "rb") as f:
+        if fmt == "jsonl":
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    payload = json.loads(line)
+                except ValueError:
+                    payload = None
+                yield offset, line, payload if isinstance(payload, dict) else None
+            return
+
+        header_line = f.readline()
+        header = [name.strip() for name in next(csv.reader([header_line.decode("utf-8-sig")]))]
+        f.seek(max(offset, len(header_line)))
+        offset = f.tell()
+        buffered = b""
+        for line in f:
+            offset += len(line)
+            buffered += line
+            # An odd number of quotes means a quoted field continues on the next line
+            if buffered.count(b'"') % 2:
+                continue
+            raw, buffered = buffered, b""
+            if not raw.strip():
+                continue
+            try:
+                row = next(csv.reader(io.StringIO(raw.decode("utf-8"))))
+            except (UnicodeDecodeError, csv.Error):
+                yield offset, raw, None
+                continue
+            if len(row) > len(header):
+                yield offset, raw, None
+                continue
+            yield offset, raw, {name: value for name, value in zip(header, row) if value != ""}
+        if buffered.strip():
+            yield offset, buffered, None
+
+
+# ---------- NORMALIZATION ----------
+
+_PHONE_NOISE = re.compile(r"[\s\-().]")
+
+
+def normalize_phone(phone: Optional[str], country_code: str) -> Optional[str]:
+    """E.164-style number: '+' and digits; national numbers get `country_code`"""
+    if not phone:
+        return None
+    phone = _PHONE_NOISE.sub("", phone)
+    if phone.startswith("00"):
+        phone = "+" + phone[2:]
+    if not phone.startswith("+"):
+        phone = phone.lstrip("0")
+        phone = f"+{phone}" if len(phone) > 10 else f"+{country_code}{phone}"
+    return phone if phone[1:].isdigit() else None
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = email.utils.parsedate_to_datetime(str(value))  # Twilio's RFC 2822 dates
+        except (TypeError, ValueError):
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _first_time(payload: Dict[str, Any], keys: Iterable[str]) -> Optional[datetime]:
+    for key in keys:
+        parsed = _parse_time(payload.get(key))
+        if parsed is not None:
+            return parsed
+    return None
+
+
+@dataclass
+class BackfillStats:
+    read: int = 0
+    invalid: int = 0
+    inserted: int = 0
+    duplicates: int = 0
+    queued: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def invalid_record(self, offset: int, reason: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < 20:
+            self.errors.append(f"record ending at byte {offset}: {reason}")
+
+
+def to_rows(
+    records: Iterable[Tuple[int, bytes, Optional[Dict[str, Any]]]],
+    route: TenantRoute,
+    provider: Optional[str],
+    country_code: str,
+    recent_since: Optional[datetime],
+    stats: BackfillStats
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Normalized `calls` rows (with the offset after each) from raw records"""
+    for offset, raw, payload in records:
+        stats.read += 1
+        if not payload:
+            stats.invalid_record(offset, "unreadable record")
+            continue
+        try:
+            event = extract_call_event(payload, provider)
+        except ValueError as e:  # includes pydantic's ValidationError
+            stats.invalid_record(offset, " ".join(str(e).split())[:200])
+            continue
+
+        caller = normalize_phone(event.caller_phone, country_code)
+        if caller is None:
+            stats.invalid_record(offset, f"bad caller phone {event.caller_phone!r}")
+            continue
+
+        call_sid = event.call_sid
+        if call_sid not in payload.values():
+            # No provider id in the record: derive a stable one so re-runs dedupe
+            call_sid = "backfill-" + hashlib.sha1(raw).hexdigest()[:24]
+
+        ended_at = _first_time(payload, END_TIME_KEYS)
+        recent = (
+            recent_since is not None and event.status == "completed"
+            and ended_at is not None and ended_at >= recent_since
+        )
+        yield offset, {
+            "tenant_id": route.tenant_id,
+            "provider": event.provider,
+            "call_sid": call_sid,
+            "caller_phone": caller,
+            "receiver_phone": normalize_phone(event.receiver_phone, country_code),
+            "status": event.status,
+            "duration_seconds": event.duration_seconds,
+            "started_at": _first_time(payload, START_TIME_KEYS),
+            "ended_at": ended_at,
+            "automation_triggered": False,
+            "automation_status": PENDING if recent else SKIPPED,
+        }
+
+
+def chunked(rows: Iterator[Tuple[int, Dict[str, Any]]], size: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """(offset after the chunk, rows) in lists of at most `size`"""
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk[-1][0], [row for _, row in chunk]
+
+
+# ---------- CHECKPOINT ----------
+
+class Checkpoint:
+    """
+    Byte offsets reached in one file for one tenant, replaced atomically:
+    `offset` when a chunk is done, `written` as soon as its rows are
+    committed (ahead of `offset` while their automations are being queued).
+    """
+
+    def __init__(self, path: str, source: str, tenant_slug: str):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.tenant_slug = tenant_slug
+
+    def load(self) -> Tuple[int, int]:
+        """(offset, written)"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0, 0
+        if data.get("source") != self.source or data.get("tenant") != self.tenant_slug:
+            raise SystemExit(f"Checkpoint {self.path} belongs to another import; remove it or pass --checkpoint")
+        offset = int(data["offset"])
+        return offset, max(offset, int(data.get("written", offset)))
+
+    def save(self, offset: int, written: int, stats: BackfillStats) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "source": self.source,
+                "tenant": self.tenant_slug,
+                "offset": offset,
+                "written": max(offset, written),
+                "inserted": stats.inserted,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+# ---------- WRITING ----------
+
+def _copy_value(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return value
+
+
+def write_chunk(conn: Connection, rows: List[Dict[str, Any]]) -> List[Tuple[int, str, str]]:
+    """Insert rows not already present; returns (id, caller_phone, automation_status) of the new ones"""
+    if conn.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # COPY's CSV format reads an unquoted empty field as NULL
+            writer.writerow(["" if (v := _copy_value(row[c])) is None else v for c in COLUMNS])
+        buffer.seek(0)
+        conn.execute(text(STAGE_DDL))
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {STAGE_TABLE} ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+        return [tuple(r) for r in conn.execute(text(MOVE_SQL))]
+
+    if conn.dialect.name != "sqlite":
+        raise SystemExit(f"Backfill supports PostgreSQL (and SQLite for local runs), not {conn.dialect.name}")
+
+    # Local SQLite: multi-row INSERT ... ON CONFLICT DO NOTHING
+    stmt = sqlite_insert(Call).values(rows).on_conflict_do_nothing(
+        index_elements=["tenant_id", "provider", "call_sid"]
+    ).returning(Call.id, Call.caller_phone, Call.automation_status)
+    return [tuple(r) for r in conn.execute(stmt)]
+
+
+def pending_calls(conn: Connection, route: TenantRoute, rows: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+    """(id, caller_phone) of the chunk's calls whose automation is still 'pending'"""
+    # Not only the rows marked 'pending' this time: --enqueue-recent-hours is relative to now
+    keys = [(row["provider"], row["call_sid"]) for row in rows]
+    return [tuple(r) for r in conn.execute(
+        select(Call.id, Call.caller_phone).where(
+            Call.tenant_id == route.tenant_id,
+            Call.automation_status == PENDING,
+            tuple_(Call.provider, Call.call_sid).in_(keys)
+        )
+    )]
+
+
+def queue_automations(route: TenantRoute, pending: List[Tuple[int, str]]) -> None:
+    """
+    Hand (call_id, caller_phone) pairs to the delay scheduler, or submit them
+    (fair queue, or over one broker connection) without it. Each call keeps its own send: a
+    caller's historical calls are not debounced into one.
+    """
+    scheduler = get_delay_scheduler() if route.message_delay_seconds > 0 else None
+    if scheduler is not None:
+        for call_id, phone in pending:
+            scheduler.schedule(route.tenant_id, call_id, phone, route.message_delay_seconds, debounce=False)
+        return
+    with celery_app.producer_or_acquire() as producer:
+        for call_id, phone in pending:
+            submit_automation(
+                route.tenant_id,
+                call_id,
+                phone,
+                countdown=route.message_delay_seconds,
+                producer=producer
+            )
+
+
+def run_backfill(
+    path: str,
+    tenant_slug: str,
+    fmt: str,
+    provider: Optional[str] = None,
+    chunk_size: int = 5000,
+    country_code: str = "91",
+    enqueue_recent_hours: Optional[float] = None,
+    checkpoint_path: Optional[str] = None,
+    engine: Engine = default_engine
+) -> BackfillStats:
+    db = SessionLocal(bind=engine)
+    try:
+        route = load_tenant_route(db, tenant_slug)
+    finally:
+        db.close()
+    if route is None:
+        raise SystemExit(f"Unknown or inactive tenant: {tenant_slug}")
+
+    recent_since = None
+    if enqueue_recent_hours:
+        if route.is_whatsapp_configured and route.is_active:
+            recent_since = datetime.now(timezone.utc) - timedelta(hours=enqueue_recent_hours)
+        else:
+            logger.warning("Automation not configured/enabled for %s, nothing will be queued", tenant_slug)
+
+    checkpoint = Checkpoint(checkpoint_path or f"{path}.checkpoint", path, tenant_slug)
+    start, written = checkpoint.load()
+    if start:
+        logger.info("Resuming %s from byte %s", path, start)
+
+    stats = BackfillStats()
+    rows = to_rows(read_records(path, fmt, start), route, provider, country_code, recent_since, stats)
+    for offset, chunk in chunked(rows, chunk_size):
+        with engine.begin() as conn:
+            inserted = write_chunk(conn, chunk)
+            if start < written:
+                # A previous run wrote (some of) these rows, and may have stopped before queueing them
+                pending = pending_calls(conn, route, chunk)
+            else:
+                # Claimed as 'pending' by the insert itself
+                pending = [(call_id, phone) for call_id, phone, status in inserted if status == PENDING]
+        stats.inserted += len(inserted)
+        stats.duplicates += len(chunk) - len(inserted)
+
+        if pending:
+            written = max(written, offset)
+            checkpoint.save(start, written, stats)
+            queue_automations(route, pending)
+            stats.queued += len(pending)
+
+        checkpoint.save(offset, written, stats)
+        start = offset
+        logger.info(
+            "Backfill %s: byte %s, %s inserted, %s duplicates, %s invalid, %s queued",
+            tenant_slug, offset, stats.inserted, stats.duplicates, stats.invalid, stats.queued
+        )
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import historical calls for a tenant from a CSV or JSONL export")
+    parser.add_argument("file")
+    parser.add_argument("--tenant", required=True, help="tenant slug")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    parser.add_argument("--provider", help="provider adapter for every record (detected per record otherwise)")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--country-code", default="91", help="prefix for national phone numbers")
+    parser.add_argument("--enqueue-recent-hours", type=float, default=None,
+                        help="queue the automation for completed calls that ended within this many hours")
+    parser.add_argument("--checkpoint", help="default: <file>.checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fmt = args.format or ("jsonl" if args.file.endswith((".jsonl", ".ndjson")) else "csv")
+    stats = run_backfill(
+        args.file,
+        args.tenant,
+        fmt,
+        provider=args.provider,
+        chunk_size=args.chunk_size,
+        country_code=args.country_code,
+        enqueue_recent_hours=args.enqueue_recent_hours,
+        checkpoint_path=args.checkpoint,
+    )
+    print(f"✔ Read {stats.read} records: {stats.inserted} inserted, {stats.duplicates} already present, "
+          f"{stats.invalid} invalid, {stats.queued} automations queued")
+    for error in stats.errors:
+        print(f"  ⚠ {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
+from typing import AsyncGenerator
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 
 from app.core.config import get_settings
 
 settings = get_settings()
 
+# Sync engine: Celery tasks, the ingest consumer, the write-behind writer and Alembic
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
@@ -16,6 +21,35 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+# Async drivers for the sync URLs' databases
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """The async-driver equivalent of a sync database URL"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.drivername}")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# Async engine: FastAPI request handlers (queries don't block the event loop)
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL),
+    pool_pre_ping=True,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    # Objects stay usable after commit without another round-trip
+    expire_on_commit=False,
+)
+
 
 def get_db() -> Session:
     db = SessionLocal()
@@ -23,3 +57,8 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,293 @@
+# NEW FILE - Local stand-in for the WhatsApp Cloud API with latency and fault injection
+"""
+Fake Graph API for load tests and local development.
+
+Run it:
+    uvicorn app.devtools.fake_whatsapp_api:app --port 9090
+    python -m app.devtools.fake_whatsapp_api --port 9090 --latency lognormal:120:0.5 --fault throttle:0.05
+
+and point the API, Celery workers and scripts at it:
+    WHATSAPP_API_BASE_URL=http://localhost:9090
+
+Behaviour is configured at startup (FAKE_WA_CONFIG env var, JSON) or at runtime
+through PUT /_fake/config. Captured requests are available at GET /_fake/requests.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter, deque
+from typing import Any, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+MAX_CAPTURED_REQUESTS = 10000
+
+# Named faults -> (HTTP status, Graph error code, message)
+FAULT_PRESETS = {
+    "throttle": (429, 130429, "Rate limit hit"),
+    "pair_limit": (429, 131056, "(Business Account, Consumer Account) pair rate limit hit"),
+    "spam_limit": (429, 131048, "Spam rate limit hit"),
+    "invalid_recipient": (400, 131026, "Message undeliverable"),
+    "outside_window": (400, 131047, "Re-engagement message"),
+    "template_missing": (404, 132001, "Template name does not exist in the translation"),
+    "auth_expired": (401, 190, "Error validating access token: Session has expired"),
+    "server_error": (500, 131000, "Something went wrong"),
+    "unavailable": (503, 131016, "Service unavailable"),
+}
+
+
+class LatencyConfig(BaseModel):
+    """Per-request latency. median/mean/min/max in milliseconds."""
+    distribution: str = "constant"  # constant, uniform, normal, lognormal
+    median_ms: float = 0.0          # constant value / lognormal median / normal mean
+    sigma: float = 0.5              # lognormal shape
+    stddev_ms: float = 0.0          # normal stddev
+    min_ms: float = 0.0             # uniform lower bound, and floor for all
+    max_ms: float = 0.0             # uniform upper bound (0 = no cap)
+
+    def sample(self) -> float:
+        if self.distribution == "uniform":
+            value = random.uniform(self.min_ms, self.max_ms or self.min_ms)
+        elif self.distribution == "normal":
+            value = random.gauss(self.median_ms, self.stddev_ms)
+        elif self.distribution == "lognormal":
+            value = random.lognormvariate(0, self.sigma) * self.median_ms
+        else:
+            value = self.median_ms
+        value = max(self.min_ms, value)
+        if self.max_ms:
+            value = min(self.max_ms, value)
+        return value / 1000.0
+
+
+class FaultConfig(BaseModel):
+    """Return an error for `rate` (0..1) of matching requests"""
+    name: Optional[str] = None    # one of FAULT_PRESETS, or custom status/code below
+    status: int = 500
+    code: int = 131000
+    message: str = "Injected fault"
+    rate: float = 0.0
+    retry_after: Optional[float] = None
+    endpoint: str = "messages"    # messages, media or any
+
+
+class FakeConfig(BaseModel):
+    latency: LatencyConfig = Field(default_factory=LatencyConfig)
+    faults: List[FaultConfig] = []
+    # Recipients that always fail as undeliverable (131026)
+    invalid_recipients: List[str] = []
+    # Access tokens that always fail as expired (190)
+    expired_tokens: List[str] = []
+    capture_bodies: bool = True
+
+
+class FakeWhatsAppState:
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig()
+        self.requests: deque = deque(maxlen=MAX_CAPTURED_REQUESTS)
+        self.counters: Counter = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def reset(self) -> None:
+        self.requests.clear()
+        self.counters.clear()
+        self.max_in_flight = 0
+
+    def pick_fault(self, endpoint: str) -> Optional[FaultConfig]:
+        for fault in self.config.faults:
+            if fault.endpoint not in (endpoint, "any"):
+                continue
+            if fault.rate > 0 and random.random() < fault.rate:
+                return fault
+        return None
+
+
+def _resolve_fault(fault: FaultConfig) -> FaultConfig:
+    if fault.name and fault.name in FAULT_PRESETS:
+        status, code, message = FAULT_PRESETS[fault.name]
+        return fault.model_copy(update={"status": status, "code": code, "message": message})
+    return fault
+
+
+def _error_response(status: int, code: int, message: str, retry_after: Optional[float] = None) -> JSONResponse:
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+    return JSONResponse(
+        status_code=status,
+        content={
+            "error": {
+                "message": message,
+                "type": "OAuthException",
+                "code": code,
+                "error_data": {"messaging_product": "whatsapp", "details": message},
+                "fbtrace_id": uuid.uuid4().hex[:24],
+            }
+        },
+        headers=headers,
+    )
+
+
+def create_app(config: Optional[FakeConfig] = None) -> FastAPI:
+    fake_app = FastAPI(title="Fake WhatsApp Cloud API", docs_url="/_fake/docs")
+    state = FakeWhatsAppState(config)
+    fake_app.state.fake = state
+
+    async def simulate(request: Request, endpoint: str, phone_number_id: str, body: Any):
+        state.in_flight += 1
+        state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        started = time.perf_counter()
+        try:
+            delay = state.config.latency.sample()
+            if delay:
+                await asyncio.sleep(delay)
+
+            token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+            to = body.get("to") if isinstance(body, dict) else None
+            fault = state.pick_fault(endpoint)
+
+            if token in state.config.expired_tokens:
+                status, code, message = FAULT_PRESETS["auth_expired"]
+                response = _error_response(status, code, message)
+            elif to and to in state.config.invalid_recipients:
+                status, code, message = FAULT_PRESETS["invalid_recipient"]
+                response = _error_response(status, code, message)
+            elif fault is not None:
+                fault = _resolve_fault(fault)
+                response = _error_response(fault.status, fault.code, fault.message, fault.retry_after)
+            else:
+                response = None
+
+            state.counters[(endpoint, response.status_code if response else 200)] += 1
+            state.requests.append({
+                "endpoint": endpoint,
+                "phone_number_id": phone_number_id,
+                "received_at": time.time(),
+                "latency_ms": round((time.perf_counter() - started) * 1000, 3),
+                "status": response.status_code if response else 200,
+                "body": body if state.config.capture_bodies else None,
+            })
+            return response
+        finally:
+            state.in_flight -= 1
+
+    @fake_app.post("/{api_version}/{phone_number_id}/messages")
+    async def send_message(api_version: str, phone_number_id: str, request: Request):
+        body = json.loads(await request.body() or b"{}")
+        error = await simulate(request, "messages", phone_number_id, body)
+        if error is not None:
+            return error
+        to = body.get("to", "")
+        return {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": to, "wa_id": to}],
+            "messages": [{"id": f"wamid.FAKE{uuid.uuid4().hex}"}],
+        }
+
+    @fake_app.post("/{api_version}/{phone_number_id}/media")
+    async def upload_media(api_version: str, phone_number_id: str, request: Request):
+        form = await request.form()
+        upload = form.get("file")
+        size = len(await upload.read()) if upload is not None and hasattr(upload, "read") else 0
+        body = {"type": form.get("type"), "size": size}
+        error = await simulate(request, "media", phone_number_id, body)
+        if error is not None:
+            return error
+        return {"id": str(random.randint(10 ** 15, 10 ** 16 - 1))}
+
+    @fake_app.get("/_fake/config")
+    async def get_config():
+        return state.config
+
+    @fake_app.put("/_fake/config")
+    async def put_config(config: FakeConfig):
+        state.config = config
+        return state.config
+
+    @fake_app.get("/_fake/requests")
+    async def get_requests(limit: int = 100, endpoint: Optional[str] = None):
+        items = [r for r in state.requests if endpoint is None or r["endpoint"] == endpoint]
+        return items[-limit:]
+
+    @fake_app.get("/_fake/stats")
+    async def get_stats():
+        return {
+            "captured": len(state.requests),
+            "in_flight": state.in_flight,
+            "max_in_flight": state.max_in_flight,
+            "responses": {f"{endpoint}:{status}": count for (endpoint, status), count in state.counters.items()},
+        }
+
+    @fake_app.delete("/_fake/requests")
+    async def clear_requests():
+        state.reset()
+        return {"cleared": True}
+
+    # Registered last so it cannot shadow the /_fake/* control routes
+    @fake_app.get("/{api_version}/{phone_number_id}")
+    async def phone_number_info(api_version: str, phone_number_id: str, request: Request):
+        error = await simulate(request, "health", phone_number_id, None)
+        if error is not None:
+            return error
+        return {
+            "id": phone_number_id,
+            "display_phone_number": "+1 555 000 0000",
+            "verified_name": "Fake WhatsApp Business",
+            "quality_rating": "GREEN",
+        }
+
+    return fake_app
+
+
+def _parse_latency(value: str) -> LatencyConfig:
+    """constant:MS | uniform:MIN:MAX | normal:MEAN:STDDEV | lognormal:MEDIAN:SIGMA"""
+    parts = value.split(":")
+    kind, args = parts[0], [float(p) for p in parts[1:]]
+    if kind == "uniform":
+        return LatencyConfig(distribution=kind, min_ms=args[0], max_ms=args[1])
+    if kind == "normal":
+        return LatencyConfig(distribution=kind, median_ms=args[0], stddev_ms=args[1])
+    if kind == "lognormal":
+        return LatencyConfig(distribution=kind, median_ms=args[0], sigma=args[1] if len(args) > 1 else 0.5)
+    return LatencyConfig(distribution="constant", median_ms=args[0] if args else 0.0)
+
+
+def _parse_fault(value: str) -> FaultConfig:
+    """NAME:RATE[:RETRY_AFTER], NAME from FAULT_PRESETS"""
+    parts = value.split(":")
+    return FaultConfig(
+        name=parts[0],
+        rate=float(parts[1]) if len(parts) > 1 else 1.0,
+        retry_after=float(parts[2]) if len(parts) > 2 else None,
+    )
+
+
+def _config_from_env() -> FakeConfig:
+    raw = os.getenv("FAKE_WA_CONFIG")
+    return FakeConfig.model_validate_json(raw) if raw else FakeConfig()
+
+
+app = create_app(_config_from_env())
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake WhatsApp Cloud API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency", help="e.g. lognormal:120:0.5 or uniform:50:300")
+    parser.add_argument("--fault", action="append", default=[], help="e.g. throttle:0.05:1")
+    args = parser.parse_args()
+
+    config = _config_from_env()
+    if args.latency:
+        config.latency = _parse_latency(args.latency)
+    config.faults.extend(_parse_fault(f) for f in args.fault)
+
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
@@ -1,15 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
+from app.core.logging import configure_logging
 from app.api.v1.api import api_router
+from app.core.serialization import DefaultJSONResponse
+from app.core.metrics import METRICS_CONTENT_TYPE, metrics_payload
+from app.services.http_pool import close_http_clients
 
 settings = get_settings()
+configure_logging()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version="0.1.0",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=DefaultJSONResponse,
 )
 
 # CORS – we'll allow all in dev; restrict later
@@ -22,9 +28,20 @@ app.add_middleware(
 )
 
 
+@app.on_event("shutdown")
+async def close_whatsapp_connections() -> None:
+    await close_http_clients()
+
+
 @app.get("/health", tags=["health"])
 def health_check() -> dict:
     return {"status": "ok"}
 
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> Response:
+        return Response(content=metrics_payload(), media_type=METRICS_CONTENT_TYPE)
+
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
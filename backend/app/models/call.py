@@ -1,5 +1,5 @@
 # Updated with automation tracking fields
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -7,6 +7,10 @@ from app.db.base_class import Base
 
 class Call(Base):
     __tablename__ = "calls"
+    __table_args__ = (
+        # One row per provider call; repeated status callbacks update it
+        UniqueConstraint("tenant_id", "provider", "call_sid", name="uq_calls_tenant_provider_call_sid"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
@@ -1,5 +1,5 @@
 # NEW FILE - Track all sent messages for history and debugging
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DateTime, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
@@ -7,10 +7,19 @@ from app.db.base_class import Base
 
 class MessageLog(Base):
     __tablename__ = "message_logs"
+    __table_args__ = (
+        # "<tenant>:<call>:<step>": a step is logged (and sent) once per call
+        UniqueConstraint("idempotency_key", name="uq_message_logs_idempotency_key"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     tenant_id = Column(Integer, ForeignKey("tenants.id"), nullable=False)
-    call_id = Column(Integer, ForeignKey("calls.id"), nullable=True)
+    call_id = Column(Integer, ForeignKey("calls.id"), nullable=True, index=True)
+
+    # Automation step journal: one row per outbound message of a call's automation
+    # (thank_you, catalog:header, catalog:product:<id>, catalog:footer, catalog)
+    step_key = Column(String(100), nullable=True)
+    idempotency_key = Column(String(150), nullable=True)
 
     # Recipient Info
     recipient_phone = Column(String(20), nullable=False)
@@ -23,13 +32,17 @@ class MessageLog(Base):
 
     # WhatsApp API Response
     whatsapp_message_id = Column(String(255), nullable=True)
-    status = Column(String(50), default="pending")  # pending, sent, delivered, read, failed
+    status = Column(String(50), default="pending", index=True)  # pending, sending, sent, delivered, read, failed, retrying, unknown, partial
     error_message = Column(Text, nullable=True)
     api_response = Column(JSON, nullable=True)
 
+    # Replay spec for message-level retries: {"method": <client send method>, "kwargs": {...}}
+    payload = Column(JSON, nullable=True)
+
     # Retry Logic
     retry_count = Column(Integer, default=0)
     max_retries = Column(Integer, default=3)
+    last_attempt_at = Column(DateTime(timezone=True), nullable=True)
 
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
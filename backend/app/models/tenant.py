@@ -30,5 +30,6 @@ class Tenant(Base):
     users = relationship("User", back_populates="tenant")
     products = relationship("Product", back_populates="tenant")
     calls = relationship("Call", back_populates="tenant")
+    webhook_calls = relationship("WebhookCall", back_populates="tenant")
     settings = relationship("TenantSettings", back_populates="tenant", uselist=False)
     automation_settings = relationship("AutomationSettings", back_populates="tenant", uselist=False)
@@ -16,6 +16,7 @@ class TenantSettings(Base):
     whatsapp_business_account_id = Column(String(100), nullable=True)
     whatsapp_access_token = Column(Text, nullable=True)  # Encrypted in production
     whatsapp_webhook_verify_token = Column(String(255), nullable=True)
+    whatsapp_rate_limit_tier = Column(String(20), default="standard")  # see WHATSAPP_RATE_LIMIT_TIERS
 
     # Webhook Security (for Twilio/Exotel)
     webhook_secret_key = Column(String(255), nullable=True)  # Secret to verify incoming webhooks
@@ -25,6 +26,8 @@ class TenantSettings(Base):
     include_catalog = Column(Boolean, default=True)
     catalog_header_message = Column(Text, default="Browse our exclusive collection:")
     catalog_footer_message = Column(Text, default="Reply with product number to inquire!")
+    catalog_delivery_mode = Column(String(30), default="images")  # images, interactive_list, multi_product
+    whatsapp_catalog_id = Column(String(100), nullable=True)  # Meta commerce catalog for multi_product
 
     # Timing Settings
     message_delay_seconds = Column(Integer, default=5)  # Delay before sending after call ends
@@ -39,3 +42,7 @@ class TenantSettings(Base):
 
     # Relationship
     tenant = relationship("Tenant", back_populates="settings")
+
+    @property
+    def has_webhook_secret(self) -> bool:
+        return bool(self.webhook_secret_key)
@@ -1,15 +1,26 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+# Updated to match what the call-ended webhook records
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 from app.db.base_class import Base
 
+
 class WebhookCall(Base):
     __tablename__ = "webhook_calls"
 
     id = Column(Integer, primary_key=True, index=True)
-    caller_number = Column(String, nullable=False)
-    call_status = Column(String, nullable=False)
-    call_duration_seconds = Column(Integer, nullable=False)
-    tenant_id = Column(Integer, ForeignKey("tenants.id"))
+    tenant_id = Column(Integer, ForeignKey("tenants.id"), index=True)
+
+    # Normalized call details
+    provider = Column(String(50), default="generic")  # twilio, exotel, generic
+    call_sid = Column(String(255), nullable=True)
+    caller_phone = Column(String(20), nullable=True)
+    receiver_phone = Column(String(20), nullable=True)
+    status = Column(String(50), nullable=True)
+
+    # Original provider payload
+    raw_payload = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    # 🚀 Add this so relationships work correctly
     tenant = relationship("Tenant", back_populates="webhook_calls")
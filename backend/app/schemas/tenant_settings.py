@@ -1,6 +1,6 @@
 # NEW FILE - Schemas for tenant settings
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -9,6 +9,8 @@ class TenantSettingsBase(BaseModel):
     include_catalog: Optional[bool] = True
     catalog_header_message: Optional[str] = "Browse our exclusive collection:"
     catalog_footer_message: Optional[str] = "Reply with product number to inquire!"
+    catalog_delivery_mode: Optional[Literal["images", "interactive_list", "multi_product"]] = "images"
+    whatsapp_catalog_id: Optional[str] = None
     message_delay_seconds: Optional[int] = Field(default=5, ge=0, le=300)
 
 
@@ -25,6 +27,7 @@ class WhatsAppCredentialsUpdate(BaseModel):
     whatsapp_business_account_id: str
     whatsapp_access_token: str
     whatsapp_webhook_verify_token: Optional[str] = None
+    whatsapp_rate_limit_tier: Optional[str] = None
 
 
 class WebhookSecurityUpdate(BaseModel):
@@ -36,6 +39,7 @@ class TenantSettingsResponse(TenantSettingsBase):
     tenant_id: int
     whatsapp_phone_number_id: Optional[str] = None
     whatsapp_business_account_id: Optional[str] = None
+    whatsapp_rate_limit_tier: Optional[str] = None
     is_whatsapp_configured: bool = False
     webhook_secret_key: Optional[str] = None
     is_active: bool = True
@@ -54,10 +58,36 @@ class TenantSettingsPublic(BaseModel):
     include_catalog: bool
     catalog_header_message: str
     catalog_footer_message: str
+    catalog_delivery_mode: str = "images"
+    whatsapp_catalog_id: Optional[str] = None
     message_delay_seconds: int
     is_whatsapp_configured: bool
     has_webhook_secret: bool = False
     is_active: bool
+    whatsapp_circuit_state: str = "closed"
+    whatsapp_circuit_reason: Optional[str] = None
+    whatsapp_circuit_opened_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+    @field_validator("catalog_delivery_mode", mode="before")
+    @classmethod
+    def default_delivery_mode(cls, v: Optional[str]) -> str:
+        return v or "images"
+
+
+class CircuitTransition(BaseModel):
+    state: str
+    reason: Optional[str] = None
+    at: datetime
+
+
+class WhatsAppCircuitStatus(BaseModel):
+    """State of the tenant's WhatsApp credentials circuit breaker"""
+    state: str
+    failures: int = 0
+    reason: Optional[str] = None
+    opened_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    transitions: List[CircuitTransition] = []
@@ -1,5 +1,5 @@
 # COMPLETE REWRITE - Proper webhook schemas for different providers
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
 from typing import Optional, List, Any
 from datetime import datetime
 
@@ -10,35 +10,58 @@ class GenericWebhookPayload(BaseModel):
     raw_data: Optional[Any] = None
 
 
+def _optional_int(value: Any) -> Optional[int]:
+    """Providers send durations as strings, sometimes empty"""
+    if value is None or isinstance(value, int):
+        return value
+    value = str(value).strip()
+    return int(value) if value.isdigit() else None
+
+
 # Twilio webhook payload
 class TwilioCallWebhook(BaseModel):
     CallSid: str
     AccountSid: str
-    From_: str = Field(alias="From")
-    To: str
-    CallStatus: str  # queued, ringing, in-progress, completed, busy, failed, no-answer
-    Direction: str  # inbound, outbound
+    From_: str = Field("", validation_alias=AliasChoices("From", "Caller"))
+    To: str = Field("", validation_alias=AliasChoices("To", "Called"))
+    CallStatus: str = ""  # queued, ringing, in-progress, completed, busy, failed, no-answer
+    Direction: Optional[str] = None  # inbound, outbound-api, outbound-dial
     CallerName: Optional[str] = None
     CallDuration: Optional[int] = None
     Timestamp: Optional[str] = None
 
-    class Config:
-        populate_by_name = True
+    model_config = ConfigDict(populate_by_name=True, coerce_numbers_to_str=True)
+
+    _duration = field_validator("CallDuration", mode="before")(_optional_int)
 
 
 # Exotel webhook payload
 class ExotelCallWebhook(BaseModel):
     CallSid: str
-    From_: str = Field(alias="From")
-    To: str
-    Status: str  # ringing, in-progress, completed, failed, busy, no-answer
-    Direction: str
+    From_: str = Field("", validation_alias=AliasChoices("From", "CallFrom"))
+    To: str = Field("", validation_alias=AliasChoices("To", "CallTo"))
+    Status: str = ""  # ringing, in-progress, completed, failed, busy, no-answer
+    Direction: Optional[str] = None
     RecordingUrl: Optional[str] = None
     CurrentTime: Optional[str] = None
     DialCallDuration: Optional[int] = None
 
-    class Config:
-        populate_by_name = True
+    model_config = ConfigDict(populate_by_name=True, coerce_numbers_to_str=True)
+
+    _duration = field_validator("DialCallDuration", mode="before")(_optional_int)
+
+
+# Provider-agnostic webhook payload (our documented generic format)
+class GenericCallWebhook(BaseModel):
+    call_sid: Optional[str] = Field(None, validation_alias=AliasChoices("call_id", "call_sid"))
+    caller_phone: str = Field("", validation_alias=AliasChoices("caller", "from", "caller_phone"))
+    receiver_phone: str = Field("", validation_alias=AliasChoices("receiver", "to", "receiver_phone"))
+    status: Optional[str] = "completed"
+    duration_seconds: Optional[int] = Field(None, validation_alias=AliasChoices("duration", "duration_seconds"))
+
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    _duration = field_validator("duration_seconds", mode="before")(_optional_int)
 
 
 # Generic call ended event (normalized)
@@ -59,3 +82,25 @@ class WebhookResponse(BaseModel):
     message: str
     call_id: Optional[int] = None
     automation_triggered: bool = False
+    duplicate: bool = False
+
+
+# Bulk CDR ingestion
+class CdrRecordResult(BaseModel):
+    index: int  # 1-based position in the batch (row/line number, header excluded)
+    status: str  # accepted, invalid, failed
+    call_sid: Optional[str] = None
+    call_id: Optional[int] = None
+    automation_triggered: bool = False
+    error: Optional[str] = None
+
+
+class CdrBatchResponse(BaseModel):
+    success: bool
+    total: int = 0
+    accepted: int = 0
+    invalid: int = 0
+    failed: int = 0
+    automation_triggered: int = 0
+    truncated: bool = False  # stopped at CDR_BATCH_MAX_RECORDS
+    results: List[CdrRecordResult] = []
@@ -0,0 +1,254 @@
+# NEW FILE - Per-call step journal for the post-call automation (resume instead of resending)
+"""
+Every outbound message of a call's automation is a step with a fixed key:
+
+    thank_you, catalog:header, catalog:product:<product id>, catalog:footer
+    (or one `catalog` step for the list / multi-product modes)
+
+Each step is one MessageLog row (`step_key`), created up front with an
+idempotency key unique per (call, step). Before a step is sent it is claimed
+with a conditional UPDATE (pending / failed -> 'sending'), so a retried task,
+a second task for the same call, and the message retry worker
+(app.services.message_retry) can never send the same step twice. A step that
+is already 'sent' is skipped: a retry resumes at the first step that is not
+done.
+
+A step left in flight past MESSAGE_RETRY_STALE_SECONDS (its sender died) may
+have been delivered before the outcome was written. The Cloud API has no
+idempotency key to dedupe a resend, so such a step becomes 'unknown' and is
+only sent again by an explicit retry (retry_failed_messages(resend_unknown=True)).
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.call import Call
+from app.models.message_log import MessageLog
+
+STEP_THANK_YOU = "thank_you"
+STEP_CATALOG = "catalog"
+STEP_CATALOG_HEADER = "catalog:header"
+STEP_CATALOG_FOOTER = "catalog:footer"
+
+STATUS_SENDING = "sending"    # claimed by an automation run
+STATUS_RETRYING = "retrying"  # claimed by the message retry worker
+# The send may have reached WhatsApp (timeout after sending, dropped connection):
+# never resent automatically, only by an explicit retry (see app.services.message_retry)
+STATUS_UNKNOWN = "unknown"
+DONE_STATUSES = ("sent", "delivered", "read")
+# Claimed by a sender that has not written the outcome yet
+IN_FLIGHT_STATUSES = (STATUS_SENDING, STATUS_RETRYING)
+INTERRUPTED_SEND_ERROR = "Send interrupted, delivery unknown"
+
+# Call.automation_status
+AUTOMATION_PENDING = "pending"
+AUTOMATION_IN_PROGRESS = "in_progress"
+AUTOMATION_SENT = "sent"
+AUTOMATION_PARTIAL = "partial"
+AUTOMATION_FAILED = "failed"
+AUTOMATION_SKIPPED = "skipped"
+# A later call from the same number replaced this call's delayed send
+AUTOMATION_SUPERSEDED = "superseded"
+
+
+def product_step_key(number: int, product: Dict[str, Any]) -> str:
+    return f"catalog:product:{product.get('id') or number}"
+
+
+def idempotency_key(tenant_id: int, call_id: int, step_key: str) -> str:
+    return f"{tenant_id}:{call_id}:{step_key}"
+
+
+def outcome_status(result: Dict[str, Any]) -> str:
+    """MessageLog.status for a send result"""
+    if result.get("success"):
+        return "sent"
+    return STATUS_UNKNOWN if result.get("delivery_unknown") else "failed"
+
+
+class AutomationJournal:
+    """
+    The steps of one call's automation. `specs` passed to ensure() are dicts
+    with step_key, message_type, message_content, media_url and payload.
+    Without a call_id nothing can be resumed; rows are still logged.
+    """
+
+    def __init__(self, db: Session, tenant_id: int, call_id: Optional[int], recipient_phone: str):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.call_id = call_id
+        self.recipient_phone = recipient_phone
+        # step_key -> MessageLog id, and the steps already sent when the journal was loaded
+        self.steps: Dict[str, int] = {}
+        self.done: Set[str] = set()
+        self._load()
+
+    def _load(self) -> None:
+        if self.call_id is None:
+            return
+        rows = self.db.execute(
+            select(MessageLog.step_key, MessageLog.id, MessageLog.status).where(
+                MessageLog.call_id == self.call_id,
+                MessageLog.step_key.isnot(None)
+            )
+        ).all()
+        for step_key, step_id, status in rows:
+            self.steps[step_key] = step_id
+            if status in DONE_STATUSES:
+                self.done.add(step_key)
+
+    def ensure(self, specs: Iterable[Dict[str, Any]]) -> None:
+        """Create the journal rows of steps not seen before, in one commit"""
+        missing = [spec for spec in specs if spec["step_key"] not in self.steps]
+        if not missing:
+            return
+        logs = [
+            MessageLog(
+                tenant_id=self.tenant_id,
+                call_id=self.call_id,
+                recipient_phone=self.recipient_phone,
+                message_type=spec["message_type"],
+                message_content=spec.get("message_content"),
+                media_url=spec.get("media_url"),
+                payload=spec["payload"],
+                step_key=spec["step_key"],
+                idempotency_key=(
+                    idempotency_key(self.tenant_id, self.call_id, spec["step_key"])
+                    if self.call_id is not None else None
+                ),
+                status="pending",
+                retry_count=0
+            )
+            for spec in missing
+        ]
+        self.db.add_all(logs)
+        try:
+            self.db.flush()
+            ids = {log.step_key: log.id for log in logs}
+            self.db.commit()
+        except IntegrityError:
+            # Another run for this call created them first: use its rows
+            self.db.rollback()
+            self._load()
+            return
+        self.steps.update(ids)
+
+    def claim(self, step_keys: Iterable[str]) -> Set[str]:
+        """
+        Take the steps that still need sending; returns the keys this caller
+        now owns. Done steps, steps another sender holds, steps whose delivery
+        is unknown and failed steps without attempts left are not returned.
+        """
+        step_keys = list(step_keys)
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=get_settings().MESSAGE_RETRY_STALE_SECONDS)
+        # A sender that died mid-send may have delivered: do not send again
+        self.db.execute(
+            update(MessageLog)
+            .where(
+                MessageLog.id.in_([self.steps[step_key] for step_key in step_keys]),
+                MessageLog.status.in_(IN_FLIGHT_STATUSES),
+                MessageLog.last_attempt_at < stale_before
+            )
+            .values(status=STATUS_UNKNOWN, error_message=INTERRUPTED_SEND_ERROR)
+            .execution_options(synchronize_session=False)
+        )
+        claimed = set()
+        for step_key in step_keys:
+            result = self.db.execute(
+                update(MessageLog)
+                .where(
+                    MessageLog.id == self.steps[step_key],
+                    or_(
+                        MessageLog.status == "pending",
+                        and_(MessageLog.status == "failed", MessageLog.retry_count < MessageLog.max_retries)
+                    )
+                )
+                .values(
+                    status=STATUS_SENDING,
+                    last_attempt_at=now,
+                    # The first send is not a retry
+                    retry_count=MessageLog.retry_count + case((MessageLog.status == "pending", 0), else_=1)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                claimed.add(step_key)
+        self.db.commit()
+        return claimed
+
+    def record(self, outcomes: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Write the send results of claimed steps: one bulk UPDATE, one commit"""
+        if not outcomes:
+            return
+        now = datetime.utcnow()
+        values, permanent = [], []
+        for step_key, result in outcomes:
+            step_id = self.steps[step_key]
+            success = bool(result.get("success"))
+            values.append({
+                "id": step_id,
+                "status": outcome_status(result),
+                "whatsapp_message_id": result.get("message_id") if success else None,
+                "error_message": None if success else result.get("error_message"),
+                "api_response": result.get("response"),
+                "sent_at": now if success else None
+            })
+            if not success and not result.get("retryable") and not result.get("delivery_unknown"):
+                permanent.append(step_id)
+        self.db.execute(update(MessageLog), values)
+        if permanent:
+            # Permanent errors (invalid number, expired token): no more attempts
+            self.db.execute(
+                update(MessageLog)
+                .where(MessageLog.id.in_(permanent))
+                .values(max_retries=MessageLog.retry_count)
+                .execution_options(synchronize_session=False)
+            )
+        self.db.commit()
+
+
+def set_automation_status(db: Session, call_id: Optional[int], status: str) -> None:
+    if call_id is not None:
+        db.execute(
+            update(Call).where(Call.id == call_id).values(automation_status=status)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def refresh_automation_status(db: Session, call_ids: Iterable[Optional[int]]) -> None:
+    """
+    Derive Call.automation_status from the calls' journal rows (one GROUP BY,
+    one bulk UPDATE; the caller commits): in_progress while a step is pending
+    or in flight, then sent, partial or failed.
+    """
+    call_ids = {call_id for call_id in call_ids if call_id is not None}
+    if not call_ids:
+        return
+    rows = db.execute(
+        select(
+            MessageLog.call_id,
+            func.count(),
+            func.sum(case((MessageLog.status.in_(DONE_STATUSES), 1), else_=0)),
+            func.sum(case((MessageLog.status.in_(("pending",) + IN_FLIGHT_STATUSES), 1), else_=0))
+        )
+        .where(MessageLog.call_id.in_(call_ids), MessageLog.step_key.isnot(None))
+        .group_by(MessageLog.call_id)
+    ).all()
+    values = []
+    for call_id, total, done, open_steps in rows:
+        if open_steps:
+            status = AUTOMATION_IN_PROGRESS
+        elif done == total:
+            status = AUTOMATION_SENT
+        elif done:
+            status = AUTOMATION_PARTIAL
+        else:
+            status = AUTOMATION_FAILED
+        values.append({"id": call_id, "automation_status": status})
+    if values:
+        db.execute(update(Call), values)
@@ -1,6 +1,6 @@
 # COMPLETE REWRITE - Proper automation flow with real credentials
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 
@@ -9,10 +9,58 @@ from app.models.automation_settings import AutomationSettings
 from app.models.product import Product
 from app.models.call import Call
 from app.models.message_log import MessageLog
+from app.core.config import get_settings
+from app.services.catalog_messages import (
+    CATALOG_MODE_IMAGES,
+    CATALOG_MODE_MULTI_PRODUCT,
+    build_list_message,
+    build_multi_product_message,
+    select_catalog_mode,
+)
+from app.services.automation_journal import (
+    AUTOMATION_IN_PROGRESS,
+    AUTOMATION_SKIPPED,
+    STEP_CATALOG,
+    STEP_CATALOG_FOOTER,
+    STEP_CATALOG_HEADER,
+    STEP_THANK_YOU,
+    AutomationJournal,
+    product_step_key,
+    refresh_automation_status,
+    set_automation_status,
+)
+from app.services.circuit_breaker import get_circuit_breaker
 from app.services.whatsapp_client import WhatsAppCloudAPIClient
+from app.services.whatsapp_errors import REASON_AUTH
 
 logger = logging.getLogger(__name__)
 
+# WhatsAppCloudAPIClient methods a stored MessageLog payload may replay
+REPLAYABLE_METHODS = frozenset({
+    "send_text_message",
+    "send_image_message",
+    "send_document_message",
+    "send_template_message",
+    "send_interactive_list",
+    "send_multi_product_message",
+})
+
+
+def replay_payload(method: str, **kwargs: Any) -> Dict[str, Any]:
+    """Stored on a MessageLog so a retry can resend exactly that message (recipient comes from the row)"""
+    if method not in REPLAYABLE_METHODS:
+        raise ValueError(f"Not a replayable WhatsApp method: {method}")
+    return {"method": method, "kwargs": kwargs}
+
+
+def text_message_spec(text: str, step_key: str) -> Dict[str, Any]:
+    return {
+        "step_key": step_key,
+        "message_type": "text",
+        "message_content": text,
+        "payload": replay_payload("send_text_message", message=text)
+    }
+
 
 class AutomationService:
     """Handles the complete post-call automation flow"""
@@ -47,30 +95,46 @@ class AutomationService:
                 self._whatsapp_client = WhatsAppCloudAPIClient(
                     phone_number_id=self.tenant_settings.whatsapp_phone_number_id,
                     access_token=self.tenant_settings.whatsapp_access_token,
-                    business_account_id=self.tenant_settings.whatsapp_business_account_id
+                    business_account_id=self.tenant_settings.whatsapp_business_account_id,
+                    rate_limit_tier=self.tenant_settings.whatsapp_rate_limit_tier,
+                    tenant_id=self.tenant_id
                 )
         return self._whatsapp_client
 
     def is_automation_enabled(self) -> bool:
         """Check if automation is properly configured and enabled"""
         if not self.tenant_settings:
-            logger.warning(f"No tenant settings found for tenant {self.tenant_id}")
+            logger.warning("No tenant settings found for tenant %s", self.tenant_id)
             return False
 
         if not self.tenant_settings.is_whatsapp_configured:
-            logger.warning(f"WhatsApp not configured for tenant {self.tenant_id}")
+            logger.warning("WhatsApp not configured for tenant %s", self.tenant_id)
             return False
 
         if not self.tenant_settings.is_active:
-            logger.warning(f"Tenant settings inactive for tenant {self.tenant_id}")
+            logger.warning("Tenant settings inactive for tenant %s", self.tenant_id)
             return False
 
         if self.automation_settings and not self.automation_settings.is_enabled:
-            logger.warning(f"Automation disabled for tenant {self.tenant_id}")
+            logger.warning("Automation disabled for tenant %s", self.tenant_id)
             return False
 
         return True
 
+    def circuit_allows_send(self) -> bool:
+        """False while this tenant's WhatsApp circuit is open (credentials failing)"""
+        phone_number_id = self.tenant_settings.whatsapp_phone_number_id if self.tenant_settings else None
+        return get_circuit_breaker().allow(self.tenant_id, phone_number_id)
+
+    def record_send_results(self, send_results: List[Dict[str, Any]]) -> None:
+        """Report send outcomes to the tenant's circuit breaker"""
+        if send_results and self.tenant_settings:
+            get_circuit_breaker().record_results(
+                self.tenant_id,
+                self.tenant_settings.whatsapp_phone_number_id,
+                send_results
+            )
+
     def get_catalog_products(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get active products for catalog"""
         products = self.db.query(Product).filter(
@@ -85,7 +149,7 @@ class AutomationService:
                 "price": f"₹{p.price}" if p.price else "Contact for price",
                 "description": p.description,
                 "image_url": p.image_url,
-                "sku": p.sku
+                "category": p.category
             }
             for p in products
         ]
@@ -96,9 +160,10 @@ class AutomationService:
         message_type: str,
         message_content: Optional[str] = None,
         call_id: Optional[int] = None,
-        media_url: Optional[str] = None
+        media_url: Optional[str] = None,
+        payload: Optional[Dict[str, Any]] = None
     ) -> MessageLog:
-        """Create a message log entry"""
+        """Create a message log entry; `payload` is what a retry replays (see replay_payload)"""
         log = MessageLog(
             tenant_id=self.tenant_id,
             call_id=call_id,
@@ -106,6 +171,7 @@ class AutomationService:
             message_type=message_type,
             message_content=message_content,
             media_url=media_url,
+            payload=payload,
             status="pending"
         )
         self.db.add(log)
@@ -119,7 +185,8 @@ class AutomationService:
         status: str,
         whatsapp_message_id: Optional[str] = None,
         error_message: Optional[str] = None,
-        api_response: Optional[Dict] = None
+        api_response: Optional[Dict] = None,
+        retryable: bool = True
     ):
         """Update message log with result"""
         log = self.db.query(MessageLog).filter(MessageLog.id == log_id).first()
@@ -130,17 +197,159 @@ class AutomationService:
             log.api_response = api_response
             if status == "sent":
                 log.sent_at = datetime.utcnow()
+            elif status == "failed" and not retryable:
+                # Permanent error (invalid number, expired token): retries would only burn quota
+                log.max_retries = log.retry_count or 0
             self.db.commit()
 
+    @staticmethod
+    def catalog_message_specs(
+        products: List[Dict[str, Any]],
+        header_text: Optional[str] = None,
+        footer_text: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Journal steps of an images-mode catalog, in display order (header, products..., footer)"""
+        specs = []
+        if header_text:
+            specs.append(text_message_spec(header_text, STEP_CATALOG_HEADER))
+        for number, product in enumerate(products, 1):
+            caption = WhatsAppCloudAPIClient.build_product_caption(number, product)
+            step_key = product_step_key(number, product)
+            if product.get("image_url"):
+                spec = {
+                    "step_key": step_key,
+                    "message_type": "image",
+                    "message_content": caption,
+                    "media_url": product["image_url"],
+                    "payload": replay_payload("send_image_message", image_url=product["image_url"], caption=caption)
+                }
+            else:
+                spec = text_message_spec(caption, step_key)
+            specs.append({**spec, "product": product, "number": number})
+        if footer_text:
+            specs.append(text_message_spec(footer_text, STEP_CATALOG_FOOTER))
+        return specs
+
+    @staticmethod
+    def _count_results(
+        results: Dict[str, Any],
+        outcomes: List[Tuple[str, Dict[str, Any]]],
+        label: str
+    ) -> None:
+        """Fold the outcomes of freshly sent steps into the run's results"""
+        failed = [result for _, result in outcomes if not result.get("success")]
+        results["messages_sent"] += len(outcomes) - len(failed)
+        results["message_ids"].extend(
+            result.get("message_id") for _, result in outcomes
+            if result.get("success") and result.get("message_id")
+        )
+        if not failed:
+            return
+        # A failed send fails the run, so the task can retry the steps that are not done
+        results["success"] = False
+        if len(failed) == 1 and len(outcomes) == 1:
+            results["errors"].append(f"{label} failed: {failed[0].get('error_message')}")
+        else:
+            results["errors"].append(f"{label}: {len(failed)} messages failed")
+        results["retryable"] = results["retryable"] or any(result.get("retryable") for result in failed)
+
+    async def _send_catalog_images(
+        self,
+        journal: AutomationJournal,
+        caller_phone: str,
+        products: List[Dict[str, Any]],
+        results: Dict[str, Any]
+    ) -> None:
+        """Catalog as header + one image message per product + footer; only steps not sent yet"""
+        settings = self.tenant_settings
+
+        specs = self.catalog_message_specs(products, settings.catalog_header_message, settings.catalog_footer_message)
+        journal.ensure(specs)
+        claimed = journal.claim(spec["step_key"] for spec in specs)
+        pending = [spec for spec in specs if spec["step_key"] in claimed]
+        if not pending:
+            return
+
+        # Resumed products keep their original numbers in the captions
+        product_specs = [spec for spec in pending if "product" in spec]
+        app_settings = get_settings()
+        catalog_results = await self.whatsapp_client.send_catalog_carousel(
+            to_phone=caller_phone,
+            products=[spec["product"] for spec in product_specs],
+            header_text=settings.catalog_header_message if STEP_CATALOG_HEADER in claimed else None,
+            footer_text=settings.catalog_footer_message if STEP_CATALOG_FOOTER in claimed else None,
+            concurrency=app_settings.WHATSAPP_CATALOG_CONCURRENCY,
+            delivery_order=app_settings.WHATSAPP_CATALOG_DELIVERY_ORDER,
+            product_numbers=[spec["number"] for spec in product_specs]
+        )
+
+        self.record_send_results(catalog_results)
+
+        # send_catalog_carousel returns results in display order, like `pending`
+        outcomes = [(spec["step_key"], result) for spec, result in zip(pending, catalog_results)]
+        journal.record(outcomes)
+        self._count_results(results, outcomes, "Catalog")
+
+    async def _send_catalog_single_message(
+        self,
+        journal: AutomationJournal,
+        caller_phone: str,
+        products: List[Dict[str, Any]],
+        mode: str,
+        results: Dict[str, Any]
+    ) -> None:
+        """Whole catalog as one interactive list or multi-product message"""
+        settings = self.tenant_settings
+
+        if mode == CATALOG_MODE_MULTI_PRODUCT:
+            method = "send_multi_product_message"
+            message = build_multi_product_message(
+                products,
+                catalog_id=settings.whatsapp_catalog_id,
+                header_text=settings.catalog_header_message,
+                body_text=settings.catalog_footer_message
+            )
+        else:
+            method = "send_interactive_list"
+            message = build_list_message(
+                products,
+                header_text=settings.catalog_header_message,
+                body_text=settings.catalog_footer_message
+            )
+
+        journal.ensure([{
+            "step_key": STEP_CATALOG,
+            "message_type": mode,
+            "message_content": f"Catalog with {len(products)} products",
+            "payload": replay_payload(method, **message)
+        }])
+        if not journal.claim([STEP_CATALOG]):
+            return
+
+        catalog_result = await getattr(self.whatsapp_client, method)(
+            to_phone=caller_phone,
+            **message
+        )
+
+        self.record_send_results([catalog_result])
+        outcomes = [(STEP_CATALOG, catalog_result)]
+        journal.record(outcomes)
+        self._count_results(results, outcomes, "Catalog message")
+
     async def send_post_call_messages(
         self,
         caller_phone: str,
         call_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """
-        Main method: Send thank you message + catalog after call ends
+        Main method: Send thank you message + catalog after call ends.
+
+        Steps already sent for this call (an earlier, failed run of the task)
+        are skipped, so a retry resumes where that run stopped.
         """
         if not self.is_automation_enabled():
+            set_automation_status(self.db, call_id, AUTOMATION_SKIPPED)
+            self.db.commit()
             return {
                 "success": False,
                 "error": "Automation not enabled or configured"
@@ -155,81 +364,51 @@ class AutomationService:
         results = {
             "success": True,
             "messages_sent": 0,
+            # Steps an earlier run already delivered
+            "messages_skipped": 0,
             "errors": [],
-            "message_ids": []
+            "message_ids": [],
+            # True when at least one failure could succeed on a later attempt
+            "retryable": False
         }
 
         settings = self.tenant_settings
 
         try:
-            # Step 1: Send thank you message
-            thank_you_log = self.create_message_log(
-                recipient_phone=caller_phone,
-                message_type="text",
-                message_content=settings.thank_you_message,
-                call_id=call_id
-            )
-
-            thank_you_result = await self.whatsapp_client.send_text_message(
-                to_phone=caller_phone,
-                message=settings.thank_you_message
-            )
+            journal = AutomationJournal(self.db, self.tenant_id, call_id, caller_phone)
+            results["messages_skipped"] = len(journal.done)
+            set_automation_status(self.db, call_id, AUTOMATION_IN_PROGRESS)
 
-            if thank_you_result.get("success"):
-                self.update_message_log(
-                    log_id=thank_you_log.id,
-                    status="sent",
-                    whatsapp_message_id=thank_you_result.get("message_id"),
-                    api_response=thank_you_result.get("response")
-                )
-                results["messages_sent"] += 1
-                results["message_ids"].append(thank_you_result.get("message_id"))
-            else:
-                self.update_message_log(
-                    log_id=thank_you_log.id,
-                    status="failed",
-                    error_message=thank_you_result.get("error_message"),
-                    api_response=thank_you_result.get("response")
+            # Step 1: Send thank you message
+            journal.ensure([text_message_spec(settings.thank_you_message, STEP_THANK_YOU)])
+            if journal.claim([STEP_THANK_YOU]):
+                thank_you_result = await self.whatsapp_client.send_text_message(
+                    to_phone=caller_phone,
+                    message=settings.thank_you_message
                 )
-                results["errors"].append(f"Thank you message failed: {thank_you_result.get('error_message')}")
+                outcomes = [(STEP_THANK_YOU, thank_you_result)]
+                journal.record(outcomes)
+                self._count_results(results, outcomes, "Thank you message")
+
+                self.record_send_results([thank_you_result])
+                if thank_you_result.get("error_reason") == REASON_AUTH:
+                    # Credentials are broken - the catalog would fail the same way
+                    return results
 
             # Step 2: Send catalog if enabled
             if settings.include_catalog:
                 products = self.get_catalog_products()
 
                 if products:
-                    catalog_log = self.create_message_log(
-                        recipient_phone=caller_phone,
-                        message_type="catalog",
-                        message_content=f"Catalog with {len(products)} products",
-                        call_id=call_id
-                    )
-
-                    catalog_results = await self.whatsapp_client.send_catalog_carousel(
-                        to_phone=caller_phone,
-                        products=products,
-                        header_text=settings.catalog_header_message,
-                        footer_text=settings.catalog_footer_message
+                    mode = select_catalog_mode(
+                        settings.catalog_delivery_mode,
+                        products,
+                        settings.whatsapp_catalog_id
                     )
-
-                    # Count successful sends
-                    successful = sum(1 for r in catalog_results if r.get("success"))
-                    results["messages_sent"] += successful
-
-                    if successful == len(catalog_results):
-                        self.update_message_log(
-                            log_id=catalog_log.id,
-                            status="sent",
-                            api_response={"total_products": len(products), "sent": successful}
-                        )
+                    if mode == CATALOG_MODE_IMAGES:
+                        await self._send_catalog_images(journal, caller_phone, products, results)
                     else:
-                        failed = len(catalog_results) - successful
-                        self.update_message_log(
-                            log_id=catalog_log.id,
-                            status="partial",
-                            error_message=f"{failed} of {len(catalog_results)} messages failed"
-                        )
-                        results["errors"].append(f"Catalog: {failed} messages failed")
+                        await self._send_catalog_single_message(journal, caller_phone, products, mode, results)
 
             # Update call record if provided
             if call_id:
@@ -242,11 +421,17 @@ class AutomationService:
             return results
 
         except Exception as e:
-            logger.error(f"Error in send_post_call_messages: {str(e)}")
+            logger.error("Error in send_post_call_messages: %s", e)
+            self.db.rollback()
             results["success"] = False
+            results["retryable"] = True
             results["errors"].append(str(e))
             return results
 
+        finally:
+            refresh_automation_status(self.db, [call_id])
+            self.db.commit()
+
 
 def get_automation_service(db: Session, tenant_id: int) -> AutomationService:
     """Factory function to create automation service"""
@@ -0,0 +1,96 @@
+# NEW FILE - Fast duplicate detection for provider call-status deliveries
+import logging
+import time
+from typing import Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Value stored while the first delivery is still being processed
+IN_FLIGHT = "0"
+
+
+class CallDedupe:
+    """
+    SET NX marker per (tenant, provider, call_sid, status). Providers retry
+    callbacks and send several statuses per call; only the first delivery of
+    each status does any work. The marker holds the resulting call_id so a
+    duplicate can answer with it. The unique constraint on calls is the real
+    guarantee - this only keeps duplicates away from the database.
+    """
+
+    def __init__(self, redis_client=None, ttl: Optional[int] = None, in_flight_ttl: Optional[int] = None):
+        settings = get_settings()
+        self._redis = redis_client
+        self.ttl = ttl or settings.WEBHOOK_DEDUPE_TTL_SECONDS
+        # The in-flight marker outlives one request, not the dedupe window
+        self.in_flight_ttl = in_flight_ttl or settings.WEBHOOK_DEDUPE_IN_FLIGHT_TTL_SECONDS
+        self._redis_down_until = 0.0
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis()
+        return self._redis
+
+    @staticmethod
+    def key(tenant_id: int, provider: str, call_sid: str, status: str) -> str:
+        return f"wa:wh:seen:{tenant_id}:{provider}:{call_sid}:{status}"
+
+    def _available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _failed(self, e: Exception) -> None:
+        logger.warning("Webhook dedupe store unavailable, relying on the database: %s", e)
+        self._redis_down_until = time.monotonic() + 30.0
+
+    def claim(self, tenant_id: int, provider: str, call_sid: str, status: str) -> Tuple[bool, Optional[int]]:
+        """
+        Returns (is_first_delivery, original_call_id). original_call_id is None
+        while the first delivery is still in flight.
+        """
+        if not call_sid or not self._available():
+            return True, None
+        key = self.key(tenant_id, provider, call_sid, status)
+        try:
+            if self.redis.set(key, IN_FLIGHT, nx=True, ex=self.in_flight_ttl):
+                return True, None
+            value = self.redis.get(key)
+        except Exception as e:
+            self._failed(e)
+            return True, None
+        if value is None:
+            # Expired between SET and GET - treat as new, the database dedupes
+            return True, None
+        call_id = int(value)
+        return False, call_id or None
+
+    def remember(self, tenant_id: int, provider: str, call_sid: str, status: str, call_id: Optional[int]) -> None:
+        """Store the call_id once the first delivery has been recorded, for the full dedupe window"""
+        if not call_sid or call_id is None or not self._available():
+            return
+        try:
+            self.redis.set(self.key(tenant_id, provider, call_sid, status), str(call_id), ex=self.ttl)
+        except Exception as e:
+            self._failed(e)
+
+    def release(self, tenant_id: int, provider: str, call_sid: str, status: str) -> None:
+        """Forget a delivery whose processing failed, so the provider's retry is not dropped"""
+        if not call_sid or not self._available():
+            return
+        try:
+            self.redis.delete(self.key(tenant_id, provider, call_sid, status))
+        except Exception as e:
+            self._failed(e)
+
+
+_call_dedupe: Optional[CallDedupe] = None
+
+
+def get_call_dedupe() -> CallDedupe:
+    global _call_dedupe
+    if _call_dedupe is None:
+        _call_dedupe = CallDedupe()
+    return _call_dedupe
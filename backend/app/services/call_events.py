@@ -0,0 +1,311 @@
+# NEW FILE - Call-ended event normalization and persistence, shared by the webhook and the ingest consumer
+import json
+import logging
+from datetime import datetime
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.crud.crud_call import call_crud
+from app.models.webhook_call import WebhookCall
+from app.schemas.webhook import CallEndedEvent
+from app.services.automation_journal import AUTOMATION_SUPERSEDED, set_automation_status
+from app.services.call_dedupe import get_call_dedupe
+from app.services.circuit_breaker import get_circuit_breaker
+from app.services.delay_scheduler import get_delay_scheduler
+from app.services.fair_queue import submit_automation
+from app.services.telephony import resolve_adapter
+from app.services.tenant_routing import TenantRoute
+
+logger = logging.getLogger(__name__)
+
+
+def parse_webhook_body(body: bytes, content_type: str) -> Dict[str, Any]:
+    """Decode a JSON or form-encoded provider payload"""
+    if "application/x-www-form-urlencoded" in (content_type or ""):
+        return dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+    return json.loads(body or b"{}")
+
+
+class WebhookBody:
+    """Raw request body, read once; decoded at most once and only if needed"""
+
+    def __init__(self, raw: bytes, content_type: str):
+        self.raw = raw
+        self.content_type = content_type
+
+    @cached_property
+    def payload(self) -> Dict[str, Any]:
+        return parse_webhook_body(self.raw, self.content_type)
+
+
+def extract_call_event(
+    payload: Dict[str, Any],
+    provider_hint: Optional[str] = None,
+    headers: Optional[Mapping[str, str]] = None
+) -> CallEndedEvent:
+    """Route the payload to its provider adapter and normalize it"""
+    return resolve_adapter(payload, provider_hint, headers).parse(payload)
+
+
+class CallEventResult(NamedTuple):
+    call_id: Optional[int]
+    automation_triggered: bool = False
+    duplicate: bool = False
+
+
+def record_call_event(
+    db: Session,
+    route: TenantRoute,
+    event: CallEndedEvent,
+    ended_at: Optional[datetime] = None
+) -> CallEventResult:
+    """
+    Log the delivery, upsert the Call row for (tenant, provider, call_sid) and
+    queue the post-call automation for completed calls - at most once per call.
+    A repeated delivery of the same status is a no-op returning the original call_id.
+    """
+    dedupe = get_call_dedupe()
+    dedupe_key = (route.tenant_id, event.provider, event.call_sid, event.status)
+
+    is_first, seen_call_id = dedupe.claim(*dedupe_key)
+    if not is_first:
+        logger.info("Duplicate %s callback for %s (%s) ignored", event.provider, event.call_sid, event.status)
+        return CallEventResult(seen_call_id, duplicate=True)
+
+    try:
+        result = persist_call_event(db, route, event, ended_at)
+    except Exception:
+        dedupe.release(*dedupe_key)
+        raise
+
+    dedupe.remember(*dedupe_key, result.call_id)
+    return result
+
+
+async def record_call_event_async(
+    db: AsyncSession,
+    route: TenantRoute,
+    event: CallEndedEvent,
+    ended_at: Optional[datetime] = None
+) -> CallEventResult:
+    """
+    record_call_event for the API's event loop. Only the SQL runs on the
+    connection (db.run_sync); the dedupe store, circuit breaker and queueing
+    block on Redis or the broker, so they run in the threadpool.
+    """
+    dedupe = get_call_dedupe()
+    dedupe_key = (route.tenant_id, event.provider, event.call_sid, event.status)
+
+    is_first, seen_call_id = await run_in_threadpool(dedupe.claim, *dedupe_key)
+    if not is_first:
+        logger.info("Duplicate %s callback for %s (%s) ignored", event.provider, event.call_sid, event.status)
+        return CallEventResult(seen_call_id, duplicate=True)
+
+    try:
+        result = await persist_call_event_async(db, route, event, ended_at)
+    except Exception:
+        await run_in_threadpool(dedupe.release, *dedupe_key)
+        raise
+
+    await run_in_threadpool(dedupe.remember, *dedupe_key, result.call_id)
+    return result
+
+
+def persist_call_event(
+    db: Session,
+    route: TenantRoute,
+    event: CallEndedEvent,
+    ended_at: Optional[datetime] = None
+) -> CallEventResult:
+    """Write one event in a single transaction, then queue its automation if it claimed it"""
+    call_id, eligible, claimed = write_call_event(db, route, event, ended_at)
+
+    if not claimed:
+        if eligible:
+            logger.info("Automation for call %s already queued", call_id)
+        return CallEventResult(call_id)
+
+    enqueue_automation(db, route, event, call_id)
+    return CallEventResult(call_id, automation_triggered=True)
+
+
+async def persist_call_event_async(
+    db: AsyncSession,
+    route: TenantRoute,
+    event: CallEndedEvent,
+    ended_at: Optional[datetime] = None,
+    circuit_open: Optional[bool] = None
+) -> CallEventResult:
+    """persist_call_event with the SQL on the connection and Redis/broker calls in the threadpool"""
+    if circuit_open is None:
+        circuit_open = automation_wanted(route, event) and await run_in_threadpool(circuit_is_open, route)
+    call_id, eligible, claimed = await db.run_sync(write_call_event, route, event, ended_at, circuit_open)
+
+    if not claimed:
+        if eligible:
+            logger.info("Automation for call %s already queued", call_id)
+        return CallEventResult(call_id)
+
+    try:
+        replaced = await run_in_threadpool(queue_automation, route, event.caller_phone, call_id)
+    except Exception:
+        await db.run_sync(settle_automations, [call_id])
+        raise
+    if replaced is not None:
+        await db.run_sync(settle_automations, [], [(replaced, call_id)])
+    return CallEventResult(call_id, automation_triggered=True)
+
+
+def write_call_event(
+    db: Session,
+    route: TenantRoute,
+    event: CallEndedEvent,
+    ended_at: Optional[datetime] = None,
+    circuit_open: Optional[bool] = None
+) -> Tuple[int, bool, bool]:
+    """
+    The SQL of one event, in one transaction: audit row, Call upsert and the
+    automation claim. Returns (call_id, eligible, claimed).
+    """
+    try:
+        db.add(WebhookCall(**webhook_call_values(route, event)))
+        call_id = call_crud.upsert_from_event(
+            db,
+            tenant_id=route.tenant_id,
+            event=event,
+            ended_at=ended_at or datetime.utcnow()
+        )
+        eligible = automation_eligible(route, event, circuit_open)
+        claimed = eligible and call_crud.claim_automation(db, call_id=call_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return call_id, eligible, claimed
+
+
+def webhook_call_values(route: TenantRoute, event: CallEndedEvent) -> Dict[str, Any]:
+    """Audit row for one delivery"""
+    return {
+        "tenant_id": route.tenant_id,
+        "provider": event.provider,
+        "call_sid": event.call_sid,
+        "caller_phone": event.caller_phone,
+        "receiver_phone": event.receiver_phone,
+        "status": event.status,
+        "raw_payload": event.raw_payload,
+    }
+
+
+def automation_wanted(route: TenantRoute, event: CallEndedEvent) -> bool:
+    """automation_eligible without the circuit breaker (no Redis) and without logging"""
+    return (
+        event.status == "completed" and bool(event.caller_phone)
+        and bool(route.is_whatsapp_configured and route.is_active)
+    )
+
+
+def circuit_is_open(route: TenantRoute) -> bool:
+    return get_circuit_breaker().is_open(route.tenant_id, route.whatsapp_phone_number_id)
+
+
+def circuit_states(routes: Iterable[TenantRoute]) -> Dict[int, bool]:
+    """Whether each tenant's WhatsApp circuit is open, by tenant_id"""
+    states: Dict[int, bool] = {}
+    for route in routes:
+        if route.tenant_id not in states:
+            states[route.tenant_id] = circuit_is_open(route)
+    return states
+
+
+def automation_eligible(route: TenantRoute, event: CallEndedEvent, circuit_open: Optional[bool] = None) -> bool:
+    """
+    Whether this event should trigger the post-call automation (before
+    claiming it). `circuit_open` is the breaker state if the caller already
+    looked it up; otherwise it is read here.
+    """
+    # Trigger automation only for completed calls
+    if event.status != "completed" or not event.caller_phone:
+        logger.info("Call status '%s' - automation not triggered", event.status)
+        return False
+
+    if not (route.is_whatsapp_configured and route.is_active):
+        logger.info("Automation not configured/enabled for tenant %s", route.tenant_id)
+        return False
+
+    if circuit_open is None:
+        circuit_open = circuit_is_open(route)
+    if circuit_open:
+        logger.warning("WhatsApp circuit open for tenant %s, automation not queued", route.tenant_id)
+        return False
+
+    return True
+
+
+def enqueue_automation(
+    db: Session,
+    route: TenantRoute,
+    event: CallEndedEvent,
+    call_id: int,
+    producer=None
+) -> None:
+    """
+    Queue the automation task for a claimed call; un-claims it if the broker
+    refuses. Batches pass one `producer` to publish over a single connection.
+    """
+    try:
+        replaced = queue_automation(route, event.caller_phone, call_id, producer=producer)
+    except Exception:
+        settle_automations(db, [call_id])
+        raise
+    if replaced is not None:
+        settle_automations(db, [], [(replaced, call_id)])
+
+
+def queue_automation(route: TenantRoute, caller_phone: str, call_id: int, producer=None) -> Optional[int]:
+    """
+    Hand a claimed call's automation over, without touching the database.
+    Delayed sends go to the delay scheduler (Celery countdown without Redis),
+    the others to the tenant's fair queue (app.services.fair_queue). Returns
+    the call whose delayed send this one replaced, if any; raises if the
+    automation could not be queued.
+    """
+    delay_seconds = route.message_delay_seconds
+    scheduler = get_delay_scheduler() if delay_seconds > 0 else None
+    if scheduler is not None:
+        try:
+            replaced = scheduler.schedule(route.tenant_id, call_id, caller_phone, delay_seconds)
+        except Exception as e:
+            logger.warning("Delay scheduler unavailable, queueing call %s with a countdown: %s", call_id, e)
+        else:
+            logger.info("Scheduled automation for call %s, delay: %ss", call_id, delay_seconds)
+            return replaced
+
+    submit_automation(route.tenant_id, call_id, caller_phone, countdown=delay_seconds, producer=producer)
+    logger.info("Queued automation for call %s, delay: %ss", call_id, delay_seconds)
+    return None
+
+
+def settle_automations(
+    db: Session,
+    released: List[int],
+    superseded: Optional[List[Tuple[int, int]]] = None
+) -> None:
+    """
+    Write back what queueing changed, in one commit: un-claim the calls whose
+    automation could not be queued, and mark the (replaced, by call) sends superseded.
+    """
+    if not released and not superseded:
+        return
+    for call_id in released:
+        call_crud.release_automation(db, call_id=call_id)
+    for replaced, call_id in superseded or []:
+        # An earlier call from this number was still waiting: this one replaces its send
+        set_automation_status(db, replaced, AUTOMATION_SUPERSEDED)
+        logger.info("Automation for call %s superseded by call %s", replaced, call_id)
+    db.commit()
@@ -0,0 +1,335 @@
+# NEW FILE - Write-behind batching of call-ended events into WebhookCall/Call rows
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.config import get_settings
+from app.core.metrics import CALL_WRITE_BATCH_SIZE, CALL_WRITE_QUEUE_DEPTH
+from app.crud.crud_call import FINAL_STATUSES, CallKey, call_crud
+from app.db.session import SessionLocal
+from app.models.webhook_call import WebhookCall
+from app.schemas.webhook import CallEndedEvent
+from app.services.call_dedupe import get_call_dedupe
+from app.services.call_events import (
+    CallEventResult,
+    automation_eligible,
+    circuit_states,
+    persist_call_event,
+    persist_call_event_async,
+    queue_automation,
+    settle_automations,
+    webhook_call_values,
+)
+from app.services.tenant_routing import TenantRoute
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+# (route, event, ended_at)
+BatchItem = Tuple[TenantRoute, CallEndedEvent, datetime]
+
+
+@dataclass
+class PendingCallEvent:
+    route: TenantRoute
+    event: CallEndedEvent
+    ended_at: datetime
+    future: Future = field(default_factory=Future)
+
+
+class CallWriteBehind:
+    """
+    Accumulates call-ended events and writes them from one background thread
+    in batches of up to `batch_size` events, or whatever arrived within
+    `flush_ms` of the first one (see record_event_batch).
+
+    `submit` returns a Future resolving to the event's CallEventResult once
+    its batch is committed (and its automation queued).
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        batch_size: Optional[int] = None,
+        flush_ms: Optional[int] = None
+    ):
+        settings = get_settings()
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.CALL_WRITE_BEHIND_BATCH_SIZE
+        self.flush_seconds = (flush_ms if flush_ms is not None else settings.CALL_WRITE_BEHIND_FLUSH_MS) / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, route: TenantRoute, event: CallEndedEvent, ended_at: Optional[datetime] = None) -> Future:
+        self._ensure_thread()
+        item = PendingCallEvent(route, event, ended_at or datetime.utcnow())
+        self._queue.put(item)
+        CALL_WRITE_QUEUE_DEPTH.inc()
+        return item.future
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Write everything already submitted and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="call-write-behind", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            CALL_WRITE_QUEUE_DEPTH.dec(len(batch))
+            CALL_WRITE_BATCH_SIZE.observe(len(batch))
+            try:
+                self.flush(batch)
+            except Exception as e:  # never let the writer thread die
+                logger.error("Call write-behind flush failed: %s", e)
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+
+    def flush(self, batch: List[PendingCallEvent]) -> None:
+        """Write one batch and resolve its futures"""
+        db = self.session_factory()
+        try:
+            results = record_event_batch(db, [(p.route, p.event, p.ended_at) for p in batch])
+        finally:
+            db.close()
+
+        for pending, result in zip(batch, results):
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+
+
+def record_event_batch(db: Session, items: Sequence[BatchItem]) -> List[Union[CallEventResult, Exception]]:
+    """
+    Persist many call events in one transaction (see write_event_batch) and
+    queue the automations they claimed over one broker connection. Returns a
+    result or the exception per item. If the batch write fails, its events
+    are written one by one so one bad event only fails itself.
+    """
+    try:
+        call_ids, eligible, claimed = write_event_batch(db, items)
+    except Exception as e:
+        db.rollback()
+        logger.warning("Call batch of %s failed, writing one by one: %s", len(items), e)
+        return _record_each(db, items)
+
+    results, released, superseded = queue_claimed(items, call_ids, eligible, claimed)
+    settle_automations(db, released, superseded)
+    return results
+
+
+async def record_event_batch_async(
+    db: AsyncSession,
+    items: Sequence[BatchItem]
+) -> List[Union[CallEventResult, Exception]]:
+    """
+    record_event_batch for the API's event loop: the SQL runs on the
+    connection (db.run_sync), the circuit breaker lookups and the queueing -
+    Redis and the broker - in the threadpool.
+    """
+    circuit_open = await run_in_threadpool(circuit_states, [route for route, _, _ in items])
+    try:
+        call_ids, eligible, claimed = await db.run_sync(write_event_batch, items, circuit_open)
+    except Exception as e:
+        await db.rollback()
+        logger.warning("Call batch of %s failed, writing one by one: %s", len(items), e)
+        results: List[Union[CallEventResult, Exception]] = []
+        for route, event, ended_at in items:
+            try:
+                results.append(await persist_call_event_async(
+                    db, route, event, ended_at, circuit_open[route.tenant_id]
+                ))
+            except Exception as item_error:
+                results.append(item_error)
+        return results
+
+    results, released, superseded = await run_in_threadpool(queue_claimed, items, call_ids, eligible, claimed)
+    if released or superseded:
+        await db.run_sync(settle_automations, released, superseded)
+    return results
+
+
+def queue_claimed(
+    items: Sequence[BatchItem],
+    call_ids: List[int],
+    eligible: List[bool],
+    claimed: Set[int]
+) -> Tuple[List[Union[CallEventResult, Exception]], List[int], List[Tuple[int, int]]]:
+    """
+    Queue the automations a batch claimed, over one broker connection, without
+    touching the database. Returns the result per item, the calls that could not
+    be queued and the (replaced, by call) delayed sends, for settle_automations.
+    """
+    claimed = set(claimed)
+    results: List[Union[CallEventResult, Exception]] = []
+    released: List[int] = []
+    superseded: List[Tuple[int, int]] = []
+    producer_context = celery_app.producer_or_acquire() if claimed else nullcontext()
+    with producer_context as producer:
+        for (route, event, _), call_id, is_eligible in zip(items, call_ids, eligible):
+            if not is_eligible or call_id not in claimed:
+                results.append(CallEventResult(call_id))
+                continue
+            # Only the first event of the batch for this call queues it
+            claimed.discard(call_id)
+            try:
+                replaced = queue_automation(route, event.caller_phone, call_id, producer=producer)
+            except Exception as e:
+                released.append(call_id)
+                results.append(e)
+                continue
+            if replaced is not None:
+                superseded.append((replaced, call_id))
+            results.append(CallEventResult(call_id, automation_triggered=True))
+    return results, released, superseded
+
+
+def write_event_batch(
+    db: Session,
+    items: Sequence[BatchItem],
+    circuit_open: Optional[Dict[int, bool]] = None
+) -> Tuple[List[int], List[bool], Set[int]]:
+    """
+    One multi-row INSERT of the WebhookCall audit rows, one multi-row upsert
+    ... RETURNING of the Call rows, one UPDATE claiming the automations, one
+    commit. Returns the call id and automation eligibility per item, and the
+    claimed call ids. `circuit_open` (by tenant_id) is the breaker state if the
+    caller already looked it up (see circuit_states).
+    """
+    db.execute(insert(WebhookCall), [webhook_call_values(route, event) for route, event, _ in items])
+
+    # One row per call: a multi-row upsert may not touch the same row twice
+    keys: List[Optional[CallKey]] = []
+    merged: Dict[CallKey, dict] = {}
+    unkeyed: List[dict] = []
+    for route, event, ended_at in items:
+        values = call_crud.values_from_event(tenant_id=route.tenant_id, event=event, ended_at=ended_at)
+        key = (route.tenant_id, event.provider, event.call_sid) if event.call_sid else None
+        keys.append(key)
+        if key is None:
+            unkeyed.append(values)
+        else:
+            merged[key] = _merge(merged.get(key), values)
+
+    ids = call_crud.upsert_many(db, list(merged.values()))
+    unkeyed_ids = iter(call_crud.insert_many(db, unkeyed))
+    call_ids = [ids[key] if key is not None else next(unkeyed_ids) for key in keys]
+
+    eligible = [
+        automation_eligible(route, event, circuit_open.get(route.tenant_id) if circuit_open is not None else None)
+        for route, event, _ in items
+    ]
+    eligible_ids = {call_id for call_id, is_eligible in zip(call_ids, eligible) if is_eligible}
+    claimed = call_crud.claim_automation_many(db, call_ids=eligible_ids)
+    db.commit()
+
+    for call_id in eligible_ids - claimed:
+        logger.info("Automation for call %s already queued", call_id)
+    return call_ids, eligible, claimed
+
+
+def _record_each(db: Session, items: Sequence[BatchItem]) -> List[Union[CallEventResult, Exception]]:
+    results: List[Union[CallEventResult, Exception]] = []
+    for route, event, ended_at in items:
+        try:
+            results.append(persist_call_event(db, route, event, ended_at))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _merge(current: Optional[dict], update: dict) -> dict:
+    """Fold a later event for the same call into the pending row, as the upsert would"""
+    if current is None:
+        return update
+    if current["status"] in FINAL_STATUSES:
+        return current
+    merged = dict(update)
+    for column in ("receiver_phone", "duration_seconds"):
+        if merged[column] is None:
+            merged[column] = current[column]
+    return merged
+
+
+def submit_call_event(route: TenantRoute, event: CallEndedEvent, ended_at: Optional[datetime] = None) -> Future:
+    """
+    record_call_event through the write-behind writer: the returned Future
+    resolves to the CallEventResult once the event's batch is committed.
+    """
+    dedupe = get_call_dedupe()
+    dedupe_key = (route.tenant_id, event.provider, event.call_sid, event.status)
+
+    is_first, seen_call_id = dedupe.claim(*dedupe_key)
+    if not is_first:
+        logger.info("Duplicate %s callback for %s (%s) ignored", event.provider, event.call_sid, event.status)
+        future: Future = Future()
+        future.set_result(CallEventResult(seen_call_id, duplicate=True))
+        return future
+
+    def _done(f: Future) -> None:
+        if f.exception() is not None:
+            dedupe.release(*dedupe_key)
+        else:
+            dedupe.remember(*dedupe_key, f.result().call_id)
+
+    future = get_call_writer().submit(route, event, ended_at)
+    future.add_done_callback(_done)
+    return future
+
+
+_call_writer: Optional[CallWriteBehind] = None
+_call_writer_lock = threading.Lock()
+
+
+def get_call_writer() -> CallWriteBehind:
+    global _call_writer
+    if _call_writer is None:
+        with _call_writer_lock:
+            if _call_writer is None:
+                _call_writer = CallWriteBehind()
+                atexit.register(_call_writer.close)
+    return _call_writer
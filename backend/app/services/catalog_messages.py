@@ -0,0 +1,147 @@
+# NEW FILE - Catalog delivery modes and single-request catalog payload builders
+from typing import Any, Dict, List, Optional
+
+# Delivery modes (TenantSettings.catalog_delivery_mode)
+CATALOG_MODE_IMAGES = "images"                      # header + one image per product + footer
+CATALOG_MODE_INTERACTIVE_LIST = "interactive_list"  # one list message, sections per category
+CATALOG_MODE_MULTI_PRODUCT = "multi_product"        # one multi-product message from a Meta catalog
+
+CATALOG_DELIVERY_MODES = (
+    CATALOG_MODE_IMAGES,
+    CATALOG_MODE_INTERACTIVE_LIST,
+    CATALOG_MODE_MULTI_PRODUCT,
+)
+
+# WhatsApp limits for interactive messages
+LIST_MAX_ROWS = 10
+LIST_MAX_SECTIONS = 10
+LIST_HEADER_MAX = 60
+LIST_BUTTON_MAX = 20
+LIST_SECTION_TITLE_MAX = 24
+LIST_ROW_TITLE_MAX = 24
+LIST_ROW_DESCRIPTION_MAX = 72
+MULTI_PRODUCT_MAX_ITEMS = 30
+MULTI_PRODUCT_MAX_SECTIONS = 10
+BODY_MAX = 1024
+
+DEFAULT_SECTION_TITLE = "More products"
+DEFAULT_LIST_BUTTON = "View products"
+
+
+def _truncate(text: Optional[str], limit: int) -> str:
+    text = (text or "").strip()
+    if len(text) <= limit:
+        return text
+    return text[:limit - 1].rstrip() + "…"
+
+
+def _group_by_category(products: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group products by category, keeping first-seen category order"""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for product in products:
+        category = (product.get("category") or "").strip() or DEFAULT_SECTION_TITLE
+        groups.setdefault(category, []).append(product)
+    return groups
+
+
+def retailer_id(product: Dict[str, Any]) -> str:
+    """Content ID the product is registered under in the Meta catalog"""
+    return str(product.get("sku") or product["id"])
+
+
+def select_catalog_mode(
+    requested_mode: Optional[str],
+    products: List[Dict[str, Any]],
+    catalog_id: Optional[str] = None
+) -> str:
+    """
+    Resolve the mode actually used for a send.
+    Multi-product needs a Meta catalog; anything unknown or unusable falls
+    back to one image message per product.
+    """
+    if not products:
+        return CATALOG_MODE_IMAGES
+    if requested_mode == CATALOG_MODE_MULTI_PRODUCT:
+        return CATALOG_MODE_MULTI_PRODUCT if catalog_id else CATALOG_MODE_INTERACTIVE_LIST
+    if requested_mode == CATALOG_MODE_INTERACTIVE_LIST:
+        return CATALOG_MODE_INTERACTIVE_LIST
+    return CATALOG_MODE_IMAGES
+
+
+def build_list_sections(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Interactive list sections, one per product category (max 10 rows in total)"""
+    sections = []
+    rows_left = LIST_MAX_ROWS
+
+    for category, items in _group_by_category(products).items():
+        if rows_left <= 0 or len(sections) >= LIST_MAX_SECTIONS:
+            break
+
+        rows = []
+        for product in items[:rows_left]:
+            description = product.get("price") or ""
+            if product.get("description"):
+                description = f"{description} · {product['description']}" if description else product["description"]
+            row = {
+                "id": f"product_{product['id']}",
+                "title": _truncate(product.get("name") or "Product", LIST_ROW_TITLE_MAX),
+            }
+            if description:
+                row["description"] = _truncate(description, LIST_ROW_DESCRIPTION_MAX)
+            rows.append(row)
+
+        rows_left -= len(rows)
+        sections.append({
+            "title": _truncate(category, LIST_SECTION_TITLE_MAX),
+            "rows": rows
+        })
+
+    return sections
+
+
+def build_multi_product_sections(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Multi-product message sections, one per category (max 30 items in total)"""
+    sections = []
+    items_left = MULTI_PRODUCT_MAX_ITEMS
+
+    for category, items in _group_by_category(products).items():
+        if items_left <= 0 or len(sections) >= MULTI_PRODUCT_MAX_SECTIONS:
+            break
+        product_items = [{"product_retailer_id": retailer_id(p)} for p in items[:items_left]]
+        items_left -= len(product_items)
+        sections.append({
+            "title": _truncate(category, LIST_SECTION_TITLE_MAX),
+            "product_items": product_items
+        })
+
+    return sections
+
+
+def build_list_message(
+    products: List[Dict[str, Any]],
+    header_text: Optional[str],
+    body_text: Optional[str],
+    button_text: str = DEFAULT_LIST_BUTTON
+) -> Dict[str, Any]:
+    """Arguments for WhatsAppCloudAPIClient.send_interactive_list"""
+    return {
+        "header_text": _truncate(header_text or "Our catalog", LIST_HEADER_MAX),
+        "body_text": _truncate(body_text or "Tap below to browse our products.", BODY_MAX),
+        "button_text": _truncate(button_text, LIST_BUTTON_MAX),
+        "sections": build_list_sections(products)
+    }
+
+
+def build_multi_product_message(
+    products: List[Dict[str, Any]],
+    catalog_id: str,
+    header_text: Optional[str],
+    body_text: Optional[str]
+) -> Dict[str, Any]:
+    """Arguments for WhatsAppCloudAPIClient.send_multi_product_message"""
+    return {
+        "catalog_id": catalog_id,
+        "header_text": _truncate(header_text or "Our catalog", LIST_HEADER_MAX),
+        "body_text": _truncate(body_text or "Tap below to browse our products.", BODY_MAX),
+        "sections": build_multi_product_sections(products)
+    }
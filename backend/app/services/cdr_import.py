@@ -0,0 +1,188 @@
+# NEW FILE - Streaming readers for bulk call detail record (CDR) uploads
+import codecs
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Sequence
+
+from app.core import serialization
+
+JSON = "json"
+NDJSON = "ndjson"
+CSV = "csv"
+
+CONTENT_TYPES = {
+    "application/json": JSON,
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/json-lines": NDJSON,
+    "text/csv": CSV,
+    "application/csv": CSV,
+}
+
+# Where providers' CDR exports put the call's end and start time
+END_TIME_FIELDS = ("ended_at", "end_time", "EndTime", "endTime")
+START_TIME_FIELDS = ("started_at", "start_time", "StartTime", "startTime")
+DURATION_FIELDS = ("duration_seconds", "duration", "Duration", "DialCallDuration")
+
+
+class CdrRecord(NamedTuple):
+    index: int
+    payload: Optional[Dict[str, Any]]
+    error: Optional[str] = None
+
+
+def cdr_format(content_type: Optional[str]) -> Optional[str]:
+    """Batch format for a Content-Type header (None if unsupported)"""
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    return CONTENT_TYPES.get(media_type)
+
+
+def record_ended_at(payload: Dict[str, Any]) -> Optional[datetime]:
+    """
+    When the recorded call ended (naive UTC): its end time, else its start
+    time plus its duration, else its start time. None if the record has
+    neither or they cannot be parsed.
+    """
+    ended_at = _first_timestamp(payload, END_TIME_FIELDS)
+    if ended_at is not None:
+        return ended_at
+    started_at = _first_timestamp(payload, START_TIME_FIELDS)
+    if started_at is None:
+        return None
+    for name in DURATION_FIELDS:
+        try:
+            return started_at + timedelta(seconds=int(payload[name]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return started_at
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """ISO 8601, RFC 2822 (Twilio) or epoch seconds, as naive UTC; None if unparseable"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    # Timestamps without an offset are taken as UTC
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _first_timestamp(payload: Dict[str, Any], names: Sequence[str]) -> Optional[datetime]:
+    for name in names:
+        parsed = parse_timestamp(payload.get(name))
+        if parsed is not None:
+            return parsed
+    return None
+
+
+async def iter_cdr_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[CdrRecord]:
+    """
+    Yield records from a request body as it arrives. NDJSON and CSV are
+    decoded record by record; a JSON array is parsed once fully received.
+    Records that cannot be decoded come back with `error` set.
+    """
+    if fmt == JSON:
+        async for record in _json_records(chunks):
+            yield record
+    elif fmt == NDJSON:
+        async for record in _ndjson_records(chunks):
+            yield record
+    elif fmt == CSV:
+        async for record in _csv_records(chunks):
+            yield record
+    else:
+        raise ValueError(f"Unsupported CDR format: {fmt}")
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _json_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[CdrRecord]:
+    body = bytearray()
+    async for chunk in chunks:
+        body.extend(chunk)
+    try:
+        data = serialization.loads(bytes(body) or b"[]")
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON body: {str(e)}")
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ValueError("JSON body must be an array of call records")
+    for index, item in enumerate(data, start=1):
+        if isinstance(item, dict):
+            yield CdrRecord(index, item)
+        else:
+            yield CdrRecord(index, None, "record is not a JSON object")
+
+
+async def _ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[CdrRecord]:
+    index = 0
+    async for line in _lines(chunks):
+        line = line.strip()
+        if not line:
+            continue
+        index += 1
+        try:
+            item = serialization.loads(line)
+        except ValueError as e:
+            yield CdrRecord(index, None, f"invalid JSON: {str(e)}")
+            continue
+        if isinstance(item, dict):
+            yield CdrRecord(index, item)
+        else:
+            yield CdrRecord(index, None, "record is not a JSON object")
+
+
+async def _csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[CdrRecord]:
+    """Header row then one record per row; quoted fields may span lines"""
+    header: Optional[List[str]] = None
+    index = 0
+    buffered = ""
+    async for line in _lines(chunks):
+        buffered += line
+        # An odd number of quotes means a quoted field continues on the next line
+        if buffered.count('"') % 2:
+            continue
+        text, buffered = buffered, ""
+        if not text.strip():
+            continue
+        row = next(csv.reader(io.StringIO(text)))
+        if header is None:
+            header = [name.strip() for name in row]
+            continue
+        index += 1
+        if len(row) > len(header):
+            yield CdrRecord(index, None, f"{len(row)} fields, header has {len(header)}")
+            continue
+        # Empty cells are missing values, not empty strings
+        payload = {name: value for name, value in zip(header, row) if value != ""}
+        yield CdrRecord(index, payload) if payload else CdrRecord(index, None, "empty row")
+    if buffered.strip():
+        yield CdrRecord(index + 1, None, "unterminated quoted field")
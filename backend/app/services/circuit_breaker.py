@@ -0,0 +1,257 @@
+# NEW FILE - Per-tenant circuit breaker around WhatsApp credentials
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.services.whatsapp_errors import REASON_AUTH
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"        # sends allowed
+OPEN = "open"            # sends skipped until the cooldown elapses
+HALF_OPEN = "half_open"  # one probe send allowed to test the credentials
+
+MAX_TRANSITIONS = 20
+
+
+@dataclass
+class CircuitStatus:
+    state: str = CLOSED
+    failures: int = 0
+    reason: Optional[str] = None
+    opened_at: Optional[float] = None
+    updated_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "reason": self.reason,
+            "opened_at": self.opened_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class LocalCircuitStore:
+    """In-process state - used when Redis is absent"""
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, str]] = {}
+        self._transitions: Dict[str, List[str]] = {}
+        self._locks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._data.get(key, {}))
+
+    def save(self, key: str, values: Dict[str, str]) -> None:
+        with self._lock:
+            self._data.setdefault(key, {}).update(values)
+
+    def add_transition(self, key: str, entry: str) -> None:
+        with self._lock:
+            history = self._transitions.setdefault(key, [])
+            history.insert(0, entry)
+            del history[MAX_TRANSITIONS:]
+
+    def transitions(self, key: str) -> List[str]:
+        with self._lock:
+            return list(self._transitions.get(key, []))
+
+    def acquire_probe(self, key: str, ttl: int) -> bool:
+        now = time.time()
+        with self._lock:
+            if self._locks.get(key, 0) > now:
+                return False
+            self._locks[key] = now + ttl
+            return True
+
+    def release_probe(self, key: str) -> None:
+        with self._lock:
+            self._locks.pop(key, None)
+
+
+class RedisCircuitStore:
+    """State shared by every API replica and Celery worker"""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    def load(self, key: str) -> Dict[str, str]:
+        return {k.decode(): v.decode() for k, v in self.redis.hgetall(key).items()}
+
+    def save(self, key: str, values: Dict[str, str]) -> None:
+        self.redis.hset(key, mapping=values)
+
+    def add_transition(self, key: str, entry: str) -> None:
+        pipe = self.redis.pipeline()
+        pipe.lpush(f"{key}:transitions", entry)
+        pipe.ltrim(f"{key}:transitions", 0, MAX_TRANSITIONS - 1)
+        pipe.execute()
+
+    def transitions(self, key: str) -> List[str]:
+        return [v.decode() for v in self.redis.lrange(f"{key}:transitions", 0, -1)]
+
+    def acquire_probe(self, key: str, ttl: int) -> bool:
+        return bool(self.redis.set(f"{key}:probe", "1", nx=True, ex=ttl))
+
+    def release_probe(self, key: str) -> None:
+        self.redis.delete(f"{key}:probe")
+
+
+class CircuitBreaker:
+    """
+    Trips when a tenant's WhatsApp credentials stop working, so completed calls
+    are not queued (webhook) or sent (task) until the credentials recover.
+
+    - Auth failures (expired token, locked or banned number) open it immediately.
+    - `failure_threshold` consecutive failures of any other kind also open it.
+    - After `cooldown` seconds one probe send is let through (half-open); its
+      success closes the circuit, its failure re-opens it.
+    """
+
+    def __init__(self, store=None, failure_threshold: Optional[int] = None, cooldown: Optional[int] = None):
+        settings = get_settings()
+        self._store = store
+        self._local = LocalCircuitStore()
+        self._store_down_until = 0.0
+        self.failure_threshold = failure_threshold or settings.WHATSAPP_CIRCUIT_FAILURE_THRESHOLD
+        self.cooldown = cooldown or settings.WHATSAPP_CIRCUIT_COOLDOWN_SECONDS
+
+    @property
+    def store(self):
+        if self._store is None:
+            client = get_redis()
+            self._store = RedisCircuitStore(client) if client is not None else self._local
+        return self._store
+
+    def _call(self, method: str, *args):
+        if time.monotonic() >= self._store_down_until:
+            try:
+                return getattr(self.store, method)(*args)
+            except Exception as e:
+                logger.warning("Circuit breaker store unavailable, using local state: %s", e)
+                self._store_down_until = time.monotonic() + 30.0
+        return getattr(self._local, method)(*args)
+
+    @staticmethod
+    def key(tenant_id: int, phone_number_id: Optional[str]) -> str:
+        return f"wa:cb:{tenant_id}:{phone_number_id or '-'}"
+
+    def status(self, tenant_id: int, phone_number_id: Optional[str]) -> CircuitStatus:
+        raw = self._call("load", self.key(tenant_id, phone_number_id))
+        if not raw:
+            return CircuitStatus()
+        return CircuitStatus(
+            state=raw.get("state", CLOSED),
+            failures=int(raw.get("failures", 0)),
+            reason=raw.get("reason") or None,
+            opened_at=float(raw["opened_at"]) if raw.get("opened_at") else None,
+            updated_at=float(raw["updated_at"]) if raw.get("updated_at") else None,
+        )
+
+    def transitions(self, tenant_id: int, phone_number_id: Optional[str]) -> List[Dict[str, Any]]:
+        return [json.loads(t) for t in self._call("transitions", self.key(tenant_id, phone_number_id))]
+
+    def _transition(self, key: str, state: str, failures: int, reason: Optional[str]) -> None:
+        now = time.time()
+        values = {
+            "state": state,
+            "failures": str(failures),
+            "reason": reason or "",
+            "updated_at": str(now),
+        }
+        if state == OPEN:
+            values["opened_at"] = str(now)
+        self._call("save", key, values)
+        self._call("add_transition", key, json.dumps({"state": state, "reason": reason, "at": now}))
+        logger.warning("WhatsApp circuit %s -> %s (%s)", key, state, reason or "no reason")
+
+    def is_open(self, tenant_id: int, phone_number_id: Optional[str]) -> bool:
+        """Read-only check for the webhook: True while open and still cooling down"""
+        status = self.status(tenant_id, phone_number_id)
+        if status.state != OPEN:
+            return False
+        return time.time() - (status.opened_at or 0) < self.cooldown
+
+    def allow(self, tenant_id: int, phone_number_id: Optional[str]) -> bool:
+        """Check before sending; moves an expired open circuit to half-open for one probe"""
+        key = self.key(tenant_id, phone_number_id)
+        status = self.status(tenant_id, phone_number_id)
+
+        if status.state == CLOSED:
+            return True
+
+        if status.state == OPEN and time.time() - (status.opened_at or 0) < self.cooldown:
+            return False
+
+        # Cooldown elapsed (or already half-open): let exactly one probe through
+        if not self._call("acquire_probe", key, self.cooldown):
+            return False
+        if status.state == OPEN:
+            self._transition(key, HALF_OPEN, status.failures, status.reason)
+        return True
+
+    def record_success(self, tenant_id: int, phone_number_id: Optional[str]) -> None:
+        key = self.key(tenant_id, phone_number_id)
+        status = self.status(tenant_id, phone_number_id)
+        if status.state == CLOSED and status.failures == 0:
+            return
+        if status.state == CLOSED:
+            self._call("save", key, {"failures": "0"})
+            return
+        self._transition(key, CLOSED, 0, None)
+        self._call("release_probe", key)
+
+    def record_failure(self, tenant_id: int, phone_number_id: Optional[str], reason: Optional[str] = None) -> None:
+        key = self.key(tenant_id, phone_number_id)
+        status = self.status(tenant_id, phone_number_id)
+        failures = status.failures + 1
+
+        if status.state == HALF_OPEN or reason == REASON_AUTH or failures >= self.failure_threshold:
+            if status.state != OPEN:
+                self._transition(key, OPEN, failures, reason or "consecutive_failures")
+            self._call("release_probe", key)
+            return
+
+        self._call("save", key, {"failures": str(failures), "updated_at": str(time.time())})
+
+    def record_results(self, tenant_id: int, phone_number_id: Optional[str], results: Iterable[Dict[str, Any]]) -> None:
+        """
+        Feed send results into the breaker. Recipient-specific failures (invalid
+        number, 24h window) say nothing about the credentials and are ignored.
+        """
+        results = list(results)
+        auth_failure = next((r for r in results if r.get("error_reason") == REASON_AUTH), None)
+        if auth_failure is not None:
+            self.record_failure(tenant_id, phone_number_id, REASON_AUTH)
+        elif any(r.get("success") for r in results):
+            self.record_success(tenant_id, phone_number_id)
+        elif any(r.get("retryable") or r.get("delivery_unknown") for r in results):
+            self.record_failure(tenant_id, phone_number_id, results[0].get("error_category"))
+
+    def reset(self, tenant_id: int, phone_number_id: Optional[str], reason: str = "reset") -> None:
+        """Close the circuit, e.g. after new credentials were verified"""
+        key = self.key(tenant_id, phone_number_id)
+        if self.status(tenant_id, phone_number_id).state != CLOSED:
+            self._transition(key, CLOSED, 0, reason)
+        else:
+            self._call("save", key, {"failures": "0"})
+        self._call("release_probe", key)
+
+
+_circuit_breaker: Optional[CircuitBreaker] = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Process-wide breaker shared by the webhook handler and Celery tasks"""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
@@ -0,0 +1,255 @@
+# NEW FILE - Delayed post-call sends in a Redis sorted set instead of Celery ETA tasks
+"""
+Celery `countdown` tasks sit in worker memory until they are due, and are all
+redelivered when a worker restarts. Delayed sends are kept in Redis instead:
+
+    <prefix>:due      ZSET  key -> due time (unix seconds)
+    <prefix>:items    HASH  key -> send (JSON)
+    <prefix>:claimed  ZSET  send -> time a poller took it
+
+The key is "<tenant>:<caller phone>", so a second call from the same number
+while a send is still waiting replaces it and restarts the delay (debounce)
+instead of sending twice. app.workers.delay_poller moves due sends to
+`claimed` in one atomic script call per batch, hands them to Celery, then
+acknowledges them. Sends a poller claimed but never acknowledged go back to
+`due` after DELAY_SCHEDULER_CLAIM_TIMEOUT_SECONDS, unless a newer send for
+the same key replaced it meanwhile: the claim then returns the lost send's
+call, for the poller to mark superseded. A send queued twice that way is
+harmless: the automation's step journal skips steps already sent.
+
+LocalDelayBackend is the in-process stand-in for tests and scripts.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.redis import get_redis
+from app.core.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+UNAVAILABLE_BACKOFF_SECONDS = 30.0
+
+# Store a send under its key and (re)set its due time. Returns the send it replaced.
+# KEYS = due, items; ARGV = key, send, due time
+SCHEDULE_SCRIPT = """
+local old = redis.call('HGET', KEYS[2], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return old
+"""
+
+# Put back stale claims, then move up to ARGV[2] due sends from due/items to claimed.
+# Returns {claimed sends, stale sends a newer send for another call replaced}.
+# KEYS = due, items, claimed; ARGV = now, limit, claims older than this are stale
+CLAIM_DUE_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[3], 'LIMIT', 0, ARGV[2])
+local dropped = {}
+for _, send in ipairs(stale) do
+    redis.call('ZREM', KEYS[3], send)
+    local lost = cjson.decode(send)
+    -- A newer send for the same key replaces the lost one
+    local newer = redis.call('HGET', KEYS[2], lost['key'])
+    if not newer then
+        redis.call('HSET', KEYS[2], lost['key'], send)
+        redis.call('ZADD', KEYS[1], ARGV[1], lost['key'])
+    elseif cjson.decode(newer)['call_id'] ~= lost['call_id'] then
+        table.insert(dropped, send)
+    end
+end
+local keys = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local sends = {}
+for _, key in ipairs(keys) do
+    local send = redis.call('HGET', KEYS[2], key)
+    redis.call('ZREM', KEYS[1], key)
+    redis.call('HDEL', KEYS[2], key)
+    if send then
+        redis.call('ZADD', KEYS[3], ARGV[1], send)
+        table.insert(sends, send)
+    end
+end
+return {sends, dropped}
+"""
+
+
+@dataclass(frozen=True)
+class ScheduledSend:
+    tenant_id: int
+    call_id: int
+    caller_phone: str
+    due_at: float
+    # The encoded entry, as stored (acknowledged by value)
+    raw: bytes = b""
+
+
+class LocalDelayBackend:
+    """In-process delay queue with the Redis backend's semantics - for tests and scripts"""
+
+    def __init__(self):
+        self._due: Dict[str, float] = {}
+        self._items: Dict[str, bytes] = {}
+        self._claimed: Dict[bytes, float] = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, key: str, send: bytes, due_at: float) -> Optional[bytes]:
+        with self._lock:
+            old = self._items.get(key)
+            self._items[key] = send
+            self._due[key] = due_at
+            return old
+
+    def claim_due(self, now: float, limit: int, stale_before: float) -> Tuple[List[bytes], List[bytes]]:
+        with self._lock:
+            stale = sorted((at, send) for send, at in self._claimed.items() if at <= stale_before)[:limit]
+            dropped = []
+            for _, send in stale:
+                del self._claimed[send]
+                lost = loads(send)
+                newer = self._items.get(lost["key"])
+                if newer is None:
+                    self._items[lost["key"]] = send
+                    self._due[lost["key"]] = now
+                elif loads(newer)["call_id"] != lost["call_id"]:
+                    dropped.append(send)
+            due = sorted((at, key) for key, at in self._due.items() if at <= now)[:limit]
+            sends = []
+            for _, key in due:
+                del self._due[key]
+                send = self._items.pop(key)
+                self._claimed[send] = now
+                sends.append(send)
+            return sends, dropped
+
+    def ack(self, sends: List[bytes]) -> None:
+        with self._lock:
+            for send in sends:
+                self._claimed.pop(send, None)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._due)
+
+
+class RedisDelayBackend:
+    """Delay queue shared by every API process, consumer and poller"""
+
+    def __init__(self, redis_client=None, prefix: Optional[str] = None):
+        self.redis = redis_client or get_redis()
+        prefix = prefix or get_settings().DELAY_SCHEDULER_KEY_PREFIX
+        self.due_key = f"{prefix}:due"
+        self.items_key = f"{prefix}:items"
+        self.claimed_key = f"{prefix}:claimed"
+        self._schedule = self.redis.register_script(SCHEDULE_SCRIPT)
+        self._claim_due = self.redis.register_script(CLAIM_DUE_SCRIPT)
+
+    def schedule(self, key: str, send: bytes, due_at: float) -> Optional[bytes]:
+        return self._schedule(keys=[self.due_key, self.items_key], args=[key, send, due_at])
+
+    def claim_due(self, now: float, limit: int, stale_before: float) -> Tuple[List[bytes], List[bytes]]:
+        sends, dropped = self._claim_due(
+            keys=[self.due_key, self.items_key, self.claimed_key],
+            args=[now, limit, stale_before]
+        )
+        return sends, dropped
+
+    def ack(self, sends: List[bytes]) -> None:
+        if sends:
+            self.redis.zrem(self.claimed_key, *sends)
+
+    def pending(self) -> int:
+        return self.redis.zcard(self.due_key)
+
+
+class DelayScheduler:
+    def __init__(self, backend, debounce: Optional[bool] = None, clock=time.time):
+        settings = get_settings()
+        self.backend = backend
+        self.debounce = settings.DELAY_SCHEDULER_DEBOUNCE if debounce is None else debounce
+        self.claim_timeout = settings.DELAY_SCHEDULER_CLAIM_TIMEOUT_SECONDS
+        self._clock = clock
+        self._down_until = 0.0
+
+    def schedule(
+        self,
+        tenant_id: int,
+        call_id: int,
+        caller_phone: str,
+        delay_seconds: float,
+        debounce: Optional[bool] = None
+    ) -> Optional[int]:
+        """
+        Send the automation for `call_id` after `delay_seconds`. Returns the
+        call_id of a send from the same number this one replaced, if any.
+        """
+        if debounce is None:
+            debounce = self.debounce
+        key = f"{tenant_id}:{caller_phone}" if debounce else f"{tenant_id}:call:{call_id}"
+        due_at = self._clock() + delay_seconds
+        send = dumps({
+            "key": key,
+            "tenant_id": tenant_id,
+            "call_id": call_id,
+            "caller_phone": caller_phone,
+            "due_at": due_at,
+        })
+        if time.monotonic() < self._down_until:
+            # Fail fast for a while instead of waiting on a dead Redis every call
+            raise ConnectionError("Delay scheduler unavailable")
+        try:
+            old = self.backend.schedule(key, send, due_at)
+        except Exception:
+            self._down_until = time.monotonic() + UNAVAILABLE_BACKOFF_SECONDS
+            raise
+        if old is None:
+            return None
+        replaced = loads(old)["call_id"]
+        return replaced if replaced != call_id else None
+
+    def claim_due(self, limit: int) -> Tuple[List[ScheduledSend], List[int]]:
+        """
+        Take up to `limit` sends that are due; acknowledge them once they are
+        queued. Also returns the call_ids of lost claims a later call's send
+        replaced: they will not be sent, mark them superseded.
+        """
+        now = self._clock()
+        sends, dropped = self.backend.claim_due(now, limit, now - self.claim_timeout)
+        return [self._decode(send) for send in sends], [loads(send)["call_id"] for send in dropped]
+
+    def ack(self, sends: List[ScheduledSend]) -> None:
+        self.backend.ack([send.raw for send in sends])
+
+    def pending(self) -> int:
+        return self.backend.pending()
+
+    @staticmethod
+    def _decode(raw: bytes) -> ScheduledSend:
+        data = loads(raw)
+        return ScheduledSend(
+            tenant_id=data["tenant_id"],
+            call_id=data["call_id"],
+            caller_phone=data["caller_phone"],
+            due_at=data["due_at"],
+            raw=raw
+        )
+
+
+_delay_scheduler: Optional[DelayScheduler] = None
+
+
+def get_delay_scheduler() -> Optional[DelayScheduler]:
+    """The Redis-backed scheduler, or None when disabled or Redis is not configured"""
+    global _delay_scheduler
+    if _delay_scheduler is None:
+        if not get_settings().DELAY_SCHEDULER_ENABLED or get_redis() is None:
+            return None
+        _delay_scheduler = DelayScheduler(RedisDelayBackend())
+    return _delay_scheduler
+
+
+def set_delay_scheduler(scheduler: Optional[DelayScheduler]) -> None:
+    """Swap the process-wide scheduler (tests use a LocalDelayBackend)"""
+    global _delay_scheduler
+    _delay_scheduler = scheduler
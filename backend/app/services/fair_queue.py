@@ -0,0 +1,355 @@
+# NEW FILE - Per-tenant fair queueing (deficit round-robin) for the live automation lane
+"""
+Live post-call automations do not go straight onto the Celery live queue,
+where one tenant's burst would hold up every other tenant behind it. They wait
+in per-tenant queues instead:
+
+    <prefix>:q:<tenant>   LIST  automations of one tenant, oldest first
+    <prefix>:active       SET   tenants with a non-empty queue
+    <prefix>:inflight     ZSET  "<tenant>:<task id>" -> deadline, for dispatched tasks
+
+app.workers.fair_dispatcher runs FairDispatcher: deficit round-robin across
+the active tenants, publishing to the live lane only while fewer than
+FAIR_QUEUE_CAPACITY tasks are in flight, and - while other tenants are
+waiting - at most FAIR_QUEUE_TENANT_MAX_SHARE of them for any one tenant. A
+task frees its slot when it finishes, including when it is handed to the
+retry lane (release_fair_share_slot on task_postrun), or after
+FAIR_QUEUE_TASK_TIMEOUT_SECONDS if its worker died.
+
+LocalFairQueueBackend is the in-process stand-in for tests and the benchmark.
+"""
+import bisect
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional
+
+from app.core.celery_app import celery_app
+from app.core.config import get_settings
+from app.core.metrics import AUTOMATION_QUEUE_WAIT_SECONDS, tenant_label
+from app.core.redis import get_redis
+from app.core.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+AUTOMATION_TASK = "app.tasks.whatsapp_tasks.process_call_ended_automation"
+
+# Pop the oldest automation of a tenant; drop the tenant from the active set once empty.
+# KEYS = tenant queue, active set; ARGV = tenant id
+POP_SCRIPT = """
+local item = redis.call('LPOP', KEYS[1])
+if redis.call('LLEN', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[2], ARGV[1])
+end
+return item
+"""
+
+# Single dispatcher: take or renew the lease if free or already ours.
+# KEYS = lease; ARGV = owner, ttl ms
+LEASE_SCRIPT = """
+local owner = redis.call('GET', KEYS[1])
+if not owner or owner == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class FairItem:
+    tenant_id: int
+    call_id: int
+    caller_phone: str
+    enqueued_at: float
+    raw: bytes = b""
+
+
+class LocalFairQueueBackend:
+    """In-process tenant queues with the Redis backend's semantics - for tests and the benchmark"""
+
+    def __init__(self):
+        self._queues: Dict[int, Deque[bytes]] = {}
+        self._in_flight: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def push(self, tenant_id: int, item: bytes, front: bool = False) -> None:
+        with self._lock:
+            queue = self._queues.setdefault(tenant_id, deque())
+            queue.appendleft(item) if front else queue.append(item)
+
+    def pop(self, tenant_id: int) -> Optional[bytes]:
+        with self._lock:
+            queue = self._queues.get(tenant_id)
+            if not queue:
+                return None
+            item = queue.popleft()
+            if not queue:
+                del self._queues[tenant_id]
+            return item
+
+    def active_tenants(self) -> List[int]:
+        with self._lock:
+            return list(self._queues)
+
+    def depths(self, tenant_ids: List[int]) -> Dict[int, int]:
+        with self._lock:
+            return {tenant_id: len(self._queues.get(tenant_id, ())) for tenant_id in tenant_ids}
+
+    def start(self, tenant_id: int, task_id: str, deadline: float) -> None:
+        with self._lock:
+            self._in_flight[f"{tenant_id}:{task_id}"] = deadline
+
+    def finish(self, tenant_id: int, task_id: str) -> None:
+        with self._lock:
+            self._in_flight.pop(f"{tenant_id}:{task_id}", None)
+
+    def in_flight(self, now: float) -> Dict[int, int]:
+        with self._lock:
+            for member in [m for m, deadline in self._in_flight.items() if deadline <= now]:
+                del self._in_flight[member]
+            return _count_by_tenant(self._in_flight)
+
+    def lead(self, owner: str, ttl: float) -> bool:
+        return True
+
+
+class RedisFairQueueBackend:
+    """Tenant queues shared by every producer (API, consumer, delay poller) and the dispatcher"""
+
+    def __init__(self, redis_client=None, prefix: Optional[str] = None):
+        self.redis = redis_client or get_redis()
+        self.prefix = prefix or get_settings().FAIR_QUEUE_KEY_PREFIX
+        self.active_key = f"{self.prefix}:active"
+        self.in_flight_key = f"{self.prefix}:inflight"
+        self.lease_key = f"{self.prefix}:dispatcher"
+        self._pop = self.redis.register_script(POP_SCRIPT)
+        self._lease = self.redis.register_script(LEASE_SCRIPT)
+
+    def queue_key(self, tenant_id: int) -> str:
+        return f"{self.prefix}:q:{tenant_id}"
+
+    def push(self, tenant_id: int, item: bytes, front: bool = False) -> None:
+        pipe = self.redis.pipeline()
+        if front:
+            pipe.lpush(self.queue_key(tenant_id), item)
+        else:
+            pipe.rpush(self.queue_key(tenant_id), item)
+        pipe.sadd(self.active_key, tenant_id)
+        pipe.execute()
+
+    def pop(self, tenant_id: int) -> Optional[bytes]:
+        return self._pop(keys=[self.queue_key(tenant_id), self.active_key], args=[tenant_id])
+
+    def active_tenants(self) -> List[int]:
+        return [int(tenant_id) for tenant_id in self.redis.smembers(self.active_key)]
+
+    def depths(self, tenant_ids: List[int]) -> Dict[int, int]:
+        pipe = self.redis.pipeline(transaction=False)
+        for tenant_id in tenant_ids:
+            pipe.llen(self.queue_key(tenant_id))
+        return dict(zip(tenant_ids, pipe.execute()))
+
+    def start(self, tenant_id: int, task_id: str, deadline: float) -> None:
+        self.redis.zadd(self.in_flight_key, {f"{tenant_id}:{task_id}": deadline})
+
+    def finish(self, tenant_id: int, task_id: str) -> None:
+        self.redis.zrem(self.in_flight_key, f"{tenant_id}:{task_id}")
+
+    def in_flight(self, now: float) -> Dict[int, int]:
+        pipe = self.redis.pipeline()
+        pipe.zremrangebyscore(self.in_flight_key, "-inf", now)
+        pipe.zrange(self.in_flight_key, 0, -1)
+        members = pipe.execute()[1]
+        return _count_by_tenant(m.decode() if isinstance(m, bytes) else m for m in members)
+
+    def lead(self, owner: str, ttl: float) -> bool:
+        return bool(self._lease(keys=[self.lease_key], args=[owner, int(ttl * 1000)]))
+
+
+def _count_by_tenant(members) -> Dict[int, int]:
+    counts: Dict[int, int] = {}
+    for member in members:
+        tenant_id = int(member.split(":", 1)[0])
+        counts[tenant_id] = counts.get(tenant_id, 0) + 1
+    return counts
+
+
+class FairQueue:
+    """Producer side: where live automations are submitted"""
+
+    def __init__(self, backend, clock=time.time):
+        self.backend = backend
+        self._clock = clock
+
+    def submit(self, tenant_id: int, call_id: int, caller_phone: str) -> None:
+        self.backend.push(tenant_id, dumps({
+            "tenant_id": tenant_id,
+            "call_id": call_id,
+            "caller_phone": caller_phone,
+            "enqueued_at": self._clock(),
+        }))
+
+
+class FairDispatcher:
+    """
+    Deficit round-robin over the tenants' queues. Each round every active
+    tenant earns `quantum` dispatches (one task costs 1); a tenant dispatches
+    while it has credit, its queue is not empty, the lane as a whole is under
+    `capacity` and - if other tenants are waiting too - it is under its share
+    of `capacity`. Rounds resume after the last tenant served, so no tenant
+    always goes first.
+    """
+
+    def __init__(
+        self,
+        backend,
+        capacity: Optional[int] = None,
+        max_share: Optional[float] = None,
+        quantum: Optional[float] = None,
+        task_timeout: Optional[float] = None,
+        clock=time.time
+    ):
+        settings = get_settings()
+        self.backend = backend
+        self.capacity = capacity or settings.FAIR_QUEUE_CAPACITY
+        max_share = max_share or settings.FAIR_QUEUE_TENANT_MAX_SHARE
+        self.tenant_cap = max(1, int(self.capacity * max_share))
+        self.quantum = quantum or settings.FAIR_QUEUE_QUANTUM
+        self.task_timeout = task_timeout or settings.FAIR_QUEUE_TASK_TIMEOUT_SECONDS
+        self._clock = clock
+        self.deficits: Dict[int, float] = {}
+        self._last_tenant: Optional[int] = None
+
+    def _round_order(self) -> List[int]:
+        tenants = sorted(self.backend.active_tenants())
+        if self._last_tenant is None:
+            return tenants
+        start = bisect.bisect_right(tenants, self._last_tenant)
+        return tenants[start:] + tenants[:start]
+
+    def dispatch_round(self, publish: Callable[[FairItem, str], None]) -> int:
+        """One DRR round; `publish(item, task_id)` hands a task to Celery. Returns tasks dispatched."""
+        now = self._clock()
+        in_flight = self.backend.in_flight(now)
+        total = sum(in_flight.values())
+        dispatched = 0
+
+        tenants = self._round_order()
+        # The share cap applies while other tenants are waiting; a tenant alone may use every worker
+        tenant_cap = self.tenant_cap if len(tenants) > 1 else self.capacity
+        for tenant_id in tenants:
+            if total >= self.capacity:
+                break
+            self._last_tenant = tenant_id
+            # Credit does not pile up while a tenant is held back by its cap
+            deficit = min(self.deficits.get(tenant_id, 0.0) + self.quantum, self.quantum)
+            while deficit >= 1 and total < self.capacity and in_flight.get(tenant_id, 0) < tenant_cap:
+                raw = self.backend.pop(tenant_id)
+                if raw is None:
+                    deficit = 0.0
+                    break
+                item = self._decode(raw)
+                task_id = uuid.uuid4().hex
+                self.backend.start(tenant_id, task_id, now + self.task_timeout)
+                try:
+                    publish(item, task_id)
+                except Exception:
+                    self.backend.finish(tenant_id, task_id)
+                    self.backend.push(tenant_id, raw, front=True)
+                    raise
+                AUTOMATION_QUEUE_WAIT_SECONDS.labels(tenant_label(tenant_id)).observe(
+                    max(0.0, now - item.enqueued_at)
+                )
+                in_flight[tenant_id] = in_flight.get(tenant_id, 0) + 1
+                total += 1
+                deficit -= 1
+                dispatched += 1
+            self.deficits[tenant_id] = deficit
+
+        # Forget tenants that went idle
+        active = set(self.backend.active_tenants())
+        for tenant_id in [t for t in self.deficits if t not in active]:
+            del self.deficits[tenant_id]
+        return dispatched
+
+    @staticmethod
+    def _decode(raw: bytes) -> FairItem:
+        data = loads(raw)
+        return FairItem(
+            tenant_id=data["tenant_id"],
+            call_id=data["call_id"],
+            caller_phone=data["caller_phone"],
+            enqueued_at=data["enqueued_at"],
+            raw=raw
+        )
+
+
+def publish_live(item: FairItem, task_id: str, producer=None) -> None:
+    """Publish a dispatched automation to the live lane (routed by task_routes)"""
+    celery_app.send_task(
+        AUTOMATION_TASK,
+        args=[item.tenant_id, item.call_id, item.caller_phone],
+        task_id=task_id,
+        producer=producer
+    )
+
+
+_fair_queue: Optional[FairQueue] = None
+
+
+def get_fair_queue() -> Optional[FairQueue]:
+    """The Redis-backed fair queue, or None when disabled or Redis is not configured"""
+    global _fair_queue
+    if _fair_queue is None:
+        if not get_settings().FAIR_QUEUE_ENABLED or get_redis() is None:
+            return None
+        _fair_queue = FairQueue(RedisFairQueueBackend())
+    return _fair_queue
+
+
+def set_fair_queue(fair_queue: Optional[FairQueue]) -> None:
+    """Swap the process-wide fair queue (tests use a LocalFairQueueBackend)"""
+    global _fair_queue
+    _fair_queue = fair_queue
+
+
+def submit_automation(
+    tenant_id: int,
+    call_id: int,
+    caller_phone: str,
+    countdown: Optional[float] = None,
+    producer=None
+) -> None:
+    """
+    Queue a live automation: into its tenant's fair queue when available,
+    straight onto the live lane otherwise (or when it must wait `countdown`).
+    """
+    fair_queue = get_fair_queue() if not countdown else None
+    if fair_queue is not None:
+        try:
+            fair_queue.submit(tenant_id, call_id, caller_phone)
+            return
+        except Exception as e:
+            logger.warning("Fair queue unavailable, publishing call %s to the live lane: %s", call_id, e)
+    celery_app.send_task(
+        AUTOMATION_TASK,
+        args=[tenant_id, call_id, caller_phone],
+        countdown=countdown,
+        producer=producer
+    )
+
+
+def release_fair_share_slot(tenant_id: int, task_id: str) -> None:
+    """Free a finished live task's in-flight slot"""
+    fair_queue = get_fair_queue()
+    if fair_queue is None:
+        return
+    try:
+        fair_queue.backend.finish(tenant_id, task_id)
+    except Exception as e:
+        # The slot expires after FAIR_QUEUE_TASK_TIMEOUT_SECONDS anyway
+        logger.warning("Could not release fair-share slot of task %s: %s", task_id, e)
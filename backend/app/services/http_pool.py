@@ -0,0 +1,115 @@
+# NEW FILE - Per-process registry of long-lived HTTP connection pools for the WhatsApp Cloud API
+import asyncio
+import logging
+import threading
+from typing import Dict, Tuple
+
+import httpx
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # httpx[http2] extra not installed - fall back to HTTP/1.1
+    HTTP2_AVAILABLE = False
+
+DEFAULT_TIMEOUT = 30.0
+
+
+class HTTPClientRegistry:
+    """
+    Keeps one keep-alive, HTTP/2-capable httpx.AsyncClient per phone_number_id.
+
+    httpx async clients are bound to the event loop that first used them, so
+    entries are keyed by (event loop, phone_number_id). Clients whose loop has
+    been closed are dropped and rebuilt on next use.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[int, str], Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+        self._lock = threading.Lock()
+
+    def _build_client(self) -> httpx.AsyncClient:
+        settings = get_settings()
+        limits = httpx.Limits(
+            max_connections=settings.WHATSAPP_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.WHATSAPP_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.WHATSAPP_HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            http2=settings.WHATSAPP_HTTP2_ENABLED and HTTP2_AVAILABLE,
+            limits=limits,
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=10.0),
+        )
+
+    def _prune_closed_loops(self) -> None:
+        stale = [key for key, (loop, _) in self._clients.items() if loop.is_closed()]
+        for key in stale:
+            # The loop is gone, so the client can no longer be closed cleanly
+            self._clients.pop(key, None)
+
+    def get(self, key: str) -> httpx.AsyncClient:
+        """Return the pooled client for `key` on the running event loop"""
+        loop = asyncio.get_running_loop()
+        registry_key = (id(loop), key)
+
+        with self._lock:
+            self._prune_closed_loops()
+            entry = self._clients.get(registry_key)
+            if entry is not None and not entry[1].is_closed:
+                return entry[1]
+
+            client = self._build_client()
+            self._clients[registry_key] = (loop, client)
+            logger.debug("Opened WhatsApp HTTP pool for %s", key)
+            return client
+
+    async def aclose(self) -> None:
+        """Close every pool that belongs to the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            keys = [key for key, (owner, _) in self._clients.items() if owner is loop]
+            clients = [self._clients.pop(key)[1] for key in keys]
+
+        for client in clients:
+            if not client.is_closed:
+                await client.aclose()
+
+    def close_all(self) -> None:
+        """Close every pool from synchronous code (worker shutdown)"""
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+
+        for loop, client in entries:
+            if loop.is_closed() or client.is_closed:
+                continue
+            try:
+                if loop.is_running():
+                    asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+                else:
+                    loop.run_until_complete(client.aclose())
+            except Exception as e:
+                logger.warning("Failed to close WhatsApp HTTP pool cleanly: %s", e)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_http_client(phone_number_id: str) -> httpx.AsyncClient:
+    """Pooled client shared by every WhatsAppCloudAPIClient for this phone number"""
+    return http_clients.get(phone_number_id)
+
+
+async def close_http_clients() -> None:
+    await http_clients.aclose()
+
+
+def close_all_http_clients() -> None:
+    http_clients.close_all()
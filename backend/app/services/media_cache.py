@@ -0,0 +1,236 @@
+# NEW FILE - Upload-once cache of WhatsApp media IDs for product images
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.redis import get_async_redis
+from app.services.http_pool import get_http_client
+
+if TYPE_CHECKING:
+    from app.services.whatsapp_client import WhatsAppCloudAPIClient
+
+logger = logging.getLogger(__name__)
+
+MEDIA_DOWNLOAD_POOL = "media-download"
+
+
+class LocalMediaStore:
+    """In-process key/value store with TTLs - used when Redis is absent"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                self._data.pop(key, None)
+                return None
+            return value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisMediaStore:
+    """Media IDs shared by every worker, so each image is uploaded once per phone number"""
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+
+    def _client(self):
+        client = self._redis or get_async_redis()
+        if client is None:
+            raise ConnectionError("Redis is not configured")
+        return client
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._client().get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        await self._client().set(key, value, ex=max(1, int(ttl)))
+
+    async def delete(self, key: str) -> None:
+        await self._client().delete(key)
+
+
+class MediaCache:
+    """
+    Maps product image URLs to uploaded WhatsApp media IDs.
+
+    - image URL -> content hash (short TTL, so changed images are picked up)
+    - (phone_number_id, content hash) -> {media_id, expires_at}
+
+    Media IDs are re-uploaded once they are within the refresh margin of
+    Meta's expiry. Any failure returns None so callers fall back to `link`.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        fallback: Optional[LocalMediaStore] = None,
+        store_retry_after: float = 30.0
+    ):
+        self.store = store if store is not None else RedisMediaStore()
+        self.fallback = fallback or LocalMediaStore()
+        self.store_retry_after = store_retry_after
+        self._store_down_until = 0.0
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def _store_available(self) -> bool:
+        return time.monotonic() >= self._store_down_until
+
+    def _mark_store_down(self, error: Exception) -> None:
+        logger.warning("Media cache store unavailable, using local cache: %s", error)
+        self._store_down_until = time.monotonic() + self.store_retry_after
+
+    @staticmethod
+    def _url_key(phone_number_id: str, image_url: str) -> str:
+        url_hash = hashlib.sha1(image_url.encode()).hexdigest()
+        return f"wa:media:url:{phone_number_id}:{url_hash}"
+
+    @staticmethod
+    def _media_key(phone_number_id: str, content_hash: str) -> str:
+        return f"wa:media:id:{phone_number_id}:{content_hash}"
+
+    async def _get(self, key: str) -> Optional[str]:
+        if self._store_available():
+            try:
+                return await self.store.get(key)
+            except Exception as e:
+                self._mark_store_down(e)
+        return await self.fallback.get(key)
+
+    async def _set(self, key: str, value: str, ttl: int) -> None:
+        if self._store_available():
+            try:
+                await self.store.set(key, value, ttl)
+                return
+            except Exception as e:
+                self._mark_store_down(e)
+        await self.fallback.set(key, value, ttl)
+
+    async def _delete(self, key: str) -> None:
+        await self.fallback.delete(key)
+        if self._store_available():
+            try:
+                await self.store.delete(key)
+            except Exception as e:
+                self._mark_store_down(e)
+
+    async def _fresh_media_id(self, key: str) -> Optional[str]:
+        raw = await self._get(key)
+        if not raw:
+            return None
+        entry = json.loads(raw)
+        margin = get_settings().WHATSAPP_MEDIA_REFRESH_MARGIN_SECONDS
+        if entry["expires_at"] - time.time() <= margin:
+            return None
+        return entry["media_id"]
+
+    async def _download(self, image_url: str) -> Tuple[bytes, str]:
+        client = get_http_client(MEDIA_DOWNLOAD_POOL)
+        response = await client.get(image_url, follow_redirects=True)
+        response.raise_for_status()
+        mime_type = response.headers.get("content-type", "").split(";")[0].strip()
+        if not mime_type.startswith("image/"):
+            mime_type = mimetypes.guess_type(image_url)[0] or "image/jpeg"
+        return response.content, mime_type
+
+    async def _upload(
+        self,
+        client: "WhatsAppCloudAPIClient",
+        key: str,
+        content: bytes,
+        mime_type: str,
+        filename: str
+    ) -> Optional[str]:
+        result = await client.upload_media(content, mime_type, filename)
+        if not result.get("success"):
+            logger.warning("Media upload failed: %s", result.get("error_message"))
+            return None
+
+        ttl = get_settings().WHATSAPP_MEDIA_TTL_SECONDS
+        entry = {"media_id": result["media_id"], "expires_at": time.time() + ttl}
+        await self._set(key, json.dumps(entry), ttl)
+        return result["media_id"]
+
+    async def _resolve(self, client: "WhatsAppCloudAPIClient", image_url: str, url_key: str) -> Optional[str]:
+        """Download the image, then reuse or upload the media ID for its content"""
+        phone_number_id = client.phone_number_id
+        content, mime_type = await self._download(image_url)
+        content_hash = hashlib.sha256(content).hexdigest()
+        await self._set(url_key, content_hash, get_settings().WHATSAPP_MEDIA_URL_TTL_SECONDS)
+
+        # Another URL may already point at identical content
+        media_key = self._media_key(phone_number_id, content_hash)
+        media_id = await self._fresh_media_id(media_key)
+        if media_id:
+            return media_id
+
+        filename = image_url.rsplit("/", 1)[-1].split("?")[0] or "image"
+        return await self._upload(client, media_key, content, mime_type, filename)
+
+    async def get_media_id(self, client: "WhatsAppCloudAPIClient", image_url: str) -> Optional[str]:
+        """Cached media ID for `image_url`, uploading it first if needed"""
+        phone_number_id = client.phone_number_id
+        url_key = self._url_key(phone_number_id, image_url)
+
+        try:
+            content_hash = await self._get(url_key)
+            if content_hash:
+                media_id = await self._fresh_media_id(self._media_key(phone_number_id, content_hash))
+                if media_id:
+                    return media_id
+
+            # Concurrent sends of the same image in this process share one download/upload
+            inflight_key = (phone_number_id, image_url)
+            pending = self._inflight.get(inflight_key)
+            if pending is not None:
+                return await asyncio.shield(pending)
+
+            task = asyncio.ensure_future(self._resolve(client, image_url, url_key))
+            self._inflight[inflight_key] = task
+            try:
+                return await asyncio.shield(task)
+            finally:
+                self._inflight.pop(inflight_key, None)
+
+        except Exception as e:
+            logger.warning("Media cache lookup failed for %s: %s", image_url, e)
+            return None
+
+    async def invalidate(self, phone_number_id: str, image_url: str) -> None:
+        """Forget a media ID that Meta rejected"""
+        url_key = self._url_key(phone_number_id, image_url)
+        content_hash = await self._get(url_key)
+        await self._delete(url_key)
+        if content_hash:
+            await self._delete(self._media_key(phone_number_id, content_hash))
+
+
+_media_cache: Optional[MediaCache] = None
+
+
+def get_media_cache() -> MediaCache:
+    """Process-wide media cache shared by every WhatsAppCloudAPIClient"""
+    global _media_cache
+    if _media_cache is None:
+        _media_cache = MediaCache()
+    return _media_cache
@@ -0,0 +1,294 @@
+# NEW FILE - Message-level retries: replay failed MessageLog rows from their stored payload
+"""
+Only the messages that failed are resent (one catalog image, not the whole
+post-call automation), from the `payload` stored on their MessageLog row.
+
+Work is claimed in batches, each in its own short transaction:
+
+    SELECT ... FROM message_logs WHERE status = 'failed' AND retry_count < max_retries
+        ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED
+    UPDATE message_logs SET status = 'retrying', retry_count = retry_count + 1 WHERE id IN (...)
+    COMMIT
+
+so several retry workers can run at once: rows another worker is claiming
+are skipped, and claimed rows are no longer 'failed'. The sends happen after
+the commit, and their outcomes are written with one bulk UPDATE per batch.
+Rows left 'retrying' by a crashed worker ('sending' by an automation run)
+become 'unknown' after MESSAGE_RETRY_STALE_SECONDS: that attempt may have been
+delivered. 'unknown' rows are only resent with resend_unknown=True.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.async_runtime import run_async
+from app.core.config import get_settings
+from app.db.session import SessionLocal
+from app.models.message_log import MessageLog
+from app.services.automation_journal import (
+    IN_FLIGHT_STATUSES,
+    INTERRUPTED_SEND_ERROR,
+    STATUS_RETRYING,
+    STATUS_UNKNOWN,
+    outcome_status,
+    refresh_automation_status,
+)
+from app.services.automation_service import REPLAYABLE_METHODS, AutomationService
+from app.services.whatsapp_client import WhatsAppCloudAPIClient
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClaimedMessage:
+    id: int
+    tenant_id: int
+    call_id: Optional[int]
+    recipient_phone: str
+    payload: Dict[str, Any]
+    retry_count: int  # including the attempt this claim is for
+    max_retries: int
+
+
+def _tenant_filter(tenant_id: Optional[int]) -> list:
+    return [MessageLog.tenant_id == tenant_id] if tenant_id is not None else []
+
+
+def release_stale_claims(db: Session, stale_before: datetime, tenant_id: Optional[int] = None) -> int:
+    """Mark rows whose sender (retry worker or automation run) died mid-attempt 'unknown'"""
+    result = db.execute(
+        update(MessageLog)
+        .where(
+            MessageLog.status.in_(IN_FLIGHT_STATUSES),
+            MessageLog.last_attempt_at < stale_before,
+            *_tenant_filter(tenant_id)
+        )
+        .values(status=STATUS_UNKNOWN, error_message=INTERRUPTED_SEND_ERROR)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def claim_batch(
+    db: Session,
+    batch_size: int,
+    attempted_before: datetime,
+    tenant_id: Optional[int] = None,
+    exclude_tenants: Optional[Set[int]] = None,
+    resend_unknown: bool = False
+) -> List[ClaimedMessage]:
+    """
+    Lock up to `batch_size` retryable rows no other worker holds, mark them
+    'retrying' and count the attempt, in one transaction. Rows whose delivery
+    is unknown are only taken with `resend_unknown`.
+
+    Rows attempted at or after `attempted_before` (earlier in this run) are not
+    claimed again, so one run makes at most one attempt per message.
+    """
+    query = (
+        select(
+            MessageLog.id,
+            MessageLog.tenant_id,
+            MessageLog.call_id,
+            MessageLog.recipient_phone,
+            MessageLog.payload,
+            MessageLog.retry_count,
+            MessageLog.max_retries
+        )
+        .where(
+            MessageLog.status.in_(("failed", STATUS_UNKNOWN) if resend_unknown else ("failed",)),
+            MessageLog.payload.isnot(None),
+            MessageLog.retry_count < MessageLog.max_retries,
+            or_(MessageLog.last_attempt_at.is_(None), MessageLog.last_attempt_at < attempted_before),
+            *_tenant_filter(tenant_id)
+        )
+        .order_by(MessageLog.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        # Stream rows (server-side cursor on PostgreSQL) instead of buffering
+        # every payload; rows are locked as they are fetched
+        .execution_options(yield_per=batch_size)
+    )
+    if exclude_tenants:
+        query = query.where(MessageLog.tenant_id.notin_(exclude_tenants))
+
+    claimed = [
+        ClaimedMessage(
+            id=row.id,
+            tenant_id=row.tenant_id,
+            call_id=row.call_id,
+            recipient_phone=row.recipient_phone,
+            payload=row.payload,
+            retry_count=(row.retry_count or 0) + 1,
+            max_retries=row.max_retries
+        )
+        for row in db.execute(query)
+    ]
+
+    if claimed:
+        db.execute(
+            update(MessageLog)
+            .where(MessageLog.id.in_([message.id for message in claimed]))
+            .values(
+                status=STATUS_RETRYING,
+                retry_count=MessageLog.retry_count + 1,
+                last_attempt_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return claimed
+
+
+async def replay_messages(
+    sends: List[Tuple[WhatsAppCloudAPIClient, ClaimedMessage]],
+    concurrency: int
+) -> List[Dict[str, Any]]:
+    """Resend (client, ClaimedMessage) pairs, at most `concurrency` at a time; results in input order"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def replay(client: WhatsAppCloudAPIClient, message: ClaimedMessage) -> Dict[str, Any]:
+        method = message.payload.get("method")
+        if method not in REPLAYABLE_METHODS:
+            return {"success": False, "error_message": f"Not a replayable WhatsApp method: {method}", "retryable": False}
+        async with semaphore:
+            try:
+                return await getattr(client, method)(
+                    to_phone=message.recipient_phone,
+                    **(message.payload.get("kwargs") or {})
+                )
+            except Exception as e:
+                return {"success": False, "error_message": str(e), "retryable": True}
+
+    return list(await asyncio.gather(*(replay(client, message) for client, message in sends)))
+
+
+def outcome_values(message: ClaimedMessage, result: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """Bulk UPDATE parameters (by primary key) for one replayed message"""
+    if result.get("success"):
+        return {
+            "id": message.id,
+            "status": "sent",
+            "whatsapp_message_id": result.get("message_id"),
+            "error_message": None,
+            "api_response": result.get("response"),
+            "sent_at": now,
+            "max_retries": message.max_retries
+        }
+    return {
+        "id": message.id,
+        "status": outcome_status(result),
+        "whatsapp_message_id": None,
+        "error_message": result.get("error_message"),
+        "api_response": result.get("response"),
+        "sent_at": None,
+        # Permanent errors stop here instead of burning the remaining attempts
+        "max_retries": (
+            message.max_retries if result.get("retryable") or result.get("delivery_unknown")
+            else message.retry_count
+        )
+    }
+
+
+def retry_failed_messages(
+    tenant_id: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    db: Optional[Session] = None,
+    resend_unknown: bool = False
+) -> Dict[str, int]:
+    """
+    Replay every retryable failed message (of one tenant, or all) once.
+    Safe to run from several workers at the same time. `resend_unknown` also
+    resends messages that may have been delivered already - an explicit
+    decision, e.g. after checking with the customer.
+    """
+    settings = get_settings()
+    batch_size = batch_size or settings.MESSAGE_RETRY_BATCH_SIZE
+    concurrency = concurrency or settings.MESSAGE_RETRY_CONCURRENCY
+    own_session = db is None
+    db = db or SessionLocal()
+
+    started_at = datetime.utcnow()
+    summary = {"retried": 0, "sent": 0, "failed": 0, "released": 0, "stale": 0, "batches": 0}
+    # Tenants whose circuit is open: their claims are released and not claimed again this run
+    skipped_tenants: Set[int] = set()
+
+    try:
+        summary["stale"] = release_stale_claims(
+            db, started_at - timedelta(seconds=settings.MESSAGE_RETRY_STALE_SECONDS), tenant_id
+        )
+
+        while True:
+            claimed = claim_batch(db, batch_size, started_at, tenant_id, skipped_tenants, resend_unknown)
+            if not claimed:
+                break
+            summary["batches"] += 1
+            summary["retried"] += len(claimed)
+
+            # Tenant settings and clients are loaded here, before the sends leave this thread
+            services: Dict[int, AutomationService] = {}
+            sends, unsendable, released = [], [], []
+            for message in claimed:
+                service = services.get(message.tenant_id)
+                if service is None:
+                    service = services[message.tenant_id] = AutomationService(db=db, tenant_id=message.tenant_id)
+                if message.tenant_id in skipped_tenants or not service.circuit_allows_send():
+                    skipped_tenants.add(message.tenant_id)
+                    released.append(message.id)
+                elif not service.is_automation_enabled() or not service.whatsapp_client:
+                    unsendable.append(message)
+                else:
+                    sends.append((service.whatsapp_client, message))
+
+            results = run_async(replay_messages(sends, concurrency)) if sends else []
+
+            now = datetime.utcnow()
+            outcomes = [outcome_values(message, result, now) for (_, message), result in zip(sends, results)]
+            outcomes.extend(
+                outcome_values(
+                    message,
+                    {"success": False, "error_message": "Automation not enabled or configured", "retryable": True},
+                    now
+                )
+                for message in unsendable
+            )
+            if outcomes:
+                # One executemany UPDATE keyed by primary key for the whole batch
+                db.execute(update(MessageLog), outcomes)
+            if released:
+                # The attempt never happened: give it back
+                db.execute(
+                    update(MessageLog)
+                    .where(MessageLog.id.in_(released))
+                    .values(status="failed", retry_count=MessageLog.retry_count - 1)
+                    .execution_options(synchronize_session=False)
+                )
+            refresh_automation_status(db, (message.call_id for message in claimed))
+            db.commit()
+
+            for tenant, service in services.items():
+                service.record_send_results([
+                    result for (_, message), result in zip(sends, results) if message.tenant_id == tenant
+                ])
+
+            sent = sum(1 for outcome in outcomes if outcome["status"] == "sent")
+            summary["sent"] += sent
+            summary["failed"] += len(outcomes) - sent
+            summary["released"] += len(released)
+            logger.info(
+                "Message retry batch: %s claimed, %s sent, %s failed, %s released",
+                len(claimed), sent, len(outcomes) - sent, len(released)
+            )
+
+        return summary
+
+    finally:
+        if own_session:
+            db.close()
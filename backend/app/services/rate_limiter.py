@@ -0,0 +1,182 @@
+# NEW FILE - Token-bucket throttling for outbound WhatsApp Cloud API sends
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from app.core.config import get_settings
+from app.core.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BucketSpec:
+    """A token bucket: `rate` tokens per second, holding at most `capacity`"""
+    key: str
+    rate: float
+    capacity: float
+
+
+# Consumes one token from every bucket only if all of them have one available.
+# Returns the seconds to wait (as a string, Lua numbers are truncated to ints).
+# KEYS = bucket keys, ARGV = rate1, capacity1, rate2, capacity2, ...
+TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+local state = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or capacity
+    local ts = tonumber(data[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if tokens < 1 then
+        wait = math.max(wait, (1 - tokens) / rate)
+    end
+    state[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2 - 1])
+    local capacity = tonumber(ARGV[i * 2])
+    local tokens = state[i]
+    if wait == 0 then
+        tokens = tokens - 1
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000) + 1000)
+end
+return tostring(wait)
+"""
+
+
+class LocalBucketBackend:
+    """In-process token buckets - used when Redis is absent and as a test stand-in"""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, spec: BucketSpec, now: float) -> float:
+        tokens, ts = self._buckets.get(spec.key, (spec.capacity, now))
+        return min(spec.capacity, tokens + max(0.0, now - ts) * spec.rate)
+
+    async def try_acquire(self, specs: Sequence[BucketSpec]) -> float:
+        now = self._clock()
+        with self._lock:
+            levels = [self._refill(spec, now) for spec in specs]
+            wait = max(
+                [(1 - tokens) / spec.rate for spec, tokens in zip(specs, levels) if tokens < 1],
+                default=0.0,
+            )
+            for spec, tokens in zip(specs, levels):
+                self._buckets[spec.key] = [tokens - 1 if wait == 0 else tokens, now]
+        return wait
+
+
+class RedisBucketBackend:
+    """Cluster-wide token buckets shared by every API process and Celery worker"""
+
+    def __init__(self, redis_client=None):
+        # None = resolve the per-event-loop client lazily from app.core.redis
+        self._redis = redis_client
+
+    async def try_acquire(self, specs: Sequence[BucketSpec]) -> float:
+        client = self._redis or get_async_redis()
+        if client is None:
+            raise ConnectionError("Redis is not configured")
+
+        args = []
+        for spec in specs:
+            args.extend([spec.rate, spec.capacity])
+
+        wait = await client.eval(TOKEN_BUCKET_SCRIPT, len(specs), *[s.key for s in specs], *args)
+        return float(wait)
+
+
+class RateLimiter:
+    """
+    Throttles sends per business phone number (tier-dependent messages/second)
+    and per business -> recipient pair.
+
+    Uses Redis when available and falls back to local buckets for
+    `redis_retry_after` seconds whenever Redis errors.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        fallback: Optional[LocalBucketBackend] = None,
+        redis_retry_after: float = 30.0
+    ):
+        self.backend = backend if backend is not None else RedisBucketBackend()
+        self.fallback = fallback or LocalBucketBackend()
+        self.redis_retry_after = redis_retry_after
+        self._backend_down_until = 0.0
+
+    def bucket_specs(
+        self,
+        phone_number_id: str,
+        recipient: Optional[str] = None,
+        tier: Optional[str] = None
+    ) -> List[BucketSpec]:
+        settings = get_settings()
+        tiers = settings.WHATSAPP_RATE_LIMIT_TIERS
+        tier = tier if tier in tiers else settings.WHATSAPP_DEFAULT_RATE_LIMIT_TIER
+        rate = tiers.get(tier, 80.0)
+
+        specs = [BucketSpec(f"wa:rl:phone:{phone_number_id}", rate, rate)]
+        if recipient:
+            specs.append(BucketSpec(
+                f"wa:rl:pair:{phone_number_id}:{recipient}",
+                settings.WHATSAPP_PAIR_RATE_PER_SECOND,
+                settings.WHATSAPP_PAIR_BURST,
+            ))
+        return specs
+
+    async def _try_acquire(self, specs: List[BucketSpec]) -> float:
+        if time.monotonic() >= self._backend_down_until:
+            try:
+                return await self.backend.try_acquire(specs)
+            except Exception as e:
+                logger.warning("Rate limiter backend unavailable, using local buckets: %s", e)
+                self._backend_down_until = time.monotonic() + self.redis_retry_after
+        return await self.fallback.try_acquire(specs)
+
+    async def acquire(
+        self,
+        phone_number_id: str,
+        recipient: Optional[str] = None,
+        tier: Optional[str] = None,
+        max_wait: Optional[float] = None
+    ) -> bool:
+        """Wait for a send slot. Returns False if it would take longer than max_wait."""
+        if max_wait is None:
+            max_wait = get_settings().WHATSAPP_RATE_LIMIT_MAX_WAIT
+
+        specs = self.bucket_specs(phone_number_id, recipient, tier)
+        deadline = time.monotonic() + max_wait
+
+        while True:
+            wait = await self._try_acquire(specs)
+            if wait <= 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter shared by every WhatsAppCloudAPIClient"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
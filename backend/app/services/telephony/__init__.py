@@ -0,0 +1,37 @@
+# NEW FILE - Telephony provider adapters (Twilio, Exotel, generic, ...)
+"""
+Each provider lives in its own module under telephony/providers/ and registers
+itself with @register_adapter; every module in that package is imported here,
+so supporting a new provider means adding one module.
+"""
+import importlib
+import pkgutil
+
+from app.services.telephony import providers
+from app.services.telephony.base import COMMON_STATUS_ALIASES, TelephonyAdapter
+from app.services.telephony.registry import (
+    FALLBACK_PROVIDER,
+    PROVIDER_HINT_HEADER,
+    detect_adapter,
+    get_adapter,
+    register_adapter,
+    registered_providers,
+    resolve_adapter,
+    signed_by,
+)
+
+for _module in pkgutil.iter_modules(providers.__path__):
+    importlib.import_module(f"{providers.__name__}.{_module.name}")
+
+__all__ = [
+    "COMMON_STATUS_ALIASES",
+    "FALLBACK_PROVIDER",
+    "PROVIDER_HINT_HEADER",
+    "TelephonyAdapter",
+    "detect_adapter",
+    "get_adapter",
+    "register_adapter",
+    "registered_providers",
+    "resolve_adapter",
+    "signed_by",
+]
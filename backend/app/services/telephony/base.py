@@ -0,0 +1,71 @@
+# NEW FILE - Base class for telephony provider adapters
+import hashlib
+import hmac
+from typing import Any, Callable, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from app.schemas.webhook import CallEndedEvent
+
+# Provider status spellings -> our call statuses
+COMMON_STATUS_ALIASES = {
+    "completed": "completed",
+    "call-completed": "completed",
+    "complete": "completed",
+    "busy": "busy",
+    "line-busy": "busy",
+    "no-answer": "no-answer",
+    "noanswer": "no-answer",
+    "no_answer": "no-answer",
+    "unanswered": "no-answer",
+    "failed": "failed",
+    "error": "failed",
+    "call-failed": "failed",
+    "canceled": "canceled",
+    "cancelled": "canceled",
+}
+
+
+class TelephonyAdapter:
+    """
+    One telephony provider's call-status webhook.
+
+    Subclasses set `name`, `payload_model` (validated once per delivery), and
+    override `detect` and `to_event`. Providers that sign requests differently
+    from the generic HMAC-SHA256 scheme override `verify_signature`.
+    Register with @register_adapter in a module under telephony/providers/.
+    """
+
+    name: str = ""
+    # Detection order when there is no hint - lower runs first
+    priority: int = 100
+    # Header carrying this provider's request signature, if it signs requests
+    signature_header: Optional[str] = None
+    payload_model: Type[BaseModel]
+    status_aliases: Dict[str, str] = {}
+
+    def detect(self, payload: Dict[str, Any]) -> bool:
+        """Does this (already decoded) payload come from this provider?"""
+        return False
+
+    def parse(self, payload: Dict[str, Any]) -> CallEndedEvent:
+        return self.to_event(self.payload_model.model_validate(payload), payload)
+
+    def to_event(self, data: BaseModel, payload: Dict[str, Any]) -> CallEndedEvent:
+        raise NotImplementedError
+
+    def normalize_status(self, status: Optional[str]) -> str:
+        status = (status or "").lower()
+        return self.status_aliases.get(status) or COMMON_STATUS_ALIASES.get(status, status)
+
+    def verify_signature(
+        self,
+        body: bytes,
+        signature: str,
+        secret_key: str,
+        url: str,
+        load_payload: Callable[[], Dict[str, Any]]
+    ) -> bool:
+        """Generic HMAC-SHA256 (hex) of the raw body"""
+        expected = hmac.new(secret_key.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
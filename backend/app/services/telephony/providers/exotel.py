@@ -0,0 +1,27 @@
+# NEW FILE - Exotel passthru / status callbacks
+from typing import Any, Dict
+
+from app.schemas.webhook import CallEndedEvent, ExotelCallWebhook
+from app.services.telephony.base import TelephonyAdapter
+from app.services.telephony.registry import register_adapter
+
+
+@register_adapter
+class ExotelAdapter(TelephonyAdapter):
+    name = "exotel"
+    priority = 20
+    payload_model = ExotelCallWebhook
+
+    def detect(self, payload: Dict[str, Any]) -> bool:
+        return "CallSid" in payload and "Status" in payload
+
+    def to_event(self, data: ExotelCallWebhook, payload: Dict[str, Any]) -> CallEndedEvent:
+        return CallEndedEvent(
+            call_sid=data.CallSid,
+            caller_phone=data.From_,
+            receiver_phone=data.To,
+            status=self.normalize_status(data.Status),
+            duration_seconds=data.DialCallDuration,
+            provider=self.name,
+            raw_payload=payload
+        )
@@ -0,0 +1,29 @@
+# NEW FILE - Provider-agnostic call-ended format (fallback when nothing else matches)
+from datetime import datetime
+from typing import Any, Dict
+
+from app.schemas.webhook import CallEndedEvent, GenericCallWebhook
+from app.services.telephony.base import TelephonyAdapter
+from app.services.telephony.registry import register_adapter
+
+
+@register_adapter
+class GenericAdapter(TelephonyAdapter):
+    name = "generic"
+    priority = 1000
+    signature_header = "x-webhook-signature"
+    payload_model = GenericCallWebhook
+
+    def detect(self, payload: Dict[str, Any]) -> bool:
+        return True
+
+    def to_event(self, data: GenericCallWebhook, payload: Dict[str, Any]) -> CallEndedEvent:
+        return CallEndedEvent(
+            call_sid=data.call_sid or str(datetime.utcnow().timestamp()),
+            caller_phone=data.caller_phone,
+            receiver_phone=data.receiver_phone,
+            status=self.normalize_status(data.status or "completed"),
+            duration_seconds=data.duration_seconds,
+            provider=self.name,
+            raw_payload=payload
+        )
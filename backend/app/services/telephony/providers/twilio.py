@@ -0,0 +1,53 @@
+# NEW FILE - Twilio call status callbacks
+import base64
+import hashlib
+import hmac
+from typing import Any, Callable, Dict
+
+from app.schemas.webhook import CallEndedEvent, TwilioCallWebhook
+from app.services.telephony.base import TelephonyAdapter
+from app.services.telephony.registry import register_adapter
+
+
+@register_adapter
+class TwilioAdapter(TelephonyAdapter):
+    name = "twilio"
+    priority = 10
+    signature_header = "x-twilio-signature"
+    payload_model = TwilioCallWebhook
+
+    def detect(self, payload: Dict[str, Any]) -> bool:
+        return "CallSid" in payload and "AccountSid" in payload
+
+    def to_event(self, data: TwilioCallWebhook, payload: Dict[str, Any]) -> CallEndedEvent:
+        return CallEndedEvent(
+            call_sid=data.CallSid,
+            caller_phone=data.From_,
+            receiver_phone=data.To,
+            status=self.normalize_status(data.CallStatus),
+            duration_seconds=data.CallDuration,
+            provider=self.name,
+            raw_payload=payload
+        )
+
+    def verify_signature(
+        self,
+        body: bytes,
+        signature: str,
+        secret_key: str,
+        url: str,
+        load_payload: Callable[[], Dict[str, Any]]
+    ) -> bool:
+        """
+        Twilio scheme: base64 HMAC-SHA1 of the full URL followed by the POST
+        params sorted by name. A hex HMAC-SHA1 of the raw body (what this
+        endpoint used to check) is still accepted.
+        """
+        signed = url + "".join(f"{k}{v}" for k, v in sorted(load_payload().items()))
+        expected = base64.b64encode(
+            hmac.new(secret_key.encode(), signed.encode(), hashlib.sha1).digest()
+        ).decode()
+        if hmac.compare_digest(expected, signature):
+            return True
+        legacy = hmac.new(secret_key.encode(), body, hashlib.sha1).hexdigest()
+        return hmac.compare_digest(legacy, signature)
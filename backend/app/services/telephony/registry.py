@@ -0,0 +1,65 @@
+# NEW FILE - Registry of telephony provider adapters
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Type
+
+from app.services.telephony.base import TelephonyAdapter
+
+logger = logging.getLogger(__name__)
+
+# Header a provider (or a proxy in front of it) can set to skip detection
+PROVIDER_HINT_HEADER = "x-telephony-provider"
+FALLBACK_PROVIDER = "generic"
+
+_adapters: Dict[str, TelephonyAdapter] = {}
+_detection_order: List[TelephonyAdapter] = []
+
+
+def register_adapter(cls: Type[TelephonyAdapter]) -> Type[TelephonyAdapter]:
+    """Class decorator: make a provider adapter available for routing and detection"""
+    adapter = cls()
+    if not adapter.name:
+        raise ValueError(f"{cls.__name__} has no provider name")
+    if adapter.name in _adapters:
+        logger.warning("Telephony adapter %s registered twice, replacing", adapter.name)
+    _adapters[adapter.name] = adapter
+    _detection_order[:] = sorted(_adapters.values(), key=lambda a: a.priority)
+    return cls
+
+
+def get_adapter(name: Optional[str]) -> Optional[TelephonyAdapter]:
+    return _adapters.get((name or "").strip().lower())
+
+
+def registered_providers() -> List[str]:
+    return [adapter.name for adapter in _detection_order]
+
+
+def detect_adapter(payload: Dict[str, Any]) -> TelephonyAdapter:
+    """First adapter (by priority) that recognises the payload, else the generic one"""
+    for adapter in _detection_order:
+        if adapter.detect(payload):
+            return adapter
+    return _adapters[FALLBACK_PROVIDER]
+
+
+def signed_by(headers: Mapping[str, str]) -> Tuple[Optional[TelephonyAdapter], Optional[str]]:
+    """Adapter whose signature header is present, with the signature"""
+    for adapter in _detection_order:
+        if adapter.signature_header and headers.get(adapter.signature_header):
+            return adapter, headers[adapter.signature_header]
+    return None, None
+
+
+def resolve_adapter(
+    payload: Dict[str, Any],
+    hint: Optional[str] = None,
+    headers: Optional[Mapping[str, str]] = None
+) -> TelephonyAdapter:
+    """Route by explicit hint (path or header) first, then by payload detection"""
+    for name in (hint, (headers or {}).get(PROVIDER_HINT_HEADER)):
+        if name:
+            adapter = get_adapter(name)
+            if adapter is not None:
+                return adapter
+            logger.warning("Unknown telephony provider hint '%s', detecting from payload", name)
+    return detect_adapter(payload)
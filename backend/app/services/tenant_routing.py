@@ -0,0 +1,215 @@
+# NEW FILE - Cached tenant routing records for the call-ended webhook
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import TENANT_ROUTE_CACHE_REQUESTS
+from app.core.redis import get_redis
+from app.models.tenant import Tenant
+from app.models.tenant_settings import TenantSettings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "wa:tenant-routes:invalidate"
+INVALIDATE_ALL = "*"
+
+
+@dataclass(frozen=True)
+class TenantRoute:
+    """Everything the webhook needs to route a call for one tenant"""
+    tenant_id: int
+    slug: str
+    has_settings: bool
+    is_active: bool = False  # automation enabled (TenantSettings.is_active)
+    webhook_secret_key: Optional[str] = None
+    is_whatsapp_configured: bool = False
+    message_delay_seconds: int = 5
+    whatsapp_phone_number_id: Optional[str] = None
+
+
+def _route_query(slug: str):
+    return (
+        select(Tenant.id, TenantSettings)
+        .outerjoin(TenantSettings, TenantSettings.tenant_id == Tenant.id)
+        .where(Tenant.slug == slug, Tenant.is_active == True)
+        .limit(1)
+    )
+
+
+def load_tenant_route(db: Session, slug: str) -> Optional[TenantRoute]:
+    """Build the routing record for an active tenant (None if unknown or inactive)"""
+    return _route_from_row(slug, db.execute(_route_query(slug)).first())
+
+
+async def load_tenant_route_async(db: AsyncSession, slug: str) -> Optional[TenantRoute]:
+    """load_tenant_route for the API's AsyncSession"""
+    return _route_from_row(slug, (await db.execute(_route_query(slug))).first())
+
+
+def _route_from_row(slug: str, row) -> Optional[TenantRoute]:
+    if row is None:
+        return None
+
+    tenant_id, settings = row
+    if settings is None:
+        return TenantRoute(tenant_id=tenant_id, slug=slug, has_settings=False)
+
+    return TenantRoute(
+        tenant_id=tenant_id,
+        slug=slug,
+        has_settings=True,
+        is_active=bool(settings.is_active),
+        webhook_secret_key=settings.webhook_secret_key or None,
+        is_whatsapp_configured=bool(settings.is_whatsapp_configured),
+        message_delay_seconds=settings.message_delay_seconds or 5,
+        whatsapp_phone_number_id=settings.whatsapp_phone_number_id,
+    )
+
+
+class TenantRouteCache:
+    """
+    In-process TTL + LRU cache of TenantRoute records keyed by slug.
+
+    Writes to tenant settings call `invalidate(tenant_id)`, which evicts locally
+    and publishes on Redis so every other API replica evicts too. The TTL
+    bounds staleness if an invalidation message is lost.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_size: Optional[int] = None):
+        settings = get_settings()
+        self.ttl = ttl if ttl is not None else settings.TENANT_ROUTE_CACHE_TTL_SECONDS
+        self.max_size = max_size or settings.TENANT_ROUTE_CACHE_MAX_SIZE
+        self._entries: "OrderedDict[str, Tuple[float, TenantRoute]]" = OrderedDict()
+        self._slugs_by_tenant: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, slug: str, loader: Callable[[], Optional[TenantRoute]]) -> Optional[TenantRoute]:
+        """Cached record for `slug`, calling `loader` on a miss. Unknown slugs are not cached."""
+        now = time.monotonic()
+        route = self._lookup(slug, now)
+        if route is not None:
+            return route
+        return self._store(slug, loader(), now)
+
+    async def get_async(
+        self, slug: str, loader: Callable[[], Awaitable[Optional[TenantRoute]]]
+    ) -> Optional[TenantRoute]:
+        """get() with an async loader"""
+        now = time.monotonic()
+        route = self._lookup(slug, now)
+        if route is not None:
+            return route
+        return self._store(slug, await loader(), now)
+
+    def _lookup(self, slug: str, now: float) -> Optional[TenantRoute]:
+        self._ensure_listener()
+        with self._lock:
+            entry = self._entries.get(slug)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(slug)
+                self.hits += 1
+                TENANT_ROUTE_CACHE_REQUESTS.labels("hit").inc()
+                return entry[1]
+            self.misses += 1
+            TENANT_ROUTE_CACHE_REQUESTS.labels("miss").inc()
+        return None
+
+    def _store(self, slug: str, route: Optional[TenantRoute], now: float) -> Optional[TenantRoute]:
+        if route is None or self.ttl <= 0:
+            return route
+
+        with self._lock:
+            self._entries[slug] = (now + self.ttl, route)
+            self._entries.move_to_end(slug)
+            self._slugs_by_tenant[route.tenant_id] = slug
+            while len(self._entries) > self.max_size:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._slugs_by_tenant.pop(evicted.tenant_id, None)
+        return route
+
+    def evict(self, tenant_id: Optional[int] = None) -> None:
+        """Drop one tenant's record locally (all records if tenant_id is None)"""
+        with self._lock:
+            if tenant_id is None:
+                self._entries.clear()
+                self._slugs_by_tenant.clear()
+                return
+            slug = self._slugs_by_tenant.pop(tenant_id, None)
+            if slug is not None:
+                self._entries.pop(slug, None)
+
+    def invalidate(self, tenant_id: int) -> None:
+        """Evict here and tell the other replicas to evict"""
+        self.evict(tenant_id)
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            client.publish(INVALIDATION_CHANNEL, str(tenant_id))
+        except Exception as e:
+            logger.warning("Could not publish tenant route invalidation for %s: %s", tenant_id, e)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def _ensure_listener(self) -> None:
+        if self._listener is not None or get_redis() is None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="tenant-route-invalidation", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self) -> None:
+        """Apply invalidations published by other replicas; reconnects on Redis errors"""
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were disconnected is lost
+                self.evict()
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    data = message["data"].decode()
+                    self.evict(None if data == INVALIDATE_ALL else int(data))
+            except Exception as e:
+                logger.warning("Tenant route invalidation listener error: %s", e)
+                time.sleep(5.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+_tenant_routes: Optional[TenantRouteCache] = None
+
+
+def get_tenant_routes() -> TenantRouteCache:
+    """Process-wide routing cache used by the webhook handlers"""
+    global _tenant_routes
+    if _tenant_routes is None:
+        _tenant_routes = TenantRouteCache()
+    return _tenant_routes
+
+
+def invalidate_tenant_route(tenant_id: int) -> None:
+    get_tenant_routes().invalidate(tenant_id)
@@ -0,0 +1,175 @@
+# NEW FILE - Durable append-only log for accepted call-ended webhooks
+import base64
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.core.metrics import WEBHOOK_INGEST_APPENDS
+from app.core.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Request headers kept with the body (signature already verified before append)
+KEPT_HEADERS = (
+    "content-type",
+    "user-agent",
+    "x-request-id",
+    "x-telephony-provider",
+    "i-twilio-idempotency-token",
+)
+
+
+@dataclass
+class IngestEntry:
+    """One verified webhook delivery, exactly as received"""
+    tenant_slug: str
+    tenant_id: int
+    body: bytes
+    content_type: str = ""
+    headers: Dict[str, str] = field(default_factory=dict)
+    received_at: float = field(default_factory=time.time)
+
+    def to_fields(self) -> Dict[str, bytes | str]:
+        return {
+            "slug": self.tenant_slug,
+            "tenant_id": str(self.tenant_id),
+            "content_type": self.content_type,
+            "headers": json.dumps(self.headers),
+            "received_at": repr(self.received_at),
+            "body": self.body,
+        }
+
+    @classmethod
+    def from_fields(cls, fields: Dict[bytes, bytes]) -> "IngestEntry":
+        return cls(
+            tenant_slug=fields[b"slug"].decode(),
+            tenant_id=int(fields[b"tenant_id"]),
+            body=fields[b"body"],
+            content_type=fields.get(b"content_type", b"").decode(),
+            headers=json.loads(fields.get(b"headers", b"{}")),
+            received_at=float(fields[b"received_at"]),
+        )
+
+    def to_line(self) -> str:
+        return json.dumps({
+            "slug": self.tenant_slug,
+            "tenant_id": self.tenant_id,
+            "content_type": self.content_type,
+            "headers": self.headers,
+            "received_at": self.received_at,
+            "body": base64.b64encode(self.body).decode(),
+        }) + "\n"
+
+    @classmethod
+    def from_line(cls, line: str) -> "IngestEntry":
+        data = json.loads(line)
+        return cls(
+            tenant_slug=data["slug"],
+            tenant_id=int(data["tenant_id"]),
+            body=base64.b64decode(data["body"]),
+            content_type=data.get("content_type", ""),
+            headers=data.get("headers", {}),
+            received_at=float(data["received_at"]),
+        )
+
+
+class SpoolFile:
+    """
+    Local append-only JSON-lines file used while Redis is unreachable.
+    The ingest consumer drains it (see WebhookStreamConsumer.drain_spool).
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+    def append(self, entry: IngestEntry) -> str:
+        line = entry.to_line()
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        return f"spool-{entry.received_at:.6f}"
+
+    def claim(self) -> Optional[str]:
+        """
+        Atomically move the current spool aside for processing and return the
+        claimed path (None if there is nothing to drain). New webhooks keep
+        appending to a fresh file.
+        """
+        claimed = f"{self.path}.{os.getpid()}.{int(time.time() * 1000)}.draining"
+        with self._lock:
+            try:
+                os.rename(self.path, claimed)
+            except FileNotFoundError:
+                return None
+        return claimed
+
+    @staticmethod
+    def read(path: str) -> Iterator[IngestEntry]:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield IngestEntry.from_line(line)
+                except (ValueError, KeyError) as e:
+                    logger.error("Skipping unreadable spool line in %s: %s", path, e)
+
+
+class WebhookIngestLog:
+    """
+    Appends verified webhooks to the Redis Stream, falling back to the local
+    spool file when Redis is unavailable (retrying Redis after 30s).
+    """
+
+    def __init__(self, stream: Optional[str] = None, spool: Optional[SpoolFile] = None):
+        settings = get_settings()
+        self.stream = stream or settings.WEBHOOK_INGEST_STREAM
+        self.maxlen = settings.WEBHOOK_INGEST_STREAM_MAXLEN
+        self.spool = spool or SpoolFile(settings.WEBHOOK_INGEST_SPOOL_PATH, settings.WEBHOOK_INGEST_SPOOL_FSYNC)
+        self._redis_down_until = 0.0
+
+    async def append(self, entry: IngestEntry) -> str:
+        """Durably record the entry and return its ID (stream ID or spool marker)"""
+        if time.monotonic() >= self._redis_down_until:
+            client = get_async_redis()
+            if client is not None:
+                try:
+                    entry_id = await client.xadd(
+                        self.stream,
+                        entry.to_fields(),
+                        maxlen=self.maxlen or None,
+                        approximate=True
+                    )
+                    WEBHOOK_INGEST_APPENDS.labels("stream").inc()
+                    return entry_id.decode()
+                except Exception as e:
+                    logger.warning("Webhook stream unavailable, spooling locally: %s", e)
+                    self._redis_down_until = time.monotonic() + 30.0
+
+        WEBHOOK_INGEST_APPENDS.labels("spool").inc()
+        # Blocking file write (and optional fsync): keep it off the event loop
+        return await run_in_threadpool(self.spool.append, entry)
+
+
+_ingest_log: Optional[WebhookIngestLog] = None
+
+
+def get_webhook_ingest_log() -> WebhookIngestLog:
+    global _ingest_log
+    if _ingest_log is None:
+        _ingest_log = WebhookIngestLog()
+    return _ingest_log
@@ -1,28 +1,71 @@
 # COMPLETE REWRITE - Full WhatsApp Cloud API client with media support
+import asyncio
+import random
+import time
 import httpx
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Sequence, Tuple
 from datetime import datetime
 import logging
 
+from app.core.config import get_settings
+from app.core import serialization
+from app.core.logging import LogPayload
+from app.core.metrics import (
+    WHATSAPP_BYTES_SENT,
+    WHATSAPP_IN_FLIGHT,
+    observe_whatsapp_request,
+    tenant_label,
+)
+from app.services.http_pool import get_http_client
+from app.services.media_cache import MediaCache, get_media_cache
+from app.services.rate_limiter import RateLimiter, get_rate_limiter
+from app.services.whatsapp_errors import (
+    PERMANENT,
+    REASON_REQUEST,
+    UNKNOWN,
+    backoff_delay,
+    classify_error,
+    classify_transport_error,
+    error_reason,
+    parse_retry_after,
+)
+
 logger = logging.getLogger(__name__)
 
+CATALOG_DELIVERY_ORDERS = ("sequential", "barrier", "unordered")
+
+# Graph API "rate limit hit" code, reused when our own limiter gives up waiting
+THROUGHPUT_LIMIT_ERROR_CODE = 130429
+
 
 class WhatsAppCloudAPIClient:
     """WhatsApp Cloud API Client with full media and catalog support"""
 
-    BASE_URL = "https://graph.facebook.com/v18.0"
+    # Overridable via WHATSAPP_API_BASE_URL / WHATSAPP_API_VERSION (e.g. the local fake API)
+    BASE_URL = get_settings().whatsapp_api_url
 
     def __init__(
         self,
         phone_number_id: str,
         access_token: str,
-        business_account_id: Optional[str] = None
+        business_account_id: Optional[str] = None,
+        rate_limit_tier: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        media_cache: Optional[MediaCache] = None,
+        base_url: Optional[str] = None,
+        tenant_id: Optional[int] = None
     ):
         self.phone_number_id = phone_number_id
         self.access_token = access_token
         self.business_account_id = business_account_id
-        self.messages_url = f"{self.BASE_URL}/{phone_number_id}/messages"
-        self.media_url = f"{self.BASE_URL}/{phone_number_id}/media"
+        self.rate_limit_tier = rate_limit_tier
+        self.rate_limiter = rate_limiter
+        self.media_cache = media_cache
+        self.tenant_id = tenant_id
+        self.metrics_tenant = tenant_label(tenant_id)
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.messages_url = f"{self.base_url}/{phone_number_id}/messages"
+        self.media_url = f"{self.base_url}/{phone_number_id}/media"
 
     def _get_headers(self) -> Dict[str, str]:
         return {
@@ -60,24 +103,98 @@ class WhatsAppCloudAPIClient:
     async def send_image_message(
         self,
         to_phone: str,
-        image_url: str,
-        caption: Optional[str] = None
+        image_url: Optional[str] = None,
+        caption: Optional[str] = None,
+        media_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Send an image message with optional caption"""
+        """
+        Send an image message with optional caption.
+        Prefers an uploaded media ID (from the media cache) over a link, so
+        Meta does not re-fetch the image for every recipient.
+        """
+        cache = self._get_media_cache()
+        cached = False
+        if media_id is None and image_url and cache is not None:
+            media_id = await cache.get_media_id(self, image_url)
+            cached = media_id is not None
+
         payload = {
             "messaging_product": "whatsapp",
             "recipient_type": "individual",
             "to": self._format_phone_number(to_phone),
             "type": "image",
-            "image": {
-                "link": image_url
-            }
+            "image": {"id": media_id} if media_id else {"link": image_url}
         }
 
         if caption:
             payload["image"]["caption"] = caption
 
-        return await self._send_request(payload)
+        result = await self._send_request(payload)
+
+        if cached and not result.get("success") and result.get("error_reason") == REASON_REQUEST:
+            # Meta rejected the cached ID (expired early or deleted) - resend by link
+            await cache.invalidate(self.phone_number_id, image_url)
+            payload["image"] = {"link": image_url}
+            if caption:
+                payload["image"]["caption"] = caption
+            result = await self._send_request(payload)
+
+        return result
+
+    def _get_media_cache(self) -> Optional[MediaCache]:
+        if self.media_cache is not None:
+            return self.media_cache
+        if get_settings().WHATSAPP_MEDIA_CACHE_ENABLED:
+            return get_media_cache()
+        return None
+
+    async def upload_media(
+        self,
+        content: bytes,
+        mime_type: str,
+        filename: str = "file"
+    ) -> Dict[str, Any]:
+        """Upload media to the phone number's media store and return its ID"""
+        started = time.perf_counter()
+        in_flight = WHATSAPP_IN_FLIGHT.labels(self.metrics_tenant)
+        WHATSAPP_BYTES_SENT.labels(self.metrics_tenant, "media_upload").inc(len(content))
+        try:
+            client = get_http_client(self.phone_number_id)
+            with in_flight.track_inprogress():
+                response = await client.post(
+                    self.media_url,
+                    headers={"Authorization": f"Bearer {self.access_token}"},
+                    data={"messaging_product": "whatsapp", "type": mime_type},
+                    files={"file": (filename, content, mime_type)}
+                )
+            duration = time.perf_counter() - started
+
+            try:
+                response_data = serialization.loads(response.content)
+            except ValueError:
+                response_data = {}
+
+            error = response_data.get("error", {}) if isinstance(response_data, dict) else {}
+            observe_whatsapp_request(
+                self.metrics_tenant, "media_upload", str(response.status_code), error.get("code"), duration
+            )
+
+            if response.status_code == 200 and response_data.get("id"):
+                return {"success": True, "media_id": response_data["id"]}
+
+            return self._failure(
+                response.status_code,
+                error.get("code"),
+                error.get("message") or f"HTTP {response.status_code}",
+                response_data
+            )
+
+        except Exception as e:
+            logger.error("WhatsApp media upload failed: %s", e)
+            observe_whatsapp_request(
+                self.metrics_tenant, "media_upload", "error", None, time.perf_counter() - started
+            )
+            return self._failure(None, None, str(e), None)
 
     async def send_document_message(
         self,
@@ -129,51 +246,96 @@ class WhatsAppCloudAPIClient:
 
         return await self._send_request(payload)
 
+    @staticmethod
+    def build_product_caption(idx: int, product: Dict[str, Any]) -> str:
+        caption = f"*{idx}. {product.get('name', 'Product')}*\n"
+        caption += f"Price: {product.get('price', 'Contact for price')}\n"
+        if product.get('description'):
+            caption += f"{product['description']}\n"
+        if product.get('sku'):
+            caption += f"SKU: {product['sku']}"
+        return caption.strip()
+
+    async def _send_product(self, to_phone: str, idx: int, product: Dict[str, Any]) -> Dict[str, Any]:
+        caption = self.build_product_caption(idx, product)
+        if product.get('image_url'):
+            return await self.send_image_message(to_phone, product['image_url'], caption)
+        return await self.send_text_message(to_phone, caption)
+
     async def send_catalog_carousel(
         self,
         to_phone: str,
         products: List[Dict[str, Any]],
         header_text: Optional[str] = None,
         body_text: Optional[str] = None,
-        footer_text: Optional[str] = None
+        footer_text: Optional[str] = None,
+        concurrency: int = 1,
+        delivery_order: str = "barrier",
+        product_numbers: Optional[Sequence[int]] = None
     ) -> List[Dict[str, Any]]:
         """
         Send product catalog as individual image messages
         Each product: {name, price, image_url, description}
-        Returns list of API responses
+        product_numbers: the number shown in each caption (default 1..n), so a
+        resumed catalog keeps the numbering of the full one
+
+        delivery_order:
+        - "sequential": every message waits for the previous one
+        - "barrier": header first, products pipelined with up to `concurrency`
+          requests in flight (dispatched in product order), footer last
+        - "unordered": header, products and footer all share the concurrency limit
+
+        Returns list of API responses in display order (header, products..., footer)
         """
-        responses = []
-        to_phone = self._format_phone_number(to_phone)
+        if delivery_order not in CATALOG_DELIVERY_ORDERS:
+            raise ValueError(f"Unknown catalog delivery order: {delivery_order}")
 
-        # Send header message if provided
+        to_phone = self._format_phone_number(to_phone)
+        concurrency = max(1, concurrency)
+        numbered = list(zip(product_numbers or range(1, len(products) + 1), products))
+
+        if delivery_order == "sequential" or concurrency == 1:
+            responses = []
+            if header_text:
+                responses.append(await self.send_text_message(to_phone, header_text))
+            for idx, product in numbered:
+                responses.append(await self._send_product(to_phone, idx, product))
+            if footer_text:
+                responses.append(await self.send_text_message(to_phone, footer_text))
+            return responses
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(coro):
+            # Semaphore waiters are woken FIFO, so requests leave in creation order
+            async with semaphore:
+                return await coro
+
+        if delivery_order == "unordered":
+            sends = []
+            if header_text:
+                sends.append(self.send_text_message(to_phone, header_text))
+            sends.extend(
+                self._send_product(to_phone, idx, product)
+                for idx, product in numbered
+            )
+            if footer_text:
+                sends.append(self.send_text_message(to_phone, footer_text))
+            return list(await asyncio.gather(*(bounded(send) for send in sends)))
+
+        # "barrier": header must land before any product, footer after all of them
+        responses = []
         if header_text:
-            response = await self.send_text_message(to_phone, header_text)
-            responses.append(response)
-
-        # Send each product as image with caption
-        for idx, product in enumerate(products, 1):
-            caption = f"*{idx}. {product.get('name', 'Product')}*\n"
-            caption += f"Price: {product.get('price', 'Contact for price')}\n"
-            if product.get('description'):
-                caption += f"{product['description']}\n"
-            if product.get('sku'):
-                caption += f"SKU: {product['sku']}"
-
-            if product.get('image_url'):
-                response = await self.send_image_message(
-                    to_phone,
-                    product['image_url'],
-                    caption.strip()
-                )
-            else:
-                response = await self.send_text_message(to_phone, caption.strip())
+            responses.append(await self.send_text_message(to_phone, header_text))
 
-            responses.append(response)
+        product_responses = await asyncio.gather(*(
+            bounded(self._send_product(to_phone, idx, product))
+            for idx, product in numbered
+        ))
+        responses.extend(product_responses)
 
-        # Send footer message if provided
         if footer_text:
-            response = await self.send_text_message(to_phone, footer_text)
-            responses.append(response)
+            responses.append(await self.send_text_message(to_phone, footer_text))
 
         return responses
 
@@ -209,63 +371,228 @@ class WhatsAppCloudAPIClient:
 
         return await self._send_request(payload)
 
+    async def send_multi_product_message(
+        self,
+        to_phone: str,
+        catalog_id: str,
+        header_text: str,
+        body_text: str,
+        sections: List[Dict[str, Any]],
+        footer_text: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Send a multi-product message listing items from a Meta commerce catalog"""
+        payload = {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": self._format_phone_number(to_phone),
+            "type": "interactive",
+            "interactive": {
+                "type": "product_list",
+                "header": {
+                    "type": "text",
+                    "text": header_text
+                },
+                "body": {
+                    "text": body_text
+                },
+                "action": {
+                    "catalog_id": catalog_id,
+                    "sections": sections
+                }
+            }
+        }
+
+        if footer_text:
+            payload["interactive"]["footer"] = {"text": footer_text}
+
+        return await self._send_request(payload)
+
+    async def _acquire_send_slot(self, payload: Dict[str, Any]) -> bool:
+        """Wait for the phone-number and recipient-pair token buckets"""
+        if not get_settings().WHATSAPP_RATE_LIMIT_ENABLED:
+            return True
+        limiter = self.rate_limiter or get_rate_limiter()
+        return await limiter.acquire(
+            self.phone_number_id,
+            recipient=payload.get("to"),
+            tier=self.rate_limit_tier
+        )
+
     async def _send_request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """Send request to WhatsApp API with error handling"""
+        """
+        Send request to WhatsApp API with error handling.
+
+        Retryable and throttled failures are retried in-client with jittered
+        exponential backoff (honouring Retry-After); permanent failures return
+        immediately, and so do failures after the request may have been sent
+        (`delivery_unknown`): resending those could deliver the message twice.
+        Every failed result carries `error_category` and `retryable`.
+        """
+        settings = get_settings()
+        max_attempts = max(1, settings.WHATSAPP_SEND_MAX_ATTEMPTS)
+
+        for attempt in range(max_attempts):
+            result, retry_after = await self._post_message(payload)
+            result["attempts"] = attempt + 1
+
+            if result["success"] or not result["retryable"] or attempt + 1 >= max_attempts:
+                return result
+
+            delay = backoff_delay(
+                attempt,
+                settings.WHATSAPP_RETRY_BASE_DELAY,
+                settings.WHATSAPP_RETRY_MAX_DELAY,
+                retry_after
+            )
+            if delay > settings.WHATSAPP_RETRY_MAX_DELAY:
+                # Retry-After is longer than we are willing to hold a worker slot
+                return result
+
+            logger.warning(
+                "WhatsApp send %s (code %s), retrying in %.2fs",
+                result["error_category"], result.get("error_code"), delay
+            )
+            await asyncio.sleep(delay)
+
+        return result
+
+    @staticmethod
+    def _should_log_success() -> bool:
+        """Successful sends are logged at DEBUG, otherwise only a sample of them"""
+        if logger.isEnabledFor(logging.DEBUG):
+            return True
+        rate = get_settings().WHATSAPP_SUCCESS_LOG_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def _failure(
+        self,
+        status_code: Optional[int],
+        error_code: Optional[int],
+        error_message: Optional[str],
+        response_data: Optional[Dict[str, Any]],
+        category: Optional[str] = None
+    ) -> Dict[str, Any]:
+        category = category or classify_error(status_code, error_code)
+        return {
+            "success": False,
+            "error_code": error_code,
+            "error_message": error_message,
+            "error_category": category,
+            "error_reason": error_reason(error_code),
+            "retryable": category not in (PERMANENT, UNKNOWN),
+            "delivery_unknown": category == UNKNOWN,
+            "response": response_data
+        }
+
+    async def _post_message(self, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[float]]:
+        """
+        Single POST to the messages endpoint. Returns (result, retry_after_seconds).
+        Records latency, status/error code, in-flight and bytes-sent metrics.
+        """
+        message_type = payload.get("type", "unknown")
+        if not await self._acquire_send_slot(payload):
+            logger.warning("Local rate limit exceeded for phone number %s", self.phone_number_id)
+            observe_whatsapp_request(
+                self.metrics_tenant, message_type, "local_throttle", THROUGHPUT_LIMIT_ERROR_CODE
+            )
+            result = self._failure(
+                None,
+                THROUGHPUT_LIMIT_ERROR_CODE,
+                "Rate limit exceeded (throttled before sending)",
+                None
+            )
+            # Already waited for the limiter - leave further retries to the caller
+            result["retryable"] = False
+            return result, None
+
+        body = serialization.dumps(payload)
+        started = time.perf_counter()
+        in_flight = WHATSAPP_IN_FLIGHT.labels(self.metrics_tenant)
+        WHATSAPP_BYTES_SENT.labels(self.metrics_tenant, message_type).inc(len(body))
+
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+            client = get_http_client(self.phone_number_id)
+            with in_flight.track_inprogress():
                 response = await client.post(
                     self.messages_url,
                     headers=self._get_headers(),
-                    json=payload
+                    content=body
                 )
-
-                response_data = response.json()
-
-                if response.status_code == 200:
-                    logger.info(f"WhatsApp message sent successfully: {response_data}")
-                    return {
-                        "success": True,
-                        "message_id": response_data.get("messages", [{}])[0].get("id"),
-                        "response": response_data
-                    }
-                else:
-                    error = response_data.get("error", {})
-                    logger.error(f"WhatsApp API error: {error}")
-                    return {
-                        "success": False,
-                        "error_code": error.get("code"),
-                        "error_message": error.get("message"),
-                        "response": response_data
-                    }
-
-        except httpx.TimeoutException:
-            logger.error("WhatsApp API request timed out")
-            return {
-                "success": False,
-                "error_message": "Request timed out",
-                "response": None
-            }
+            duration = time.perf_counter() - started
+
+            try:
+                response_data = serialization.loads(response.content)
+            except ValueError:
+                response_data = {}
+
+            error = response_data.get("error", {}) if isinstance(response_data, dict) else {}
+            observe_whatsapp_request(
+                self.metrics_tenant, message_type, str(response.status_code), error.get("code"), duration
+            )
+
+            if response.status_code == 200:
+                if self._should_log_success():
+                    logger.info(
+                        "WhatsApp message sent successfully: %s", LogPayload(response_data),
+                        extra={"tenant_id": self.tenant_id}
+                    )
+                return {
+                    "success": True,
+                    "message_id": response_data.get("messages", [{}])[0].get("id"),
+                    "response": response_data
+                }, None
+
+            logger.error(
+                "WhatsApp API error: %s", LogPayload(error or response.status_code), extra={"tenant_id": self.tenant_id}
+            )
+            return (
+                self._failure(
+                    response.status_code,
+                    error.get("code"),
+                    error.get("message") or f"HTTP {response.status_code}",
+                    response_data
+                ),
+                parse_retry_after(response.headers.get("retry-after"))
+            )
+
+        except httpx.TimeoutException as e:
+            category = classify_transport_error(e)
+            logger.error("WhatsApp API request timed out (%s)", type(e).__name__)
+            observe_whatsapp_request(
+                self.metrics_tenant, message_type, "timeout", None, time.perf_counter() - started
+            )
+            return self._failure(None, None, f"Request timed out ({type(e).__name__})", None, category), None
+        except httpx.TransportError as e:
+            category = classify_transport_error(e)
+            logger.error("WhatsApp API request failed: %s", e)
+            observe_whatsapp_request(
+                self.metrics_tenant, message_type, "transport_error", None, time.perf_counter() - started
+            )
+            return self._failure(None, None, str(e), None, category), None
         except Exception as e:
-            logger.error(f"WhatsApp API request failed: {str(e)}")
-            return {
-                "success": False,
-                "error_message": str(e),
-                "response": None
-            }
+            logger.error("WhatsApp API request failed: %s", e)
+            observe_whatsapp_request(
+                self.metrics_tenant, message_type, "error", None, time.perf_counter() - started
+            )
+            result = self._failure(None, None, str(e), None)
+            result["retryable"] = False
+            result["error_category"] = PERMANENT
+            return result, None
 
     async def check_health(self) -> Dict[str, Any]:
         """Check if credentials are valid"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"{self.BASE_URL}/{self.phone_number_id}",
-                    headers=self._get_headers()
-                )
-
-                if response.status_code == 200:
-                    return {"success": True, "data": response.json()}
-                else:
-                    return {"success": False, "error": response.json()}
+            client = get_http_client(self.phone_number_id)
+            response = await client.get(
+                f"{self.base_url}/{self.phone_number_id}",
+                headers=self._get_headers(),
+                timeout=10.0
+            )
+
+            if response.status_code == 200:
+                return {"success": True, "data": response.json()}
+            else:
+                return {"success": False, "error": response.json()}
 
         except Exception as e:
             return {"success": False, "error": str(e)}
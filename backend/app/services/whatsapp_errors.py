@@ -0,0 +1,131 @@
+# NEW FILE - Classification of WhatsApp Cloud API (Graph API) errors and retry backoff
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+# Error categories
+RETRYABLE = "retryable"  # transient Meta/network failure - retry with backoff
+THROTTLED = "throttled"  # rate limited - retry, honouring Retry-After
+PERMANENT = "permanent"  # will never succeed as-is - do not retry
+UNKNOWN = "unknown"      # the request may have reached Meta - delivery unknown, do not resend
+
+# Permanent error reasons (what has to change before a resend can work)
+REASON_AUTH = "auth"            # token expired/revoked, missing permission, account locked
+REASON_RECIPIENT = "recipient"  # invalid or unreachable number, outside the 24h window
+REASON_TEMPLATE = "template"    # template missing, paused or parameters mismatch
+REASON_REQUEST = "request"      # malformed payload
+
+THROTTLED_CODES = {
+    4,       # Too many API calls (app level)
+    80007,   # WhatsApp Business Account rate limit
+    130429,  # Cloud API throughput reached for the phone number
+    131048,  # Spam rate limit
+    131056,  # Business -> user pair rate limit
+}
+
+RETRYABLE_CODES = {
+    1,       # Unknown API error
+    2,       # Service temporarily unavailable
+    131000,  # Something went wrong
+    131016,  # Service unavailable
+    133004,  # Server temporarily unavailable
+}
+
+PERMANENT_CODES = {
+    0: REASON_AUTH,          # AuthException
+    3: REASON_AUTH,          # Capability / permission missing
+    10: REASON_AUTH,         # Permission denied
+    190: REASON_AUTH,        # Access token expired or invalid
+    200: REASON_AUTH,        # Permission error
+    368: REASON_AUTH,        # Temporarily blocked for policy violations
+    131031: REASON_AUTH,     # Business account locked
+    131045: REASON_AUTH,     # Phone number not registered / certificate issue
+    133010: REASON_AUTH,     # Business phone number not registered
+    131021: REASON_RECIPIENT,  # Recipient cannot be the sender
+    131026: REASON_RECIPIENT,  # Message undeliverable (invalid / non-WhatsApp number)
+    131047: REASON_RECIPIENT,  # Re-engagement required (outside 24h window)
+    131051: REASON_REQUEST,    # Unsupported message type
+    131008: REASON_REQUEST,    # Required parameter missing
+    131009: REASON_REQUEST,    # Parameter value invalid
+    131053: REASON_REQUEST,    # Media upload error (unusable media ID or file)
+    100: REASON_REQUEST,       # Invalid parameter
+    132000: REASON_TEMPLATE,   # Template parameter count mismatch
+    132001: REASON_TEMPLATE,   # Template does not exist
+    132005: REASON_TEMPLATE,   # Template hydrated text too long
+    132007: REASON_TEMPLATE,   # Template format character policy violated
+    132012: REASON_TEMPLATE,   # Template parameter format mismatch
+    132015: REASON_TEMPLATE,   # Template paused
+    132016: REASON_TEMPLATE,   # Template disabled
+}
+
+
+def classify_error(status_code: Optional[int], error_code: Optional[int]) -> str:
+    """
+    Map a failed send to RETRYABLE, THROTTLED or PERMANENT.
+    status_code is None when no response came back (see classify_transport_error).
+    """
+    if error_code in THROTTLED_CODES:
+        return THROTTLED
+    if error_code in RETRYABLE_CODES:
+        return RETRYABLE
+    if error_code in PERMANENT_CODES:
+        return PERMANENT
+
+    if status_code is None or status_code >= 500:
+        return RETRYABLE
+    if status_code == 429:
+        return THROTTLED
+    return PERMANENT
+
+
+def classify_transport_error(error: Exception) -> str:
+    """
+    RETRYABLE if the request never left (no connection, no pooled connection
+    free in time), UNKNOWN once it may have been sent: after a read timeout or
+    a dropped connection Meta may already have accepted the message.
+    """
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return RETRYABLE
+    return UNKNOWN
+
+
+def error_reason(error_code: Optional[int]) -> Optional[str]:
+    """Why a permanent error will not go away on its own (None if unknown)"""
+    return PERMANENT_CODES.get(error_code)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float,
+    max_delay: float,
+    retry_after: Optional[float] = None
+) -> float:
+    """
+    Full-jitter exponential backoff for retry number `attempt` (0-based).
+    A server-provided Retry-After is a floor, never shortened by jitter.
+    """
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
@@ -1,28 +1,63 @@
 # COMPLETE REWRITE - Proper Celery tasks with async support
-import asyncio
 import logging
 from datetime import datetime
 from celery import shared_task
+from billiard import current_process
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown, worker_shutdown
 from sqlalchemy.orm import Session
 
+from app.core.async_runtime import get_async_runtime, on_runtime_shutdown, run_async
 from app.core.celery_app import celery_app
+from app.core.config import get_settings
+from app.core.metrics import start_worker_metrics_server
 from app.db.session import SessionLocal
+from app.services import fair_queue, message_retry
 from app.services.automation_service import AutomationService
+from app.services.http_pool import close_all_http_clients, close_http_clients
 
 logger = logging.getLogger(__name__)
 
+class RetryableAutomationError(Exception):
+    """Raised when a post-call automation failed in a way a retry can fix"""
+
+
+# Pooled WhatsApp connections live on the worker's async runtime loop
+on_runtime_shutdown(close_http_clients)
+
 
 def get_db_session() -> Session:
     """Create a new database session for the task"""
     return SessionLocal()
 
 
+@worker_process_init.connect
+def start_metrics_server(**kwargs):
+    """Expose this pool process's WhatsApp metrics for Prometheus to scrape"""
+    start_worker_metrics_server(getattr(current_process(), "index", 0) or 0)
+
+
+@worker_process_init.connect
+def start_async_runtime(**kwargs):
+    """One event loop per pool process, shared by every task it runs"""
+    get_async_runtime().start()
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_async_runtime(**kwargs):
+    """Close pooled WhatsApp connections and stop the worker loop on shutdown"""
+    get_async_runtime().stop()
+    close_all_http_clients()
+
+
 @celery_app.task(
     bind=True,
     max_retries=3,
     default_retry_delay=60,
     autoretry_for=(Exception,),
-    retry_backoff=True
+    retry_backoff=True,
+    # Retries wait in the retry lane, not in front of new live calls
+    retry_kwargs={"queue": get_settings().CELERY_RETRY_QUEUE}
 )
 def process_call_ended_automation(
     self,
@@ -32,55 +67,63 @@ def process_call_ended_automation(
 ):
     """
     Celery task to process post-call automation.
-    Sends thank you message and catalog via WhatsApp.
+    Sends thank you message and catalog via WhatsApp. A retry resumes at the
+    first step not sent yet (see app.services.automation_journal).
     """
-    logger.info(f"Processing automation for tenant {tenant_id}, call {call_id}, phone {caller_phone}")
+    logger.info("Processing automation for tenant %s, call %s, phone %s", tenant_id, call_id, caller_phone)
 
     db = get_db_session()
 
     try:
         service = AutomationService(db=db, tenant_id=tenant_id)
 
+        # Fail fast while the tenant's credentials are known to be broken
+        if not service.circuit_allows_send():
+            logger.warning("WhatsApp circuit open for tenant %s, skipping call %s", tenant_id, call_id)
+            return {"success": False, "error": "WhatsApp circuit open", "circuit_open": True}
+
         # Run the async function in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        try:
-            result = loop.run_until_complete(
-                service.send_post_call_messages(
-                    caller_phone=caller_phone,
-                    call_id=call_id
-                )
+        result = run_async(
+            service.send_post_call_messages(
+                caller_phone=caller_phone,
+                call_id=call_id
             )
-        finally:
-            loop.close()
+        )
 
         if result.get("success"):
             logger.info(
-                f"Automation completed for call {call_id}: "
-                f"{result.get('messages_sent')} messages sent"
+                "Automation completed for call %s: %s messages sent",
+                call_id, result.get("messages_sent")
             )
         else:
-            logger.error(f"Automation failed for call {call_id}: {result.get('errors')}")
+            logger.error("Automation failed for call %s: %s", call_id, result.get("errors"))
 
-            # Retry if there were errors
-            if result.get("errors") and self.request.retries < self.max_retries:
-                raise Exception(f"Automation errors: {result.get('errors')}")
+            # Retry only failures that can succeed later - permanent errors (invalid
+            # number, missing template, expired token) would just burn quota
+            if result.get("retryable") and self.request.retries < self.max_retries:
+                raise RetryableAutomationError(f"Automation errors: {result.get('errors')}")
 
         return result
 
     except Exception as e:
-        logger.error(f"Task failed for call {call_id}: {str(e)}")
+        logger.error("Task failed for call %s: %s", call_id, e)
         raise
 
     finally:
         db.close()
 
 
+@task_postrun.connect
+def release_live_slot(task_id=None, task=None, args=None, **kwargs):
+    """Give the tenant's fair-share slot back once a live attempt is over (also when it is retried)"""
+    if task is not None and task.name == process_call_ended_automation.name and args:
+        fair_queue.release_fair_share_slot(args[0], task_id)
+
+
 @celery_app.task
 def send_test_whatsapp_message(tenant_id: int, phone_number: str, message: str):
     """Send a test WhatsApp message to verify configuration"""
-    logger.info(f"Sending test message for tenant {tenant_id} to {phone_number}")
+    logger.info("Sending test message for tenant %s to %s", tenant_id, phone_number)
 
     db = get_db_session()
 
@@ -90,18 +133,12 @@ def send_test_whatsapp_message(tenant_id: int, phone_number: str, message: str):
         if not service.whatsapp_client:
             return {"success": False, "error": "WhatsApp not configured"}
 
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        try:
-            result = loop.run_until_complete(
-                service.whatsapp_client.send_text_message(
-                    to_phone=phone_number,
-                    message=message
-                )
+        result = run_async(
+            service.whatsapp_client.send_text_message(
+                to_phone=phone_number,
+                message=message
             )
-        finally:
-            loop.close()
+        )
 
         return result
 
@@ -110,36 +147,15 @@ def send_test_whatsapp_message(tenant_id: int, phone_number: str, message: str):
 
 
 @celery_app.task
-def retry_failed_messages(tenant_id: int | None = None):
-    """Retry sending failed messages"""
-    from app.models.message_log import MessageLog
-
-    db = get_db_session()
-
-    try:
-        query = db.query(MessageLog).filter(
-            MessageLog.status == "failed",
-            MessageLog.retry_count < MessageLog.max_retries
-        )
-
-        if tenant_id is not None:
-            query = query.filter(MessageLog.tenant_id == tenant_id)
-
-        failed_messages = query.all()
-
-        logger.info(f"Found {len(failed_messages)} failed messages to retry")
-
-        for msg in failed_messages:
-            # Queue retry
-            process_call_ended_automation.apply_async(
-                args=[msg.tenant_id, msg.call_id, msg.recipient_phone],
-                countdown=10
-            )
-
-            msg.retry_count = int(msg.retry_count) + 1
-            db.commit()
-
-        return {"retried": len(failed_messages)}
-
-    finally:
-        db.close()
+def retry_failed_messages(tenant_id: int | None = None, resend_unknown: bool = False):
+    """
+    Resend only the failed messages (from their stored payload), not the whole
+    automation. Several of these can run at once without double-sending.
+    With resend_unknown, messages whose delivery is unknown are resent too.
+    """
+    result = message_retry.retry_failed_messages(tenant_id=tenant_id, resend_unknown=resend_unknown)
+    logger.info(
+        "Message retries: %s retried, %s sent, %s failed",
+        result["retried"], result["sent"], result["failed"]
+    )
+    return result
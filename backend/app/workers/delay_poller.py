@@ -0,0 +1,124 @@
+# NEW FILE - Moves due delayed sends from the delay scheduler onto the Celery work queue
+"""
+Polls the delay scheduler (app.services.delay_scheduler) and submits every
+post-call send that is due, in batches of DELAY_SCHEDULER_BATCH_SIZE: to the
+tenant's fair queue (app.services.fair_queue), or as
+`process_call_ended_automation` tasks over one broker connection without it.
+
+    python -m app.workers.delay_poller
+
+Several pollers can run: each batch is claimed atomically by one of them.
+A send is acknowledged only after it was queued; if the poller dies in
+between, the send is claimed again after DELAY_SCHEDULER_CLAIM_TIMEOUT_SECONDS.
+If a later call from the same number replaced it meanwhile, its call is
+marked superseded instead.
+"""
+import logging
+import signal
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.celery_app import celery_app
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.core.metrics import (
+    DELAY_SCHEDULER_LAG_SECONDS,
+    DELAY_SCHEDULER_MOVED,
+    DELAY_SCHEDULER_PENDING,
+    start_worker_metrics_server,
+)
+from app.db.session import SessionLocal
+from app.services.automation_journal import AUTOMATION_SUPERSEDED, set_automation_status
+from app.services.delay_scheduler import DelayScheduler, get_delay_scheduler
+from app.services.fair_queue import submit_automation
+
+logger = logging.getLogger(__name__)
+
+
+class DelayPoller:
+    def __init__(
+        self,
+        scheduler: Optional[DelayScheduler] = None,
+        session_factory: Callable[[], Session] = SessionLocal
+    ):
+        settings = get_settings()
+        self.scheduler = scheduler or get_delay_scheduler()
+        self.session_factory = session_factory
+        if self.scheduler is None:
+            raise RuntimeError("Delay scheduler needs REDIS_URL and DELAY_SCHEDULER_ENABLED=true")
+        self.batch_size = settings.DELAY_SCHEDULER_BATCH_SIZE
+        self.interval = settings.DELAY_SCHEDULER_POLL_INTERVAL_MS / 1000.0
+        self._stop = threading.Event()
+
+    def stop(self, *args) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        logger.info("Delay poller started, batches of %s every %ss", self.batch_size, self.interval)
+        while not self._stop.is_set():
+            try:
+                moved = self.poll_once()
+            except Exception as e:
+                logger.warning("Delay poller: scheduler error, retrying: %s", e)
+                moved = 0
+            # A full batch means more are due: poll again right away
+            if moved < self.batch_size:
+                self._stop.wait(self.interval)
+        logger.info("Delay poller stopped")
+
+    def poll_once(self) -> int:
+        """Queue one batch of due sends; returns how many were claimed"""
+        sends, superseded = self.scheduler.claim_due(self.batch_size)
+        if superseded:
+            self.mark_superseded(superseded)
+        if sends:
+            DELAY_SCHEDULER_LAG_SECONDS.set(max(0.0, time.time() - min(send.due_at for send in sends)))
+            queued = []
+            with celery_app.producer_or_acquire() as producer:
+                for send in sends:
+                    try:
+                        submit_automation(send.tenant_id, send.call_id, send.caller_phone, producer=producer)
+                    except Exception as e:
+                        # Not acknowledged: claimed again after the claim timeout
+                        logger.error("Delay poller could not queue call %s: %s", send.call_id, e)
+                        DELAY_SCHEDULER_MOVED.labels("failed").inc()
+                        continue
+                    queued.append(send)
+            self.scheduler.ack(queued)
+            DELAY_SCHEDULER_MOVED.labels("queued").inc(len(queued))
+        else:
+            DELAY_SCHEDULER_LAG_SECONDS.set(0)
+        DELAY_SCHEDULER_PENDING.set(self.scheduler.pending())
+        return len(sends)
+
+    def mark_superseded(self, call_ids: List[int]) -> None:
+        """Calls whose lost send a later call's send replaced: they will not be sent"""
+        db = self.session_factory()
+        try:
+            for call_id in call_ids:
+                set_automation_status(db, call_id, AUTOMATION_SUPERSEDED)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error("Delay poller could not mark calls %s superseded: %s", call_ids, e)
+            return
+        finally:
+            db.close()
+        DELAY_SCHEDULER_MOVED.labels("superseded").inc(len(call_ids))
+
+
+def main() -> None:
+    configure_logging()
+    start_worker_metrics_server(0, base_port=get_settings().DELAY_POLLER_METRICS_PORT)
+
+    poller = DelayPoller()
+    signal.signal(signal.SIGTERM, poller.stop)
+    signal.signal(signal.SIGINT, poller.stop)
+    poller.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# NEW FILE - Moves live automations from the per-tenant fair queues onto the Celery live lane
+"""
+Runs the deficit round-robin dispatcher (app.services.fair_queue) in a loop:
+
+    python -m app.workers.fair_dispatcher
+
+Only one dispatcher dispatches at a time (a Redis lease, renewed every loop);
+a second one stands by and takes over when the first stops renewing.
+FAIR_QUEUE_CAPACITY should match the concurrency of the live-lane workers, so
+that tasks wait in the fair queues - where the next one is picked fairly -
+rather than in the broker's FIFO.
+"""
+import logging
+import signal
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+
+from app.core.celery_app import celery_app
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.core.metrics import FAIR_QUEUE_DEPTH, FAIR_QUEUE_IN_FLIGHT, start_worker_metrics_server, tenant_label
+from app.services.fair_queue import FairDispatcher, get_fair_queue, publish_live
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 10.0
+GAUGE_INTERVAL_SECONDS = 5.0
+
+
+class FairDispatcherWorker:
+    def __init__(self, dispatcher: Optional[FairDispatcher] = None):
+        settings = get_settings()
+        if dispatcher is None:
+            fair_queue = get_fair_queue()
+            if fair_queue is None:
+                raise RuntimeError("Fair queue needs REDIS_URL and FAIR_QUEUE_ENABLED=true")
+            dispatcher = FairDispatcher(fair_queue.backend)
+        self.dispatcher = dispatcher
+        self.interval = settings.FAIR_QUEUE_POLL_INTERVAL_MS / 1000.0
+        self.owner = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._gauges_at = 0.0
+        self._gauge_tenants = set()
+
+    def stop(self, *args) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        logger.info(
+            "Fair dispatcher started: capacity %s, at most %s per tenant",
+            self.dispatcher.capacity, self.dispatcher.tenant_cap
+        )
+        while not self._stop.is_set():
+            try:
+                if not self.dispatcher.backend.lead(self.owner, LEASE_SECONDS):
+                    # Another dispatcher is active
+                    self._stop.wait(LEASE_SECONDS / 2)
+                    continue
+                dispatched = self.dispatch_once()
+                self.refresh_gauges()
+            except Exception as e:
+                logger.warning("Fair dispatcher: queue or broker error, retrying: %s", e)
+                dispatched = 0
+            # Something was dispatched: there may be more room right away
+            if not dispatched:
+                self._stop.wait(self.interval)
+        logger.info("Fair dispatcher stopped")
+
+    def dispatch_once(self) -> int:
+        """One round over the active tenants; returns how many tasks were published"""
+        with celery_app.producer_or_acquire() as producer:
+            return self.dispatcher.dispatch_round(lambda item, task_id: publish_live(item, task_id, producer))
+
+    def refresh_gauges(self) -> None:
+        now = time.monotonic()
+        if now - self._gauges_at < GAUGE_INTERVAL_SECONDS:
+            return
+        self._gauges_at = now
+        backend = self.dispatcher.backend
+        in_flight = backend.in_flight(time.time())
+        depths = backend.depths(backend.active_tenants())
+        tenants = set(depths) | set(in_flight)
+        # Zero the tenants that went idle since the last refresh
+        for tenant_id in self._gauge_tenants | tenants:
+            FAIR_QUEUE_DEPTH.labels(tenant_label(tenant_id)).set(depths.get(tenant_id, 0))
+            FAIR_QUEUE_IN_FLIGHT.labels(tenant_label(tenant_id)).set(in_flight.get(tenant_id, 0))
+        self._gauge_tenants = tenants
+
+
+def main() -> None:
+    configure_logging()
+    start_worker_metrics_server(0, base_port=get_settings().FAIR_DISPATCHER_METRICS_PORT)
+
+    worker = FairDispatcherWorker()
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
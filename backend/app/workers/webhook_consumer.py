@@ -0,0 +1,301 @@
+# NEW FILE - Consumer that turns ingested call-ended webhooks into Call rows and automation tasks
+"""
+Reads the webhook ingest stream (WEBHOOK_INGEST_MODE=stream) as a member of a
+Redis consumer group, persists WebhookCall/Call rows and queues the post-call
+automation, then acknowledges the entry.
+
+    python -m app.workers.webhook_consumer [--name ingest-1]
+
+Run as many as needed; entries are split across the group. Entries a crashed
+consumer left unacknowledged are claimed by another after
+WEBHOOK_CONSUMER_CLAIM_IDLE_MS, and entries that keep failing are moved to the
+"<stream>:dead" stream after WEBHOOK_CONSUMER_MAX_DELIVERIES attempts.
+Spool files written while Redis was down are forwarded into the stream by
+whichever consumer can see WEBHOOK_INGEST_SPOOL_PATH.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.core.metrics import (
+    WEBHOOK_INGEST_BACKLOG,
+    WEBHOOK_INGEST_LAG_SECONDS,
+    WEBHOOK_INGEST_PENDING,
+    WEBHOOK_INGEST_PROCESSED,
+    start_worker_metrics_server,
+)
+from app.db.session import SessionLocal
+from app.services.call_events import extract_call_event, parse_webhook_body, record_call_event
+from app.services.call_writer import submit_call_event
+from app.schemas.webhook import CallEndedEvent
+from app.services.tenant_routing import TenantRoute, get_tenant_routes, load_tenant_route
+from app.services.webhook_ingest import IngestEntry, SpoolFile
+
+logger = logging.getLogger(__name__)
+
+LAG_REFRESH_SECONDS = 5.0
+SPOOL_CHECK_SECONDS = 10.0
+# Let API processes finish writes to a spool file that was just moved aside
+SPOOL_GRACE_SECONDS = 1.0
+
+
+class PermanentIngestError(Exception):
+    """The entry can never be processed (unparseable body); dead-letter it right away"""
+
+
+def _entry_time(entry_id: str) -> float:
+    """Stream IDs start with the append time in milliseconds"""
+    return int(entry_id.split("-", 1)[0]) / 1000.0
+
+
+class WebhookStreamConsumer:
+    def __init__(
+        self,
+        name: str,
+        redis_client: Optional[redis.Redis] = None,
+        stream: Optional[str] = None,
+        group: Optional[str] = None,
+        spool: Optional[SpoolFile] = None
+    ):
+        settings = get_settings()
+        self.name = name
+        self.stream = stream or settings.WEBHOOK_INGEST_STREAM
+        self.group = group or settings.WEBHOOK_INGEST_GROUP
+        self.dead_letter_stream = f"{self.stream}:dead"
+        self.batch_size = settings.WEBHOOK_CONSUMER_BATCH_SIZE
+        self.block_ms = settings.WEBHOOK_CONSUMER_BLOCK_MS
+        self.claim_idle_ms = settings.WEBHOOK_CONSUMER_CLAIM_IDLE_MS
+        self.max_deliveries = settings.WEBHOOK_CONSUMER_MAX_DELIVERIES
+        self.spool = spool or SpoolFile(settings.WEBHOOK_INGEST_SPOOL_PATH)
+        # Blocking reads need a socket timeout longer than the block time
+        self.redis = redis_client or redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=self.block_ms / 1000.0 + 5.0,
+            socket_connect_timeout=5.0,
+        )
+        self._stop = threading.Event()
+        self._next_lag_refresh = 0.0
+        self._next_spool_check = 0.0
+
+    def stop(self, *args) -> None:
+        self._stop.set()
+
+    def ensure_group(self) -> None:
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def run(self) -> None:
+        logger.info("Webhook consumer %s reading %s as group %s", self.name, self.stream, self.group)
+        recovered = False
+        while not self._stop.is_set():
+            try:
+                if not recovered:
+                    self.ensure_group()
+                    # Entries this consumer name read but never acked before a restart
+                    self._process(self._read("0"))
+                    recovered = True
+                self._housekeeping()
+                self._process(self._claim_stale())
+                self._process(self._read(">"))
+            except redis.RedisError as e:
+                logger.warning("Webhook consumer %s: Redis error, retrying: %s", self.name, e)
+                self._stop.wait(2.0)
+        logger.info("Webhook consumer %s stopped", self.name)
+
+    def _read(self, start_id: str) -> List[Tuple[str, Dict[bytes, bytes]]]:
+        response = self.redis.xreadgroup(
+            self.group,
+            self.name,
+            {self.stream: start_id},
+            count=self.batch_size,
+            block=None if start_id == "0" else self.block_ms,
+        )
+        if not response:
+            return []
+        return [(self._id(entry_id), fields) for entry_id, fields in response[0][1] if fields]
+
+    def _claim_stale(self) -> List[Tuple[str, Dict[bytes, bytes]]]:
+        """Take over entries other (crashed) consumers left unacknowledged"""
+        result = self.redis.xautoclaim(
+            self.stream, self.group, self.name,
+            min_idle_time=self.claim_idle_ms,
+            start_id="0-0",
+            count=self.batch_size,
+        )
+        claimed = [(self._id(entry_id), fields) for entry_id, fields in result[1] if fields]
+        for entry_id, _ in claimed:
+            logger.warning("Webhook consumer %s claimed stale entry %s", self.name, entry_id)
+        return claimed
+
+    @staticmethod
+    def _id(entry_id: bytes | str) -> str:
+        return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+    def _deliveries(self, entry_id: str) -> int:
+        pending = self.redis.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+        return pending[0]["times_delivered"] if pending else 0
+
+    def _process(self, entries: List[Tuple[str, Dict[bytes, bytes]]]) -> None:
+        if not entries:
+            return
+
+        write_behind = get_settings().CALL_WRITE_BEHIND_ENABLED
+        submitted = []
+        db = SessionLocal()
+        try:
+            for entry_id, fields in entries:
+                try:
+                    entry = IngestEntry.from_fields(fields)
+                    if write_behind:
+                        # The whole read batch goes out as one write-behind batch
+                        submitted.append((entry_id, fields, submit_call_event(*self.prepare_entry(db, entry))))
+                        continue
+                    self.process_entry(db, entry)
+                except (PermanentIngestError, KeyError, ValueError) as e:
+                    db.rollback()
+                    self._dead_letter(entry_id, fields, str(e))
+                    continue
+                except Exception as e:
+                    db.rollback()
+                    self._failed(entry_id, fields, e)
+                    continue
+                self._ack(entry_id)
+        finally:
+            db.close()
+
+        for entry_id, fields, future in submitted:
+            try:
+                future.result()
+            except Exception as e:
+                self._failed(entry_id, fields, e)
+                continue
+            self._ack(entry_id)
+
+    def _ack(self, entry_id: str) -> None:
+        self.redis.xack(self.stream, self.group, entry_id)
+        WEBHOOK_INGEST_PROCESSED.labels("processed").inc()
+
+    def _failed(self, entry_id: str, fields: Dict[bytes, bytes], error: Exception) -> None:
+        logger.error("Webhook entry %s failed, will be retried: %s", entry_id, error)
+        WEBHOOK_INGEST_PROCESSED.labels("failed").inc()
+        if self._deliveries(entry_id) >= self.max_deliveries:
+            self._dead_letter(entry_id, fields, str(error))
+
+    def prepare_entry(self, db, entry: IngestEntry) -> Tuple[TenantRoute, CallEndedEvent, datetime]:
+        """Decode one delivery into its tenant route, normalized event and receive time"""
+        try:
+            payload = parse_webhook_body(entry.body, entry.content_type)
+        except ValueError as e:
+            raise PermanentIngestError(f"Invalid webhook payload: {str(e)}")
+
+        route = get_tenant_routes().get(entry.tenant_slug, lambda: load_tenant_route(db, entry.tenant_slug))
+        if route is None or route.tenant_id != entry.tenant_id:
+            raise PermanentIngestError(f"Tenant {entry.tenant_slug} no longer active")
+
+        event = extract_call_event(payload, headers=entry.headers)
+        return route, event, datetime.utcfromtimestamp(entry.received_at)
+
+    def process_entry(self, db, entry: IngestEntry) -> Optional[int]:
+        """Normalize and persist one delivery; returns the Call id"""
+        result = record_call_event(db, *self.prepare_entry(db, entry))
+        return result.call_id
+
+    def _dead_letter(self, entry_id: str, fields: Dict[bytes, bytes], error: str) -> None:
+        logger.error("Webhook entry %s moved to %s: %s", entry_id, self.dead_letter_stream, error)
+        pipe = self.redis.pipeline()
+        pipe.xadd(self.dead_letter_stream, {**fields, b"source_id": entry_id, b"error": error[:500]})
+        pipe.xack(self.stream, self.group, entry_id)
+        pipe.execute()
+        WEBHOOK_INGEST_PROCESSED.labels("dead_lettered").inc()
+
+    def _housekeeping(self) -> None:
+        now = time.monotonic()
+        if now >= self._next_spool_check:
+            self._next_spool_check = now + SPOOL_CHECK_SECONDS
+            self.drain_spool()
+        if now >= self._next_lag_refresh:
+            self._next_lag_refresh = now + LAG_REFRESH_SECONDS
+            self.refresh_lag()
+
+    def drain_spool(self) -> int:
+        """Forward entries spooled while Redis was down into the stream"""
+        claimed = self.spool.claim()
+        if claimed is None:
+            return 0
+
+        self._stop.wait(SPOOL_GRACE_SECONDS)
+        entries = list(SpoolFile.read(claimed))
+        forwarded = 0
+        try:
+            for entry in entries:
+                self.redis.xadd(self.stream, entry.to_fields())
+                forwarded += 1
+        finally:
+            # Anything not forwarded goes back to the live spool for the next attempt
+            for entry in entries[forwarded:]:
+                self.spool.append(entry)
+            os.remove(claimed)
+            logger.info("Forwarded %s/%s spooled webhooks into %s", forwarded, len(entries), self.stream)
+        return forwarded
+
+    def refresh_lag(self) -> Dict[str, Any]:
+        """Update the lag gauges: oldest unacknowledged entry age, pending and undelivered counts"""
+        group = next(
+            (g for g in self.redis.xinfo_groups(self.stream) if self._id(g["name"]) == self.group),
+            None
+        )
+        if group is None:
+            return {}
+
+        summary = self.redis.xpending(self.stream, self.group)
+        pending = summary["pending"]
+        oldest: Optional[float] = _entry_time(self._id(summary["min"])) if pending else None
+
+        last_delivered = self._id(group["last-delivered-id"])
+        undelivered = self.redis.xrange(self.stream, min=f"({last_delivered}", count=1)
+        if undelivered:
+            first = _entry_time(self._id(undelivered[0][0]))
+            oldest = first if oldest is None else min(oldest, first)
+
+        backlog = group.get("lag")
+        if backlog is None:
+            backlog = len(undelivered)
+        lag = max(0.0, time.time() - oldest) if oldest is not None else 0.0
+
+        WEBHOOK_INGEST_LAG_SECONDS.set(lag)
+        WEBHOOK_INGEST_PENDING.set(pending)
+        WEBHOOK_INGEST_BACKLOG.set(backlog or 0)
+        return {"lag_seconds": lag, "pending": pending, "backlog": backlog or 0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Call-ended webhook ingest consumer")
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}", help="consumer name in the group")
+    parser.add_argument("--metrics-port", type=int, default=None, help="default WEBHOOK_CONSUMER_METRICS_PORT")
+    args = parser.parse_args()
+
+    configure_logging()
+    settings = get_settings()
+    start_worker_metrics_server(0, base_port=args.metrics_port or settings.WEBHOOK_CONSUMER_METRICS_PORT)
+
+    consumer = WebhookStreamConsumer(args.name)
+    signal.signal(signal.SIGTERM, consumer.stop)
+    signal.signal(signal.SIGINT, consumer.stop)
+    consumer.run()
+
+
+if __name__ == "__main__":
+    main()
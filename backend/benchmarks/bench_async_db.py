@@ -0,0 +1,191 @@
+# NEW FILE - Benchmark: concurrent request throughput, sync Session in async handlers vs AsyncSession
+"""
+Throughput of GET /tenant-settings/ under concurrent requests:
+
+  sync-session   the handler as it was: `async def` + the sync SessionLocal,
+                 so every query blocks the event loop and requests serialize
+  async-session  the ported handler (AsyncSession dependency)
+
+Both run against the same temporary SQLite file with a simulated database
+round-trip of --latency-ms per statement (slept inside the driver call: the
+calling thread for sqlite3, aiosqlite's connection thread for the async engine).
+
+    cd backend
+    python -m benchmarks.bench_async_db [--requests 2000] [--concurrency 50] [--latency-ms 2]
+
+Needs aiosqlite (requirements.txt).
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Optional, cast
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import jwt
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import get_settings
+
+# Circuit breaker state from local memory, not Redis
+get_settings().REDIS_URL = ""
+get_settings().LOG_LEVEL = "WARNING"
+
+import app.db.base  # noqa: E402,F401 - register all models
+from app.api.deps import bearer_scheme, get_async_db_dep  # noqa: E402
+from app.api.v1.endpoints.tenant_settings import _public_settings  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.db.base_class import Base  # noqa: E402
+from app.models.tenant import Tenant  # noqa: E402
+from app.models.tenant_settings import TenantSettings  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.schemas.tenant_settings import TenantSettingsPublic  # noqa: E402
+
+LATENCY_SECONDS = 0.0
+
+
+class SlowCursor(sqlite3.Cursor):
+    """Adds a fixed round-trip to every statement, like a database over the network"""
+
+    def execute(self, *args, **kwargs):
+        time.sleep(LATENCY_SECONDS)
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        time.sleep(LATENCY_SECONDS)
+        return super().executemany(*args, **kwargs)
+
+
+class SlowConnection(sqlite3.Connection):
+    def cursor(self, factory=SlowCursor):
+        return super().cursor(factory)
+
+
+def sync_session_app(SessionFactory) -> FastAPI:
+    """GET /tenant-settings/ as it was before the port"""
+    app = FastAPI()
+
+    def get_db():
+        db = SessionFactory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def get_current_user(
+        db: Session = Depends(get_db),
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    ) -> User:
+        settings = get_settings()
+        payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        user = db.query(User).filter(User.id == int(payload["sub"])).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    @app.get("/api/v1/tenant-settings/", response_model=TenantSettingsPublic)
+    async def get_tenant_settings(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+        settings = db.query(TenantSettings).filter(
+            TenantSettings.tenant_id == cast(int, current_user.tenant_id)
+        ).first()
+        return _public_settings(settings)
+
+    return app
+
+
+def async_session_app(AsyncSessionFactory) -> FastAPI:
+    """The real application, with the AsyncSession dependency pointed at the benchmark database"""
+    from app.main import app
+
+    async def get_db():
+        async with AsyncSessionFactory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db_dep] = get_db
+    return app
+
+
+async def drive(app: FastAPI, token: str, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one() -> None:
+            async with semaphore:
+                response = await client.get("/api/v1/tenant-settings/", headers=headers)
+                response.raise_for_status()
+
+        await one()  # warm up
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return time.perf_counter() - start
+
+
+def report(name: str, requests: int, elapsed: float) -> float:
+    rate = requests / elapsed
+    print(f"{name:<16} {requests:>6} requests  {elapsed:8.2f}s  {rate:9.0f} req/s")
+    return rate
+
+
+def main() -> None:
+    global LATENCY_SECONDS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    LATENCY_SECONDS = args.latency_ms / 1000.0
+
+    path = tempfile.mktemp(suffix=".db", prefix="bench-async-db-")
+    connect_args = {"check_same_thread": False, "factory": SlowConnection, "timeout": 60}
+    engine = create_engine(f"sqlite:///{path}", connect_args=connect_args, pool_size=args.concurrency)
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}",
+        connect_args=connect_args,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=args.concurrency,
+    )
+    Base.metadata.create_all(engine)
+
+    db = sessionmaker(bind=engine)()
+    tenant = Tenant(name="Async DB benchmark", slug="bench-async-db")
+    db.add(tenant)
+    db.commit()
+    user = User(email="bench@example.com", hashed_password="x", tenant_id=tenant.id)
+    db.add_all([user, TenantSettings(tenant_id=tenant.id)])
+    db.commit()
+    token = create_access_token(user.id)
+    db.close()
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {args.latency_ms}ms per statement")
+    before = report(
+        "sync-session", args.requests,
+        asyncio.run(drive(sync_session_app(sessionmaker(bind=engine)), token, args.requests, args.concurrency))
+    )
+    async def run_async() -> float:
+        try:
+            return await drive(
+                async_session_app(async_sessionmaker(async_engine, expire_on_commit=False)),
+                token, args.requests, args.concurrency
+            )
+        finally:
+            # aiosqlite connection threads would keep the process alive
+            await async_engine.dispose()
+
+    after = report("async-session", args.requests, asyncio.run(run_async()))
+    print(f"async-session vs sync-session: {after / before:.1f}x")
+
+    engine.dispose()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# NEW FILE - Benchmark: per-task cost of a fresh event loop vs the worker's long-lived async runtime
+"""
+Sync callers (Celery tasks) sending one WhatsApp text message each, against
+the fake Cloud API (app.devtools.fake_whatsapp_api) served on localhost:
+
+  loop-per-task  new_event_loop() + run_until_complete + close, as the tasks and
+                 tenant-settings endpoints used to: a new HTTP pool and TCP
+                 connection (TLS handshake on the real Graph API) every time
+  runtime        app.core.async_runtime.run_async: one loop per process, pooled
+                 keep-alive connections reused across tasks
+
+    cd backend
+    python -m benchmarks.bench_async_runtime [--tasks 500] [--latency-ms 0]
+
+The fake API is plain HTTP on loopback, so connection setup is far cheaper
+here than against graph.facebook.com over TLS.
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+from typing import Callable, List
+
+from app.core.config import get_settings
+
+get_settings().REDIS_URL = ""
+get_settings().LOG_LEVEL = "WARNING"
+# This measures loop and connection setup, not send throttling
+get_settings().WHATSAPP_RATE_LIMIT_ENABLED = False
+
+import uvicorn  # noqa: E402
+
+from app.core.async_runtime import get_async_runtime, run_async  # noqa: E402
+from app.devtools.fake_whatsapp_api import FakeConfig, LatencyConfig, create_app  # noqa: E402
+from app.services import http_pool  # noqa: E402
+from app.services.http_pool import close_http_clients  # noqa: E402
+from app.services.whatsapp_client import WhatsAppCloudAPIClient  # noqa: E402
+
+PHONE_NUMBER_ID = "100000000000001"
+
+
+def serve_fake_api(latency_ms: float) -> str:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    config = FakeConfig(latency=LatencyConfig(median_ms=latency_ms))
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/{get_settings().WHATSAPP_API_VERSION}"
+
+
+def make_client(base_url: str) -> WhatsAppCloudAPIClient:
+    return WhatsAppCloudAPIClient(phone_number_id=PHONE_NUMBER_ID, access_token="bench", base_url=base_url)
+
+
+def loop_per_task(base_url: str, i: int) -> dict:
+    async def task() -> dict:
+        try:
+            return await make_client(base_url).send_text_message(to_phone=f"+9198{i:08d}", message="Thanks!")
+        finally:
+            await close_http_clients()
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(task())
+    finally:
+        loop.close()
+
+
+def runtime(base_url: str, i: int) -> dict:
+    return run_async(make_client(base_url).send_text_message(to_phone=f"+9198{i:08d}", message="Thanks!"))
+
+
+def measure(name: str, run_task: Callable[[str, int], dict], base_url: str, tasks: int) -> float:
+    pools_before = built[0]
+    durations: List[float] = []
+    run_task(base_url, 0)  # warm up
+    for i in range(tasks):
+        start = time.perf_counter()
+        result = run_task(base_url, i)
+        durations.append(time.perf_counter() - start)
+        if not result.get("success"):
+            raise RuntimeError(f"send failed: {result}")
+    ordered = sorted(durations)
+    mean = sum(ordered) / len(ordered) * 1000
+    print(
+        f"{name:<14} {tasks:>6} tasks  mean {mean:7.2f}ms  p50 {ordered[len(ordered) // 2] * 1000:7.2f}ms  "
+        f"p99 {ordered[int(len(ordered) * 0.99) - 1] * 1000:7.2f}ms  {built[0] - pools_before:>5} HTTP pools opened"
+    )
+    return mean
+
+
+built = [0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fake Cloud API response latency")
+    args = parser.parse_args()
+
+    build_client = http_pool.http_clients._build_client
+
+    def counting_build_client():
+        built[0] += 1
+        return build_client()
+
+    http_pool.http_clients._build_client = counting_build_client
+
+    base_url = serve_fake_api(args.latency_ms)
+    print(f"{args.tasks} sequential tasks, fake API at {base_url}, {args.latency_ms}ms latency")
+    before = measure("loop-per-task", loop_per_task, base_url, args.tasks)
+    after = measure("runtime", runtime, base_url, args.tasks)
+    get_async_runtime().stop()
+    print(f"runtime vs loop-per-task: {before / after:.1f}x faster per task")
+
+
+if __name__ == "__main__":
+    main()
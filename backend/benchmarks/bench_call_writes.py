@@ -0,0 +1,174 @@
+# NEW FILE - Benchmark: sustained call-ended inserts/sec, per-event transactions vs write-behind batches
+"""
+Sustained write throughput for call-ended events, with N concurrent producers
+(webhook requests or consumer batches):
+
+  two-commit    the original webhook path: commit WebhookCall, commit Call,
+                refresh the Call (three round-trips and two commits per event)
+  per-event     record_call_event's path: both rows in one transaction
+  write-behind  CallWriteBehind: multi-row INSERT/upsert ... RETURNING, one
+                commit per batch; producers wait for their call_id
+
+    cd backend
+    python -m benchmarks.bench_call_writes [--events 5000] [--concurrency 64]
+        [--database-url postgresql://...]  # default: a temporary SQLite file
+
+Against a real database the tables must exist (alembic upgrade head); rows are
+written for a tenant with slug "bench-call-writes".
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import get_settings
+
+# Dedupe markers would short-circuit repeated runs
+get_settings().REDIS_URL = ""
+
+import app.db.base  # noqa: E402,F401 - register all models
+from app.db.base_class import Base  # noqa: E402
+from app.models.call import Call  # noqa: E402
+from app.models.tenant import Tenant  # noqa: E402
+from app.models.webhook_call import WebhookCall  # noqa: E402
+from app.schemas.webhook import CallEndedEvent  # noqa: E402
+from app.services.call_events import persist_call_event  # noqa: E402
+from app.services.call_writer import CallWriteBehind  # noqa: E402
+from app.services.tenant_routing import TenantRoute  # noqa: E402
+
+TENANT_SLUG = "bench-call-writes"
+
+
+def make_event(run: str, i: int) -> CallEndedEvent:
+    return CallEndedEvent(
+        provider="twilio",
+        call_sid=f"{run}-{i}",
+        caller_phone=f"+9198{i:08d}",
+        receiver_phone="+919800000000",
+        status="completed",
+        duration_seconds=30 + i % 300,
+        raw_payload={"CallSid": f"{run}-{i}", "CallStatus": "completed", "From": f"+9198{i:08d}"},
+    )
+
+
+def two_commit(db: Session, route: TenantRoute, event: CallEndedEvent) -> int:
+    db.add(WebhookCall(
+        tenant_id=route.tenant_id,
+        provider=event.provider,
+        call_sid=event.call_sid,
+        caller_phone=event.caller_phone,
+        receiver_phone=event.receiver_phone,
+        status=event.status,
+        raw_payload=event.raw_payload,
+    ))
+    db.commit()
+    call = Call(
+        tenant_id=route.tenant_id,
+        provider=event.provider,
+        call_sid=event.call_sid,
+        caller_phone=event.caller_phone,
+        receiver_phone=event.receiver_phone,
+        status=event.status,
+        duration_seconds=event.duration_seconds,
+    )
+    db.add(call)
+    db.commit()
+    db.refresh(call)
+    return call.id
+
+
+def run_sync(name: str, write: Callable, SessionFactory, route, events, concurrency: int) -> float:
+    def produce(chunk):
+        db = SessionFactory()
+        try:
+            for event in chunk:
+                write(db, route, event)
+        finally:
+            db.close()
+
+    chunks = [events[i::concurrency] for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(produce, chunks))
+    return report(name, len(events), time.perf_counter() - start)
+
+
+def run_write_behind(SessionFactory, route, events, concurrency: int, batch_size: int, flush_ms: int) -> float:
+    writer = CallWriteBehind(SessionFactory, batch_size=batch_size, flush_ms=flush_ms)
+
+    def produce(chunk):
+        # Each producer waits for its call_id, like a webhook request would
+        for event in chunk:
+            writer.submit(route, event).result()
+
+    chunks = [events[i::concurrency] for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(produce, chunks))
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return report(f"write-behind (batch {batch_size}, {flush_ms}ms)", len(events), elapsed)
+
+
+def report(name: str, count: int, elapsed: float) -> float:
+    rate = count / elapsed
+    print(f"{name:<36} {count:>7} events  {elapsed:8.2f}s  {rate:10.0f} events/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=get_settings().CALL_WRITE_BEHIND_BATCH_SIZE)
+    parser.add_argument("--flush-ms", type=int, default=get_settings().CALL_WRITE_BEHIND_FLUSH_MS)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = None
+    if args.database_url:
+        engine = create_engine(args.database_url, pool_size=args.concurrency + 2)
+    else:
+        path = tempfile.mktemp(suffix=".db", prefix="bench-call-writes-")
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 60})
+        Base.metadata.create_all(engine)
+    SessionFactory = sessionmaker(bind=engine, autoflush=False)
+
+    db = SessionFactory()
+    tenant = db.query(Tenant).filter(Tenant.slug == TENANT_SLUG).first()
+    if tenant is None:
+        tenant = Tenant(name="Call write benchmark", slug=TENANT_SLUG, is_active=True)
+        db.add(tenant)
+        db.commit()
+    # Automation disabled: this measures the writes, not the broker
+    route = TenantRoute(tenant_id=tenant.id, slug=TENANT_SLUG, has_settings=True)
+    db.close()
+
+    print(f"{engine.dialect.name}, {args.events} events, {args.concurrency} concurrent producers")
+    run_id = str(int(time.time()))
+    before = run_sync(
+        "two-commit (original)", two_commit, SessionFactory, route,
+        [make_event(f"{run_id}-a", i) for i in range(args.events)], args.concurrency
+    )
+    run_sync(
+        "per-event (one commit)", persist_call_event, SessionFactory, route,
+        [make_event(f"{run_id}-b", i) for i in range(args.events)], args.concurrency
+    )
+    after = run_write_behind(
+        SessionFactory, route, [make_event(f"{run_id}-c", i) for i in range(args.events)],
+        args.concurrency, args.batch_size, args.flush_ms
+    )
+    print(f"write-behind vs two-commit: {after / before:.1f}x")
+
+    engine.dispose()
+    if path is not None:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# NEW FILE - Benchmark: per-tenant queue wait under a skewed load, broker FIFO vs the fair dispatcher
+"""
+A discrete-event simulation on a virtual clock (no broker, no Redis): one
+tenant bursts a backlog of automations (a campaign, a backfill) while a few
+small tenants keep receiving calls at a steady rate, all served by the same
+live-lane workers.
+
+  fifo  every task goes straight onto the live queue, as before: workers take
+        them in arrival order, so small tenants wait behind the whole burst
+  fair  tasks wait in per-tenant queues and app.services.fair_queue's
+        FairDispatcher (LocalFairQueueBackend) publishes them deficit
+        round-robin, at most --max-share of the workers per tenant
+
+    cd backend
+    python -m benchmarks.bench_fair_queue [--burst 2000] [--small-tenants 5] [--workers 8]
+
+Waits are enqueue -> dispatch to a worker. In the fair run they are also
+read back from the automation_queue_wait_seconds histogram the dispatcher
+records, as a check on the metric.
+"""
+import argparse
+import heapq
+import random
+from collections import deque
+from typing import Dict, List, Tuple
+
+from app.core.config import get_settings
+
+get_settings().REDIS_URL = ""
+
+from prometheus_client import REGISTRY  # noqa: E402
+
+from app.services.fair_queue import FairDispatcher, FairQueue, LocalFairQueueBackend  # noqa: E402
+
+BIG_TENANT = 1
+
+# (arrival time, tenant id, call id)
+Arrival = Tuple[float, int, int]
+
+
+def make_arrivals(burst: int, small_tenants: int, interval: float, duration: float) -> List[Arrival]:
+    rng = random.Random(7)
+    arrivals = [(rng.uniform(0, 1.0), BIG_TENANT, i) for i in range(burst)]
+    call_id = burst
+    for tenant_id in range(2, small_tenants + 2):
+        t = rng.uniform(0, interval)
+        while t < duration:
+            arrivals.append((t, tenant_id, call_id))
+            call_id += 1
+            t += rng.expovariate(1 / interval)
+    return sorted(arrivals)
+
+
+def service_times(count: int, mean: float) -> List[float]:
+    rng = random.Random(11)
+    return [rng.uniform(0.5 * mean, 1.5 * mean) for _ in range(count)]
+
+
+def simulate_fifo(
+    arrivals: List[Arrival],
+    workers: int,
+    service: List[float]
+) -> Tuple[Dict[int, List[float]], float]:
+    waits: Dict[int, List[float]] = {}
+    free_at = [0.0] * workers
+    heapq.heapify(free_at)
+    # One shared FIFO: each task starts when it has arrived and a worker is free
+    for i, (arrived, tenant_id, _) in enumerate(arrivals):
+        start = max(arrived, heapq.heappop(free_at))
+        heapq.heappush(free_at, start + service[i])
+        waits.setdefault(tenant_id, []).append(start - arrived)
+    return waits, max(free_at)
+
+
+def simulate_fair(
+    arrivals: List[Arrival],
+    workers: int,
+    service: List[float],
+    max_share: float
+) -> Tuple[Dict[int, List[float]], float]:
+    now = [0.0]
+    backend = LocalFairQueueBackend()
+    fair_queue = FairQueue(backend, clock=lambda: now[0])
+    dispatcher = FairDispatcher(
+        backend, capacity=workers, max_share=max_share, quantum=1, task_timeout=3600, clock=lambda: now[0]
+    )
+    waits: Dict[int, List[float]] = {}
+    completions: List[Tuple[float, int, str]] = []
+    pending = deque(arrivals)
+    durations = iter(service)
+    finished_at = 0.0
+
+    def publish(item, task_id):
+        waits.setdefault(item.tenant_id, []).append(now[0] - item.enqueued_at)
+        heapq.heappush(completions, (now[0] + next(durations), item.tenant_id, task_id))
+
+    while pending or completions or backend.active_tenants():
+        next_arrival = pending[0][0] if pending else float("inf")
+        next_completion = completions[0][0] if completions else float("inf")
+        now[0] = min(next_arrival, next_completion)
+        while completions and completions[0][0] <= now[0]:
+            finished_at, tenant_id, task_id = heapq.heappop(completions)
+            backend.finish(tenant_id, task_id)
+        while pending and pending[0][0] <= now[0]:
+            _, tenant_id, call_id = pending.popleft()
+            fair_queue.submit(tenant_id, call_id, "+910000000000")
+        while dispatcher.dispatch_round(publish):
+            pass
+    return waits, finished_at
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def report(name: str, waits: Dict[int, List[float]]) -> None:
+    print(f"\n{name}")
+    print(f"  {'tenant':>8} {'tasks':>6} {'p50 wait':>10} {'p95 wait':>10} {'max wait':>10}")
+    for tenant_id in sorted(waits):
+        w = waits[tenant_id]
+        label = f"{tenant_id}{' (big)' if tenant_id == BIG_TENANT else ''}"
+        print(
+            f"  {label:>8} {len(w):>6} {percentile(w, 0.5):>9.2f}s "
+            f"{percentile(w, 0.95):>9.2f}s {max(w):>9.2f}s"
+        )
+
+
+def metric_mean_wait(tenant_id: int) -> float:
+    total = REGISTRY.get_sample_value("automation_queue_wait_seconds_sum", {"tenant": str(tenant_id)})
+    count = REGISTRY.get_sample_value("automation_queue_wait_seconds_count", {"tenant": str(tenant_id)})
+    return total / count if count else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=2000, help="tasks the big tenant enqueues in its first second")
+    parser.add_argument("--small-tenants", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=2.0, help="mean seconds between a small tenant's calls")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds the small tenants keep calling")
+    parser.add_argument("--workers", type=int, default=8, help="live-lane concurrency (FAIR_QUEUE_CAPACITY)")
+    parser.add_argument("--service-ms", type=float, default=200.0, help="mean task run time")
+    parser.add_argument("--max-share", type=float, default=0.5, help="FAIR_QUEUE_TENANT_MAX_SHARE")
+    args = parser.parse_args()
+
+    arrivals = make_arrivals(args.burst, args.small_tenants, args.interval, args.duration)
+    service = service_times(len(arrivals), args.service_ms / 1000.0)
+    print(
+        f"{len(arrivals)} tasks: tenant {BIG_TENANT} bursts {args.burst}, {args.small_tenants} small tenants "
+        f"every ~{args.interval}s for {args.duration:.0f}s; {args.workers} workers, ~{args.service_ms:.0f}ms per task"
+    )
+
+    waits, finished_at = simulate_fifo(arrivals, args.workers, service)
+    report("fifo (one live queue)", waits)
+    print(f"  all work done at {finished_at:.1f}s")
+    waits, finished_at = simulate_fair(arrivals, args.workers, service, args.max_share)
+    report(f"fair (DRR, max share {args.max_share})", waits)
+    print(f"  all work done at {finished_at:.1f}s")
+    print("  mean wait from automation_queue_wait_seconds: " + ", ".join(
+        f"tenant {tenant_id} {metric_mean_wait(tenant_id):.2f}s" for tenant_id in sorted(waits)
+    ))
+
+
+if __name__ == "__main__":
+    main()
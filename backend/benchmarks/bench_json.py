@@ -0,0 +1,148 @@
+# NEW FILE - Micro-benchmark: stdlib vs orjson on list endpoints and the WhatsApp send loop
+"""
+Per-request CPU spent on JSON for the hottest paths, before and after the
+orjson path (app.core.serialization).
+
+    cd backend
+    python -m benchmarks.bench_json [--rows 100] [--number 2000]
+
+List endpoints: response-model serialization + body rendering for
+GET /products/ and GET /message-logs/ (JSONResponse vs the app default).
+Send loop: building the Graph request body, parsing the response and logging
+the success (httpx json= + eager f-string log vs pre-serialized bytes + sampled log).
+"""
+import argparse
+import logging
+import timeit
+from datetime import datetime, timezone
+from typing import List
+
+import httpx
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.core import serialization
+from app.core.serialization import DefaultJSONResponse
+from app.schemas.message_log import MessageLogResponse
+from app.schemas.product import Product
+
+logger = logging.getLogger("bench")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+logger.setLevel(logging.INFO)
+
+MESSAGES_URL = "https://graph.facebook.com/v18.0/123456789/messages"
+SAMPLE_RATE = 0.01
+
+
+def make_products(rows: int) -> List[Product]:
+    return [
+        Product(
+            id=i,
+            tenant_id=1,
+            name=f"Men Formal Shirt {i}",
+            category="Shirt",
+            gender="Men",
+            tags="men,shirt,formal",
+            price=799.0 + i,
+            description="High-quality cotton formal shirt with a slim fit and mother-of-pearl buttons",
+            image_url=f"https://cdn.example.com/images/men-shirt-{i}.jpg",
+        )
+        for i in range(rows)
+    ]
+
+
+def make_message_logs(rows: int) -> List[MessageLogResponse]:
+    now = datetime.now(timezone.utc)
+    return [
+        MessageLogResponse(
+            id=i,
+            tenant_id=1,
+            call_id=i // 5,
+            recipient_phone="919876543210",
+            recipient_name="Customer",
+            message_type="image",
+            message_content=f"*{i}. Men Formal Shirt*\nPrice: 799\nHigh-quality cotton formal shirt",
+            media_url=f"https://cdn.example.com/images/men-shirt-{i}.jpg",
+            whatsapp_message_id=f"wamid.HBgMOTE5ODc2NTQzMjEwFQIAERgSMEI{i:010d}",
+            status="sent",
+            retry_count=0,
+            created_at=now,
+            sent_at=now,
+        )
+        for i in range(rows)
+    ]
+
+
+def image_payload(idx: int) -> dict:
+    return {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": "919876543210",
+        "type": "image",
+        "image": {
+            "id": "1234567890123456",
+            "caption": f"*{idx}. Men Formal Shirt*\nPrice: ₹799\nHigh-quality cotton formal shirt\nSKU: MFS-{idx}",
+        },
+    }
+
+
+GRAPH_RESPONSE = (
+    b'{"messaging_product":"whatsapp","contacts":[{"input":"919876543210","wa_id":"919876543210"}],'
+    b'"messages":[{"id":"wamid.HBgMOTE5ODc2NTQzMjEwFQIAERgSMEI5QjE2RkQ2NkVCQUVBNTFBAA=="}]}'
+)
+
+
+def send_stdlib(payload: dict) -> None:
+    request = httpx.Request("POST", MESSAGES_URL, json=payload)
+    response = httpx.Response(200, content=GRAPH_RESPONSE, request=request)
+    response_data = response.json()
+    logger.info(f"WhatsApp message sent successfully: {response_data}")
+
+
+def send_fast(payload: dict, sample: bool) -> None:
+    request = httpx.Request("POST", MESSAGES_URL, content=serialization.dumps(payload))
+    response = httpx.Response(200, content=GRAPH_RESPONSE, request=request)
+    response_data = serialization.loads(response.content)
+    if sample:
+        logger.info("WhatsApp message sent successfully: %s", response_data)
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def report(name: str, before: float, after: float) -> None:
+    saved = before - after
+    print(f"{name:<28} {before:>10.1f} {after:>10.1f} {saved:>10.1f} {saved / before * 100:>7.1f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="rows per list response")
+    parser.add_argument("--number", type=int, default=2000, help="iterations per measurement")
+    args = parser.parse_args()
+
+    print(f"orjson available: {serialization.ORJSON_AVAILABLE}; default response class: {DefaultJSONResponse.__name__}")
+    print(f"{'path':<28} {'before µs':>10} {'after µs':>10} {'saved µs':>10} {'saved':>8}")
+
+    list_number = max(1, args.number // 10)
+    for name, model, rows in (
+        ("GET /products/", Product, make_products(args.rows)),
+        ("GET /message-logs/", MessageLogResponse, make_message_logs(args.rows)),
+    ):
+        adapter = TypeAdapter(List[model])
+        before = per_call_us(lambda: JSONResponse(adapter.dump_python(rows, mode="json")), list_number)
+        after = per_call_us(lambda: DefaultJSONResponse(adapter.dump_python(rows, mode="json")), list_number)
+        report(f"{name} ({args.rows} rows)", before, after)
+
+    payloads = [image_payload(i) for i in range(10)]
+    counter = iter(range(10 ** 9))
+    step = int(1 / SAMPLE_RATE)
+    before = per_call_us(lambda: send_stdlib(payloads[next(counter) % 10]), args.number)
+    after = per_call_us(lambda: send_fast(payloads[next(counter) % 10], next(counter) % step == 0), args.number)
+    report("send loop (per message)", before, after)
+
+
+if __name__ == "__main__":
+    main()
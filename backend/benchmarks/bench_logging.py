@@ -0,0 +1,136 @@
+# NEW FILE - Benchmark: time a request spends blocked in logging, synchronous handler vs queued pipeline
+"""
+Time spent inside logging calls per call-ended webhook request (the lines the
+sync ingestion path writes: payload, dedupe/eligibility, queued automation).
+
+  before   eager f-strings, full payload at INFO on every request, a plain
+           StreamHandler writing on the calling thread
+  after    app.core.logging: lazy %-args, payload sampled per tenant, records
+           enqueued; JSON formatting, redaction and writes on the listener thread
+
+The sink is a file; --sink-latency-us adds a delay to every write, like a
+stdout pipe to a slow container log driver.
+
+    cd backend
+    python -m benchmarks.bench_logging [--requests 20000] [--tenants 20] [--sink-latency-us 50]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+from app.core.config import get_settings
+from app.core.logging import LogPayload, configure_logging, payload_sampled, stop_logging
+
+logger = logging.getLogger("app.api.v1.endpoints.webhooks_calls")
+
+
+class SlowFile:
+    """File sink whose writes take at least `latency` seconds"""
+
+    def __init__(self, path: str, latency: float):
+        self.file = open(path, "w", encoding="utf-8")
+        self.latency = latency
+
+    def write(self, text: str) -> int:
+        if self.latency:
+            deadline = time.perf_counter() + self.latency
+            while time.perf_counter() < deadline:
+                pass
+        return self.file.write(text)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def make_payload(i: int) -> dict:
+    return {
+        "AccountSid": "AC00000000000000000000000000000000",
+        "CallSid": f"CA{i:032d}",
+        "From": f"+9198{i % 100000000:08d}",
+        "To": "+919800000000",
+        "CallStatus": "completed",
+        "CallDuration": str(30 + i % 300),
+        "Direction": "inbound",
+        "ApiVersion": "2010-04-01",
+        "Timestamp": "Mon, 01 Jan 2024 10:00:00 +0000",
+        "CallbackSource": "call-progress-events",
+        "SequenceNumber": "3",
+        "RecordingUrl": f"https://api.twilio.com/2010-04-01/Accounts/AC0/Recordings/RE{i:032d}",
+    }
+
+
+def before(i: int, tenant_id: int, payload: dict) -> None:
+    logger.info(f"Received webhook for tenant tenant-{tenant_id}: {payload}")
+    logger.info(f"Automation not configured/enabled for tenant {tenant_id}" if i % 10 == 0
+                else f"Queued automation for call {i}, delay: 5s")
+
+
+def after(i: int, tenant_id: int, payload: dict) -> None:
+    if payload_sampled(logger, tenant_id):
+        logger.info(
+            "Received %s webhook for tenant %s: %s", "twilio", f"tenant-{tenant_id}", LogPayload(payload),
+            extra={"tenant_id": tenant_id, "call_sid": payload["CallSid"]}
+        )
+    if i % 10 == 0:
+        logger.info("Automation not configured/enabled for tenant %s", tenant_id)
+    else:
+        logger.info("Queued automation for call %s, delay: %ss", i, 5)
+
+
+def measure(log_request: Callable[[int, int, dict], None], requests: int, tenants: int) -> List[float]:
+    payloads = [make_payload(i) for i in range(requests)]
+    blocked = []
+    for i, payload in enumerate(payloads):
+        start = time.perf_counter()
+        log_request(i, i % tenants, payload)
+        blocked.append(time.perf_counter() - start)
+    return blocked
+
+
+def report(name: str, blocked: List[float]) -> float:
+    ordered = sorted(blocked)
+    mean = sum(ordered) / len(ordered) * 1e6
+    p99 = ordered[int(len(ordered) * 0.99) - 1] * 1e6
+    print(f"{name:<8} {len(ordered):>7} requests  mean {mean:8.1f}us  p99 {p99:8.1f}us blocked per request")
+    return mean
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--sink-latency-us", type=float, default=50.0)
+    args = parser.parse_args()
+    latency = args.sink_latency_us / 1e6
+    root = logging.getLogger()
+
+    path = tempfile.mktemp(suffix=".log", prefix="bench-logging-")
+    sink = SlowFile(path, latency)
+    handler = logging.StreamHandler(sink)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    root.handlers = [handler]
+    root.setLevel(logging.INFO)
+    print(f"{args.requests} requests, {args.tenants} tenants, {args.sink_latency_us}us per write")
+    old = report("before", measure(before, args.requests, args.tenants))
+    sink.close()
+
+    get_settings().LOG_FORMAT = "json"
+    sink = SlowFile(path, latency)
+    configure_logging(stream=sink)
+    new = report("after", measure(after, args.requests, args.tenants))
+    started = time.perf_counter()
+    stop_logging()  # the listener drains what is still queued
+    print(f"listener drained the queue {time.perf_counter() - started:.2f}s after the last request")
+    sink.close()
+    os.remove(path)
+    print(f"after vs before: {old / new:.1f}x less time blocked")
+
+
+if __name__ == "__main__":
+    main()
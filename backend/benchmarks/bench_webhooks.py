@@ -0,0 +1,415 @@
+# NEW FILE - Load benchmark: call-ended webhooks one API worker can absorb
+"""
+Drives POST /api/v1/webhooks/call-ended/{tenant} on the FastAPI app,
+in-process (httpx ASGI transport, one event loop = one worker). Each scenario
+sends a distinct payload format:
+
+  twilio / twilio-signed     form-encoded status callback (X-Twilio-Signature)
+  exotel                     form-encoded passthru callback
+  generic / generic-signed   JSON body (X-Webhook-Signature HMAC-SHA256)
+
+Unsigned scenarios post to a tenant without a webhook secret; signed ones to a
+tenant that has one. Every call is completed and the tenant is configured, so
+each request also publishes the automation task, to an in-memory Celery broker.
+
+Reports throughput, p50/p95/p99 latency, SQL statements per request and how
+long the event loop stalled (a probe that sleeps 5ms at a time; anything past
+that is time the loop was blocked, e.g. by a sync Redis or broker call).
+--baseline-out writes the results as JSON; --compare checks a run against
+such a file and exits 1 on a regression beyond --tolerance.
+
+    cd backend
+    python -m benchmarks.bench_webhooks [--requests 2000] [--concurrency 50]
+        [--scenarios twilio,generic-signed] [--write-behind]
+        [--database-url postgresql://...]  # default: a temporary SQLite file
+        [--redis-url redis://localhost:6379/15]  # default: in-memory stand-ins
+        [--baseline-out baseline.json] [--compare baseline.json --tolerance 0.2]
+
+Against a real database the tables must exist (alembic upgrade head).
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, NamedTuple, Tuple
+from urllib.parse import urlencode
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Automation tasks are published to an in-process broker. Celery also reads
+# these from the environment, so they are set before anything loads .env
+os.environ["CELERY_BROKER_URL"] = "memory://"
+os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
+
+from app.core.config import get_settings  # noqa: E402
+
+# Dedupe, circuit breaker, queues and route invalidation from local memory
+# unless --redis-url is given
+get_settings().REDIS_URL = ""
+get_settings().WEBHOOK_INGEST_MODE = "sync"
+get_settings().LOG_LEVEL = "WARNING"
+
+import app.db.base  # noqa: E402,F401 - register all models
+from app.api.deps import get_async_db_dep  # noqa: E402
+from app.db.base_class import Base  # noqa: E402
+from app.db.session import async_database_url  # noqa: E402
+from app.models.tenant import Tenant  # noqa: E402
+from app.models.tenant_settings import TenantSettings  # noqa: E402
+from app.services import call_writer  # noqa: E402
+from app.services.tenant_routing import get_tenant_routes  # noqa: E402
+
+BASE_URL = "http://bench"
+OPEN_TENANT = "bench-webhooks"
+SIGNED_TENANT = "bench-webhooks-signed"
+SECRET = "bench-webhook-secret"
+SCENARIOS = ("twilio", "twilio-signed", "exotel", "generic", "generic-signed")
+
+
+class Scenario(NamedTuple):
+    tenant: str
+    build: Callable[[str, int], Tuple[bytes, Dict[str, str]]]
+
+
+def _url(tenant: str) -> str:
+    return f"{BASE_URL}/api/v1/webhooks/call-ended/{tenant}"
+
+
+def _caller(i: int) -> str:
+    return f"+9198{i % 100000000:08d}"
+
+
+def twilio(signed: bool) -> Scenario:
+    tenant = SIGNED_TENANT if signed else OPEN_TENANT
+
+    def build(run: str, i: int) -> Tuple[bytes, Dict[str, str]]:
+        params = {
+            "AccountSid": "AC00000000000000000000000000000000",
+            "CallSid": f"CA{run}{i:010d}",
+            "From": _caller(i),
+            "To": "+919800000000",
+            "CallStatus": "completed",
+            "CallDuration": str(30 + i % 300),
+            "Direction": "inbound",
+        }
+        headers = {"content-type": "application/x-www-form-urlencoded"}
+        if signed:
+            signed_data = _url(tenant) + "".join(f"{k}{v}" for k, v in sorted(params.items()))
+            headers["x-twilio-signature"] = base64.b64encode(
+                hmac.new(SECRET.encode(), signed_data.encode(), hashlib.sha1).digest()
+            ).decode()
+        return urlencode(params).encode(), headers
+
+    return Scenario(tenant, build)
+
+
+def exotel() -> Scenario:
+    def build(run: str, i: int) -> Tuple[bytes, Dict[str, str]]:
+        params = {
+            "CallSid": f"ex-{run}-{i}",
+            "CallFrom": _caller(i),
+            "CallTo": "+919800000000",
+            "Status": "completed",
+            "DialCallDuration": str(30 + i % 300),
+            "CurrentTime": "2024-01-01 10:00:00",
+        }
+        return urlencode(params).encode(), {"content-type": "application/x-www-form-urlencoded"}
+
+    return Scenario(OPEN_TENANT, build)
+
+
+def generic(signed: bool) -> Scenario:
+    tenant = SIGNED_TENANT if signed else OPEN_TENANT
+
+    def build(run: str, i: int) -> Tuple[bytes, Dict[str, str]]:
+        body = json.dumps({
+            "call_id": f"gen-{run}-{i}",
+            "caller": _caller(i),
+            "receiver": "+919800000000",
+            "status": "completed",
+            "duration": 30 + i % 300,
+        }).encode()
+        headers = {"content-type": "application/json"}
+        if signed:
+            headers["x-webhook-signature"] = hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+        return body, headers
+
+    return Scenario(tenant, build)
+
+
+def scenario(name: str) -> Scenario:
+    return {
+        "twilio": lambda: twilio(False),
+        "twilio-signed": lambda: twilio(True),
+        "exotel": exotel,
+        "generic": lambda: generic(False),
+        "generic-signed": lambda: generic(True),
+    }[name]()
+
+
+# ---------- DRIVER ----------
+
+class StatementCounter:
+    """Counts SQL statements executed on the given engines"""
+
+    def __init__(self, *sync_engines):
+        self.count = 0
+        for sync_engine in sync_engines:
+            event.listen(sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args) -> None:
+        self.count += 1
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def watch_loop(stalls: List[float], stop: asyncio.Event, interval: float = 0.005) -> None:
+    """Record how late each short sleep wakes up: the time the loop was blocked"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    sc: Scenario,
+    run: str,
+    requests: int,
+    concurrency: int
+) -> Tuple[float, List[float], List[float]]:
+    # Bodies (and signatures) are built up front: only the server side is timed
+    bodies = [sc.build(run, i) for i in range(requests + 1)]
+    url = _url(sc.tenant)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    stalls: List[float] = []
+
+    async def one(body: bytes, headers: Dict[str, str]) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(url, content=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200 or not response.json().get("automation_triggered"):
+                raise RuntimeError(f"{url}: {response.status_code} {response.text}")
+
+    await one(*bodies[0])  # warm up (route cache, first connection)
+    latencies.clear()
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stalls, stop))
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(*body) for body in bodies[1:]))
+    finally:
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await watcher
+    return elapsed, latencies, stalls
+
+
+def summarize(
+    requests: int,
+    elapsed: float,
+    latencies: List[float],
+    statements: int,
+    stalls: List[float]
+) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    ordered_stalls = sorted(stalls) or [0.0]
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "queries_per_request": round(statements / requests, 2),
+        "loop_stall_p99_ms": round(percentile(ordered_stalls, 99) * 1000, 2),
+        "loop_stall_max_ms": round(ordered_stalls[-1] * 1000, 2),
+    }
+
+
+def report(name: str, result: Dict[str, float]) -> None:
+    print(
+        f"{name:<16} {result['throughput_rps']:9.0f} req/s  p50 {result['p50_ms']:7.2f}ms  "
+        f"p95 {result['p95_ms']:7.2f}ms  p99 {result['p99_ms']:7.2f}ms  "
+        f"{result['queries_per_request']:5.2f} queries/req  "
+        f"loop stall p99 {result['loop_stall_p99_ms']:6.2f}ms max {result['loop_stall_max_ms']:7.2f}ms"
+    )
+
+
+# ---------- BASELINE ----------
+
+def compare(results: Dict[str, Dict[str, float]], run_info: Dict, baseline_path: str, tolerance: float) -> List[str]:
+    """Regressions against a baseline file: slower throughput or p95, or more queries"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for key, value in run_info.items():
+        if key in data and data[key] != value:
+            print(f"Warning: baseline has {key}={data[key]}, this run {value}")
+    baseline = data["scenarios"]
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput_rps']} < {before['throughput_rps']} req/s")
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']} > {before['p95_ms']} ms")
+        # Statement counts are deterministic: any increase is a regression
+        if result["queries_per_request"] > before["queries_per_request"] + 0.01:
+            regressions.append(
+                f"{name}: {result['queries_per_request']} > {before['queries_per_request']} queries/request"
+            )
+    return regressions
+
+
+def setup_tenants(SessionFactory) -> None:
+    db = SessionFactory()
+    try:
+        for slug, secret in ((OPEN_TENANT, None), (SIGNED_TENANT, SECRET)):
+            tenant = db.query(Tenant).filter(Tenant.slug == slug).first()
+            if tenant is None:
+                tenant = Tenant(name=slug, slug=slug, is_active=True)
+                db.add(tenant)
+                db.flush()
+                db.add(TenantSettings(tenant_id=tenant.id))
+                db.flush()
+            settings = db.query(TenantSettings).filter(TenantSettings.tenant_id == tenant.id).first()
+            settings.webhook_secret_key = secret
+            settings.is_whatsapp_configured = True
+            settings.is_active = True
+            settings.whatsapp_phone_number_id = f"{slug}-phone"
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run(args, engine, async_engine, SessionFactory) -> Dict[str, Dict[str, float]]:
+    from app.main import app
+
+    AsyncSessionFactory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def get_db():
+        async with AsyncSessionFactory() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db_dep] = get_db
+    get_tenant_routes().evict()
+    if args.write_behind:
+        get_settings().CALL_WRITE_BEHIND_ENABLED = True
+        call_writer._call_writer = call_writer.CallWriteBehind(SessionFactory)
+
+    counter = StatementCounter(async_engine.sync_engine, engine)
+    run_id = str(int(time.time()))
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=BASE_URL) as client:
+            for name in args.scenarios:
+                sc = scenario(name)
+                await drive(client, sc, f"{run_id}w", 1, 1)  # route cache + connection for this tenant
+                counter.count = 0
+                elapsed, latencies, stalls = await drive(client, sc, run_id, args.requests, args.concurrency)
+                results[name] = summarize(args.requests, elapsed, latencies, counter.count, stalls)
+                report(name, results[name])
+    finally:
+        if args.write_behind:
+            call_writer._call_writer.close()
+        # aiosqlite connection threads would keep the process alive
+        await async_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--write-behind", action="store_true", help="CALL_WRITE_BEHIND_ENABLED for the run")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--redis-url", default="", help="dedupe, breaker and queues in this Redis (a scratch db)")
+    parser.add_argument("--baseline-out", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="baseline JSON file to check the results against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown (default 0.2)")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    path = None
+    if args.database_url:
+        database_url = args.database_url
+        engine = create_engine(database_url)
+        async_engine = create_async_engine(async_database_url(database_url), pool_size=args.concurrency)
+    else:
+        path = tempfile.mktemp(suffix=".db", prefix="bench-webhooks-")
+        database_url = f"sqlite:///{path}"
+        connect_args = {"check_same_thread": False, "timeout": 60}
+        engine = create_engine(database_url, connect_args=connect_args)
+        Base.metadata.create_all(engine)
+        async_engine = create_async_engine(
+            async_database_url(database_url),
+            connect_args=connect_args,
+            poolclass=AsyncAdaptedQueuePool,
+            # SQLite has one writer: more connections only add lock waits and retries
+            pool_size=1,
+        )
+    SessionFactory = sessionmaker(bind=engine, autoflush=False)
+    setup_tenants(SessionFactory)
+    get_settings().REDIS_URL = args.redis_url
+
+    mode = "write-behind" if args.write_behind else "per-request commit"
+    redis = "Redis" if args.redis_url else "no Redis"
+    print(
+        f"{engine.dialect.name}, {redis}, {args.requests} requests per scenario, "
+        f"{args.concurrency} concurrent, {mode}"
+    )
+    results = asyncio.run(run(args, engine, async_engine, SessionFactory))
+
+    engine.dispose()
+    if path is not None:
+        os.remove(path)
+
+    run_info = {
+        "database": engine.dialect.name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "write_behind": args.write_behind,
+        "redis": bool(args.redis_url),
+    }
+    if args.baseline_out:
+        with open(args.baseline_out, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                **run_info,
+                "scenarios": results,
+            }, f, indent=2)
+        print(f"Baseline written to {args.baseline_out}")
+
+    if args.compare:
+        regressions = compare(results, run_info, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression against {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
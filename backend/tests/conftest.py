@@ -0,0 +1,22 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Tests run offline: no Redis, no broker, no Postgres
+os.environ.setdefault("REDIS_URL", "")
+os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
+
+
+@pytest.fixture
+def Session(tmp_path):
+    """Session factory on a fresh SQLite file with every table"""
+    import app.db.base  # noqa: F401 - register all models
+    from app.db.base_class import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
@@ -0,0 +1,115 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+from app.core.async_runtime import AsyncRuntime
+
+
+@pytest.fixture
+def runtime():
+    runtime = AsyncRuntime(name="test-runtime")
+    yield runtime
+    runtime.stop()
+
+
+async def current_loop():
+    return asyncio.get_running_loop()
+
+
+def test_every_run_uses_the_same_loop(runtime):
+    loop = runtime.run(current_loop())
+
+    assert runtime.run(current_loop()) is loop
+    assert loop.is_running()
+
+
+def test_objects_bound_to_the_loop_survive_between_runs(runtime):
+    async def make_lock():
+        return asyncio.Lock()
+
+    async def use(lock):
+        async with lock:
+            return True
+
+    lock = runtime.run(make_lock())
+    # A fresh asyncio.run() per task would fail here: the lock belongs to another loop
+    assert runtime.run(use(lock)) is True
+
+
+def test_exceptions_reach_the_caller(runtime):
+    async def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        runtime.run(fail())
+
+
+def test_timeout_cancels_the_coroutine(runtime):
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        runtime.run(slow(), timeout=0.05)
+    assert cancelled.wait(5)
+
+
+def test_run_from_the_loop_itself_is_refused(runtime):
+    async def nested():
+        runtime.run(current_loop())
+
+    with pytest.raises(RuntimeError, match="await the coroutine instead"):
+        runtime.run(nested())
+
+
+def test_submitted_coroutines_keep_running_in_the_background(runtime):
+    started = threading.Event()
+
+    async def background():
+        started.set()
+        await asyncio.sleep(0)
+        return "done"
+
+    future = runtime.submit(background())
+    assert future.result(5) == "done"
+    assert started.is_set()
+
+
+def test_stop_runs_shutdown_hooks_and_cancels_what_is_left(runtime):
+    closed, cancelled = [], threading.Event()
+
+    async def close_pools():
+        closed.append(True)
+
+    async def forever():
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    runtime.on_shutdown(close_pools)
+    runtime.on_shutdown(close_pools)  # registered once
+    runtime.submit(forever())
+    loop = runtime.run(current_loop())
+
+    runtime.stop()
+
+    assert closed == [True]
+    assert cancelled.is_set()
+    assert not runtime.running and loop.is_closed()
+
+
+def test_restarts_after_stop(runtime):
+    first = runtime.run(current_loop())
+    runtime.stop()
+
+    assert runtime.run(current_loop()) is not first
+    assert runtime.running
@@ -0,0 +1,215 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import select, update
+
+from app.core.config import get_settings
+from app.models.call import Call
+from app.models.message_log import MessageLog
+from app.models.product import Product
+from app.models.tenant import Tenant
+from app.models.tenant_settings import TenantSettings
+from app.services import automation_service, whatsapp_client
+from app.services.automation_journal import (
+    AUTOMATION_PARTIAL,
+    AUTOMATION_SENT,
+    STATUS_SENDING,
+    STATUS_UNKNOWN,
+    STEP_THANK_YOU,
+    AutomationJournal,
+    refresh_automation_status,
+)
+from app.services.automation_service import AutomationService
+from app.services.circuit_breaker import CircuitBreaker, LocalCircuitStore
+from app.services.message_retry import claim_batch, release_stale_claims
+
+TENANT = 1
+PHONE = "+919876543210"
+STEPS = [STEP_THANK_YOU, "catalog"]
+
+SENT = {"success": True, "message_id": "wamid.1"}
+RETRYABLE_FAILURE = {"success": False, "error_message": "Service unavailable", "retryable": True}
+PERMANENT_FAILURE = {"success": False, "error_message": "Invalid number", "retryable": False}
+UNKNOWN_DELIVERY = {
+    "success": False, "error_message": "Request timed out", "retryable": False, "delivery_unknown": True
+}
+
+
+@pytest.fixture
+def db(Session):
+    db = Session()
+    db.add(Call(id=1, tenant_id=TENANT, caller_phone=PHONE, automation_status="pending"))
+    db.commit()
+    yield db
+    db.close()
+
+
+def open_journal(db):
+    journal = AutomationJournal(db, TENANT, 1, PHONE)
+    journal.ensure([
+        {"step_key": key, "message_type": "text", "payload": {"method": "send_text_message", "kwargs": {}}}
+        for key in STEPS
+    ])
+    return journal
+
+
+def statuses(db):
+    return dict(db.execute(select(MessageLog.step_key, MessageLog.status)).all())
+
+
+def test_steps_are_created_once(db):
+    open_journal(db)
+    open_journal(db)
+    assert len(db.execute(select(MessageLog.id)).all()) == len(STEPS)
+
+
+def test_a_step_is_claimed_by_one_sender_only(db):
+    first, second = open_journal(db), open_journal(db)
+    assert first.claim(STEPS) == set(STEPS)
+    assert second.claim(STEPS) == set()
+
+
+def test_resume_skips_sent_steps(db):
+    journal = open_journal(db)
+    journal.claim(STEPS)
+    journal.record([(STEP_THANK_YOU, SENT), ("catalog", RETRYABLE_FAILURE)])
+
+    retry = open_journal(db)
+    assert retry.done == {STEP_THANK_YOU}
+    assert retry.claim(STEPS) == {"catalog"}
+    retry_count = db.execute(select(MessageLog.retry_count).where(MessageLog.step_key == "catalog")).scalar_one()
+    assert retry_count == 1
+
+
+def test_permanent_failure_is_not_claimed_again(db):
+    journal = open_journal(db)
+    journal.claim(STEPS)
+    journal.record([(STEP_THANK_YOU, SENT), ("catalog", PERMANENT_FAILURE)])
+    assert open_journal(db).claim(STEPS) == set()
+
+
+def test_unknown_delivery_is_not_resent(db):
+    journal = open_journal(db)
+    journal.claim(STEPS)
+    journal.record([(STEP_THANK_YOU, SENT), ("catalog", UNKNOWN_DELIVERY)])
+
+    assert statuses(db)["catalog"] == STATUS_UNKNOWN
+    assert open_journal(db).claim(STEPS) == set()
+
+
+def test_stale_in_flight_step_becomes_unknown_instead_of_being_resent(db):
+    journal = open_journal(db)
+    journal.claim(STEPS)
+    # The worker died after sending, before recording the outcome
+    stale = datetime.utcnow() - timedelta(seconds=get_settings().MESSAGE_RETRY_STALE_SECONDS + 1)
+    db.execute(update(MessageLog).values(last_attempt_at=stale))
+    db.commit()
+
+    assert open_journal(db).claim(STEPS) == set()
+    assert set(statuses(db).values()) == {STATUS_UNKNOWN}
+
+
+def test_fresh_in_flight_step_is_left_to_its_sender(db):
+    open_journal(db).claim(STEPS)
+    assert open_journal(db).claim(STEPS) == set()
+    assert set(statuses(db).values()) == {STATUS_SENDING}
+
+
+def test_automation_status_follows_the_steps(db):
+    journal = open_journal(db)
+    journal.claim(STEPS)
+    journal.record([(STEP_THANK_YOU, SENT), ("catalog", UNKNOWN_DELIVERY)])
+    refresh_automation_status(db, [1])
+    db.commit()
+    assert db.execute(select(Call.automation_status)).scalar_one() == AUTOMATION_PARTIAL
+
+
+def test_retry_worker_marks_stale_claims_unknown_and_skips_them(db):
+    journal = open_journal(db)
+    journal.claim(STEPS)
+    journal.record([(STEP_THANK_YOU, RETRYABLE_FAILURE)])
+    now = datetime.utcnow()
+
+    # 'catalog' is still 'sending': stale once its sender is gone
+    assert release_stale_claims(db, now + timedelta(seconds=1)) == 1
+    assert statuses(db) == {STEP_THANK_YOU: "failed", "catalog": STATUS_UNKNOWN}
+
+    later = now + timedelta(seconds=2)
+    assert [m.id for m in claim_batch(db, 10, later)] == [journal.steps[STEP_THANK_YOU]]
+    assert [m.id for m in claim_batch(db, 10, later, resend_unknown=True)] == [journal.steps["catalog"]]
+
+
+class FlakyGraphAPI:
+    """Messages endpoint that fails the texts containing `fail_on` (retryable 500), once each"""
+
+    def __init__(self, fail_on):
+        self.fail_on = set(fail_on)
+        self.sent = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        text = json.loads(request.content)["text"]["body"]
+        failing = next((marker for marker in self.fail_on if marker in text), None)
+        if failing is not None:
+            self.fail_on.discard(failing)
+            return httpx.Response(500, json={"error": {"code": 131000, "message": "Something went wrong"}})
+        self.sent.append(text)
+        return httpx.Response(200, json={"messages": [{"id": f"wamid.{len(self.sent)}"}]})
+
+
+@pytest.fixture
+def automation(db, monkeypatch):
+    """A tenant with a two-product catalog; returns (run the automation, fake Graph API)"""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "WHATSAPP_RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "WHATSAPP_SEND_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(automation_service, "get_circuit_breaker", lambda: CircuitBreaker(LocalCircuitStore()))
+    db.add_all([
+        Tenant(id=TENANT, name="Acme", slug="acme"),
+        TenantSettings(
+            tenant_id=TENANT,
+            whatsapp_phone_number_id="1234",
+            whatsapp_access_token="token",
+            is_whatsapp_configured=True,
+            is_active=True,
+            thank_you_message="Thanks for calling",
+            catalog_header_message="Our catalog",
+            catalog_footer_message="Reply with a number",
+        ),
+        Product(tenant_id=TENANT, name="Kurta", price=999),
+        Product(tenant_id=TENANT, name="Saree", price=2499),
+    ])
+    db.commit()
+    api = FlakyGraphAPI(fail_on=["Saree"])
+    client = httpx.AsyncClient(transport=httpx.MockTransport(api))
+    monkeypatch.setattr(whatsapp_client, "get_http_client", lambda phone_number_id: client)
+
+    def run():
+        return asyncio.run(AutomationService(db, TENANT).send_post_call_messages(PHONE, call_id=1))
+
+    return run, api
+
+
+def test_rerun_resumes_at_the_failed_step(db, automation):
+    run, api = automation
+
+    first = run()
+    assert first["success"] is False and first["retryable"] is True
+    assert first["messages_sent"] == 4
+    assert db.get(Call, 1).automation_status == AUTOMATION_PARTIAL
+
+    sent_before = list(api.sent)
+    second = run()
+
+    assert second["success"] is True
+    assert (second["messages_sent"], second["messages_skipped"]) == (1, 4)
+    # Only the failed product went out again, under its original number
+    assert api.sent[len(sent_before):] == ["*2. Saree*\nPrice: ₹2499.00"]
+    assert db.get(Call, 1).automation_status == AUTOMATION_SENT
+
+    # A third run has nothing left to send
+    third = run()
+    assert (third["messages_sent"], third["messages_skipped"]) == (0, 5)
+    assert len(api.sent) == 5
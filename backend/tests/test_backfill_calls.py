@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+import app.db.base  # noqa: F401 - register all models
+from app.db import backfill_calls
+from app.db.base_class import Base
+from app.models.call import Call
+from app.models.tenant import Tenant
+from app.models.tenant_settings import TenantSettings
+
+TENANT = "backfill-brand"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'backfill.db'}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    tenant = Tenant(name=TENANT, slug=TENANT, is_active=True)
+    db.add(tenant)
+    db.flush()
+    db.add(TenantSettings(
+        tenant_id=tenant.id, is_active=True, is_whatsapp_configured=True, message_delay_seconds=0
+    ))
+    db.commit()
+    db.close()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def export(tmp_path):
+    ended_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    path = tmp_path / "calls.jsonl"
+    with open(path, "w") as f:
+        for i in range(5):
+            f.write(json.dumps({
+                "call_id": f"CA{i}",
+                "caller": f"98765432{i:02d}",
+                "receiver": "9000000000",
+                "status": "completed",
+                "ended_at": ended_at.isoformat(),
+            }) + "\n")
+    return str(path)
+
+
+def run(export, engine, **kwargs):
+    return backfill_calls.run_backfill(
+        export, TENANT, "jsonl", provider="generic", chunk_size=2, enqueue_recent_hours=24, engine=engine, **kwargs
+    )
+
+
+def test_rerun_queues_rows_left_pending_by_a_failed_queue(export, engine, monkeypatch):
+    queued = []
+
+    def broken_queue(route, pending):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(backfill_calls, "queue_automations", broken_queue)
+    with pytest.raises(ConnectionError):
+        run(export, engine)
+
+    monkeypatch.setattr(backfill_calls, "queue_automations", lambda route, pending: queued.extend(pending))
+    stats = run(export, engine)
+
+    with engine.connect() as conn:
+        ids = {call_id for call_id, in conn.execute(select(Call.id))}
+    assert stats.inserted == 3 and stats.duplicates == 2
+    assert sorted(call_id for call_id, _ in queued) == sorted(ids)
+    assert stats.queued == 5
+
+
+def test_resume_does_not_requeue_finished_chunks(export, engine, monkeypatch):
+    queued = []
+    monkeypatch.setattr(backfill_calls, "queue_automations", lambda route, pending: queued.extend(pending))
+    run(export, engine)
+    assert len(queued) == 5
+
+    stats = run(export, engine)
+    assert stats.read == 0 and stats.queued == 0
+    assert len(queued) == 5
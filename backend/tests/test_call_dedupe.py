@@ -0,0 +1,99 @@
+import fakeredis
+import pytest
+from sqlalchemy import select
+
+from app.models.call import Call
+from app.models.tenant import Tenant
+from app.schemas.webhook import CallEndedEvent
+from app.services import call_events
+from app.services.call_dedupe import CallDedupe
+from app.services.tenant_routing import TenantRoute
+
+KEY = (1, "twilio", "CA123", "completed")
+ROUTE = TenantRoute(
+    tenant_id=1, slug="acme", has_settings=True, is_active=True, is_whatsapp_configured=True, message_delay_seconds=0
+)
+
+
+def make_dedupe():
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    return redis, CallDedupe(redis_client=redis, ttl=48 * 3600, in_flight_ttl=30)
+
+
+def test_first_delivery_holds_a_short_in_flight_marker():
+    redis, dedupe = make_dedupe()
+    assert dedupe.claim(*KEY) == (True, None)
+    assert 0 < redis.ttl(CallDedupe.key(*KEY)) <= 30
+    # A retry while the first delivery is in flight is a duplicate without a call yet
+    assert dedupe.claim(*KEY) == (False, None)
+
+
+def test_remember_keeps_the_call_id_for_the_dedupe_window():
+    redis, dedupe = make_dedupe()
+    dedupe.claim(*KEY)
+    dedupe.remember(*KEY, 42)
+    assert redis.ttl(CallDedupe.key(*KEY)) > 30
+    assert dedupe.claim(*KEY) == (False, 42)
+
+
+def test_release_lets_the_retry_through():
+    _, dedupe = make_dedupe()
+    dedupe.claim(*KEY)
+    dedupe.release(*KEY)
+    assert dedupe.claim(*KEY) == (True, None)
+
+
+class FailingRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis down")
+        return fail
+
+
+@pytest.fixture
+def record(Session, monkeypatch):
+    """record_call_event on a fresh database; queued automations are collected"""
+    with Session() as db:
+        db.add(Tenant(id=1, name="Acme", slug="acme"))
+        db.commit()
+    queued = []
+    monkeypatch.setattr(
+        call_events, "queue_automation", lambda route, caller_phone, call_id, producer=None: queued.append(call_id)
+    )
+
+    def record(dedupe, status="completed"):
+        monkeypatch.setattr(call_events, "get_call_dedupe", lambda: dedupe)
+        event = CallEndedEvent(
+            call_sid="CA123", caller_phone="+919876543210", receiver_phone="+911234567890",
+            status=status, provider="twilio",
+        )
+        with Session() as db:
+            return call_events.record_call_event(db, ROUTE, event)
+
+    record.queued = queued
+    record.Session = Session
+    return record
+
+
+def test_repeated_delivery_answers_with_the_original_call(record):
+    _, dedupe = make_dedupe()
+    first = record(dedupe)
+    again = record(dedupe)
+
+    assert first.automation_triggered and not first.duplicate
+    assert again == call_events.CallEventResult(first.call_id, duplicate=True)
+    assert record.queued == [first.call_id]
+
+
+@pytest.mark.parametrize("redis_client", [FailingRedis(), None], ids=["redis_down", "no_redis"])
+def test_without_the_dedupe_store_the_database_keeps_one_call_and_one_automation(record, redis_client):
+    dedupe = CallDedupe(redis_client=redis_client)
+    first = record(dedupe)
+    again = record(dedupe)
+    ringing = record(dedupe, status="ringing")
+
+    assert first.call_id == again.call_id == ringing.call_id
+    assert not again.duplicate and not again.automation_triggered
+    assert record.queued == [first.call_id]
+    with record.Session() as db:
+        assert db.scalars(select(Call)).one().status == "completed"
@@ -0,0 +1,172 @@
+from concurrent.futures import wait
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models.call import Call
+from app.models.tenant import Tenant
+from app.models.webhook_call import WebhookCall
+from app.schemas.webhook import CallEndedEvent
+from app.services import call_events, call_writer
+from app.services.call_writer import CallWriteBehind, record_event_batch, record_event_batch_async
+from app.services.tenant_routing import TenantRoute
+
+ROUTE = TenantRoute(
+    tenant_id=1,
+    slug="acme",
+    has_settings=True,
+    is_active=True,
+    is_whatsapp_configured=True,
+    message_delay_seconds=0,
+)
+ENDED_AT = datetime(2026, 1, 1, 12, 0)
+
+
+def event(call_sid, status="completed", duration=None):
+    return CallEndedEvent(
+        call_sid=call_sid,
+        caller_phone="+919876543210",
+        receiver_phone="+911234567890",
+        status=status,
+        duration_seconds=duration,
+        provider="twilio",
+    )
+
+
+@pytest.fixture
+def Session(Session):
+    with Session() as db:
+        db.add(Tenant(id=1, name="Acme", slug="acme"))
+        db.commit()
+    return Session
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Automations handed to the queue (no broker in the tests)"""
+    calls = []
+
+    def queue_automation(route, caller_phone, call_id, producer=None):
+        calls.append(call_id)
+
+    # The batch path and the one-by-one fallback (app.services.call_events)
+    monkeypatch.setattr(call_writer, "queue_automation", queue_automation)
+    monkeypatch.setattr(call_events, "queue_automation", queue_automation)
+    monkeypatch.setattr(call_writer.celery_app, "producer_or_acquire", lambda: call_writer.nullcontext())
+    return calls
+
+
+def calls(Session):
+    with Session() as db:
+        return {c.call_sid: c for c in db.scalars(select(Call))}
+
+
+def test_batch_writes_one_row_per_call_and_one_audit_row_per_event(Session, queued):
+    items = [(ROUTE, event(sid), ENDED_AT) for sid in ("CA1", "CA2", "CA1", "CA3")]
+    with Session() as db:
+        results = record_event_batch(db, items)
+
+    assert results[0].call_id == results[2].call_id
+    assert len({r.call_id for r in results}) == 3
+    assert set(calls(Session)) == {"CA1", "CA2", "CA3"}
+    with Session() as db:
+        assert db.scalar(select(func.count()).select_from(WebhookCall)) == 4
+
+
+def test_automation_is_queued_once_per_call(Session, queued):
+    with Session() as db:
+        first = record_event_batch(db, [(ROUTE, event("CA1"), ENDED_AT), (ROUTE, event("CA1"), ENDED_AT)])
+        again = record_event_batch(db, [(ROUTE, event("CA1"), ENDED_AT)])
+
+    assert [r.automation_triggered for r in first + again] == [True, False, False]
+    assert queued == [first[0].call_id]
+    assert calls(Session)["CA1"].automation_status == "pending"
+
+
+def test_only_completed_calls_of_enabled_tenants_are_queued(Session, queued):
+    disabled = replace(ROUTE, is_active=False)
+    with Session() as db:
+        results = record_event_batch(db, [(ROUTE, event("CA1", "no-answer"), ENDED_AT), (disabled, event("CA2"), ENDED_AT)])
+
+    assert not any(r.automation_triggered for r in results)
+    assert queued == []
+
+
+def test_completed_call_is_not_downgraded_by_a_late_callback(Session, queued):
+    with Session() as db:
+        record_event_batch(db, [(ROUTE, event("CA1", "ringing"), ENDED_AT), (ROUTE, event("CA1", duration=42), ENDED_AT)])
+        record_event_batch(db, [(ROUTE, event("CA1", "in-progress"), ENDED_AT)])
+
+    call = calls(Session)["CA1"]
+    assert call.status == "completed"
+    assert call.duration_seconds == 42
+
+
+def test_failed_queueing_releases_the_claim(Session, monkeypatch):
+    def queue_automation(route, caller_phone, call_id, producer=None):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(call_writer, "queue_automation", queue_automation)
+    monkeypatch.setattr(call_writer.celery_app, "producer_or_acquire", lambda: call_writer.nullcontext())
+    with Session() as db:
+        results = record_event_batch(db, [(ROUTE, event("CA1"), ENDED_AT)])
+
+    assert isinstance(results[0], ConnectionError)
+    # The provider's retry can claim and queue it again
+    assert calls(Session)["CA1"].automation_status is None
+
+
+def test_failed_batch_is_written_one_by_one(Session, queued, monkeypatch):
+    def broken_upsert(db, rows):
+        raise RuntimeError("batch rejected")
+
+    monkeypatch.setattr(call_writer.call_crud, "upsert_many", broken_upsert)
+    with Session() as db:
+        results = record_event_batch(db, [(ROUTE, event("CA1"), ENDED_AT), (ROUTE, event("CA2"), ENDED_AT)])
+
+    assert all(r.automation_triggered for r in results)
+    assert set(calls(Session)) == {"CA1", "CA2"}
+
+
+def test_writer_groups_submitted_events_into_batches(Session, queued, monkeypatch):
+    writer = CallWriteBehind(session_factory=Session, batch_size=3, flush_ms=200)
+    sizes = []
+    flush = writer.flush
+    monkeypatch.setattr(writer, "flush", lambda batch: (sizes.append(len(batch)), flush(batch)))
+
+    futures = [writer.submit(ROUTE, event(f"CA{i}"), ENDED_AT) for i in range(7)]
+    wait(futures, timeout=10)
+    writer.close()
+
+    assert sizes == [3, 3, 1]
+    assert len({f.result().call_id for f in futures}) == 7
+    assert len(queued) == 7
+
+
+def test_close_writes_what_was_submitted(Session, queued):
+    writer = CallWriteBehind(session_factory=Session, batch_size=100, flush_ms=60_000)
+    futures = [writer.submit(ROUTE, event(f"CA{i}"), ENDED_AT) for i in range(3)]
+
+    writer.close()
+
+    assert all(f.done() and f.exception() is None for f in futures)
+    assert len(calls(Session)) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_batch_matches_the_sync_path(Session, queued, tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    try:
+        async with AsyncSession(engine) as db:
+            results = await record_event_batch_async(
+                db, [(ROUTE, event("CA1"), ENDED_AT), (ROUTE, event("CA1"), ENDED_AT), (ROUTE, event("CA2"), ENDED_AT)]
+            )
+    finally:
+        await engine.dispose()
+
+    assert [r.automation_triggered for r in results] == [True, False, True]
+    assert results[0].call_id == results[1].call_id
+    assert sorted(queued) == sorted({r.call_id for r in results})
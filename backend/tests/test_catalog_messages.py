@@ -0,0 +1,80 @@
+from app.services.catalog_messages import (
+    CATALOG_MODE_IMAGES,
+    CATALOG_MODE_INTERACTIVE_LIST,
+    CATALOG_MODE_MULTI_PRODUCT,
+    DEFAULT_SECTION_TITLE,
+    LIST_MAX_ROWS,
+    LIST_ROW_TITLE_MAX,
+    MULTI_PRODUCT_MAX_ITEMS,
+    build_list_message,
+    build_multi_product_message,
+    select_catalog_mode,
+)
+
+
+def make_products(count, category=None, **extra):
+    return [
+        {"id": i + 1, "name": f"Product {i + 1}", "price": "₹10.00", "category": category, **extra}
+        for i in range(count)
+    ]
+
+
+def test_multi_product_without_catalog_falls_back_to_list():
+    products = make_products(3)
+    assert select_catalog_mode(CATALOG_MODE_MULTI_PRODUCT, products, None) == CATALOG_MODE_INTERACTIVE_LIST
+    assert select_catalog_mode(CATALOG_MODE_MULTI_PRODUCT, products, "") == CATALOG_MODE_INTERACTIVE_LIST
+    assert select_catalog_mode(CATALOG_MODE_MULTI_PRODUCT, products, "cat-1") == CATALOG_MODE_MULTI_PRODUCT
+
+
+def test_list_mode_is_kept():
+    assert select_catalog_mode(CATALOG_MODE_INTERACTIVE_LIST, make_products(3)) == CATALOG_MODE_INTERACTIVE_LIST
+
+
+def test_unknown_mode_or_no_products_uses_images():
+    assert select_catalog_mode("carousel", make_products(3)) == CATALOG_MODE_IMAGES
+    assert select_catalog_mode(None, make_products(3)) == CATALOG_MODE_IMAGES
+    assert select_catalog_mode(CATALOG_MODE_MULTI_PRODUCT, [], "cat-1") == CATALOG_MODE_IMAGES
+
+
+def test_list_message_is_capped_at_ten_rows():
+    message = build_list_message(make_products(25), "Thanks for calling", None)
+    rows = [row for section in message["sections"] for row in section["rows"]]
+    assert len(rows) == LIST_MAX_ROWS
+    assert [row["id"] for row in rows] == [f"product_{i}" for i in range(1, LIST_MAX_ROWS + 1)]
+
+
+def test_multi_product_message_is_capped_at_thirty_items():
+    message = build_multi_product_message(make_products(45), "cat-1", None, None)
+    items = [item for section in message["sections"] for item in section["product_items"]]
+    assert message["catalog_id"] == "cat-1"
+    assert len(items) == MULTI_PRODUCT_MAX_ITEMS
+
+
+def test_sections_group_by_category_in_first_seen_order():
+    products = [
+        {"id": 1, "name": "Kurta", "category": "Apparel"},
+        {"id": 2, "name": "Mug", "category": "Kitchen"},
+        {"id": 3, "name": "Scarf", "category": "Apparel"},
+        {"id": 4, "name": "Gift card", "category": None},
+    ]
+    sections = build_list_message(products, None, None)["sections"]
+    assert [section["title"] for section in sections] == ["Apparel", "Kitchen", DEFAULT_SECTION_TITLE]
+    assert [row["id"] for row in sections[0]["rows"]] == ["product_1", "product_3"]
+
+    sections = build_multi_product_message(products, "cat-1", None, None)["sections"]
+    assert [section["title"] for section in sections] == ["Apparel", "Kitchen", DEFAULT_SECTION_TITLE]
+    assert sections[0]["product_items"] == [{"product_retailer_id": "1"}, {"product_retailer_id": "3"}]
+
+
+def test_row_limit_spans_sections():
+    products = make_products(8, category="Apparel") + make_products(8, category="Kitchen")
+    sections = build_list_message(products, None, None)["sections"]
+    assert [len(section["rows"]) for section in sections] == [8, 2]
+
+
+def test_long_titles_are_truncated():
+    products = [{"id": 1, "name": "An extremely long product name for a list row", "price": "₹10.00"}]
+    row = build_list_message(products, None, None)["sections"][0]["rows"][0]
+    assert len(row["title"]) == LIST_ROW_TITLE_MAX
+    assert row["title"].endswith("…")
+    assert row["description"] == "₹10.00"
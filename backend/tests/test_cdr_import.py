@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from app.services.cdr_import import parse_timestamp, record_ended_at
+
+
+def test_end_time_wins():
+    payload = {"StartTime": "2026-10-01 09:00:00", "EndTime": "2026-10-01 09:05:00", "Duration": "300"}
+    assert record_ended_at(payload) == datetime(2026, 10, 1, 9, 5)
+
+
+def test_start_time_plus_duration():
+    payload = {"start_time": "2026-10-01T09:00:00Z", "duration": 90}
+    assert record_ended_at(payload) == datetime(2026, 10, 1, 9, 1, 30)
+
+
+def test_start_time_alone():
+    assert record_ended_at({"StartTime": "2026-10-01 09:00:00"}) == datetime(2026, 10, 1, 9)
+
+
+def test_missing_or_unparseable_time_is_none():
+    assert record_ended_at({"call_sid": "CA1"}) is None
+    assert record_ended_at({"EndTime": "yesterday", "StartTime": ""}) is None
+
+
+def test_formats_are_converted_to_naive_utc():
+    # Twilio's RFC 2822 timestamps
+    assert parse_timestamp("Thu, 01 Oct 2026 14:30:00 +0530") == datetime(2026, 10, 1, 9)
+    assert parse_timestamp("2026-10-01T14:30:00+05:30") == datetime(2026, 10, 1, 9)
+    assert parse_timestamp(1790845200) == datetime(2026, 10, 1, 9)
+    assert parse_timestamp(True) is None
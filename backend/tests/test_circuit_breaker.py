@@ -0,0 +1,166 @@
+import fakeredis
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    LocalCircuitStore,
+    RedisCircuitStore,
+)
+from app.services.whatsapp_errors import PERMANENT, REASON_AUTH, REASON_RECIPIENT, RETRYABLE, UNKNOWN
+
+TENANT = 7
+PHONE_NUMBER_ID = "1234"
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class BrokenStore:
+    def __getattr__(self, name):
+        def fail(*args):
+            raise ConnectionError("store down")
+        return fail
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["local", "redis"])
+def breaker(request, clock):
+    store = LocalCircuitStore() if request.param == "local" else RedisCircuitStore(fakeredis.FakeRedis())
+    return CircuitBreaker(store, failure_threshold=3, cooldown=60)
+
+
+def state(breaker):
+    return breaker.status(TENANT, PHONE_NUMBER_ID).state
+
+
+def open_circuit(breaker):
+    breaker.record_failure(TENANT, PHONE_NUMBER_ID, REASON_AUTH)
+    assert state(breaker) == OPEN
+
+
+def test_consecutive_failures_open_the_circuit(breaker):
+    for _ in range(2):
+        breaker.record_failure(TENANT, PHONE_NUMBER_ID, RETRYABLE)
+    assert state(breaker) == CLOSED
+    assert breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+    breaker.record_failure(TENANT, PHONE_NUMBER_ID, RETRYABLE)
+    assert state(breaker) == OPEN
+    assert breaker.is_open(TENANT, PHONE_NUMBER_ID)
+    assert not breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+
+def test_a_success_resets_the_failure_count(breaker):
+    for _ in range(2):
+        breaker.record_failure(TENANT, PHONE_NUMBER_ID, RETRYABLE)
+    breaker.record_success(TENANT, PHONE_NUMBER_ID)
+    for _ in range(2):
+        breaker.record_failure(TENANT, PHONE_NUMBER_ID, RETRYABLE)
+
+    assert state(breaker) == CLOSED
+
+
+def test_auth_failure_opens_at_once(breaker):
+    open_circuit(breaker)
+    assert breaker.status(TENANT, PHONE_NUMBER_ID).reason == REASON_AUTH
+
+
+def test_circuits_are_per_tenant_and_phone_number(breaker):
+    open_circuit(breaker)
+    assert breaker.allow(TENANT, "5678")
+    assert breaker.allow(TENANT + 1, PHONE_NUMBER_ID)
+
+
+def test_one_probe_after_the_cooldown_and_its_success_closes(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 59
+    assert not breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+    clock.now += 1
+    assert not breaker.is_open(TENANT, PHONE_NUMBER_ID)
+    assert breaker.allow(TENANT, PHONE_NUMBER_ID)
+    assert state(breaker) == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+    breaker.record_success(TENANT, PHONE_NUMBER_ID)
+    assert state(breaker) == CLOSED
+    assert breaker.allow(TENANT, PHONE_NUMBER_ID)
+    assert [t["state"] for t in breaker.transitions(TENANT, PHONE_NUMBER_ID)] == [CLOSED, HALF_OPEN, OPEN]
+
+
+def test_failed_probe_reopens_for_another_cooldown(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 60
+    assert breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+    breaker.record_failure(TENANT, PHONE_NUMBER_ID, RETRYABLE)
+    assert state(breaker) == OPEN
+    assert breaker.status(TENANT, PHONE_NUMBER_ID).opened_at == clock.now
+    assert not breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+    clock.now += 60
+    assert breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+
+def test_results_about_the_recipient_are_ignored(breaker):
+    recipient_failure = {"success": False, "error_category": PERMANENT, "error_reason": REASON_RECIPIENT}
+    for _ in range(5):
+        breaker.record_results(TENANT, PHONE_NUMBER_ID, [recipient_failure])
+
+    assert breaker.status(TENANT, PHONE_NUMBER_ID).failures == 0
+
+
+def test_results_count_transient_and_unknown_failures(breaker):
+    retryable = {"success": False, "error_category": RETRYABLE, "retryable": True}
+    unknown = {"success": False, "error_category": UNKNOWN, "retryable": False, "delivery_unknown": True}
+    breaker.record_results(TENANT, PHONE_NUMBER_ID, [retryable])
+    breaker.record_results(TENANT, PHONE_NUMBER_ID, [unknown])
+    breaker.record_results(TENANT, PHONE_NUMBER_ID, [retryable, unknown])
+
+    assert state(breaker) == OPEN
+
+
+def test_auth_result_opens_even_next_to_successes(breaker):
+    breaker.record_results(TENANT, PHONE_NUMBER_ID, [
+        {"success": True},
+        {"success": False, "error_category": PERMANENT, "error_reason": REASON_AUTH},
+    ])
+    assert state(breaker) == OPEN
+
+
+def test_reset_closes_and_frees_the_probe(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 60
+    assert breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+    breaker.reset(TENANT, PHONE_NUMBER_ID, reason="credentials_updated")
+    assert state(breaker) == CLOSED
+    assert breaker.transitions(TENANT, PHONE_NUMBER_ID)[0]["reason"] == "credentials_updated"
+
+    # A later trip gets its own probe
+    open_circuit(breaker)
+    clock.now += 60
+    assert breaker.allow(TENANT, PHONE_NUMBER_ID)
+
+
+def test_unreachable_store_falls_back_to_local_state(clock):
+    breaker = CircuitBreaker(BrokenStore(), failure_threshold=3, cooldown=60)
+
+    open_circuit(breaker)
+    assert not breaker.allow(TENANT, PHONE_NUMBER_ID)
@@ -0,0 +1,51 @@
+from sqlalchemy import select
+
+from app.models.call import Call
+from app.services.automation_journal import AUTOMATION_SUPERSEDED
+from app.services.delay_scheduler import DelayScheduler, LocalDelayBackend
+from app.workers import delay_poller
+
+PHONE = "+919876543210"
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def add_calls(Session, count):
+    db = Session()
+    calls = [Call(tenant_id=1, caller_phone=PHONE, automation_status="pending") for _ in range(count)]
+    db.add_all(calls)
+    db.commit()
+    ids = [call.id for call in calls]
+    db.close()
+    return ids
+
+
+def test_lost_send_replaced_by_a_later_call_is_marked_superseded(Session, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(delay_poller, "submit_automation", lambda *args, **kwargs: submitted.append(args[1]))
+    first, second = add_calls(Session, 2)
+    clock = FakeClock()
+    scheduler = DelayScheduler(LocalDelayBackend(), debounce=True, clock=clock)
+    poller = delay_poller.DelayPoller(scheduler, session_factory=Session)
+
+    scheduler.schedule(1, first, PHONE, 0)
+    # Claimed by a poller that dies before queueing it
+    scheduler.claim_due(10)
+    scheduler.schedule(1, second, PHONE, scheduler.claim_timeout + 10)
+
+    clock.now += scheduler.claim_timeout
+    assert poller.poll_once() == 0
+    clock.now += 10
+    assert poller.poll_once() == 1
+
+    assert submitted == [second]
+    db = Session()
+    status = db.execute(select(Call.automation_status).where(Call.id == first)).scalar_one()
+    db.close()
+    assert status == AUTOMATION_SUPERSEDED
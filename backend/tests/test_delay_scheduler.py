@@ -0,0 +1,123 @@
+import fakeredis
+import pytest
+
+from app.services.delay_scheduler import DelayScheduler, LocalDelayBackend, RedisDelayBackend
+
+TENANT = 7
+PHONE = "+919876543210"
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(params=["local", "redis"])
+def backend(request):
+    if request.param == "local":
+        return LocalDelayBackend()
+    return RedisDelayBackend(fakeredis.FakeRedis(), prefix="test:delay")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_scheduler(backend, clock, debounce=True):
+    return DelayScheduler(backend, debounce=debounce, clock=clock)
+
+
+def claim(scheduler, limit=10):
+    sends, superseded = scheduler.claim_due(limit)
+    assert superseded == []
+    return sends
+
+
+def test_debounce_replaces_the_waiting_send(backend, clock):
+    scheduler = make_scheduler(backend, clock)
+    assert scheduler.schedule(TENANT, 1, PHONE, 10) is None
+    clock.now += 5
+    # Same number: replaces call 1's send and restarts the delay
+    assert scheduler.schedule(TENANT, 2, PHONE, 10) == 1
+    assert scheduler.pending() == 1
+
+    clock.now += 6
+    assert claim(scheduler) == []
+    clock.now += 4
+    assert [send.call_id for send in claim(scheduler)] == [2]
+
+
+def test_rescheduling_the_same_call_replaces_nothing(backend, clock):
+    scheduler = make_scheduler(backend, clock)
+    scheduler.schedule(TENANT, 1, PHONE, 10)
+    assert scheduler.schedule(TENANT, 1, PHONE, 10) is None
+
+
+def test_without_debounce_each_call_keeps_its_send(backend, clock):
+    scheduler = make_scheduler(backend, clock, debounce=False)
+    scheduler.schedule(TENANT, 1, PHONE, 10)
+    assert scheduler.schedule(TENANT, 2, PHONE, 10) is None
+    clock.now += 10
+    assert sorted(send.call_id for send in claim(scheduler)) == [1, 2]
+
+
+def test_claim_due_takes_due_sends_oldest_first_up_to_limit(backend, clock):
+    scheduler = make_scheduler(backend, clock)
+    for call_id, delay in ((1, 30), (2, 10), (3, 20), (4, 5), (5, 100)):
+        scheduler.schedule(TENANT, call_id, f"+91900000000{call_id}", delay)
+    clock.now += 30
+
+    assert [send.call_id for send in claim(scheduler, 2)] == [4, 2]
+    assert [send.call_id for send in claim(scheduler)] == [3, 1]
+    assert claim(scheduler) == []
+    assert scheduler.pending() == 1
+
+
+def test_unacknowledged_claim_is_redelivered_after_claim_timeout(backend, clock):
+    scheduler = make_scheduler(backend, clock)
+    scheduler.schedule(TENANT, 1, PHONE, 0)
+    (send,) = claim(scheduler)
+
+    # The poller died before acknowledging
+    clock.now += scheduler.claim_timeout - 1
+    assert claim(scheduler) == []
+    clock.now += 1
+    assert [s.call_id for s in claim(scheduler)] == [send.call_id]
+
+
+def test_acknowledged_claim_is_not_redelivered(backend, clock):
+    scheduler = make_scheduler(backend, clock)
+    scheduler.schedule(TENANT, 1, PHONE, 0)
+    scheduler.ack(claim(scheduler))
+    clock.now += scheduler.claim_timeout + 1
+    assert claim(scheduler) == []
+
+
+def test_lost_claim_replaced_by_a_later_call_is_returned_as_superseded(backend, clock):
+    scheduler = make_scheduler(backend, clock)
+    scheduler.schedule(TENANT, 1, PHONE, 0)
+    claim(scheduler)
+    # The poller dies; meanwhile the same number calls again
+    scheduler.schedule(TENANT, 2, PHONE, scheduler.claim_timeout + 10)
+
+    clock.now += scheduler.claim_timeout
+    sends, superseded = scheduler.claim_due(10)
+    assert sends == [] and superseded == [1]
+    # Reported once, and the later call's send is still waiting
+    assert scheduler.claim_due(10) == ([], [])
+    clock.now += 10
+    assert [send.call_id for send in claim(scheduler)] == [2]
+
+
+def test_lost_claim_rescheduled_for_the_same_call_is_not_superseded(backend, clock):
+    scheduler = make_scheduler(backend, clock, debounce=False)
+    scheduler.schedule(TENANT, 1, PHONE, 0)
+    claim(scheduler)
+    scheduler.schedule(TENANT, 1, PHONE, 5)
+
+    clock.now += scheduler.claim_timeout
+    assert [send.call_id for send in claim(scheduler)] == [1]
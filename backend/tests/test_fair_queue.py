@@ -0,0 +1,167 @@
+import fakeredis
+import pytest
+
+from app.services.fair_queue import (
+    FairDispatcher,
+    FairQueue,
+    LocalFairQueueBackend,
+    RedisFairQueueBackend,
+)
+
+A, B, C = 1, 2, 3
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Lane:
+    """Collects what the dispatcher publishes to the live lane"""
+
+    def __init__(self):
+        self.published = []
+
+    def __call__(self, item, task_id):
+        self.published.append((item.tenant_id, item.call_id, task_id))
+
+    def calls(self, tenant_id=None):
+        return [call_id for tenant, call_id, _ in self.published if tenant_id in (None, tenant)]
+
+    def finish(self, backend, tenant_id):
+        """Complete the oldest in-flight task of a tenant"""
+        for index, (tenant, _, task_id) in enumerate(self.published):
+            if tenant == tenant_id:
+                backend.finish(tenant, task_id)
+                del self.published[index]
+                return
+
+
+@pytest.fixture(params=["local", "redis"])
+def backend(request):
+    if request.param == "local":
+        return LocalFairQueueBackend()
+    return RedisFairQueueBackend(fakeredis.FakeRedis(), prefix="test:fair")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def submit(backend, clock, tenant_id, count, first_call=1):
+    queue = FairQueue(backend, clock=clock)
+    for call_id in range(first_call, first_call + count):
+        queue.submit(tenant_id, call_id, "+919876543210")
+
+
+def make_dispatcher(backend, clock, capacity=4, max_share=0.5, quantum=1, task_timeout=60):
+    return FairDispatcher(
+        backend, capacity=capacity, max_share=max_share, quantum=quantum, task_timeout=task_timeout, clock=clock
+    )
+
+
+def test_each_tenant_is_served_in_order(backend, clock):
+    submit(backend, clock, A, 3)
+    dispatcher, lane = make_dispatcher(backend, clock, capacity=10, quantum=10), Lane()
+
+    assert dispatcher.dispatch_round(lane) == 3
+    assert lane.calls(A) == [1, 2, 3]
+    assert backend.active_tenants() == []
+
+
+def test_a_burst_does_not_hold_up_other_tenants(backend, clock):
+    submit(backend, clock, A, 50)
+    submit(backend, clock, B, 2, first_call=100)
+    dispatcher, lane = make_dispatcher(backend, clock, capacity=10), Lane()
+
+    dispatcher.dispatch_round(lane)
+    dispatcher.dispatch_round(lane)
+
+    # One each per round (quantum 1): B is done after two rounds despite A's backlog
+    assert lane.calls(B) == [100, 101]
+    assert lane.calls(A) == [1, 2]
+
+
+def test_a_tenant_is_capped_at_its_share_while_others_wait(backend, clock):
+    submit(backend, clock, A, 10)
+    submit(backend, clock, B, 10, first_call=100)
+    dispatcher, lane = make_dispatcher(backend, clock, capacity=4, quantum=10), Lane()
+
+    assert dispatcher.dispatch_round(lane) == 4
+    assert len(lane.calls(A)) == 2 and len(lane.calls(B)) == 2
+    # Lane full: nothing more until a task finishes
+    assert dispatcher.dispatch_round(lane) == 0
+
+    lane.finish(backend, A)
+    assert dispatcher.dispatch_round(lane) == 1
+    assert len(lane.calls(A)) == 2
+
+
+def test_a_tenant_alone_may_use_the_whole_lane(backend, clock):
+    submit(backend, clock, A, 10)
+    dispatcher, lane = make_dispatcher(backend, clock, capacity=4, quantum=10), Lane()
+
+    assert dispatcher.dispatch_round(lane) == 4
+
+
+def test_capped_tenant_does_not_bank_credit(backend, clock):
+    submit(backend, clock, A, 20)
+    submit(backend, clock, B, 20, first_call=100)
+    # Share cap 4 of 10: both tenants capped while the lane still has room
+    dispatcher, lane = make_dispatcher(backend, clock, capacity=10, max_share=0.4, quantum=1), Lane()
+
+    for _ in range(10):
+        dispatcher.dispatch_round(lane)
+    assert len(lane.calls(A)) == 4 and len(lane.calls(B)) == 4
+
+    # Once its slots free up, A gets one quantum, not the credit of every capped round
+    for _ in range(4):
+        lane.finish(backend, A)
+    assert dispatcher.dispatch_round(lane) == 1
+    assert len(lane.calls(A)) == 1
+
+
+def test_rounds_resume_after_the_last_tenant_served(backend, clock):
+    for tenant_id in (A, B, C):
+        submit(backend, clock, tenant_id, 2, first_call=tenant_id * 100)
+    dispatcher, lane = make_dispatcher(backend, clock, capacity=1), Lane()
+
+    served = []
+    for _ in range(3):
+        dispatcher.dispatch_round(lane)
+        tenant_id = lane.published[-1][0]
+        served.append(tenant_id)
+        lane.finish(backend, tenant_id)
+
+    assert served == [A, B, C]
+
+
+def test_slots_of_dead_tasks_expire(backend, clock):
+    submit(backend, clock, A, 5)
+    dispatcher, lane = make_dispatcher(backend, clock, capacity=2, quantum=10, task_timeout=60), Lane()
+    assert dispatcher.dispatch_round(lane) == 2
+
+    clock.now += 59
+    assert dispatcher.dispatch_round(lane) == 0
+    clock.now += 1
+    assert dispatcher.dispatch_round(lane) == 2
+
+
+def test_failed_publish_puts_the_task_back_first(backend, clock):
+    submit(backend, clock, A, 2)
+    dispatcher = make_dispatcher(backend, clock, capacity=4, quantum=10)
+
+    def broker_down(item, task_id):
+        raise ConnectionError("broker down")
+
+    with pytest.raises(ConnectionError):
+        dispatcher.dispatch_round(broker_down)
+
+    assert backend.in_flight(clock.now) == {}
+    lane = Lane()
+    dispatcher.dispatch_round(lane)
+    assert lane.calls(A) == [1, 2]
@@ -0,0 +1,176 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.services import media_cache, whatsapp_client
+from app.services.media_cache import LocalMediaStore, MediaCache
+from app.services.whatsapp_client import WhatsAppCloudAPIClient
+
+PHONE = "+919876543210"
+IMAGE_URL = "https://shop.test/images/kurta.jpg"
+
+
+class FakeBackend:
+    """Serves product images and the Graph media/messages endpoints"""
+
+    def __init__(self):
+        self.images = {IMAGE_URL: b"kurta"}
+        self.image_status = 200
+        self.upload_status = 200
+        self.reject_media_ids = False
+        self.downloads = 0
+        self.uploads = 0
+        self.sent_images = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        url = str(request.url)
+        if url in self.images:
+            self.downloads += 1
+            if self.image_status != 200:
+                return httpx.Response(self.image_status)
+            return httpx.Response(200, content=self.images[url], headers={"content-type": "image/jpeg"})
+        if url.endswith("/media"):
+            self.uploads += 1
+            if self.upload_status != 200:
+                return httpx.Response(self.upload_status, json={"error": {"code": 131053, "message": "bad"}})
+            return httpx.Response(200, json={"id": f"media-{self.uploads}"})
+        image = json.loads(request.content)["image"]
+        self.sent_images.append(image)
+        if "id" in image and self.reject_media_ids:
+            return httpx.Response(400, json={"error": {"code": 131053, "message": "Media upload error"}})
+        return httpx.Response(200, json={"messages": [{"id": f"wamid.{len(self.sent_images)}"}]})
+
+
+class BrokenStore:
+    """A shared store that is unreachable"""
+
+    async def get(self, key):
+        raise ConnectionError("store down")
+
+    async def set(self, key, value, ttl):
+        raise ConnectionError("store down")
+
+    async def delete(self, key):
+        raise ConnectionError("store down")
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "WHATSAPP_RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "WHATSAPP_SEND_MAX_ATTEMPTS", 1)
+    fake = FakeBackend()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    monkeypatch.setattr(media_cache, "get_http_client", lambda name: client)
+    monkeypatch.setattr(whatsapp_client, "get_http_client", lambda name: client)
+    return fake
+
+
+def make_client(cache):
+    return WhatsAppCloudAPIClient(
+        "1234", "token", media_cache=cache, base_url="https://graph.test/v18.0", tenant_id=1
+    )
+
+
+@pytest.mark.asyncio
+async def test_image_is_uploaded_once_then_sent_by_media_id(backend):
+    client = make_client(MediaCache(store=LocalMediaStore()))
+
+    for _ in range(3):
+        assert (await client.send_image_message(PHONE, IMAGE_URL))["success"] is True
+
+    assert backend.uploads == 1 and backend.downloads == 1
+    assert backend.sent_images == [{"id": "media-1"}] * 3
+
+
+@pytest.mark.asyncio
+async def test_identical_content_under_another_url_reuses_the_media_id(backend):
+    backend.images["https://cdn.test/kurta.jpg?v=2"] = b"kurta"
+    client = make_client(MediaCache(store=LocalMediaStore()))
+
+    await client.send_image_message(PHONE, IMAGE_URL)
+    await client.send_image_message(PHONE, "https://cdn.test/kurta.jpg?v=2")
+
+    assert backend.uploads == 1 and backend.downloads == 2
+    assert backend.sent_images == [{"id": "media-1"}] * 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sends_share_one_upload(backend):
+    client = make_client(MediaCache(store=LocalMediaStore()))
+
+    results = await asyncio.gather(*(client.send_image_message(PHONE, IMAGE_URL) for _ in range(5)))
+
+    assert all(result["success"] for result in results)
+    assert backend.uploads == 1 and backend.downloads == 1
+
+
+@pytest.mark.asyncio
+async def test_media_ids_are_per_phone_number(backend):
+    cache = MediaCache(store=LocalMediaStore())
+    other = WhatsAppCloudAPIClient("5678", "token", media_cache=cache, base_url="https://graph.test/v18.0")
+
+    await make_client(cache).send_image_message(PHONE, IMAGE_URL)
+    await other.send_image_message(PHONE, IMAGE_URL)
+
+    assert backend.uploads == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("broken", ["image_status", "upload_status"])
+async def test_failed_download_or_upload_falls_back_to_the_link(backend, broken):
+    setattr(backend, broken, 500)
+    client = make_client(MediaCache(store=LocalMediaStore()))
+
+    result = await client.send_image_message(PHONE, IMAGE_URL, caption="Kurta")
+
+    assert result["success"] is True
+    assert backend.sent_images == [{"link": IMAGE_URL, "caption": "Kurta"}]
+
+
+@pytest.mark.asyncio
+async def test_rejected_media_id_is_resent_by_link_and_forgotten(backend):
+    client = make_client(MediaCache(store=LocalMediaStore()))
+    await client.send_image_message(PHONE, IMAGE_URL)
+
+    backend.reject_media_ids = True
+    result = await client.send_image_message(PHONE, IMAGE_URL, caption="Kurta")
+
+    assert result["success"] is True
+    assert backend.sent_images[-2:] == [{"id": "media-1", "caption": "Kurta"}, {"link": IMAGE_URL, "caption": "Kurta"}]
+
+    # The next send uploads again instead of reusing the rejected ID
+    backend.reject_media_ids = False
+    await client.send_image_message(PHONE, IMAGE_URL)
+    assert backend.uploads == 2
+    assert backend.sent_images[-1] == {"id": "media-2"}
+
+
+@pytest.mark.asyncio
+async def test_media_id_close_to_expiry_is_uploaded_again(backend, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "WHATSAPP_MEDIA_TTL_SECONDS", 3600)
+    monkeypatch.setattr(settings, "WHATSAPP_MEDIA_REFRESH_MARGIN_SECONDS", 3600)
+    client = make_client(MediaCache(store=LocalMediaStore()))
+
+    await client.send_image_message(PHONE, IMAGE_URL)
+    await client.send_image_message(PHONE, IMAGE_URL)
+
+    assert backend.uploads == 2
+    assert backend.sent_images == [{"id": "media-1"}, {"id": "media-2"}]
+
+
+@pytest.mark.asyncio
+async def test_unreachable_store_falls_back_to_the_local_cache(backend):
+    cache = MediaCache(store=BrokenStore())
+    client = make_client(cache)
+
+    await client.send_image_message(PHONE, IMAGE_URL)
+    await client.send_image_message(PHONE, IMAGE_URL)
+
+    assert backend.uploads == 1
+    assert backend.sent_images == [{"id": "media-1"}] * 2
+    assert not cache._store_available()
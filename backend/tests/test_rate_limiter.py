@@ -0,0 +1,101 @@
+import pytest
+
+from app.services.rate_limiter import BucketSpec, LocalBucketBackend, RateLimiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FailingBackend:
+    def __init__(self):
+        self.calls = 0
+
+    async def try_acquire(self, specs):
+        self.calls += 1
+        raise ConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_bucket_empties_then_refills_at_rate():
+    clock = FakeClock()
+    backend = LocalBucketBackend(clock=clock)
+    spec = [BucketSpec("phone", rate=2.0, capacity=2)]
+
+    assert await backend.try_acquire(spec) == 0
+    assert await backend.try_acquire(spec) == 0
+    assert await backend.try_acquire(spec) == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert await backend.try_acquire(spec) == 0
+    assert await backend.try_acquire(spec) == pytest.approx(0.5)
+
+
+@pytest.mark.asyncio
+async def test_refill_is_capped_at_capacity():
+    clock = FakeClock()
+    backend = LocalBucketBackend(clock=clock)
+    spec = [BucketSpec("phone", rate=10.0, capacity=3)]
+
+    clock.now += 60
+    for _ in range(3):
+        assert await backend.try_acquire(spec) == 0
+    assert await backend.try_acquire(spec) > 0
+
+
+@pytest.mark.asyncio
+async def test_phone_and_pair_buckets_are_consumed_together():
+    clock = FakeClock()
+    backend = LocalBucketBackend(clock=clock)
+    phone = BucketSpec("phone", rate=100.0, capacity=100)
+    pair = BucketSpec("pair", rate=1.0, capacity=1)
+
+    assert await backend.try_acquire([phone, pair]) == 0
+    # The pair bucket is empty: nothing is taken from either bucket
+    assert await backend.try_acquire([phone, pair]) == pytest.approx(1.0)
+    # 99 left in the phone bucket for other recipients
+    for _ in range(99):
+        assert await backend.try_acquire([phone]) == 0
+    assert await backend.try_acquire([phone]) > 0
+
+
+@pytest.mark.asyncio
+async def test_acquire_refuses_when_wait_exceeds_max_wait():
+    clock = FakeClock()
+    limiter = RateLimiter(backend=LocalBucketBackend(clock=clock))
+    specs = limiter.bucket_specs("pn-1", recipient="+15550001")
+    pair = specs[1]
+
+    for _ in range(int(pair.capacity)):
+        assert await limiter.acquire("pn-1", recipient="+15550001", max_wait=0)
+    # The next pair token is 1 / rate (~6s) away
+    assert not await limiter.acquire("pn-1", recipient="+15550001", max_wait=1)
+    # Other recipients of the same number are not held back
+    assert await limiter.acquire("pn-1", recipient="+15550002", max_wait=0)
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_local_buckets_while_backend_is_down():
+    clock = FakeClock()
+    failing = FailingBackend()
+    limiter = RateLimiter(backend=failing, fallback=LocalBucketBackend(clock=clock), redis_retry_after=30)
+
+    assert await limiter.acquire("pn-1", max_wait=0)
+    assert await limiter.acquire("pn-1", max_wait=0)
+    # The backend is not retried until redis_retry_after has passed
+    assert failing.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_fallback_enforces_the_same_limits():
+    clock = FakeClock()
+    limiter = RateLimiter(backend=FailingBackend(), fallback=LocalBucketBackend(clock=clock))
+    rate = int(limiter.bucket_specs("pn-1")[0].capacity)
+
+    for _ in range(rate):
+        assert await limiter.acquire("pn-1", max_wait=0)
+    assert not await limiter.acquire("pn-1", max_wait=0)
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import hmac
+from urllib.parse import urlencode
+
+import pytest
+
+from app.services import call_events
+from app.services.call_events import WebhookBody, extract_call_event
+from app.services.telephony import (
+    detect_adapter,
+    get_adapter,
+    registered_providers,
+    resolve_adapter,
+    signed_by,
+)
+
+TWILIO = {
+    "CallSid": "CA123",
+    "AccountSid": "AC456",
+    "From": "+919876543210",
+    "To": "+911234567890",
+    "CallStatus": "completed",
+    "CallDuration": "42",
+}
+EXOTEL = {
+    "CallSid": "ex-1",
+    "CallFrom": "09876543210",
+    "CallTo": "01234567890",
+    "Status": "no_answer",
+    "DialCallDuration": "",
+}
+GENERIC = {"call_id": "g-1", "caller": "+919876543210", "receiver": "+911234567890", "duration": 7}
+SECRET = "s3cret"
+
+
+def test_every_provider_module_registers_itself():
+    assert registered_providers() == ["twilio", "exotel", "generic"]
+
+
+@pytest.mark.parametrize("payload, provider", [(TWILIO, "twilio"), (EXOTEL, "exotel"), (GENERIC, "generic")])
+def test_detection_by_payload(payload, provider):
+    assert detect_adapter(payload).name == provider
+
+
+def test_hint_wins_over_detection():
+    assert resolve_adapter(TWILIO, "exotel").name == "exotel"
+    assert resolve_adapter(TWILIO, None, {"x-telephony-provider": "Generic"}).name == "generic"
+    # Unknown hints fall back to detection
+    assert resolve_adapter(TWILIO, "acme-telecom").name == "twilio"
+
+
+def test_payloads_are_normalized_to_call_events():
+    twilio = extract_call_event(TWILIO)
+    assert (twilio.provider, twilio.call_sid, twilio.caller_phone, twilio.status, twilio.duration_seconds) == (
+        "twilio", "CA123", "+919876543210", "completed", 42
+    )
+
+    exotel = extract_call_event(EXOTEL)
+    assert (exotel.provider, exotel.caller_phone, exotel.status, exotel.duration_seconds) == (
+        "exotel", "09876543210", "no-answer", None
+    )
+
+    generic = extract_call_event(GENERIC)
+    assert (generic.provider, generic.call_sid, generic.status, generic.duration_seconds) == (
+        "generic", "g-1", "completed", 7
+    )
+
+
+def test_signature_header_picks_the_adapter():
+    adapter, signature = signed_by({"x-twilio-signature": "abc"})
+    assert (adapter.name, signature) == ("twilio", "abc")
+    assert signed_by({"x-webhook-signature": "def"})[0].name == "generic"
+    assert signed_by({}) == (None, None)
+
+
+def test_twilio_signature_over_url_and_sorted_params():
+    url = "https://api.test/api/v1/webhooks/call-ended/acme/twilio"
+    signed = url + "".join(f"{k}{v}" for k, v in sorted(TWILIO.items()))
+    signature = base64.b64encode(hmac.new(SECRET.encode(), signed.encode(), hashlib.sha1).digest()).decode()
+    body = urlencode(TWILIO).encode()
+    twilio = get_adapter("twilio")
+
+    assert twilio.verify_signature(body, signature, SECRET, url, lambda: TWILIO)
+    assert not twilio.verify_signature(body, signature, "other", url, lambda: TWILIO)
+    assert not twilio.verify_signature(body, signature, SECRET, url + "?x=1", lambda: TWILIO)
+    # Hex HMAC-SHA1 of the raw body is still accepted
+    legacy = hmac.new(SECRET.encode(), body, hashlib.sha1).hexdigest()
+    assert twilio.verify_signature(body, legacy, SECRET, url, lambda: TWILIO)
+
+
+def test_generic_signature_does_not_decode_the_body():
+    body = b'{"call_id": "g-1"}'
+    signature = hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+    def load_payload():
+        raise AssertionError("body decoded")
+
+    assert get_adapter("generic").verify_signature(body, signature, SECRET, "", load_payload)
+    assert not get_adapter("generic").verify_signature(body + b" ", signature, SECRET, "", load_payload)
+
+
+def test_body_is_decoded_once_and_only_when_needed(monkeypatch):
+    decoded = []
+    parse = call_events.parse_webhook_body
+    monkeypatch.setattr(call_events, "parse_webhook_body", lambda raw, ct: decoded.append(raw) or parse(raw, ct))
+    body = WebhookBody(urlencode(TWILIO).encode(), "application/x-www-form-urlencoded")
+    assert decoded == []
+
+    assert body.payload == TWILIO
+    assert body.payload is body.payload
+    assert len(decoded) == 1
@@ -0,0 +1,172 @@
+import time
+
+import fakeredis
+import pytest
+
+from app.models.tenant import Tenant
+from app.models.tenant_settings import TenantSettings
+from app.services import tenant_routing
+from app.services.tenant_routing import TenantRoute, TenantRouteCache, load_tenant_route
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Loader:
+    """Counts database loads; returns the routes it knows"""
+
+    def __init__(self, *routes):
+        self.routes = {route.slug: route for route in routes}
+        self.calls = 0
+
+    def __call__(self, slug):
+        def load():
+            self.calls += 1
+            return self.routes.get(slug)
+        return load
+
+
+def route(tenant_id, slug):
+    return TenantRoute(tenant_id=tenant_id, slug=slug, has_settings=True, is_active=True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(tenant_routing.time, "monotonic", clock)
+    return clock
+
+
+def test_hit_after_the_first_load(clock):
+    cache, loader = TenantRouteCache(ttl=60, max_size=10), Loader(route(1, "acme"))
+
+    assert cache.get("acme", loader("acme")) == route(1, "acme")
+    assert cache.get("acme", loader("acme")) == route(1, "acme")
+
+    assert loader.calls == 1
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_unknown_slugs_are_not_cached(clock):
+    cache, loader = TenantRouteCache(ttl=60, max_size=10), Loader()
+
+    assert cache.get("nobody", loader("nobody")) is None
+    assert cache.get("nobody", loader("nobody")) is None
+    assert loader.calls == 2
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache, loader = TenantRouteCache(ttl=60, max_size=10), Loader(route(1, "acme"))
+    cache.get("acme", loader("acme"))
+
+    clock.now += 59
+    cache.get("acme", loader("acme"))
+    assert loader.calls == 1
+
+    clock.now += 1
+    cache.get("acme", loader("acme"))
+    assert loader.calls == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TenantRouteCache(ttl=60, max_size=2)
+    loader = Loader(route(1, "a"), route(2, "b"), route(3, "c"))
+    cache.get("a", loader("a"))
+    cache.get("b", loader("b"))
+    cache.get("a", loader("a"))  # "b" is now the oldest
+    cache.get("c", loader("c"))
+
+    cache.get("a", loader("a"))
+    assert loader.calls == 3
+    cache.get("b", loader("b"))
+    assert loader.calls == 4
+
+
+def test_invalidate_evicts_only_that_tenant(clock):
+    cache, loader = TenantRouteCache(ttl=60, max_size=10), Loader(route(1, "a"), route(2, "b"))
+    cache.get("a", loader("a"))
+    cache.get("b", loader("b"))
+
+    cache.invalidate(1)
+
+    cache.get("b", loader("b"))
+    assert loader.calls == 2
+    cache.get("a", loader("a"))
+    assert loader.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_async_loader(clock):
+    cache, calls = TenantRouteCache(ttl=60, max_size=10), []
+
+    async def load():
+        calls.append(1)
+        return route(1, "acme")
+
+    assert await cache.get_async("acme", load) == route(1, "acme")
+    assert await cache.get_async("acme", load) == route(1, "acme")
+    assert len(calls) == 1
+
+
+def test_invalidation_reaches_the_other_replicas(monkeypatch):
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(tenant_routing, "get_redis", lambda: redis)
+    replica, other = TenantRouteCache(ttl=60, max_size=10), TenantRouteCache(ttl=60, max_size=10)
+    loader = Loader(route(1, "acme"))
+
+    deadline = time.monotonic() + 5
+
+    def wait_until(condition):
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    replica._ensure_listener()
+    wait_until(lambda: redis.pubsub_numsub(tenant_routing.INVALIDATION_CHANNEL)[0][1])
+    # A (re)subscribing listener drops everything once; wait for that before loading
+    time.sleep(0.1)
+    replica.get("acme", loader("acme"))
+    replica.get("acme", loader("acme"))
+    assert loader.calls == 1
+
+    other.invalidate(1)
+    wait_until(lambda: replica.stats()["size"] == 0)
+    replica.get("acme", loader("acme"))
+    assert loader.calls == 2
+
+
+def test_load_tenant_route(Session):
+    with Session() as db:
+        db.add_all([
+            Tenant(id=1, name="Acme", slug="acme"),
+            Tenant(id=2, name="New", slug="new"),
+            Tenant(id=3, name="Gone", slug="gone", is_active=False),
+            TenantSettings(
+                tenant_id=1,
+                is_active=True,
+                webhook_secret_key="s3cret",
+                is_whatsapp_configured=True,
+                message_delay_seconds=30,
+                whatsapp_phone_number_id="1234",
+            ),
+        ])
+        db.commit()
+
+        assert load_tenant_route(db, "acme") == TenantRoute(
+            tenant_id=1,
+            slug="acme",
+            has_settings=True,
+            is_active=True,
+            webhook_secret_key="s3cret",
+            is_whatsapp_configured=True,
+            message_delay_seconds=30,
+            whatsapp_phone_number_id="1234",
+        )
+        assert load_tenant_route(db, "new") == TenantRoute(tenant_id=2, slug="new", has_settings=False)
+        assert load_tenant_route(db, "gone") is None
+        assert load_tenant_route(db, "nobody") is None
@@ -0,0 +1,147 @@
+import httpx
+import pytest
+
+from app.core.config import get_settings
+from app.services import whatsapp_client
+from app.services.whatsapp_client import WhatsAppCloudAPIClient
+from app.services.whatsapp_errors import PERMANENT, REASON_RECIPIENT, RETRYABLE, THROTTLED, UNKNOWN
+
+PHONE = "+919876543210"
+
+
+class FakeGraphAPI:
+    """Stands in for the messages endpoint: replies (or raises) from a script, one per POST"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.posts = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.posts += 1
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+
+def sent(message_id="wamid.1"):
+    return httpx.Response(200, json={"messages": [{"id": message_id}]})
+
+
+def graph_error(status_code, code, headers=None):
+    return httpx.Response(status_code, json={"error": {"code": code, "message": "error"}}, headers=headers)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "WHATSAPP_RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "WHATSAPP_SEND_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "WHATSAPP_RETRY_BASE_DELAY", 0.0)
+
+    def install(*replies):
+        fake = FakeGraphAPI(*replies)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+        monkeypatch.setattr(whatsapp_client, "get_http_client", lambda phone_number_id: client)
+        return fake
+
+    return install
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(whatsapp_client.asyncio, "sleep", sleep)
+    return delays
+
+
+def make_client():
+    return WhatsAppCloudAPIClient("1234", "token", base_url="https://graph.test/v18.0", tenant_id=1)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [
+    httpx.ReadTimeout("read timed out"),
+    httpx.RemoteProtocolError("server disconnected"),
+    httpx.ReadError("connection reset"),
+])
+async def test_failure_after_the_request_left_is_not_resent(api, error):
+    fake = api(error)
+    result = await make_client().send_text_message(PHONE, "Thanks for calling")
+
+    assert fake.posts == 1
+    assert result["success"] is False
+    assert result["error_category"] == UNKNOWN
+    assert result["delivery_unknown"] is True
+    assert result["retryable"] is False
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("connection refused"),
+    httpx.ConnectTimeout("connect timed out"),
+])
+async def test_request_that_never_left_is_retried(api, error):
+    fake = api(error, sent())
+    result = await make_client().send_text_message(PHONE, "Thanks for calling")
+
+    assert fake.posts == 2
+    assert result["success"] is True
+    assert result["message_id"] == "wamid.1"
+
+
+@pytest.mark.asyncio
+async def test_connect_failures_give_up_retryable(api):
+    fake = api(httpx.ConnectError("connection refused"))
+    result = await make_client().send_text_message(PHONE, "Thanks for calling")
+
+    assert fake.posts == 3
+    assert result["error_category"] == RETRYABLE
+    assert result["retryable"] is True and result["delivery_unknown"] is False
+
+
+@pytest.mark.asyncio
+async def test_throttled_send_waits_for_retry_after(api, sleeps, monkeypatch):
+    monkeypatch.setattr(get_settings(), "WHATSAPP_RETRY_MAX_DELAY", 5.0)
+    fake = api(graph_error(429, 130429, {"Retry-After": "2"}), sent())
+    result = await make_client().send_text_message(PHONE, "Thanks for calling")
+
+    assert fake.posts == 2
+    assert result["success"] is True and result["attempts"] == 2
+    assert sleeps == [2.0]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_beyond_the_max_delay_gives_up_retryable(api, sleeps, monkeypatch):
+    monkeypatch.setattr(get_settings(), "WHATSAPP_RETRY_MAX_DELAY", 5.0)
+    fake = api(graph_error(429, 130429, {"Retry-After": "60"}))
+    result = await make_client().send_text_message(PHONE, "Thanks for calling")
+
+    assert fake.posts == 1
+    assert sleeps == []
+    assert result["error_category"] == THROTTLED
+    assert result["retryable"] is True
+
+
+@pytest.mark.asyncio
+async def test_transient_graph_error_is_retried(api, sleeps):
+    fake = api(graph_error(500, 131000), sent())
+    result = await make_client().send_text_message(PHONE, "Thanks for calling")
+
+    assert fake.posts == 2
+    assert result["success"] is True
+
+
+@pytest.mark.asyncio
+async def test_permanent_graph_error_is_not_retried(api, sleeps):
+    fake = api(graph_error(400, 131026))
+    result = await make_client().send_text_message(PHONE, "Thanks for calling")
+
+    assert fake.posts == 1
+    assert result["error_category"] == PERMANENT
+    assert result["error_reason"] == REASON_RECIPIENT
+    assert result["retryable"] is False and result["delivery_unknown"] is False
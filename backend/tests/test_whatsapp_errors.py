@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from app.services.whatsapp_errors import (
+    PERMANENT,
+    REASON_AUTH,
+    REASON_RECIPIENT,
+    RETRYABLE,
+    THROTTLED,
+    backoff_delay,
+    classify_error,
+    error_reason,
+    parse_retry_after,
+)
+
+
+@pytest.mark.parametrize("status_code, error_code, category", [
+    (400, 130429, THROTTLED),  # throughput reached: the Graph code wins over the 400
+    (429, None, THROTTLED),
+    (400, 131000, RETRYABLE),
+    (503, None, RETRYABLE),
+    (500, 190, PERMANENT),     # expired token is permanent whatever the status
+    (400, 131026, PERMANENT),
+    (400, None, PERMANENT),    # unknown 4xx: the request itself is wrong
+])
+def test_classify_error(status_code, error_code, category):
+    assert classify_error(status_code, error_code) == category
+
+
+def test_error_reason_says_what_has_to_change():
+    assert error_reason(190) == REASON_AUTH
+    assert error_reason(131026) == REASON_RECIPIENT
+    assert error_reason(131000) is None
+
+
+def test_retry_after_in_seconds():
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after(" 0.5 ") == 0.5
+    assert parse_retry_after("-3") == 0.0
+
+
+def test_retry_after_as_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 <= parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_missing_or_unreadable_retry_after_is_none(value):
+    assert parse_retry_after(value) is None
+
+
+def test_backoff_grows_with_the_attempt_up_to_the_cap(monkeypatch):
+    # Full jitter: take the top of the range
+    monkeypatch.setattr("app.services.whatsapp_errors.random.uniform", lambda low, high: high)
+
+    assert [backoff_delay(attempt, 0.5, 3.0) for attempt in range(5)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_backoff_is_jittered_below_the_cap():
+    delays = [backoff_delay(3, 0.5, 3.0) for _ in range(200)]
+    assert all(0 <= delay <= 3.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_after_is_a_floor_for_the_backoff(monkeypatch):
+    monkeypatch.setattr("app.services.whatsapp_errors.random.uniform", lambda low, high: low)
+
+    assert backoff_delay(0, 0.5, 3.0, retry_after=2.0) == 2.0
+    # Longer than the cap: returned as is, the client then gives up instead of waiting
+    assert backoff_delay(0, 0.5, 3.0, retry_after=10.0) == 10.0